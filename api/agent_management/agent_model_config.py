@@ -5,6 +5,8 @@ This module defines which models should be used by different agents in the pipel
 allowing for centralized control over model selection for different tasks.
 """
 
+import logging
+import os
 from enum import Enum
 from typing import Dict, List, Optional
 from pydantic import BaseModel
@@ -12,6 +14,8 @@ from pydantic import BaseModel
 from agent_management.llm_service import ProviderType
 from agent_management.model_config import ModelCategory
 
+logger = logging.getLogger(__name__)
+
 class AgentType(str, Enum):
     """Types of agents in the visualization pipeline"""
     DOMAIN_VALIDATOR = "domain_validator"
@@ -30,6 +34,9 @@ class AgentModelConfig(BaseModel):
     fallback_models: List[str] = []
     required_categories: List[ModelCategory] = []
     provider_preference: Optional[ProviderType] = None
+    # p95 latency the agent should get; when the preferred model is measured
+    # slower than this, a faster model meeting required_categories is used
+    latency_slo_ms: Optional[float] = None
     description: str
 
 # Default agent model configurations
@@ -39,6 +46,7 @@ DEFAULT_AGENT_MODELS = [
         preferred_model="o3-mini",  # Fast, cost-effective
         fallback_models=["gpt-4o", "claude-3-5-sonnet-latest"],
         required_categories=[ModelCategory.GENERAL],
+        latency_slo_ms=5000,
         description="Validates if user prompts are scientific in nature"
     ),
     
@@ -79,6 +87,7 @@ DEFAULT_AGENT_MODELS = [
         preferred_model="o3-mini",  # Simple task, cost-effective model
         fallback_models=["gpt-4o", "llama3-70b-8192"],
         required_categories=[ModelCategory.GENERAL],
+        latency_slo_ms=10000,
         description="Generates captions for animation frames"
     ),
     
@@ -99,6 +108,9 @@ DEFAULT_AGENT_MODELS = [
     )
 ]
 
+# Highest recent error rate at which latency routing still considers a model healthy
+DEFAULT_MAX_ERROR_RATE = 0.2
+
 # Create a lookup dictionary for faster access
 AGENT_MODEL_MAP: Dict[AgentType, AgentModelConfig] = {
     config.agent_type: config for config in DEFAULT_AGENT_MODELS
@@ -140,6 +152,90 @@ def get_agent_config(agent_type: AgentType) -> AgentModelConfig:
     
     return AGENT_MODEL_MAP[agent_type]
 
+def latency_routing_enabled() -> bool:
+    """Whether agents with a latency SLO are routed by measured latency (LATENCY_ROUTING_ENABLED)"""
+    return os.environ.get("LATENCY_ROUTING_ENABLED", "1").lower() not in ("0", "false", "no")
+
+def get_latency_slo_ms(config: AgentModelConfig) -> Optional[float]:
+    """The agent's latency SLO, overridable with LATENCY_SLO_<AGENT>_MS (0 disables it)"""
+    override = os.environ.get(f"LATENCY_SLO_{config.agent_type.value.upper()}_MS")
+    slo = float(override) if override else config.latency_slo_ms
+    return slo if slo else None
+
+def route_by_latency(config: AgentModelConfig, candidates: List[str]) -> List[str]:
+    """
+    Order an agent's candidate models by how well they currently meet its latency SLO.
+    
+    The configured order is kept while the preferred model meets the SLO (or
+    hasn't been measured yet). Otherwise the models meeting the agent's
+    required categories join the candidates, cheapest first, and the order
+    becomes: models measured within the SLO or not measured yet (in
+    configured order), then the other healthy models, fastest first, then
+    models failing too often.
+    
+    Args:
+        config: The agent's model configuration
+        candidates: The preferred model followed by the fallbacks
+        
+    Returns:
+        The candidates in the order they should be tried
+    """
+    from agent_management.model_config import get_models_by_category
+    from agent_management.model_performance import ModelPerformance, model_performance
+    from agent_management.usage_tracker import estimate_cost
+    
+    slo = get_latency_slo_ms(config)
+    if slo is None or not latency_routing_enabled():
+        return candidates
+    
+    max_error_rate = float(os.environ.get("LATENCY_ROUTING_MAX_ERROR_RATE", DEFAULT_MAX_ERROR_RATE))
+    agent = config.agent_type.value
+    
+    def status(performance: Optional[ModelPerformance]) -> str:
+        if performance is None:
+            return "unknown"
+        if performance.error_rate > max_error_rate:
+            return "failing"
+        if performance.p95_ms is None or performance.p95_ms > slo:
+            return "slow"
+        return "ok"
+    
+    # Each model is measured once, so its status and latency can't disagree
+    # when samples age out in between
+    performances = {candidates[0]: model_performance.performance(candidates[0], agent)}
+    if status(performances[candidates[0]]) in ("ok", "unknown"):
+        return candidates
+    
+    # Widen the search to every model with the required capabilities, cheapest first
+    extra = {
+        model
+        for category in config.required_categories
+        for model in get_models_by_category(category)
+        if model not in candidates
+    }
+    def price(model: str) -> Optional[float]:
+        return estimate_cost(model, 1000, 1000)
+    
+    pool = candidates + sorted(extra, key=lambda model: (price(model) is None, price(model) or 0.0, model))
+    
+    for model in pool:
+        if model not in performances:
+            performances[model] = model_performance.performance(model, agent)
+    statuses = {model: status(performances[model]) for model in pool}
+    meeting = [model for model in pool if statuses[model] in ("ok", "unknown")]
+    slow = sorted(
+        (model for model in pool if statuses[model] == "slow"),
+        key=lambda model: performances[model].p95_ms or float("inf"),
+    )
+    failing = [model for model in pool if statuses[model] == "failing"]
+    ordered = meeting + slow + failing
+    if ordered[0] != candidates[0]:
+        logger.info(
+            f"{candidates[0]} misses the {slo:.0f}ms latency SLO of {agent} ({statuses[candidates[0]]}); "
+            f"routing to {ordered[0]}"
+        )
+    return ordered
+
 def create_agent_llm_service(agent_type: AgentType, override_model: Optional[str] = None) -> 'LLMService':
     """
     Create an LLMService configured for a specific agent.
@@ -155,36 +251,58 @@ def create_agent_llm_service(agent_type: AgentType, override_model: Optional[str
         ValueError: If the agent type is not configured or if model is not found
     """
     from agent_management.model_config import get_llm_service, ModelRegistry
+    from agent_management.hedging import HedgedLLMService, hedging_enabled
+    from agent_management.circuit_breaker import circuit_breakers
     
     # Get the agent's model configuration
     config = get_agent_config(agent_type)
     
     # Use the override model if provided, otherwise use the preferred model
     model_name = override_model or config.preferred_model
+    candidates = [model_name] if override_model else [model_name, *config.fallback_models]
+    if not override_model:
+        # Agents with a latency SLO move off a preferred model that is measured too slow
+        candidates = route_by_latency(config, candidates)
     
-    # Try to create an LLM service with the selected model
-    try:
-        return get_llm_service(model_name)
-    except ValueError:
-        # If the preferred model is not available, try fallback models
-        if not override_model and config.fallback_models:
-            for fallback_model in config.fallback_models:
-                try:
-                    return get_llm_service(fallback_model)
-                except ValueError:
-                    continue
+    # Use the first model that can be created and whose circuit isn't open
+    tripped = None
+    for candidate in candidates:
+        try:
+            service = get_llm_service(candidate, agent=agent_type.value)
+        except ValueError:
+            # If the model is not available, try the next fallback
+            continue
+        
+        if not override_model and not circuit_breakers.available(
+            service.config.provider, service.config.model_name
+        ):
+            # Skip a model that is failing right now instead of waiting for its retries
+            logger.warning(f"Circuit for {candidate} is open; trying the next fallback for {agent_type.value}")
+            tripped = tripped or service
+            continue
         
-        # If we still don't have a model, try to find one that matches the requirements
-        if config.required_categories:
-            from agent_management.model_config import get_models_by_category
-            
-            for category in config.required_categories:
-                models = get_models_by_category(category)
-                if models:
-                    return get_llm_service(models[0])
+        backups = [m for m in config.fallback_models if m != candidate]
+        if not override_model and backups and hedging_enabled():
+            # Slow structured calls are raced against the next fallback model
+            return HedgedLLMService(service.config, agent=agent_type.value, fallback_models=backups)
+        return service
+    
+    # Every configured model is tripped: use the first one, which fails fast
+    # until a half-open probe finds it healthy again
+    if tripped is not None:
+        return tripped
+    
+    # If we still don't have a model, try to find one that matches the requirements
+    if config.required_categories:
+        from agent_management.model_config import get_models_by_category
         
-        # If we get here, we couldn't find a suitable model
-        raise ValueError(
-            f"No suitable model found for agent {agent_type}. "
-            f"Tried preferred model '{config.preferred_model}' and fallbacks."
-        )
\ No newline at end of file
+        for category in config.required_categories:
+            models = get_models_by_category(category)
+            if models:
+                return get_llm_service(models[0], agent=agent_type.value)
+    
+    # If we get here, we couldn't find a suitable model
+    raise ValueError(
+        f"No suitable model found for agent {agent_type}. "
+        f"Tried preferred model '{config.preferred_model}' and fallbacks."
+    )
\ No newline at end of file
@@ -3,95 +3,15 @@ Animation Agent - Generates animation code for Three.js scenes based on script a
 Specialized for scientific visualizations including molecular structures.
 """
 
-from typing import Dict, List, Optional, Any
+from typing import AsyncIterator, Dict, List, Optional, Any, Union
 import re
 from agent_management.models import SceneScript, OrchestrationPlan, AnimationCode, AnimationKeyframe
-from agent_management.llm_service import LLMService, LLMRequest, StructuredLLMRequest
+from agent_management.llm_service import LLMService, LLMRequest, LLMStreamChunk, StructuredLLMRequest
 from agent_management.utils.code_extraction import extract_code_block
 
-class AnimationAgent:
-    def __init__(self, llm_service: LLMService):
-        self.llm_service = llm_service
-        
-    def generate_animation_code(self, 
-                               script: SceneScript, 
-                               object_geometries: Dict[str, Dict],
-                               orchestration_plan: OrchestrationPlan) -> AnimationCode:
-        """
-        Generate Three.js animation code based on the scene script and generated geometries.
-        
-        Args:
-            script: The scene script with timecodes and descriptions
-            object_geometries: Dictionary of object names to their geometry code and metadata
-            orchestration_plan: The orchestration plan with object details
-            
-        Returns:
-            AnimationCode: Animation code with keyframes
-        """
-        # Format script timeline
-        script_timeline = "\n\n".join([
-            f"TIMECODE {point.timecode}:\nDESCRIPTION: {point.description}\nCAPTION: {point.caption}"
-            for point in script.content
-        ])
-        
-        # Prepare a list of available objects with their appearance times
-        object_list = "\n".join([
-            f"- {obj.name} (appears at {obj.appears_at}): {obj.description[:100]}..." 
-            if isinstance(obj.description, str) and len(obj.description) > 100 else
-            f"- {obj.name} (appears at {obj.appears_at}): {obj.description}"
-            for obj in orchestration_plan.objects
-        ])
-        
-        # Count available objects with geometries
-        geometry_count = sum(1 for obj_data in object_geometries.values() 
-                           if obj_data.get("status") == "success")
-        
-        # Extract update function names and object references from geometry code
-        geometry_functions = []
-        object_references = []
-        
-        for obj_name, obj_data in object_geometries.items():
-            if obj_data.get("status") == "success" and obj_name != "_summary":
-                code = obj_data.get("code", "")
-                
-                # Extract function assignments to window
-                function_matches = re.findall(r'window\.(\w+)\s*=\s*function', code)
-                for func_name in function_matches:
-                    geometry_functions.append(func_name)
-                
-                # Extract object assignments to window
-                obj_matches = re.findall(r'window\.(\w+)\s*=', code)
-                for ref_name in obj_matches:
-                    if ref_name not in geometry_functions:  # Avoid duplicates with functions
-                        object_references.append(ref_name)
-        
-        # Format the object availability info, including extracted functions and references
-        objects_with_geometries = "\n".join([
-            f"- {obj_name} (available and ready to animate)"
-            for obj_name, obj_data in object_geometries.items()
-            if obj_data.get("status") == "success" and obj_name != "_summary"
-        ])
-        
-        geometry_functions_str = "\n".join([
-            f"- {func_name} (animation function provided by geometry)"
-            for func_name in geometry_functions
-        ])
-        
-        object_references_str = "\n".join([
-            f"- {ref_name} (object reference provided by geometry)"
-            for ref_name in object_references
-        ])
-        
-        # Prepare the basic prompt components
-        title_section = f"## SCENE TITLE\n{script.title}"
-        timeline_section = f"## SCRIPT TIMELINE\n{script_timeline}"
-        objects_section = f"## AVAILABLE OBJECTS ({geometry_count} objects with generated geometries)\n{objects_with_geometries}"
-        complete_objects_section = f"## COMPLETE OBJECT LIST\n{object_list}"
-        geometry_functions_section = f"## GEOMETRY FUNCTIONS (use these if provided)\n{geometry_functions_str}" if geometry_functions else ""
-        object_references_section = f"## OBJECT REFERENCES (use these with scene.getObjectByName())\n{object_references_str}" if object_references else ""
-        
-        # Use raw string for the example code to avoid f-string issues
-        example_section = r"""
+# Static instructions and example, sent as the system prompt ahead of the
+# scene details so providers can serve them from their prompt cache
+ANIMATION_EXAMPLE = r"""
 IMPORTANT: Here's ONE high-quality example of self-contained animation code that also shows how to work with any custom functions or update methods provided by the geometry:
 
 ```javascript
@@ -247,21 +167,8 @@ Note how this example:
 3. Provides fallbacks for direct manipulation when no update functions exist
 4. Creates smooth time-based animations with clear section dividers
 """
-        
-        # Combine everything into the final prompt
-        prompt = f"""You are a Three.js animation expert. Your task is to create simple, self-contained, and foolproof animation code for a scientific visualization.
-
-{title_section}
 
-{timeline_section}
-
-{objects_section}
-
-{complete_objects_section}
-
-{geometry_functions_section}
-
-{object_references_section}
+ANIMATION_SYSTEM_PROMPT = """You are an expert Three.js animator specializing in scientific visualizations. Create detailed, timeline-based animation code following the script exactly. Your code should be simple, self-contained, and foolproof, with proper handling of geometry-provided update functions.
 
 IMPORTANT STRUCTURE INFORMATION:
 The script contains 5-8 key points, each with:
@@ -273,7 +180,7 @@ Your task is to write the animation code that would go INSIDE the animate() func
 DO NOT include the function declaration itself - only provide the code that would go inside the function.
 
 CRITICAL REQUIREMENTS:
-1. If the geometry provides update functions (listed above), USE THEM INSTEAD of directly manipulating objects
+1. If the geometry provides update functions (listed in the scene details), USE THEM INSTEAD of directly manipulating objects
 2. Use scene.getObjectByName() to find objects by name
 3. ALWAYS check if objects exist before operating on them
 4. Use clear time ranges (if elapsedTime >= start && elapsedTime < end) for each script section
@@ -282,7 +189,7 @@ CRITICAL REQUIREMENTS:
 
 VERY IMPORTANT:
 - The geometry code might have its own animation/update functions for complex behaviors
-- If window.updateSomething functions are listed above, call them instead of trying to manipulate objects directly
+- If window.updateSomething functions are listed in the scene details, call them instead of trying to manipulate objects directly
 - It's ok to use window.functionName() to call these functions, but DON'T use window.objectName to access objects
 
 The animation should:
@@ -291,7 +198,7 @@ The animation should:
 3. Include camera movements where appropriate
 4. Stage the entrance and exit of objects according to their timecodes
 5. Create a cohesive visual experience that follows the script's narrative
-{example_section}
+""" + ANIMATION_EXAMPLE + """
 
 Return ONLY the animation code that would go inside the animate function, not the function declaration itself.
 Include comments with timecodes to make the code clear and maintainable.
@@ -305,18 +212,167 @@ REMEMBER:
 - IMPORTANT: Set visible=false for objects that aren't currently relevant (except main objects)
 - IMPORTANT: Fade objects in (opacity 0→1) when introducing them and fade out (opacity 1→0) when no longer needed
 - Use opacity transitions of 1-2 seconds for smooth appearance/disappearance
+"""
+
+class AnimationAgent:
+    def __init__(self, llm_service: LLMService):
+        self.llm_service = llm_service
+        
+    def generate_animation_code(self, 
+                               script: SceneScript, 
+                               object_geometries: Dict[str, Dict],
+                               orchestration_plan: OrchestrationPlan) -> AnimationCode:
+        """
+        Generate Three.js animation code based on the scene script and generated geometries.
+        
+        Args:
+            script: The scene script with timecodes, atoms and captions
+            object_geometries: Dictionary of object names to their geometry code and metadata
+            orchestration_plan: The orchestration plan with object details
+            
+        Returns:
+            AnimationCode: Animation code with keyframes
+        """
+        request = self._build_animation_request(script, object_geometries, orchestration_plan)
+        
+        # Generate the animation code
+        response = self.llm_service.generate(request)
+        return self._to_animation_code(response.content)
+
+    async def agenerate_animation_code(self,
+                                       script: SceneScript,
+                                       object_geometries: Dict[str, Dict],
+                                       orchestration_plan: OrchestrationPlan) -> AnimationCode:
+        """
+        Async version of generate_animation_code. Cancelling the awaiting task
+        aborts the provider request.
+        
+        Args:
+            script: The scene script with timecodes, atoms and captions
+            object_geometries: Dictionary of object names to their geometry code and metadata
+            orchestration_plan: The orchestration plan with object details
+            
+        Returns:
+            AnimationCode: Animation code with keyframes
+        """
+        request = self._build_animation_request(script, object_geometries, orchestration_plan)
+        response = await self.llm_service.agenerate(request)
+        return self._to_animation_code(response.content)
+
+    async def astream_animation_code(self,
+                                     script: SceneScript,
+                                     object_geometries: Dict[str, Dict],
+                                     orchestration_plan: OrchestrationPlan
+                                     ) -> AsyncIterator[Union[LLMStreamChunk, AnimationCode]]:
+        """
+        Stream the animation code as it is generated.
+        
+        Args:
+            script: The scene script with timecodes, atoms and captions
+            object_geometries: Dictionary of object names to their geometry code and metadata
+            orchestration_plan: The orchestration plan with object details
+            
+        Yields:
+            The LLM's stream chunks (including the final one with the usage),
+            then the complete AnimationCode with its keyframes
+        """
+        request = self._build_animation_request(script, object_geometries, orchestration_plan)
+        async for chunk in self.llm_service.astream(request):
+            yield chunk
+            if chunk.is_final:
+                yield self._to_animation_code(chunk.content)
+
+    def _build_animation_request(self,
+                                 script: SceneScript,
+                                 object_geometries: Dict[str, Dict],
+                                 orchestration_plan: OrchestrationPlan) -> LLMRequest:
+        """Build the animation code request from the script, geometries and plan"""
+        # Format script timeline
+        script_timeline = script.timeline()
+        
+        # Prepare a list of available objects with their appearance times
+        object_list = "\n".join([
+            f"- {obj.name} (appears at {obj.appears_at}): {obj.description[:100]}..." 
+            if isinstance(obj.description, str) and len(obj.description) > 100 else
+            f"- {obj.name} (appears at {obj.appears_at}): {obj.description}"
+            for obj in orchestration_plan.objects
+        ])
+        
+        # Count available objects with geometries
+        geometry_count = sum(1 for obj_data in object_geometries.values() 
+                           if obj_data.get("status") == "success")
+        
+        # Extract update function names and object references from geometry code
+        geometry_functions = []
+        object_references = []
+        
+        for obj_name, obj_data in object_geometries.items():
+            if obj_data.get("status") == "success" and obj_name != "_summary":
+                code = obj_data.get("code", "")
+                
+                # Extract function assignments to window
+                function_matches = re.findall(r'window\.(\w+)\s*=\s*function', code)
+                for func_name in function_matches:
+                    geometry_functions.append(func_name)
+                
+                # Extract object assignments to window
+                obj_matches = re.findall(r'window\.(\w+)\s*=', code)
+                for ref_name in obj_matches:
+                    if ref_name not in geometry_functions:  # Avoid duplicates with functions
+                        object_references.append(ref_name)
+        
+        # Format the object availability info, including extracted functions and references
+        objects_with_geometries = "\n".join([
+            f"- {obj_name} (available and ready to animate)"
+            for obj_name, obj_data in object_geometries.items()
+            if obj_data.get("status") == "success" and obj_name != "_summary"
+        ])
+        
+        geometry_functions_str = "\n".join([
+            f"- {func_name} (animation function provided by geometry)"
+            for func_name in geometry_functions
+        ])
+        
+        object_references_str = "\n".join([
+            f"- {ref_name} (object reference provided by geometry)"
+            for ref_name in object_references
+        ])
+        
+        # Prepare the basic prompt components
+        title_section = f"## SCENE TITLE\n{script.title}"
+        timeline_section = f"## SCRIPT TIMELINE\n{script_timeline}"
+        objects_section = f"## AVAILABLE OBJECTS ({geometry_count} objects with generated geometries)\n{objects_with_geometries}"
+        complete_objects_section = f"## COMPLETE OBJECT LIST\n{object_list}"
+        geometry_functions_section = f"## GEOMETRY FUNCTIONS (use these if provided)\n{geometry_functions_str}" if geometry_functions else ""
+        object_references_section = f"## OBJECT REFERENCES (use these with scene.getObjectByName())\n{object_references_str}" if object_references else ""
+        
+        # Only the scene details vary between calls; they follow the cached system prompt
+        prompt = f"""Create the animation code for the following scene.
+
+{title_section}
+
+{timeline_section}
+
+{objects_section}
+
+{complete_objects_section}
+
+{geometry_functions_section}
+
+{object_references_section}
 """
 
         # Create the request
         request = LLMRequest(
             user_prompt=prompt,
-            system_prompt="You are an expert Three.js animator specializing in scientific visualizations. Create detailed, timeline-based animation code following the script exactly. Your code should be simple, self-contained, and foolproof, with proper handling of geometry-provided update functions.",
+            system_prompt=ANIMATION_SYSTEM_PROMPT,
             llm_config=self.llm_service.config
         )
-        
-        # Generate the animation code
-        response = self.llm_service.generate(request)
-        animation_code = response.content.strip()
+        return request
+
+    def _to_animation_code(self, content: str) -> AnimationCode:
+        """Wrap the generated animation code together with its keyframes"""
+        animation_code = content.strip()
         
         # Extract keyframes from the code by parsing comments with timecodes
         keyframes = self._extract_keyframes(animation_code)
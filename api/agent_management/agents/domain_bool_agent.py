@@ -4,6 +4,7 @@ Domain Validator Agent - Validates whether a prompt is scientific in nature.
 
 import os
 from agent_management.models import BooleanResponse, MolecularStructure
+from agent_management.molecular_index import fast_path_enabled, match_molecular
 from agent_management.llm_service import (
     LLMService,
     StructuredLLMRequest,
@@ -38,16 +39,22 @@ class DomainValidator:
         )
         return self.llm_service.generate_structured(request)
     
-    def is_molecular(self, prompt: str) -> BooleanResponse:
+    def is_molecular(self, prompt: str, use_index: bool = True) -> BooleanResponse:
         """
         Determine if a prompt can be built as molecular structure.
         
         Args:
             prompt: The user prompt to validate
+            use_index: Whether to try the local index first (False when the
+                caller already has)
             
         Returns:
             BooleanResponse with is_true=True if prompt is molecular, False otherwise
         """
+        # Obvious prompts (known names, formulas, SMILES) skip the LLM round-trip
+        if use_index and fast_path_enabled() and match_molecular(prompt):
+            return BooleanResponse(is_true=True)
+
         # Create a request for scientific content validation
         request = StructuredLLMRequest[BooleanResponse](
             user_prompt=f"""Does the following prompt contain something that can be built as a molecular structure? '{prompt}'
@@ -93,6 +100,7 @@ Examples of non-molecular prompts:
 
 Always respond with JSON exactly matching the requested format.""",
             response_model=BooleanResponse,
+            cache_namespace="domain_validator",
         )
         
         # Get the structured response
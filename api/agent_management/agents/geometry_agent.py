@@ -3,18 +3,11 @@ Geometry Agent - Provides static geometry code snippets for the visualization.
 """
 
 import json
-from agent_management.llm_service import LLMService, LLMRequest
+from typing import AsyncIterator, Union
+from agent_management.llm_service import LLMService, LLMRequest, LLMStreamChunk
 from agent_management.utils.code_extraction import extract_code_block
 
-class GeometryAgent:
-    def __init__(self, llm_service: LLMService):
-        self.llm_service = llm_service
-
-    def get_geometry_snippet(self, user_prompt: str) -> str:
-        """
-        Generate Three.js geometry code using LLM.
-        """
-        prompt_for_llm = f"""You are a helpful assistant generating Three.js geometry code. The user wants geometry for a scene with the following prompt: '{user_prompt}'
+GEOMETRY_SYSTEM_PROMPT = """You are a helpful assistant generating Three.js geometry code. The user describes the scene they want geometry for.
 
 Requirements:
 1. Code Style and Syntax:
@@ -46,13 +39,13 @@ Here's an example of proper code style and semicolon usage, particularly for mol
 
 ```javascript
 // Verify scene exists
-if (typeof scene === 'undefined') {{
+if (typeof scene === 'undefined') {
     throw new Error('Scene object is undefined.');
-}}
+}
 
 // Create materials with proper semicolons
-const carbonMaterial = new THREE.MeshPhongMaterial({{ color: 0x333333 }});
-const hydrogenMaterial = new THREE.MeshPhongMaterial({{ color: 0xffffff }});
+const carbonMaterial = new THREE.MeshPhongMaterial({ color: 0x333333 });
+const hydrogenMaterial = new THREE.MeshPhongMaterial({ color: 0xffffff });
 
 // Create geometries
 const atomGeometry = new THREE.SphereGeometry(1, 32, 32);
@@ -75,7 +68,7 @@ hydrogen.position.set(
 );  // Note the semicolon after multi-line method call
 
 // Bond creation function with proper returns
-function createBond(start, end) {{
+function createBond(start, end) {
     const direction = new THREE.Vector3().subVectors(end, start);
     const length = direction.length();
     
@@ -90,46 +83,81 @@ function createBond(start, end) {{
     );  // Multi-line method with semicolon
     
     return bond;
-}}
+}
 
 // Add to scene with proper cleanup
 molecule.add(carbon, hydrogen);
 scene.add(molecule);
 
 // Add cleanup function
-if (typeof window !== 'undefined') {{
-    window.disposeMolecule = function() {{
-        if (window.molecule) {{
-            window.molecule.traverse((object) => {{
+if (typeof window !== 'undefined') {
+    window.disposeMolecule = function() {
+        if (window.molecule) {
+            window.molecule.traverse((object) => {
                 if (object.geometry) object.geometry.dispose();
-                if (object.material) {{
-                    if (Array.isArray(object.material)) {{
+                if (object.material) {
+                    if (Array.isArray(object.material)) {
                         object.material.forEach(m => m.dispose());
-                    }} else {{
+                    } else {
                         object.material.dispose();
-                    }}
-                }}
-            }});
+                    }
+                }
+            });
             scene.remove(window.molecule);
             window.molecule = undefined;
-        }}
-    }};
-}}
+        }
+    };
+}
 ```
 
 Return your code as a single JavaScript snippet, with no JSON wrapper.
 """
 
-        # Create a proper LLMRequest with higher max_tokens
-        request = LLMRequest(
-            user_prompt=prompt_for_llm
-        )
-        
+class GeometryAgent:
+    def __init__(self, llm_service: LLMService):
+        self.llm_service = llm_service
+
+    def get_geometry_snippet(self, user_prompt: str) -> str:
+        """
+        Generate Three.js geometry code using LLM.
+        """
         # Get the response from the LLM service
-        llm_response = self.llm_service.generate(request)
-        
+        llm_response = self.llm_service.generate(self._build_request(user_prompt))
+        return self._format_snippet(llm_response.content)
+
+    async def aget_geometry_snippet(self, user_prompt: str) -> str:
+        """
+        Generate Three.js geometry code using the LLM service's async API,
+        so many objects can be generated concurrently on one event loop.
+        """
+        llm_response = await self.llm_service.agenerate(self._build_request(user_prompt))
+        return self._format_snippet(llm_response.content)
+
+    async def astream_geometry_snippet(self, user_prompt: str) -> AsyncIterator[Union[LLMStreamChunk, str]]:
+        """
+        Stream the geometry code as it is generated.
+
+        Yields the LLM's stream chunks (including the final one with the usage)
+        and then the formatted snippet, the same string aget_geometry_snippet returns.
+        """
+        async for chunk in self.llm_service.astream(self._build_request(user_prompt)):
+            yield chunk
+            if chunk.is_final:
+                yield self._format_snippet(chunk.content)
+
+    def _build_request(self, user_prompt: str) -> LLMRequest:
+        """Build the geometry generation request for a user prompt"""
+        # The static instructions go first, as the system prompt, so providers
+        # can serve them from their prompt cache; only the user prompt varies
+        return LLMRequest(
+            system_prompt=GEOMETRY_SYSTEM_PROMPT,
+            user_prompt=f"The user wants geometry for a scene with the following prompt: '{user_prompt}'",
+        )
+
+    def _format_snippet(self, content: str) -> str:
+        """Extract the JavaScript from an LLM response and tag it"""
         # Extract the content from the LLMResponse and clean it
-        geometry_code = extract_code_block(llm_response.content, "javascript")
+        geometry_code = extract_code_block(content, "javascript")
         
         return f"""
 // GeometryAgent LLM-generated code
@@ -4,15 +4,22 @@ Orchestration Agent - Breaks down scene scripts into discrete objects for visual
 
 import asyncio
 import json
+import os
+import time
 from typing import Dict, List, Optional
 
-from agent_management.models import SceneScript, OrchestrationPlan, ThreeGroup, SceneObject
+from agent_management.models import SceneScript, OrchestrationPlan, ThreeGroup, SceneObject, TestQuestionSet
 from agent_management.llm_service import (
     LLMService,
     StructuredLLMRequest,
     LLMModelConfig,
     ProviderType
 )
+from agent_management.execution_pool import blocking_executor
+
+# Defaults for the geometry fan-out (overridable via environment)
+DEFAULT_GEOMETRY_FANOUT_LIMIT = 5
+DEFAULT_GEOMETRY_OBJECT_TIMEOUT = 120.0
 
 class OrchestrationAgent:
     def __init__(self, llm_service: LLMService):
@@ -30,11 +37,26 @@ class OrchestrationAgent:
         Returns:
             OrchestrationPlan: A structured plan with all objects needed for the scene
         """
+        # Get the structured response
+        return self.llm_service.generate_structured(self._build_plan_request(script))
+
+    async def agenerate_orchestration_plan(self, script: SceneScript) -> OrchestrationPlan:
+        """
+        Async version of generate_orchestration_plan. Cancelling the awaiting
+        task aborts the provider request.
+        
+        Args:
+            script: The scene script to analyze
+            
+        Returns:
+            OrchestrationPlan: A structured plan with all objects needed for the scene
+        """
+        return await self.llm_service.agenerate_structured(self._build_plan_request(script))
+
+    def _build_plan_request(self, script: SceneScript) -> StructuredLLMRequest:
+        """Build the orchestration plan request for a script"""
         # Convert the script to a structured format for the LLM prompt
-        script_content = "\n\n".join([
-            f"{point.description}\nCAPTION: {point.caption}"
-            for point in script.content
-        ])
+        script_content = script.timeline()
         
         # Prepare prompt parts
         prompt_intro = f"Analyze this scene script and identify all discrete 3D objects needed for the visualization:"
@@ -128,33 +150,63 @@ Always return properly structured JSON objects matching the requested schema exa
             llm_config=self.llm_service.config,
             response_model=OrchestrationPlan,
         )
-        
-        # Get the structured response
-        return self.llm_service.generate_structured(request)
+        return request
     
-    async def generate_geometry_from_plan(self, plan: OrchestrationPlan) -> Dict[str, Dict]:
+    async def generate_geometry_from_plan(
+        self,
+        plan: OrchestrationPlan,
+        max_concurrency: Optional[int] = None,
+        object_timeout: Optional[float] = None,
+    ) -> Dict[str, Dict]:
         """
         Generate Three.js geometry for each object in the orchestration plan.
-        Processes objects in parallel for improved performance.
+        Objects are generated concurrently through the async LLM API, so the
+        scene's latency is set by its slowest object rather than the sum.
         
         Args:
             plan: The orchestration plan containing objects to generate
+            max_concurrency: Maximum objects generated at once for this plan
+                (defaults to GEOMETRY_FANOUT_LIMIT)
+            object_timeout: Seconds each object's LLM call may take before it is
+                reported as timed out, not counting the wait for a slot
+                (defaults to GEOMETRY_OBJECT_TIMEOUT)
             
         Returns:
-            Dictionary mapping object names to their Three.js geometry
+            Dictionary mapping object names to their Three.js geometry. Objects
+            that fail or time out are included with their status, so callers
+            always get the partial results.
         """
         # Lazy-load the geometry agent
         if self._geometry_agent is None:
             from agent_management.agents.geometry_agent import GeometryAgent
             self._geometry_agent = GeometryAgent(self.llm_service)
         
+        if max_concurrency is None:
+            max_concurrency = int(os.environ.get("GEOMETRY_FANOUT_LIMIT", DEFAULT_GEOMETRY_FANOUT_LIMIT))
+        if object_timeout is None:
+            object_timeout = float(os.environ.get("GEOMETRY_OBJECT_TIMEOUT", DEFAULT_GEOMETRY_OBJECT_TIMEOUT))
+        
+        # Fan-out limit for this plan, plus a limit shared by every caller of this provider
+        fanout = asyncio.Semaphore(max(1, max_concurrency))
+        provider_limit = f"provider:{ProviderType(self.llm_service.config.provider).value}"
+        
         results = {}
         failures = []
         
         print(f"Starting to generate geometry for {len(plan.objects)} objects in parallel...")
         
+        async def generate(obj_prompt: str) -> str:
+            async with fanout:
+                async with blocking_executor.limit(provider_limit):
+                    # The deadline starts once the object has its slots, so
+                    # objects queued behind the fan-out limit don't time out
+                    return await asyncio.wait_for(
+                        self._geometry_agent.aget_geometry_snippet(obj_prompt), timeout=object_timeout
+                    )
+        
         async def process_object(i, obj):
             """Process a single object and return its result"""
+            started_at = time.perf_counter()
             try:
                 print(f"Generating geometry for object {i+1}/{len(plan.objects)}: {obj.name}")
                 
@@ -162,14 +214,29 @@ Always return properly structured JSON objects matching the requested schema exa
                 obj_prompt = self._format_object_prompt(obj, plan.scene_title)
                 
                 # Generate the geometry (this will be a string of Three.js code)
-                geometry_code = self._geometry_agent.get_geometry_snippet(obj_prompt)
+                geometry_code = await generate(obj_prompt)
                 
                 print(f"✓ Successfully generated geometry for {obj.name}")
                 
                 return obj.name, {
                     "code": geometry_code,
                     "object_info": obj.dict(),
-                    "status": "success"
+                    "status": "success",
+                    "duration_ms": round((time.perf_counter() - started_at) * 1000, 1)
+                }
+            
+            except asyncio.TimeoutError:
+                error = f"Timed out after {object_timeout:g}s"
+                print(f"✗ Geometry generation for {obj.name} timed out")
+                failures.append({
+                    "object_name": obj.name,
+                    "error": error
+                })
+                return obj.name, {
+                    "object_info": obj.dict(),
+                    "status": "timeout",
+                    "error": error,
+                    "duration_ms": round((time.perf_counter() - started_at) * 1000, 1)
                 }
                 
             except Exception as e:
@@ -181,7 +248,8 @@ Always return properly structured JSON objects matching the requested schema exa
                 return obj.name, {
                     "object_info": obj.dict(),
                     "status": "failed",
-                    "error": str(e)
+                    "error": str(e),
+                    "duration_ms": round((time.perf_counter() - started_at) * 1000, 1)
                 }
         
         # Create tasks for all objects
@@ -199,6 +267,7 @@ Always return properly structured JSON objects matching the requested schema exa
             "total_objects": len(plan.objects),
             "success_count": len([r for r in results.values() if r.get("status") == "success"]),
             "failure_count": len(failures),
+            "timeout_count": len([r for r in results.values() if r.get("status") == "timeout"]),
             "failures": failures
         }
         
@@ -243,7 +312,7 @@ Focus on capturing the key visual characteristics and ensuring it fits with the
 """
         return prompt
 
-    def generate_test_questions(self, script: SceneScript):
+    def generate_test_questions(self, script: SceneScript) -> TestQuestionSet:
         """
         Generate multiple choice test questions based on the scene script content.
         
@@ -251,13 +320,10 @@ Focus on capturing the key visual characteristics and ensuring it fits with the
             script: The scene script to analyze
             
         Returns:
-            JSON object containing test questions, choices, and correct answers
+            TestQuestionSet: Test questions, choices, and correct answers
         """
         # Format script content
-        script_content = "\n\n".join([
-            f"{point.description}\nCAPTION: {point.caption}"
-            for point in script.content
-        ])
+        script_content = script.timeline()
         
         prompt = """
 Generate multiple choice test questions based on this educational content.
@@ -297,7 +363,8 @@ Ensure all questions:
 - Have one unambiguously correct answer
 - Include a brief explanation
 Always return properly structured JSON matching the schema exactly.""",
-            llm_config=self.llm_service.config
+            llm_config=self.llm_service.config,
+            response_model=TestQuestionSet
         )
         
         return self.llm_service.generate_structured(request)
\ No newline at end of file
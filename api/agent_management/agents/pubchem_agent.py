@@ -5,10 +5,9 @@ PubChem Agent - Handles interaction with PubChem database and molecular structur
 import os
 import tempfile
 import json
-import pubchempy as pcp
-import requests
 from typing import Optional, Dict, Any, NamedTuple, List
 from agent_management.molecule_visualizer import MoleculeVisualizer
+from agent_management.pubchem_client import pubchem_client
 from agent_management.models import PubChemSearchResult, PubChemCompound
 from agent_management.agents.script_agent import ScriptAgent
 from agent_management.agents.pubchem_agent_helper import validate_and_convert_script
@@ -186,10 +185,10 @@ Output:"""
         encoded_query = urllib.parse.quote(query)
 
         # First, search for compounds matching the query
-        search_url = f"https://pubchem.ncbi.nlm.nih.gov/rest/pug/compound/name/{encoded_query}/cids/JSON"
+        search_url = f"pug/compound/name/{encoded_query}/cids/JSON"
 
         try:
-            search_response = requests.get(search_url, timeout=30)
+            search_response = pubchem_client.get(search_url)
             if search_response.status_code != 200:
                 self.logger.warning(
                     f"PubChem REST search failed with status {search_response.status_code}"
@@ -207,20 +206,12 @@ Output:"""
             # Limit the number of CIDs
             cids = cids[:max_results]
 
-            # Get detailed information for each CID
-            compounds = []
-            for cid in cids:
-                try:
-                    # Get compound details using pubchempy for consistency
-                    compound = pcp.Compound.from_cid(cid)
-                    compounds.append(compound)
-                except Exception as e:
-                    self.logger.warning(
-                        f"Failed to get details for CID {cid}: {str(e)}"
-                    )
-                    continue
-
-            return compounds
+            # Get detailed information for all CIDs in one request
+            try:
+                return pubchem_client.compounds(cids)
+            except Exception as e:
+                self.logger.warning(f"Failed to get details for CIDs {cids}: {str(e)}")
+                return []
 
         except Exception as e:
             self.logger.error(f"Error in PubChem REST search: {str(e)}")
@@ -240,20 +231,20 @@ Output:"""
 
         try:
             # First try exact name match
-            search_url = f"https://pubchem.ncbi.nlm.nih.gov/rest/pug/compound/name/{urllib.parse.quote(query)}/JSON"
-            response = requests.get(search_url, timeout=30)
+            search_url = f"pug/compound/name/{urllib.parse.quote(query)}/JSON"
+            response = pubchem_client.get(search_url)
 
             if response.status_code == 200:
                 data = response.json()
                 if "PC_Compounds" in data:
                     cid = data["PC_Compounds"][0]["id"]["id"]["cid"]
                     self.logger.info(f"[DEBUG] Found exact match CID: {cid}")
-                    compound = pcp.Compound.from_cid(int(cid))
+                    compound = pubchem_client.compound(int(cid))
                     return [compound]
 
             # If exact match fails, try the autocomplete API
-            autocomplete_url = f"https://pubchem.ncbi.nlm.nih.gov/rest/autocomplete/compound/{urllib.parse.quote(query)}/json"
-            response = requests.get(autocomplete_url, timeout=30)
+            autocomplete_url = f"autocomplete/compound/{urllib.parse.quote(query)}/json"
+            response = pubchem_client.get(autocomplete_url)
 
             if response.status_code == 200:
                 data = response.json()
@@ -266,7 +257,7 @@ Output:"""
                         if "cid" in suggestion:
                             cid = suggestion["cid"]
                             self.logger.info(f"[DEBUG] Found suggested CID: {cid}")
-                            compound = pcp.Compound.from_cid(int(cid))
+                            compound = pubchem_client.compound(int(cid))
                             return [compound]
 
             return []
@@ -310,6 +301,7 @@ Examples:
 User input: '{user_input}'
 Only respond with the molecule name or 'N/A', no other text.""",
                 system_prompt="You are a chemistry professor that helps identify the simplest, most representative molecule names from user queries. Always prefer well-known, simple examples that clearly demonstrate the concept.",
+                cache_namespace="interpret_query",
             )
             response = self.llm_service.generate(request)
             return response.content.strip()
@@ -333,14 +325,10 @@ Only respond with the molecule name or 'N/A', no other text.""",
 
     def fetch_sdf_for_cid(self, cid: int) -> Optional[str]:
         """
-        Fetches the SDF string for a given PubChem CID using a direct REST call.
+        Fetches the SDF string for a given PubChem CID (read through the compound cache).
         Returns SDF as text, or None if something fails.
         """
-        url = f"https://pubchem.ncbi.nlm.nih.gov/rest/pug/compound/cid/{cid}/SDF"
-        resp = requests.get(url, timeout=30)
-        if resp.status_code == 200:
-            return resp.text
-        return None
+        return pubchem_client.sdf(cid)
 
     def _get_molecular_formula(self, compound_name: str) -> Optional[str]:
         """
@@ -357,6 +345,7 @@ Only respond with the molecule name or 'N/A', no other text.""",
                 system_prompt="You are a chemistry expert. Provide molecular formulas for chemical compounds.",
                 user_prompt=self.FORMULA_EXTRACTION_PROMPT.format(query=compound_name),
                 temperature=0.1,  # Low temperature for more deterministic output
+                cache_namespace="molecular_formula",
             )
 
             response = self.llm_service.generate(request)
@@ -417,8 +406,10 @@ Only respond with the molecule name or 'N/A', no other text.""",
         if formula:
             self.logger.info(f"Got formula from LLM: {formula}")
             try:
-                # Try searching by formula using PubChemPy
-                compounds = pcp.get_compounds(formula, "formula")
+                # Try searching by formula
+                compounds = pubchem_client.compounds(
+                    pubchem_client.cids_by_formula(formula)
+                )
                 if compounds:
                     self.logger.info(f"Found results using formula search: {formula}")
                     return compounds
@@ -463,31 +454,23 @@ Only respond with the molecule name or 'N/A', no other text.""",
 
                 # First try to get 3D SDF
                 sdf_data = None
-                sdf_3d_url = f"https://pubchem.ncbi.nlm.nih.gov/rest/pug/compound/cid/{cid}/SDF?record_type=3d"
                 try:
-                    response = requests.get(sdf_3d_url, timeout=30)
-                    if response.status_code == 200:
-                        sdf_data = response.text
+                    sdf_data = pubchem_client.sdf(cid, three_d=True)
+                    if sdf_data:
                         self.logger.info(f"Successfully got 3D SDF for CID {cid}")
                     else:
-                        self.logger.warning(
-                            f"Failed to get 3D SDF for CID {cid} (status {response.status_code})"
-                        )
+                        self.logger.warning(f"Failed to get 3D SDF for CID {cid}")
                 except Exception as e:
                     self.logger.warning(f"Error getting 3D SDF for CID {cid}: {str(e)}")
 
                 # If 3D failed, try 2D
                 if not sdf_data:
-                    sdf_2d_url = f"https://pubchem.ncbi.nlm.nih.gov/rest/pug/compound/cid/{cid}/SDF"
                     try:
-                        response = requests.get(sdf_2d_url, timeout=30)
-                        if response.status_code == 200:
-                            sdf_data = response.text
+                        sdf_data = pubchem_client.sdf(cid)
+                        if sdf_data:
                             self.logger.info(f"Successfully got 2D SDF for CID {cid}")
                         else:
-                            self.logger.warning(
-                                f"Failed to get 2D SDF for CID {cid} (status {response.status_code})"
-                            )
+                            self.logger.warning(f"Failed to get 2D SDF for CID {cid}")
                     except Exception as e:
                         self.logger.warning(
                             f"Error getting 2D SDF for CID {cid}: {str(e)}"
@@ -529,7 +512,7 @@ Only respond with the molecule name or 'N/A', no other text.""",
         Get detailed information for a specific compound by CID.
         """
         try:
-            compound = pcp.Compound.from_cid(cid)
+            compound = pubchem_client.compound(cid)
             sdf_str = self.fetch_sdf_for_cid(cid)
 
             return PubChemCompound(
@@ -573,13 +556,11 @@ Only respond with the molecule name or 'N/A', no other text.""",
             os.makedirs(compound_dir, exist_ok=True)
 
             # Get compound details
-            compound = pcp.Compound.from_cid(cid)
+            compound = pubchem_client.compound(cid)
             sdf_str = self.fetch_sdf_for_cid(cid)
 
             # Get 3D SDF if available
-            sdf_3d_url = f"https://pubchem.ncbi.nlm.nih.gov/rest/pug/compound/cid/{cid}/SDF?record_type=3d"
-            response = requests.get(sdf_3d_url, timeout=30)
-            sdf_3d = response.text if response.status_code == 200 else None
+            sdf_3d = pubchem_client.sdf(cid, three_d=True)
 
             # Create a comprehensive data structure
             data = {
@@ -724,30 +705,18 @@ Only respond with the molecule name or 'N/A', no other text.""",
 
         # 4) Fetch 3D SDF or fallback to 2D
         sdf_data = None
-        sdf_3d_url = f"https://pubchem.ncbi.nlm.nih.gov/rest/pug/compound/cid/{cid}/SDF?record_type=3d"
         try:
-            response = requests.get(sdf_3d_url, timeout=30)
-            if response.status_code == 200:
-                sdf_data = response.text
-            else:
-                self.logger.warning(
-                    f"Failed 3D SDF for CID {cid}, status {response.status_code}"
-                )
+            sdf_data = pubchem_client.sdf(cid, three_d=True)
+            if not sdf_data:
+                self.logger.warning(f"Failed 3D SDF for CID {cid}")
         except Exception as e:
             self.logger.warning(f"Error getting 3D SDF for CID {cid}: {str(e)}")
 
         if not sdf_data:
-            sdf_2d_url = (
-                f"https://pubchem.ncbi.nlm.nih.gov/rest/pug/compound/cid/{cid}/SDF"
-            )
             try:
-                response = requests.get(sdf_2d_url, timeout=30)
-                if response.status_code == 200:
-                    sdf_data = response.text
-                else:
-                    self.logger.warning(
-                        f"Failed 2D SDF for CID {cid}, status {response.status_code}"
-                    )
+                sdf_data = pubchem_client.sdf(cid)
+                if not sdf_data:
+                    self.logger.warning(f"Failed 2D SDF for CID {cid}")
             except Exception as e:
                 self.logger.warning(f"Error getting 2D SDF for CID {cid}: {str(e)}")
 
@@ -809,13 +778,10 @@ Only respond with the molecule name or 'N/A', no other text.""",
         if not cid:
             raise ValueError("Compound has no valid CID.")
 
-        sdf_url = f"https://pubchem.ncbi.nlm.nih.gov/rest/pug/compound/cid/{cid}/SDF"
-        response = requests.get(sdf_url, timeout=30)
-        if response.status_code != 200:
+        sdf_data = pubchem_client.sdf(cid)
+        if not sdf_data:
             raise ValueError(f"Failed to get 2D SDF for CID {cid}")
 
-        sdf_data = response.text
-
         mol = Chem.MolFromMolBlock(sdf_data, sanitize=True, removeHs=False)
         if mol is None:
             raise ValueError("Unable to parse SDF data")
@@ -985,7 +951,7 @@ Only respond with the molecule name or 'N/A', no other text.""",
                 self.logger.info(f"Using display title: {display_title}")
 
                 # Get compound details using PubChemPy for additional data
-                compound_details = pcp.Compound.from_cid(compound['cid'])
+                compound_details = pubchem_client.compound(compound['cid'])
 
                 if compound_details.isomeric_smiles:
                     mol = Chem.MolFromSmiles(compound_details.isomeric_smiles)
@@ -1136,7 +1102,7 @@ Only respond with the molecule name or 'N/A', no other text.""",
                 self.logger.info(f"Using display title: {display_title}")
 
                 # Get compound details using PubChemPy for additional data
-                compound_details = pcp.Compound.from_cid(compound["cid"])
+                compound_details = pubchem_client.compound(compound["cid"])
 
                 if compound_details.isomeric_smiles:
                     mol = Chem.MolFromSmiles(compound_details.isomeric_smiles)
@@ -1321,7 +1287,7 @@ Only respond with the molecule name or 'N/A', no other text.""",
                 self.logger.info(f"Using display title: {display_title}")
 
                 # Get compound details using PubChemPy for additional data
-                compound_details = pcp.Compound.from_cid(compound["cid"])
+                compound_details = pubchem_client.compound(compound["cid"])
 
                 if compound_details.isomeric_smiles:
                     mol = Chem.MolFromSmiles(compound_details.isomeric_smiles)
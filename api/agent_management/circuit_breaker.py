@@ -0,0 +1,257 @@
+"""
+Circuit Breaker Module - Per provider/model health tracking for LLM calls.
+
+During a provider incident (Anthropic overloaded, OpenAI rate limiting) every
+request would otherwise try the failing model first and only give up after
+its retries. Each provider/model pair gets a circuit breaker instead:
+
+- closed: calls go through; failures and slow calls are counted over the
+  recent window. When the failure rate (or the slow-call rate) crosses its
+  threshold the circuit opens.
+- open: calls fail immediately with CircuitOpenError, and
+  create_agent_llm_service picks the agent's next healthy fallback model.
+- half-open: after the cooldown a limited number of probe calls go through;
+  a successful probe closes the circuit, a failed one opens it again.
+
+Only provider-side failures count: rate limits, overload, server errors,
+timeouts and connection errors (see retry_policy.classify_error). Each retry
+the retry policy made counts as a failed attempt, so a model that only works
+on the third try is noticed quickly. Bad requests, invalid model output and
+cancellations don't affect the circuit.
+
+State is kept per worker process.
+
+Configuration (environment):
+
+- ``CIRCUIT_BREAKER_ENABLED``: turn the breakers off with 0 (default: on)
+- ``CIRCUIT_FAILURE_RATE``: failure rate that opens the circuit (default: 0.5)
+- ``CIRCUIT_SLOW_CALL_RATE``: slow-call rate that opens the circuit (default: 0.8)
+- ``CIRCUIT_SLOW_CALL_SECONDS``: duration above which a call is slow (default: 60)
+- ``CIRCUIT_MIN_CALLS``: attempts in the window before rates are judged (default: 5)
+- ``CIRCUIT_WINDOW_SECONDS``: how long attempts are remembered (default: 60)
+- ``CIRCUIT_OPEN_SECONDS``: cooldown before probing an open circuit (default: 30)
+- ``CIRCUIT_HALF_OPEN_PROBES``: concurrent probe calls when half-open (default: 1)
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from enum import Enum
+from typing import Any, Deque, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitState(str, Enum):
+    """State of a circuit breaker"""
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a provider/model whose circuit is open"""
+    pass
+
+
+def breakers_enabled() -> bool:
+    """Whether circuit breakers guard LLM calls (CIRCUIT_BREAKER_ENABLED)"""
+    return os.environ.get("CIRCUIT_BREAKER_ENABLED", "1").lower() not in ("0", "false", "no", "off")
+
+
+def is_provider_failure(error: BaseException) -> bool:
+    """
+    Whether an error says something about the provider's health.
+    Providers wrap SDK errors, so the exception chain is searched.
+    """
+    from agent_management.providers.retry_policy import RETRYABLE_KINDS, classify_error
+
+    seen = set()
+    current: Optional[BaseException] = error
+    while current is not None and id(current) not in seen:
+        seen.add(id(current))
+        if classify_error(current) in RETRYABLE_KINDS:
+            return True
+        current = current.__cause__ or current.__context__
+    return False
+
+
+@dataclass
+class BreakerSettings:
+    """Thresholds shared by all circuit breakers"""
+    failure_rate: float = 0.5
+    slow_call_rate: float = 0.8
+    slow_call_seconds: float = 60.0
+    min_calls: int = 5
+    window_seconds: float = 60.0
+    open_seconds: float = 30.0
+    half_open_probes: int = 1
+
+    @classmethod
+    def from_env(cls) -> "BreakerSettings":
+        defaults = cls()
+        return cls(
+            failure_rate=float(os.environ.get("CIRCUIT_FAILURE_RATE", defaults.failure_rate)),
+            slow_call_rate=float(os.environ.get("CIRCUIT_SLOW_CALL_RATE", defaults.slow_call_rate)),
+            slow_call_seconds=float(os.environ.get("CIRCUIT_SLOW_CALL_SECONDS", defaults.slow_call_seconds)),
+            min_calls=int(os.environ.get("CIRCUIT_MIN_CALLS", defaults.min_calls)),
+            window_seconds=float(os.environ.get("CIRCUIT_WINDOW_SECONDS", defaults.window_seconds)),
+            open_seconds=float(os.environ.get("CIRCUIT_OPEN_SECONDS", defaults.open_seconds)),
+            half_open_probes=int(os.environ.get("CIRCUIT_HALF_OPEN_PROBES", defaults.half_open_probes)),
+        )
+
+
+class CircuitBreaker:
+    """Circuit breaker of one provider/model pair"""
+
+    def __init__(self, name: str, settings: Optional[BreakerSettings] = None):
+        self.name = name
+        self.settings = settings or BreakerSettings.from_env()
+        self._lock = threading.Lock()
+        self._state = CircuitState.CLOSED
+        self._opened_at = 0.0
+        self._probes = 0
+        # (timestamp, failed, slow) per attempt
+        self._attempts: Deque[Tuple[float, bool, bool]] = deque()
+        self.times_opened = 0
+        self.rejected = 0
+
+    def _refresh(self, now: float) -> None:
+        """Expire old attempts and move an open circuit to half-open after the cooldown"""
+        horizon = now - self.settings.window_seconds
+        while self._attempts and self._attempts[0][0] < horizon:
+            self._attempts.popleft()
+        if self._state == CircuitState.OPEN and now - self._opened_at >= self.settings.open_seconds:
+            self._state = CircuitState.HALF_OPEN
+            self._probes = 0
+
+    def _open(self, now: float, reason: str) -> None:
+        self._state = CircuitState.OPEN
+        self._opened_at = now
+        self._probes = 0
+        self._attempts.clear()
+        self.times_opened += 1
+        logger.warning(f"Circuit for {self.name} opened: {reason}")
+
+    @property
+    def state(self) -> CircuitState:
+        with self._lock:
+            self._refresh(time.monotonic())
+            return self._state
+
+    def available(self) -> bool:
+        """Whether a new call would be let through (without claiming a probe)"""
+        with self._lock:
+            self._refresh(time.monotonic())
+            if self._state == CircuitState.HALF_OPEN:
+                return self._probes < self.settings.half_open_probes
+            return self._state == CircuitState.CLOSED
+
+    def acquire(self) -> bool:
+        """Admit a call, claiming a probe slot when half-open; False if rejected"""
+        with self._lock:
+            self._refresh(time.monotonic())
+            if self._state == CircuitState.CLOSED:
+                return True
+            if self._state == CircuitState.HALF_OPEN and self._probes < self.settings.half_open_probes:
+                self._probes += 1
+                return True
+            self.rejected += 1
+            return False
+
+    def record(self, failed: bool, duration: float, failed_attempts: int = 0) -> None:
+        """
+        Record the outcome of an admitted call.
+
+        Args:
+            failed: Whether the call finally failed with a provider-side error
+            duration: Wall time of the call in seconds
+            failed_attempts: Earlier attempts of the call that failed and were retried
+        """
+        now = time.monotonic()
+        slow = duration >= self.settings.slow_call_seconds
+        with self._lock:
+            self._refresh(now)
+            if self._state == CircuitState.HALF_OPEN:
+                if failed or slow:
+                    self._open(now, "probe call failed" if failed else f"probe call took {duration:.1f}s")
+                else:
+                    self._state = CircuitState.CLOSED
+                    self._attempts.clear()
+                    logger.info(f"Circuit for {self.name} closed after a successful probe")
+                return
+            if self._state == CircuitState.OPEN:
+                # A call admitted before the circuit opened; it doesn't change the verdict
+                return
+
+            for _ in range(failed_attempts):
+                self._attempts.append((now, True, False))
+            self._attempts.append((now, failed, slow))
+            total = len(self._attempts)
+            if total < self.settings.min_calls:
+                return
+            failures = sum(1 for _, f, _ in self._attempts if f)
+            slow_calls = sum(1 for _, _, s in self._attempts if s)
+            if failures / total >= self.settings.failure_rate:
+                self._open(now, f"{failures}/{total} recent attempts failed")
+            elif slow_calls / total >= self.settings.slow_call_rate:
+                self._open(now, f"{slow_calls}/{total} recent calls were slow")
+
+    def release(self) -> None:
+        """Give back a probe slot of a call that ended without a verdict (e.g. cancelled)"""
+        with self._lock:
+            if self._state == CircuitState.HALF_OPEN and self._probes > 0:
+                self._probes -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._refresh(time.monotonic())
+            total = len(self._attempts)
+            failures = sum(1 for _, f, _ in self._attempts if f)
+            return {
+                "state": self._state.value,
+                "recent_attempts": total,
+                "recent_failures": failures,
+                "failure_rate": round(failures / total, 4) if total else 0.0,
+                "times_opened": self.times_opened,
+                "rejected": self.rejected,
+            }
+
+
+class CircuitBreakerRegistry:
+    """The circuit breakers of this worker, one per provider/model pair"""
+
+    def __init__(self, settings: Optional[BreakerSettings] = None):
+        self.settings = settings
+        self._lock = threading.Lock()
+        self._breakers: Dict[str, CircuitBreaker] = {}
+
+    def get(self, provider: str, model: str) -> CircuitBreaker:
+        name = f"{getattr(provider, 'value', provider)}:{model}"
+        with self._lock:
+            if name not in self._breakers:
+                self._breakers[name] = CircuitBreaker(name, self.settings)
+            return self._breakers[name]
+
+    def available(self, provider: str, model: str) -> bool:
+        """Whether calls to the provider/model would currently be let through"""
+        return not breakers_enabled() or self.get(provider, model).available()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            breakers = dict(self._breakers)
+        return {
+            "enabled": breakers_enabled(),
+            "circuits": {name: breaker.stats() for name, breaker in breakers.items()},
+        }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._breakers.clear()
+
+
+# Process-wide registry used by LLMService and create_agent_llm_service
+circuit_breakers = CircuitBreakerRegistry()
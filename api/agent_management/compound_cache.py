@@ -0,0 +1,323 @@
+"""
+Compound Cache Module - Read-through cache of PubChem data keyed by CID.
+
+The same handful of molecules are looked up again and again (water, benzene,
+caffeine...), and every lookup used to refetch the record and the 2D and 3D
+SDF from PubChem. PubChemClient now reads them through this cache first:
+
+- Entries are keyed on (CID, kind), kind being ``record`` (the PUG REST JSON
+  record with the computed properties), ``synonyms``, ``sdf_2d`` or ``sdf_3d``
+- Values are zlib-compressed in a SQLite table shared by all workers
+- "PubChem has no such data" (e.g. no 3D conformer) is cached too, as an
+  empty value with a shorter TTL, so the 404 isn't asked for again
+- When the table outgrows its size limit, the least recently used entries are
+  evicted first
+- Reads are counted in memory and written back with the next write, so a
+  cache hit doesn't take the SQLite write lock
+- Popular entries (read at least ``COMPOUND_CACHE_PIN_HITS`` times) are kept
+  past their TTL, up to ``COMPOUND_CACHE_PIN_MAX_AGE_SECONDS`` after they
+  were fetched, and are only evicted for size once no unpinned entry is left.
+  "No such data" entries are never pinned
+
+Configuration (environment):
+
+- ``COMPOUND_CACHE_ENABLED``: set to ``0`` to always go to PubChem (default: on)
+- ``COMPOUND_CACHE_URL``: SQLAlchemy URL of the cache (default: SQLite file
+  under ``api/data/``)
+- ``COMPOUND_CACHE_TTL_SECONDS``: TTL of an entry (default: 30 days)
+- ``COMPOUND_CACHE_MISSING_TTL_SECONDS``: TTL of a "no such data" entry (default: 1 day)
+- ``COMPOUND_CACHE_MAX_BYTES``: compressed size the cache is kept under (default: 256 MB)
+- ``COMPOUND_CACHE_PIN_HITS``: reads after which an entry outlives its TTL (default: 5)
+- ``COMPOUND_CACHE_PIN_MAX_AGE_SECONDS``: age after which a pinned entry is refetched (default: 180 days)
+"""
+
+import contextlib
+import logging
+import os
+import threading
+import time
+import zlib
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from sqlalchemy import (
+    Column,
+    Float,
+    Index,
+    Integer,
+    LargeBinary,
+    MetaData,
+    String,
+    Table,
+    and_,
+    case,
+    delete,
+    func,
+    or_,
+    select,
+    update,
+)
+from sqlalchemy.engine import Connection, Engine
+
+from agent_management.job_store import DATA_DIR, get_engine
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_URL = "sqlite:///" + os.path.join(DATA_DIR, "compound_cache.sqlite3")
+DEFAULT_TTL_SECONDS = 30 * 24 * 60 * 60
+DEFAULT_MISSING_TTL_SECONDS = 24 * 60 * 60
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+DEFAULT_PIN_HITS = 5
+DEFAULT_PIN_MAX_AGE_SECONDS = 180 * 24 * 60 * 60
+
+# Kinds of data cached per CID
+KINDS = ("record", "synonyms", "sdf_2d", "sdf_3d")
+
+# Reads are counted in memory and written back, together with last_used_at,
+# at most this often per entry, so hot entries don't turn every read into a write
+TOUCH_INTERVAL_SECONDS = 60.0
+
+compound_metadata = MetaData()
+
+compound_cache_table = Table(
+    "compound_cache",
+    compound_metadata,
+    Column("cid", Integer, primary_key=True),
+    Column("kind", String(16), primary_key=True),
+    Column("value", LargeBinary, nullable=False),
+    Column("size", Integer, nullable=False),
+    Column("hits", Integer, nullable=False, default=0),
+    Column("created_at", Float, nullable=False),
+    Column("expires_at", Float, nullable=False),
+    Column("last_used_at", Float, nullable=False),
+    Index("ix_compound_cache_last_used_at", "last_used_at"),
+)
+
+
+def compound_cache_enabled() -> bool:
+    return os.environ.get("COMPOUND_CACHE_ENABLED", "1").lower() not in ("0", "false", "no")
+
+
+class CompoundCache:
+    """SQL-backed, size-bounded LRU cache of PubChem data per CID"""
+
+    def __init__(
+        self,
+        url: Optional[str] = None,
+        max_bytes: Optional[int] = None,
+        pin_hits: Optional[int] = None,
+        pin_max_age: Optional[float] = None,
+    ):
+        """
+        Args:
+            url: SQLAlchemy URL; defaults to COMPOUND_CACHE_URL
+            max_bytes: Compressed size limit; defaults to COMPOUND_CACHE_MAX_BYTES
+            pin_hits: Reads after which an entry is pinned; defaults to COMPOUND_CACHE_PIN_HITS
+            pin_max_age: Seconds a pinned entry is kept after it was fetched;
+                defaults to COMPOUND_CACHE_PIN_MAX_AGE_SECONDS
+        """
+        self.max_bytes = max_bytes or int(os.environ.get("COMPOUND_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES))
+        self.pin_hits = pin_hits or int(os.environ.get("COMPOUND_CACHE_PIN_HITS", DEFAULT_PIN_HITS))
+        self.pin_max_age = pin_max_age or float(
+            os.environ.get("COMPOUND_CACHE_PIN_MAX_AGE_SECONDS", DEFAULT_PIN_MAX_AGE_SECONDS)
+        )
+        self._engine: Engine = get_engine(
+            url or os.environ.get("COMPOUND_CACHE_URL", DEFAULT_CACHE_URL), compound_metadata
+        )
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, Dict[str, int]] = {}
+        # (cid, kind) -> reads not yet added to the stored hit count
+        self._pending_hits: Dict[Tuple[int, str], int] = {}
+
+    def _count(self, kind: str, metric: str) -> None:
+        with self._lock:
+            counters = self._metrics.setdefault(kind, {"hits": 0, "misses": 0, "stores": 0, "evictions": 0})
+            counters[metric] += 1
+
+    @contextlib.contextmanager
+    def _write(self) -> Iterator[Connection]:
+        """Transaction that takes the write lock up front (BEGIN IMMEDIATE on SQLite)"""
+        with self._engine.connect() as conn:
+            conn = conn.execution_options(sqlite_immediate=True)
+            with conn.begin():
+                yield conn
+
+    def _pinned(self, now: float):
+        """Entries read often enough to outlive their TTL, until they reach the maximum age"""
+        table = compound_cache_table
+        return and_(table.c.hits >= self.pin_hits, table.c.created_at > now - self.pin_max_age)
+
+    def _live(self, now: float):
+        """Entries that are still fresh or pinned"""
+        return or_(compound_cache_table.c.expires_at > now, self._pinned(now))
+
+    def get(self, cid: int, kind: str) -> Optional[str]:
+        """
+        Look up cached data of a CID.
+
+        Args:
+            cid: PubChem compound ID
+            kind: One of KINDS
+
+        Returns:
+            The cached text, "" if PubChem is known to have none, or None on a miss
+        """
+        table = compound_cache_table
+        now = time.time()
+        key = and_(table.c.cid == int(cid), table.c.kind == kind)
+        try:
+            with self._engine.connect() as conn:
+                row = conn.execute(
+                    select(table.c.value, table.c.last_used_at).where(key, self._live(now))
+                ).first()
+            value = zlib.decompress(row.value).decode("utf-8") if row is not None else None
+            if value:
+                # Count the read (for pinning); the count and the LRU position
+                # are written back once the entry's last write is stale.
+                # "No such data" entries aren't counted, so they are never pinned
+                with self._lock:
+                    hits = self._pending_hits.get((int(cid), kind), 0) + 1
+                    stale = now - row.last_used_at > TOUCH_INTERVAL_SECONDS
+                    if stale:
+                        self._pending_hits.pop((int(cid), kind), None)
+                    else:
+                        self._pending_hits[(int(cid), kind)] = hits
+                if stale:
+                    with self._write() as conn:
+                        conn.execute(update(table).where(key).values(hits=table.c.hits + hits, last_used_at=now))
+        except Exception as e:
+            # A broken cache only costs a trip to PubChem
+            logger.warning(f"Could not read compound cache entry {cid}/{kind}: {e}")
+            value = None
+
+        if value is None:
+            self._count(kind, "misses")
+            return None
+        self._count(kind, "hits")
+        return value
+
+    def put(self, cid: int, kind: str, value: str) -> None:
+        """
+        Store data of a CID, evicting least recently used entries beyond the size limit.
+
+        Args:
+            cid: PubChem compound ID
+            kind: One of KINDS
+            value: The data, or "" to record that PubChem has none
+        """
+        table = compound_cache_table
+        now = time.time()
+        ttl = float(
+            os.environ.get("COMPOUND_CACHE_TTL_SECONDS", DEFAULT_TTL_SECONDS)
+            if value
+            else os.environ.get("COMPOUND_CACHE_MISSING_TTL_SECONDS", DEFAULT_MISSING_TTL_SECONDS)
+        )
+        compressed = zlib.compress(value.encode("utf-8"))
+        with self._lock:
+            pending, self._pending_hits = self._pending_hits, {}
+        try:
+            with self._write() as conn:
+                # Writing anyway: add the reads counted since the last write
+                # of every entry, so eviction sees the current pins
+                for (hit_cid, hit_kind), count in pending.items():
+                    conn.execute(
+                        update(table)
+                        .where(table.c.cid == hit_cid, table.c.kind == hit_kind)
+                        .values(hits=table.c.hits + count)
+                    )
+                # A refetched entry keeps its reads, unless PubChem no longer has the data
+                hits = 0
+                if value:
+                    hits = conn.execute(
+                        select(table.c.hits).where(table.c.cid == int(cid), table.c.kind == kind)
+                    ).scalar() or 0
+                conn.execute(delete(table).where(table.c.cid == int(cid), table.c.kind == kind))
+                conn.execute(
+                    table.insert().values(
+                        cid=int(cid),
+                        kind=kind,
+                        value=compressed,
+                        size=len(compressed),
+                        hits=hits,
+                        created_at=now,
+                        expires_at=now + ttl,
+                        last_used_at=now,
+                    )
+                )
+                evicted = self._evict(conn, now)
+        except Exception as e:
+            logger.warning(f"Could not persist compound cache entry {cid}/{kind}: {e}")
+            return
+        self._count(kind, "stores")
+        for evicted_kind in evicted:
+            self._count(evicted_kind, "evictions")
+
+    def _evict(self, conn: Connection, now: float) -> list:
+        """
+        Drop expired entries, then the least recently used ones while the cache
+        is over its size limit, unpinned entries before pinned ones (caller
+        holds the write transaction).
+
+        Returns:
+            The kinds of the entries evicted for size
+        """
+        table = compound_cache_table
+        conn.execute(delete(table).where(~self._live(now)))
+        total = conn.execute(select(func.coalesce(func.sum(table.c.size), 0))).scalar()
+        if total <= self.max_bytes:
+            return []
+        evicted = []
+        rows = conn.execute(
+            select(table.c.cid, table.c.kind, table.c.size)
+            .order_by(case((self._pinned(now), 1), else_=0), table.c.last_used_at)
+        )
+        for row in rows.fetchall():
+            if total <= self.max_bytes:
+                break
+            conn.execute(delete(table).where(table.c.cid == row.cid, table.c.kind == row.kind))
+            total -= row.size
+            evicted.append(row.kind)
+        return evicted
+
+    def clear(self) -> None:
+        """Forget every entry and reset the metrics"""
+        with self._lock:
+            self._metrics.clear()
+            self._pending_hits.clear()
+        with self._write() as conn:
+            conn.execute(delete(compound_cache_table))
+
+    def stats(self) -> Dict[str, Any]:
+        table = compound_cache_table
+        now = time.time()
+        with self._lock:
+            kinds = {kind: dict(counters) for kind, counters in self._metrics.items()}
+        with self._engine.connect() as conn:
+            entries, size, pinned = conn.execute(
+                select(
+                    func.count(),
+                    func.coalesce(func.sum(table.c.size), 0),
+                    func.coalesce(func.sum(case((self._pinned(now), 1), else_=0)), 0),
+                )
+            ).one()
+        return {
+            "enabled": compound_cache_enabled(),
+            "entries": entries,
+            "pinned_entries": pinned,
+            "bytes": size,
+            "max_bytes": self.max_bytes,
+            "pin_max_age_seconds": self.pin_max_age,
+            "kinds": kinds,
+        }
+
+
+_cache: Optional[CompoundCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_compound_cache() -> CompoundCache:
+    """Return the process-wide cache, creating it on first use"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = CompoundCache()
+        return _cache
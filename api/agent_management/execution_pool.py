@@ -0,0 +1,359 @@
+"""
+Execution Pool Module - Runs blocking agent work off the asyncio event loop.
+
+The agents call synchronous SDKs (OpenAI, Anthropic, Groq), ``requests``,
+``pubchempy`` and RDKit directly, and the job store and caches use
+synchronous SQLAlchemy. Calling them from an ``async def`` route
+stalls every other request on the uvicorn worker, so routes hand that work to
+one of the bounded thread pools defined here instead.
+
+Pool sizes and per-endpoint concurrency limits are read from the environment:
+
+- ``EXECUTOR_<POOL>_WORKERS`` sets the thread count of a pool
+  (e.g. ``EXECUTOR_LLM_WORKERS=32``)
+- ``EXECUTOR_ENDPOINT_LIMIT`` sets the default number of concurrent calls a
+  single endpoint may have in flight
+- ``EXECUTOR_LIMIT_<ENDPOINT>`` overrides the limit for one endpoint
+  (e.g. ``EXECUTOR_LIMIT_GENERATE_FROM_PUBCHEM=4``)
+
+Named limits can also guard native async work (e.g. the per-provider limit
+``provider:anthropic`` used by the geometry fan-out, configured with
+``EXECUTOR_LIMIT_PROVIDER_ANTHROPIC``).
+
+A thread cannot be interrupted, so cancelling a run() only stops the caller
+from waiting. The worker is told through a cancellation flag instead, and
+blocking code calls raise_if_cancelled() before expensive steps (every
+LLMService.generate call does) so it gives up its slot at the next check.
+"""
+
+import asyncio
+import contextlib
+import contextvars
+import functools
+import logging
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Any, AsyncIterator, Callable, Dict, Optional, TypeVar
+
+R = TypeVar("R")
+
+logger = logging.getLogger(__name__)
+
+# Set in worker threads; flagged when the coroutine awaiting the work is cancelled
+_cancel_flag: contextvars.ContextVar[Optional[threading.Event]] = contextvars.ContextVar(
+    "blocking_cancel_flag", default=None
+)
+
+
+class OperationCancelled(Exception):
+    """Raised inside blocking work whose caller has been cancelled"""
+    pass
+
+
+def cancellation_requested() -> bool:
+    """Whether the caller of the current blocking work has been cancelled"""
+    flag = _cancel_flag.get()
+    return flag is not None and flag.is_set()
+
+
+def raise_if_cancelled() -> None:
+    """Abort blocking work whose caller has gone away (no-op outside the pools)"""
+    if cancellation_requested():
+        raise OperationCancelled("Operation cancelled by the caller")
+
+
+def sleep_unless_cancelled(seconds: float) -> None:
+    """
+    Sleep in blocking work, waking up early and raising OperationCancelled
+    if the caller is cancelled meanwhile.
+    """
+    flag = _cancel_flag.get()
+    if flag is None:
+        time.sleep(seconds)
+    elif flag.wait(seconds):
+        raise OperationCancelled("Operation cancelled by the caller")
+
+
+class PoolType(str, Enum):
+    """Kinds of blocking work, each with its own pool"""
+    LLM = "llm"          # Provider SDK calls (network bound, long)
+    PUBCHEM = "pubchem"  # PubChem REST / pubchempy lookups (network bound)
+    CPU = "cpu"          # RDKit conversions, scene packaging (CPU bound)
+    STORE = "store"      # Job store and cache reads/writes (SQLite, short)
+
+
+DEFAULT_POOL_WORKERS: Dict[PoolType, int] = {
+    PoolType.LLM: 16,
+    PoolType.PUBCHEM: 8,
+    PoolType.CPU: max(2, os.cpu_count() or 2),
+    PoolType.STORE: 8,
+}
+
+DEFAULT_ENDPOINT_LIMIT = 8
+
+
+def _env_int(name: str, default: int) -> int:
+    """Read a positive integer from the environment, falling back to default"""
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    try:
+        parsed = int(value)
+    except ValueError:
+        logger.warning(f"Ignoring non-integer value for {name}: {value!r}")
+        return default
+    return parsed if parsed > 0 else default
+
+
+@dataclass
+class PoolStats:
+    """Counters for a single pool"""
+    workers: int
+    submitted: int = 0
+    active: int = 0
+    completed: int = 0
+    failed: int = 0
+    total_wait_s: float = 0.0
+    max_wait_s: float = 0.0
+    total_run_s: float = 0.0
+
+    @property
+    def queued(self) -> int:
+        """Tasks submitted to the pool but not yet picked up by a worker"""
+        return self.submitted - self.active - self.completed - self.failed
+
+    def as_dict(self) -> Dict[str, Any]:
+        finished = self.completed + self.failed
+        started = self.active + finished
+        return {
+            "workers": self.workers,
+            "queued": self.queued,
+            "active": self.active,
+            "completed": self.completed,
+            "failed": self.failed,
+            "avg_wait_ms": round(self.total_wait_s / started * 1000, 2) if started else 0.0,
+            "max_wait_ms": round(self.max_wait_s * 1000, 2),
+            "avg_run_ms": round(self.total_run_s / finished * 1000, 2) if finished else 0.0,
+        }
+
+
+@dataclass
+class EndpointStats:
+    """Counters for a single endpoint's concurrency limit"""
+    limit: int
+    in_flight: int = 0
+    waiting: int = 0
+    total_wait_s: float = 0.0
+    max_wait_s: float = 0.0
+    admitted: int = 0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "admitted": self.admitted,
+            "avg_wait_ms": round(self.total_wait_s / self.admitted * 1000, 2) if self.admitted else 0.0,
+            "max_wait_ms": round(self.max_wait_s * 1000, 2),
+        }
+
+
+@dataclass
+class _EndpointLimiter:
+    """Per-endpoint semaphore; recreated if used from a different event loop"""
+    stats: EndpointStats
+    semaphore: Optional[asyncio.Semaphore] = None
+    loop: Optional[asyncio.AbstractEventLoop] = field(default=None, repr=False)
+
+    def get_semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if self.semaphore is None or self.loop is not loop:
+            self.semaphore = asyncio.Semaphore(self.stats.limit)
+            self.loop = loop
+        return self.semaphore
+
+
+class BlockingExecutor:
+    """
+    Runs synchronous callables on bounded thread pools and reports
+    queue depth and wait time for each pool and endpoint.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pools: Dict[PoolType, ThreadPoolExecutor] = {}
+        self._pool_stats: Dict[PoolType, PoolStats] = {}
+        self._endpoints: Dict[str, _EndpointLimiter] = {}
+
+    def _get_pool(self, pool: PoolType) -> ThreadPoolExecutor:
+        with self._lock:
+            executor = self._pools.get(pool)
+            if executor is None:
+                workers = _env_int(
+                    f"EXECUTOR_{pool.name}_WORKERS", DEFAULT_POOL_WORKERS[pool]
+                )
+                executor = ThreadPoolExecutor(
+                    max_workers=workers, thread_name_prefix=f"{pool.value}-pool"
+                )
+                self._pools[pool] = executor
+                self._pool_stats[pool] = PoolStats(workers=workers)
+            return executor
+
+    def _get_endpoint(self, endpoint: str) -> _EndpointLimiter:
+        with self._lock:
+            limiter = self._endpoints.get(endpoint)
+            if limiter is None:
+                default_limit = _env_int("EXECUTOR_ENDPOINT_LIMIT", DEFAULT_ENDPOINT_LIMIT)
+                env_name = "EXECUTOR_LIMIT_" + re.sub(r"[^A-Z0-9]", "_", endpoint.upper())
+                limiter = _EndpointLimiter(
+                    stats=EndpointStats(limit=_env_int(env_name, default_limit))
+                )
+                self._endpoints[endpoint] = limiter
+            return limiter
+
+    def _instrument(self, pool: PoolType, func: Callable[..., R], submitted_at: float) -> Callable[[], R]:
+        """Wrap func so the worker thread records wait and run times"""
+        stats = self._pool_stats[pool]
+
+        def wrapper() -> R:
+            started_at = time.perf_counter()
+            wait = started_at - submitted_at
+            with self._lock:
+                stats.active += 1
+                stats.total_wait_s += wait
+                stats.max_wait_s = max(stats.max_wait_s, wait)
+            ok = False
+            try:
+                result = func()
+                ok = True
+                return result
+            finally:
+                with self._lock:
+                    stats.active -= 1
+                    stats.total_run_s += time.perf_counter() - started_at
+                    if ok:
+                        stats.completed += 1
+                    else:
+                        stats.failed += 1
+
+        return wrapper
+
+    async def run(
+        self,
+        pool: PoolType,
+        func: Callable[..., R],
+        *args: Any,
+        endpoint: Optional[str] = None,
+        **kwargs: Any,
+    ) -> R:
+        """
+        Run a blocking callable on the given pool without blocking the event loop.
+
+        Context variables of the caller are propagated into the worker thread.
+
+        Args:
+            pool: Which pool to run the callable on
+            func: The blocking callable
+            *args, **kwargs: Arguments for the callable
+            endpoint: Optional endpoint name whose concurrency limit applies
+
+        Returns:
+            The callable's return value (exceptions are re-raised)
+        """
+        if endpoint is None:
+            return await self._submit(pool, func, *args, **kwargs)
+
+        async with self.limit(endpoint):
+            return await self._submit(pool, func, *args, **kwargs)
+
+    @contextlib.asynccontextmanager
+    async def limit(self, name: str) -> AsyncIterator[None]:
+        """
+        Hold one slot of the named concurrency limit for the duration of the block.
+
+        The limit is read from ``EXECUTOR_LIMIT_<NAME>`` (falling back to
+        ``EXECUTOR_ENDPOINT_LIMIT``) and reported under ``endpoints`` in stats().
+        """
+        limiter = self._get_endpoint(name)
+        stats = limiter.stats
+        semaphore = limiter.get_semaphore()
+        queued_at = time.perf_counter()
+        stats.waiting += 1
+        try:
+            await semaphore.acquire()
+        finally:
+            stats.waiting -= 1
+        wait = time.perf_counter() - queued_at
+        stats.admitted += 1
+        stats.total_wait_s += wait
+        stats.max_wait_s = max(stats.max_wait_s, wait)
+        stats.in_flight += 1
+        try:
+            yield
+        finally:
+            stats.in_flight -= 1
+            semaphore.release()
+
+    async def _submit(self, pool: PoolType, func: Callable[..., R], *args: Any, **kwargs: Any) -> R:
+        executor = self._get_pool(pool)
+        ctx = contextvars.copy_context()
+        cancel_flag = threading.Event()
+        ctx.run(_cancel_flag.set, cancel_flag)
+        call = functools.partial(ctx.run, self._unless_cancelled(func), *args, **kwargs)
+        with self._lock:
+            self._pool_stats[pool].submitted += 1
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(
+                executor, self._instrument(pool, call, time.perf_counter())
+            )
+        except asyncio.CancelledError:
+            cancel_flag.set()
+            raise
+
+    @staticmethod
+    def _unless_cancelled(func: Callable[..., R]) -> Callable[..., R]:
+        """Skip work that was cancelled while it was still queued"""
+
+        def wrapper(*args: Any, **kwargs: Any) -> R:
+            raise_if_cancelled()
+            return func(*args, **kwargs)
+
+        return wrapper
+
+    def stats(self) -> Dict[str, Any]:
+        """Snapshot of pool and endpoint counters"""
+        with self._lock:
+            return {
+                "pools": {pool.value: s.as_dict() for pool, s in self._pool_stats.items()},
+                "endpoints": {name: l.stats.as_dict() for name, l in self._endpoints.items()},
+            }
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Shut down all pools (used on application shutdown)"""
+        with self._lock:
+            pools = list(self._pools.values())
+            self._pools.clear()
+            self._pool_stats.clear()
+        for executor in pools:
+            executor.shutdown(wait=wait)
+
+
+# Process-wide executor shared by all routes
+blocking_executor = BlockingExecutor()
+
+
+async def run_blocking(
+    pool: PoolType,
+    func: Callable[..., R],
+    *args: Any,
+    endpoint: Optional[str] = None,
+    **kwargs: Any,
+) -> R:
+    """Convenience wrapper around the shared BlockingExecutor"""
+    return await blocking_executor.run(pool, func, *args, endpoint=endpoint, **kwargs)
@@ -0,0 +1,326 @@
+"""
+Hedging Module - Hedged structured requests across an agent's fallback models.
+
+A few slow provider calls dominate pipeline latency. With hedging enabled,
+a structured call that hasn't answered within the agent's observed p95
+latency gets a second, identical request sent to the agent's next fallback
+model (AGENT_MODEL_MAP) whose circuit isn't open, and the first valid
+structured response wins. The slower request is cancelled (async) or told
+to stop retrying (blocking), and so are both when the caller is cancelled.
+Cache hits never reach the hedge: only the provider call of a miss is hedged.
+
+Hedges cost extra tokens, so they are capped by a budget: within the last
+``LLM_HEDGE_WINDOW`` calls of an agent, at most ``LLM_HEDGE_MAX_FRACTION`` of
+them may be hedged. Nothing is hedged until the agent has
+``LLM_HEDGE_MIN_SAMPLES`` latency samples, so the p95 is meaningful.
+
+Configuration (environment):
+
+- ``LLM_HEDGING_ENABLED``: turn hedging on (default: off)
+- ``LLM_HEDGE_MAX_FRACTION``: largest fraction of calls that may be hedged (default: 0.05)
+- ``LLM_HEDGE_MIN_SAMPLES``: latency samples needed before hedging (default: 20)
+- ``LLM_HEDGE_WINDOW``: latency samples and calls kept per agent (default: 200)
+- ``LLM_HEDGE_WORKERS``: threads for hedged blocking calls (default: 16)
+"""
+
+import asyncio
+import contextvars
+import logging
+import math
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional, Set, Tuple
+
+from agent_management.circuit_breaker import circuit_breakers
+from agent_management.execution_pool import OperationCancelled, _cancel_flag
+from agent_management.llm_service import LLMModelConfig, LLMService, StructuredLLMRequest, T
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_FRACTION = 0.05
+DEFAULT_MIN_SAMPLES = 20
+DEFAULT_WINDOW = 200
+DEFAULT_WORKERS = 16
+
+# How often a blocking hedged call checks whether its caller was cancelled
+CANCEL_CHECK_INTERVAL = 0.1
+
+
+def hedging_enabled() -> bool:
+    """Whether hedged requests are turned on (LLM_HEDGING_ENABLED)"""
+    return os.environ.get("LLM_HEDGING_ENABLED", "0").lower() in ("1", "true", "yes", "on")
+
+
+class HedgeBudget:
+    """Per-agent latency samples and the share of recent calls that were hedged"""
+
+    def __init__(
+        self,
+        max_fraction: Optional[float] = None,
+        min_samples: Optional[int] = None,
+        window: Optional[int] = None,
+    ):
+        self.max_fraction = (
+            max_fraction if max_fraction is not None
+            else float(os.environ.get("LLM_HEDGE_MAX_FRACTION", DEFAULT_MAX_FRACTION))
+        )
+        self.min_samples = (
+            min_samples if min_samples is not None
+            else int(os.environ.get("LLM_HEDGE_MIN_SAMPLES", DEFAULT_MIN_SAMPLES))
+        )
+        window = window or int(os.environ.get("LLM_HEDGE_WINDOW", DEFAULT_WINDOW))
+        self._lock = threading.Lock()
+        self._latencies: Deque[float] = deque(maxlen=window)
+        # One entry per call: whether it was hedged
+        self._calls: Deque[bool] = deque(maxlen=window)
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def record_latency(self, seconds: float) -> None:
+        with self._lock:
+            self._latencies.append(seconds)
+
+    def p95(self) -> Optional[float]:
+        """The 95th percentile latency in seconds, or None without enough samples"""
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                return None
+            ordered = sorted(self._latencies)
+        return ordered[min(len(ordered) - 1, math.ceil(0.95 * len(ordered)) - 1)]
+
+    def start_call(self) -> None:
+        """Register a hedgeable call (the latest one is the one try_hedge() applies to)"""
+        with self._lock:
+            self._calls.append(False)
+
+    def try_hedge(self) -> bool:
+        """Spend budget on hedging the latest call, if the cap allows it"""
+        with self._lock:
+            if not self._calls or self._calls[-1]:
+                return False
+            if sum(self._calls) + 1 > self.max_fraction * len(self._calls):
+                return False
+            self._calls[-1] = True
+            self.hedges += 1
+            return True
+
+    def record_win(self, hedge_won: bool) -> None:
+        if hedge_won:
+            with self._lock:
+                self.hedge_wins += 1
+
+    def stats(self) -> Dict[str, Any]:
+        p95 = self.p95()
+        with self._lock:
+            calls = len(self._calls)
+            hedged = sum(self._calls)
+            return {
+                "samples": len(self._latencies),
+                "p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+                "recent_calls": calls,
+                "recent_hedged": hedged,
+                "hedged_fraction": round(hedged / calls, 4) if calls else 0.0,
+                "max_fraction": self.max_fraction,
+                "hedges": self.hedges,
+                "hedge_wins": self.hedge_wins,
+            }
+
+
+_budgets: Dict[str, HedgeBudget] = {}
+_budgets_lock = threading.Lock()
+_hedge_pool: Optional[ThreadPoolExecutor] = None
+
+
+def get_budget(key: str) -> HedgeBudget:
+    """Shared budget for one agent/model pair"""
+    with _budgets_lock:
+        if key not in _budgets:
+            _budgets[key] = HedgeBudget()
+        return _budgets[key]
+
+
+def stats() -> Dict[str, Any]:
+    """Hedging counters of every agent that made a hedgeable call"""
+    with _budgets_lock:
+        budgets = dict(_budgets)
+    return {
+        "enabled": hedging_enabled(),
+        "agents": {key: budget.stats() for key, budget in budgets.items()},
+    }
+
+
+def _get_pool() -> ThreadPoolExecutor:
+    global _hedge_pool
+    with _budgets_lock:
+        if _hedge_pool is None:
+            _hedge_pool = ThreadPoolExecutor(
+                max_workers=int(os.environ.get("LLM_HEDGE_WORKERS", DEFAULT_WORKERS)),
+                thread_name_prefix="llm-hedge",
+            )
+        return _hedge_pool
+
+
+def _submit(func: Callable[..., Any], *args: Any) -> Tuple[Future, threading.Event]:
+    """Run func in the hedge pool with the caller's context and its own cancel flag"""
+    ctx = contextvars.copy_context()
+    cancel_flag = threading.Event()
+    ctx.run(_cancel_flag.set, cancel_flag)
+    return _get_pool().submit(ctx.run, func, *args), cancel_flag
+
+
+def _wait(
+    futures: Iterable[Future], caller_flag: Optional[threading.Event], timeout: Optional[float] = None
+) -> Tuple[Set[Future], Set[Future]]:
+    """
+    Wait for the first of the futures to finish, or for the timeout.
+
+    Raises:
+        OperationCancelled: As soon as the caller's cancel flag is set
+    """
+    deadline = None if timeout is None else time.monotonic() + timeout
+    while True:
+        if caller_flag is not None and caller_flag.is_set():
+            raise OperationCancelled("Operation cancelled by the caller")
+        interval = CANCEL_CHECK_INTERVAL
+        if deadline is not None:
+            interval = min(interval, max(0.0, deadline - time.monotonic()))
+        done, pending = wait(futures, timeout=interval, return_when=FIRST_COMPLETED)
+        if done or (deadline is not None and time.monotonic() >= deadline):
+            return done, pending
+
+
+class HedgedLLMService(LLMService):
+    """
+    LLMService whose structured calls are hedged against a fallback model.
+
+    Everything else (plain generation, streaming) behaves like LLMService.
+    """
+
+    def __init__(
+        self,
+        config: LLMModelConfig,
+        agent: Optional[str] = None,
+        fallback_models: Optional[List[str]] = None,
+        budget: Optional[HedgeBudget] = None,
+    ):
+        super().__init__(config, agent=agent)
+        self.fallback_models = list(fallback_models or [])
+        self.budget = budget or get_budget(f"{agent or 'unknown'}:{config.model_name}")
+        # Services of the fallback models, created on first use (None if unavailable)
+        self._backups: Dict[str, Optional[LLMService]] = {}
+
+    def _backup_service(self) -> Optional[LLMService]:
+        """Service for the first fallback model that can be created and whose circuit isn't open"""
+        from agent_management.model_config import get_llm_service
+
+        for model_name in self.fallback_models:
+            if model_name == self.config.model_name:
+                continue
+            if model_name not in self._backups:
+                try:
+                    self._backups[model_name] = get_llm_service(model_name, agent=self.agent)
+                except ValueError:
+                    self._backups[model_name] = None
+            backup = self._backups[model_name]
+            if backup is not None and circuit_breakers.available(backup.config.provider, backup.config.model_name):
+                return backup
+        return None
+
+    def _hedge_plan(self, request: StructuredLLMRequest[T]) -> Optional[Tuple[float, LLMService, StructuredLLMRequest[T]]]:
+        """Hedge delay, backup service and backup request, or None if this call isn't hedgeable"""
+        if not hedging_enabled():
+            return None
+        delay = self.budget.p95()
+        backup = self._backup_service() if delay is not None else None
+        if backup is None:
+            return None
+        # Requests usually carry the primary's config explicitly
+        return delay, backup, request.model_copy(update={"llm_config": backup.config})
+
+    # Cache lookups, usage records and result caching stay in LLMService;
+    # only the provider call of a cache miss is hedged
+
+    def _call_structured(self, request: StructuredLLMRequest[T], record) -> T:
+        """Provider call of a structured request, hedged with a fallback model when slow"""
+        plan = self._hedge_plan(request)
+        self.budget.start_call()
+        started = time.perf_counter()
+        if plan is None:
+            result = super()._call_structured(request, record)
+            self.budget.record_latency(time.perf_counter() - started)
+            return result
+
+        delay, backup, backup_request = plan
+        # Attempts run in the hedge pool; each gets its own cancel flag, set
+        # when it loses or when the caller itself is cancelled
+        caller_flag = _cancel_flag.get()
+        primary_future, primary_flag = _submit(super()._call_structured, request, record)
+        attempts = {primary_future: (False, primary_flag)}
+        try:
+            done, _ = _wait([primary_future], caller_flag, timeout=delay)
+            if not done and self.budget.try_hedge():
+                logger.info(f"Hedging {self.agent} call to {backup.config.model_name} after {delay:.2f}s")
+                backup_future, backup_flag = _submit(backup.generate_structured, backup_request)
+                attempts[backup_future] = (True, backup_flag)
+
+            pending = set(attempts)
+            errors: List[BaseException] = []
+            while pending:
+                done, pending = _wait(pending, caller_flag)
+                for future in done:
+                    if future.exception() is not None:
+                        errors.append(future.exception())
+                        continue
+                    hedge_won = attempts[future][0]
+                    # When the hedge wins, the primary has taken at least this
+                    # long: leaving it out would pull the p95 (the hedge delay) down
+                    self.budget.record_latency(time.perf_counter() - started)
+                    self.budget.record_win(hedge_won)
+                    return future.result()
+            raise errors[0]
+        finally:
+            for future, (_, flag) in attempts.items():
+                if not future.done():
+                    flag.set()
+
+    async def _acall_structured(self, request: StructuredLLMRequest[T], record) -> T:
+        """Async counterpart of _call_structured(); the losing request is cancelled"""
+        plan = self._hedge_plan(request)
+        self.budget.start_call()
+        started = time.perf_counter()
+        if plan is None:
+            result = await super()._acall_structured(request, record)
+            self.budget.record_latency(time.perf_counter() - started)
+            return result
+
+        delay, backup, backup_request = plan
+        primary = asyncio.ensure_future(super()._acall_structured(request, record))
+        attempts = {primary: False}
+        try:
+            done, _ = await asyncio.wait([primary], timeout=delay)
+            if not done and self.budget.try_hedge():
+                logger.info(f"Hedging {self.agent} call to {backup.config.model_name} after {delay:.2f}s")
+                attempts[asyncio.ensure_future(backup.agenerate_structured(backup_request))] = True
+
+            pending = set(attempts)
+            errors: List[BaseException] = []
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        errors.append(task.exception())
+                        continue
+                    hedge_won = attempts[task]
+                    # When the hedge wins, the primary has taken at least this
+                    # long: leaving it out would pull the p95 (the hedge delay) down
+                    self.budget.record_latency(time.perf_counter() - started)
+                    self.budget.record_win(hedge_won)
+                    return task.result()
+            raise errors[0]
+        finally:
+            for task in attempts:
+                if not task.done():
+                    task.cancel()
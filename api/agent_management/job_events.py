@@ -0,0 +1,166 @@
+"""
+Job Events Module - Pushes job progress to clients as Server-Sent Events.
+
+Pipeline tasks publish stage transitions to an in-process event bus, so a
+client connected to the same worker sees them immediately. A client whose
+stream is served by another worker (jobs live in the shared job store) falls
+back to polling the store on the server side, which still spares the client
+from re-downloading the whole job on every poll. The store is read on the
+STORE pool so a slow disk never stalls the event loop.
+"""
+
+import asyncio
+import inspect
+import json
+import threading
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional, Set, Tuple
+
+from agent_management.execution_pool import PoolType, run_blocking
+from agent_management.job_store import JobStore
+
+# Statuses after which a job's stream ends
+TERMINAL_STATUSES = {"completed", "error", "failed", "cancelled"}
+
+# How often the stream checks the job store for changes made by other workers
+STORE_POLL_INTERVAL = 1.0
+
+# Seconds between keep-alive comments on an idle stream
+KEEPALIVE_INTERVAL = 15.0
+
+# Disconnect handlers still running (referenced so they aren't garbage collected)
+_disconnect_tasks: Set["asyncio.Future[Any]"] = set()
+
+
+class JobEventBus:
+    """In-process publish/subscribe of job events, keyed by job ID"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers: Dict[str, Set[Tuple[asyncio.AbstractEventLoop, asyncio.Queue]]] = {}
+
+    def subscribe(self, job_id: str) -> asyncio.Queue:
+        """Register a queue (bound to the running loop) that receives the job's events"""
+        queue: asyncio.Queue = asyncio.Queue()
+        with self._lock:
+            self._subscribers.setdefault(job_id, set()).add((asyncio.get_running_loop(), queue))
+        return queue
+
+    def unsubscribe(self, job_id: str, queue: asyncio.Queue) -> None:
+        with self._lock:
+            subscribers = self._subscribers.get(job_id)
+            if not subscribers:
+                return
+            for entry in [entry for entry in subscribers if entry[1] is queue]:
+                subscribers.discard(entry)
+            if not subscribers:
+                del self._subscribers[job_id]
+
+    def publish(self, job_id: str, event: Dict[str, Any]) -> None:
+        """Deliver an event to every subscriber of the job; safe to call from any thread"""
+        with self._lock:
+            subscribers = list(self._subscribers.get(job_id, ()))
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, event)
+            except RuntimeError:
+                # The subscriber's loop has closed; it will be dropped on unsubscribe
+                pass
+
+    def subscriber_count(self, job_id: str) -> int:
+        with self._lock:
+            return len(self._subscribers.get(job_id, ()))
+
+
+# Process-wide bus used by the pipeline routes
+job_event_bus = JobEventBus()
+
+
+def format_sse(event: str, data: Dict[str, Any]) -> str:
+    """Format one Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def _progress_event(job_id: str, job: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "job_id": job_id,
+        "status": job.get("status"),
+        "stage": job.get("stage"),
+        "progress": job.get("progress", 0.0),
+    }
+
+
+async def stream_job_events(
+    job_id: str,
+    store: JobStore,
+    final_payload: Callable[[str, Dict[str, Any]], Dict[str, Any]],
+    bus: Optional[JobEventBus] = None,
+    poll_interval: float = STORE_POLL_INTERVAL,
+    keepalive_interval: float = KEEPALIVE_INTERVAL,
+    on_disconnect: Optional[Callable[[], Optional[Awaitable[Any]]]] = None,
+) -> AsyncIterator[str]:
+    """
+    Yield SSE messages for a job until it reaches a terminal status.
+
+    ``progress`` events carry the stage and progress value whenever either
+    changes; the stream ends with a single ``completed``, ``failed`` or
+    ``cancelled`` event whose data is ``final_payload(job_id, job)``.
+
+    Args:
+        job_id: The job to follow
+        store: The job store holding the job
+        final_payload: Builds the terminal event's data from the stored job
+        bus: Event bus to subscribe to (defaults to the process-wide bus)
+        poll_interval: Seconds between job store checks when no event arrives
+        keepalive_interval: Seconds between keep-alive comments
+        on_disconnect: Called if the client goes away before the job finishes;
+            a returned awaitable runs as its own task, since the stream itself
+            is being cancelled
+    """
+    bus = bus or job_event_bus
+    queue = bus.subscribe(job_id)
+    last_sent: Optional[Tuple[Any, Any, Any]] = None
+    last_write = time.monotonic()
+    finished = False
+    try:
+        while True:
+            # Spilled artifacts are only read for the final event
+            job = await run_blocking(PoolType.STORE, store.get, job_id, with_artifacts=False)
+            if job is None:
+                finished = True
+                yield format_sse("failed", {"job_id": job_id, "status": "failed", "error": "Job not found"})
+                return
+
+            if job.get("status") in TERMINAL_STATUSES:
+                event_name = {"completed": "completed", "cancelled": "cancelled"}.get(job["status"], "failed")
+                finished = True
+                final = await run_blocking(PoolType.STORE, store.get, job_id)
+                yield format_sse(event_name, final_payload(job_id, final or job))
+                return
+
+            event = _progress_event(job_id, job)
+            key = (event["status"], event["stage"], event["progress"])
+            if key != last_sent:
+                last_sent = key
+                last_write = time.monotonic()
+                yield format_sse("progress", event)
+            elif time.monotonic() - last_write >= keepalive_interval:
+                last_write = time.monotonic()
+                yield ": keep-alive\n\n"
+
+            # Wake up on a published event, or re-check the store after poll_interval
+            try:
+                await asyncio.wait_for(queue.get(), timeout=poll_interval)
+                # Drain events that arrived together; the store has the latest state
+                while not queue.empty():
+                    queue.get_nowait()
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        bus.unsubscribe(job_id, queue)
+        if not finished and on_disconnect is not None:
+            outcome = on_disconnect()
+            if inspect.isawaitable(outcome):
+                task = asyncio.ensure_future(outcome)
+                _disconnect_tasks.add(task)
+                task.add_done_callback(_disconnect_tasks.discard)
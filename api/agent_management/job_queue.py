@@ -0,0 +1,164 @@
+"""
+Job Queue Module - Admission control for background pipeline jobs.
+
+Every pipeline job fans out into many LLM calls, so starting one job per
+request lets a burst of submissions blow through provider rate limits. Jobs
+are instead admitted into a bounded FIFO queue served by a fixed number of
+concurrent runners. When the queue is full, submit() raises QueueFullError
+with an estimated wait time derived from the durations of recent jobs, which
+the routes turn into a 429 response with ``Retry-After``.
+
+Configuration (environment):
+
+- ``PIPELINE_QUEUE_WORKERS``: jobs that run at the same time (default: 4)
+- ``PIPELINE_QUEUE_MAX_DEPTH``: jobs that may wait for a runner (default: 50)
+"""
+
+import asyncio
+import collections
+import logging
+import math
+import os
+import time
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUEUE_WORKERS = 4
+DEFAULT_QUEUE_MAX_DEPTH = 50
+
+# Assumed job duration until the first jobs have finished
+DEFAULT_JOB_SECONDS = 60.0
+
+# Weight of the newest observation in the job duration average
+DURATION_SMOOTHING = 0.2
+
+
+class QueueFullError(Exception):
+    """Raised by JobQueue.submit() when no more jobs can be admitted"""
+
+    def __init__(self, retry_after: float, depth: int):
+        super().__init__(f"Job queue is full ({depth} jobs waiting)")
+        self.retry_after = retry_after
+        self.depth = depth
+
+
+class JobQueue:
+    """Bounded FIFO queue of async jobs served by a fixed number of runners"""
+
+    def __init__(self, name: str, workers: Optional[int] = None, max_depth: Optional[int] = None):
+        self.name = name
+        self.workers = workers or int(os.environ.get("PIPELINE_QUEUE_WORKERS", DEFAULT_QUEUE_WORKERS))
+        self.max_depth = (
+            max_depth
+            if max_depth is not None
+            else int(os.environ.get("PIPELINE_QUEUE_MAX_DEPTH", DEFAULT_QUEUE_MAX_DEPTH))
+        )
+        self._waiting: Deque[Tuple[str, Callable[[], Awaitable[Any]], float]] = collections.deque()
+        self._running: Dict[str, asyncio.Task] = {}
+        self._avg_job_seconds: Optional[float] = None
+        self.admitted = 0
+        self.rejected = 0
+        self.completed = 0
+        self.total_wait_s = 0.0
+
+    @property
+    def depth(self) -> int:
+        """Jobs waiting for a runner"""
+        return len(self._waiting)
+
+    @property
+    def avg_job_seconds(self) -> float:
+        return self._avg_job_seconds if self._avg_job_seconds is not None else DEFAULT_JOB_SECONDS
+
+    def estimate_wait(self, position: int) -> float:
+        """Seconds until the job at a (1-based) queue position should start"""
+        if position <= 0:
+            return 0.0
+        return math.ceil(position / self.workers) * self.avg_job_seconds
+
+    def submit(self, job_id: str, func: Callable[[], Awaitable[Any]]) -> int:
+        """
+        Admit a job. It starts as soon as a runner is free.
+
+        Args:
+            job_id: ID used for position lookups and cancellation
+            func: Zero-argument callable returning the job's coroutine
+
+        Returns:
+            The job's queue position (0 if it started right away)
+
+        Raises:
+            QueueFullError: If max_depth jobs are already waiting
+        """
+        if len(self._running) >= self.workers and len(self._waiting) >= self.max_depth:
+            self.rejected += 1
+            raise QueueFullError(self.estimate_wait(len(self._waiting) + 1), len(self._waiting))
+
+        self.admitted += 1
+        self._waiting.append((job_id, func, time.monotonic()))
+        self._dispatch()
+        return self.position(job_id) or 0
+
+    def position(self, job_id: str) -> Optional[int]:
+        """1-based position of a waiting job, 0 if it is running, None if unknown"""
+        if job_id in self._running:
+            return 0
+        for index, (waiting_id, _, _) in enumerate(self._waiting):
+            if waiting_id == job_id:
+                return index + 1
+        return None
+
+    def cancel(self, job_id: str) -> bool:
+        """Remove a waiting job or cancel a running one. Returns False if unknown"""
+        for entry in self._waiting:
+            if entry[0] == job_id:
+                self._waiting.remove(entry)
+                return True
+        task = self._running.get(job_id)
+        if task is not None:
+            task.cancel()
+            return True
+        return False
+
+    def _dispatch(self) -> None:
+        while self._waiting and len(self._running) < self.workers:
+            job_id, func, queued_at = self._waiting.popleft()
+            self.total_wait_s += time.monotonic() - queued_at
+            task = asyncio.get_running_loop().create_task(self._run(job_id, func))
+            self._running[job_id] = task
+
+    async def _run(self, job_id: str, func: Callable[[], Awaitable[Any]]) -> None:
+        started = time.monotonic()
+        try:
+            await func()
+        except asyncio.CancelledError:
+            logger.info(f"[{self.name} queue] Job {job_id} cancelled")
+        except Exception as e:
+            logger.error(f"[{self.name} queue] Job {job_id} failed: {e}")
+        else:
+            self._record_duration(time.monotonic() - started)
+        finally:
+            self.completed += 1
+            self._running.pop(job_id, None)
+            self._dispatch()
+
+    def _record_duration(self, seconds: float) -> None:
+        if self._avg_job_seconds is None:
+            self._avg_job_seconds = seconds
+        else:
+            self._avg_job_seconds += DURATION_SMOOTHING * (seconds - self._avg_job_seconds)
+
+    def stats(self) -> Dict[str, Any]:
+        started = self.completed + len(self._running)
+        return {
+            "workers": self.workers,
+            "max_depth": self.max_depth,
+            "running": len(self._running),
+            "waiting": len(self._waiting),
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "completed": self.completed,
+            "avg_job_seconds": round(self.avg_job_seconds, 2),
+            "avg_wait_seconds": round(self.total_wait_s / started, 2) if started else 0.0,
+        }
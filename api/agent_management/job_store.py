@@ -0,0 +1,732 @@
+"""
+Job Store Module - Persistent storage for background pipeline and geometry jobs.
+
+Jobs used to live in module-level dicts, which only worked with a single
+uvicorn worker. The SQL backend keeps them in a database shared by every
+worker (SQLite by default, any SQLAlchemy URL via ``JOB_STORE_URL``), so a
+status poll can land on any worker or node.
+
+Configuration (environment):
+
+- ``JOB_STORE_URL``: SQLAlchemy URL, or ``memory`` for the single-process
+  in-memory store (default: SQLite file under ``api/data/``)
+- ``JOB_TTL_SECONDS``: how long a job is kept after its last update
+  (default: 24 hours)
+- ``JOB_SPILL_THRESHOLD_BYTES``: string fields of a job's ``result`` at least
+  this large (the scene's ``html``, ``js`` and ``minimal_js``) are written to
+  ``JOB_ARTIFACT_DIR`` and loaded back on demand (default: 64 KiB)
+- ``JOB_STORE_MAX_JOBS`` / ``JOB_STORE_MAX_BYTES``: bounds of each kind of
+  job, counting spilled bytes; finished jobs are evicted least recently used
+  (in memory) or least recently updated (SQL) first (default: 500 jobs /
+  64 MiB)
+"""
+
+import contextlib
+import json
+import os
+import re
+import shutil
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import (
+    Column,
+    Float,
+    Index,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    Text,
+    create_engine,
+    delete,
+    event,
+    func,
+    insert,
+    inspect,
+    select,
+    update,
+)
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import DBAPIError
+
+DEFAULT_JOB_TTL_SECONDS = 24 * 60 * 60
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+DEFAULT_JOB_STORE_URL = "sqlite:///" + os.path.join(DATA_DIR, "jobs.sqlite3")
+DEFAULT_ARTIFACT_DIR = os.path.join(DATA_DIR, "artifacts")
+DEFAULT_SPILL_THRESHOLD_BYTES = 64 * 1024
+DEFAULT_MAX_JOBS = 500
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+# Marker key of a result field that was spilled to disk
+_ARTIFACT_KEY = "$artifact"
+
+# Statuses of jobs that are still running and must never be evicted
+_ACTIVE_STATUSES = ("processing",)
+
+# Fields stored in their own (indexed or frequently updated) columns;
+# everything else is kept in the JSON "data" column.
+_COLUMN_FIELDS = ("status", "progress", "error", "result")
+
+
+class JobStore(ABC):
+    """
+    Storage for jobs of one kind (e.g. "pipeline" or "geometry").
+
+    A job is a flat dict. ``status``, ``progress``, ``error`` and ``result`` are
+    always present; any other keys passed to create() or update() are kept too.
+    """
+
+    def __init__(
+        self,
+        kind: str,
+        ttl_seconds: Optional[float] = None,
+        artifact_dir: Optional[str] = None,
+        spill_threshold: Optional[int] = None,
+    ):
+        self.kind = kind
+        if ttl_seconds is None:
+            ttl_seconds = float(os.environ.get("JOB_TTL_SECONDS", DEFAULT_JOB_TTL_SECONDS))
+        self.ttl_seconds = ttl_seconds
+        self.artifact_dir = os.path.join(
+            artifact_dir or os.environ.get("JOB_ARTIFACT_DIR", DEFAULT_ARTIFACT_DIR), kind
+        )
+        if spill_threshold is None:
+            spill_threshold = int(
+                os.environ.get("JOB_SPILL_THRESHOLD_BYTES", DEFAULT_SPILL_THRESHOLD_BYTES)
+            )
+        self.spill_threshold = spill_threshold
+
+    @abstractmethod
+    def create(self, job_id: str, **fields: Any) -> Dict[str, Any]:
+        """Create a job and return it"""
+        pass
+
+    @abstractmethod
+    def get(self, job_id: str, with_artifacts: bool = True) -> Optional[Dict[str, Any]]:
+        """
+        Return a job, or None if it doesn't exist or has expired.
+
+        With ``with_artifacts=False`` spilled result fields are left as
+        ``{"$artifact": ..., "bytes": ...}`` references instead of being read
+        from disk (for callers that only need the status).
+        """
+        pass
+
+    @abstractmethod
+    def update(self, job_id: str, **fields: Any) -> bool:
+        """Atomically merge fields into a job. Returns False if the job doesn't exist"""
+        pass
+
+    @abstractmethod
+    def set_progress(self, job_id: str, progress: float) -> bool:
+        """
+        Atomically raise a job's progress. Progress never moves backwards, so
+        out-of-order updates from concurrent stages are harmless. Returns
+        False if the job doesn't exist or the progress was not raised.
+        """
+        pass
+
+    @abstractmethod
+    def delete(self, job_id: str) -> bool:
+        """Delete a job. Returns False if it didn't exist"""
+        pass
+
+    @abstractmethod
+    def find(self, status: Optional[str] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        """Return unexpired jobs, newest first, optionally filtered by status"""
+        pass
+
+    @abstractmethod
+    def purge_expired(self) -> int:
+        """Delete expired jobs and return how many were removed"""
+        pass
+
+    @abstractmethod
+    def stats(self) -> Dict[str, Any]:
+        """Job count and storage size, including bytes spilled to disk"""
+        pass
+
+    def __contains__(self, job_id: str) -> bool:
+        return self.get(job_id, with_artifacts=False) is not None
+
+    def _expires_at(self, now: float) -> float:
+        return now + self.ttl_seconds
+
+    def _job_artifact_dir(self, job_id: str) -> str:
+        return os.path.join(self.artifact_dir, re.sub(r"[^A-Za-z0-9_.-]", "_", job_id))
+
+    def _spill_result(self, job_id: str, result: Any) -> Any:
+        """Write large string fields of a result dict to disk, replacing them with references"""
+        if not isinstance(result, dict) or self.spill_threshold <= 0:
+            return result
+        spilled = {}
+        for key, value in result.items():
+            if isinstance(value, str) and len(value) >= self.spill_threshold:
+                directory = self._job_artifact_dir(job_id)
+                os.makedirs(directory, exist_ok=True)
+                filename = re.sub(r"[^A-Za-z0-9_.-]", "_", key)
+                data = value.encode("utf-8")
+                # Write then rename, so readers in other workers never see a partial file
+                tmp_path = os.path.join(directory, f".{filename}.{os.getpid()}.tmp")
+                with open(tmp_path, "wb") as f:
+                    f.write(data)
+                os.replace(tmp_path, os.path.join(directory, filename))
+                spilled[key] = {_ARTIFACT_KEY: filename, "bytes": len(data)}
+            else:
+                spilled[key] = value
+        return spilled
+
+    def _load_result(self, job_id: str, result: Any) -> Any:
+        """Replace artifact references in a result dict with the file contents"""
+        if not isinstance(result, dict):
+            return result
+        loaded = {}
+        for key, value in result.items():
+            if isinstance(value, dict) and _ARTIFACT_KEY in value:
+                path = os.path.join(self._job_artifact_dir(job_id), value[_ARTIFACT_KEY])
+                try:
+                    with open(path, "rb") as f:
+                        value = f.read().decode("utf-8")
+                except FileNotFoundError:
+                    value = None
+            loaded[key] = value
+        return loaded
+
+    def _delete_artifacts(self, job_id: str) -> None:
+        shutil.rmtree(self._job_artifact_dir(job_id), ignore_errors=True)
+
+    def _spilled_bytes(self) -> int:
+        total = 0
+        for root, _, files in os.walk(self.artifact_dir):
+            for name in files:
+                with contextlib.suppress(OSError):
+                    total += os.path.getsize(os.path.join(root, name))
+        return total
+
+
+class InMemoryJobStore(JobStore):
+    """
+    Single-process job store (tests and local development).
+
+    Besides the TTL, the store is bounded by job count and by resident size:
+    when either bound is exceeded, finished jobs are evicted least recently
+    used first. Running jobs are never evicted.
+    """
+
+    def __init__(
+        self,
+        kind: str,
+        ttl_seconds: Optional[float] = None,
+        max_jobs: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        artifact_dir: Optional[str] = None,
+        spill_threshold: Optional[int] = None,
+    ):
+        super().__init__(kind, ttl_seconds, artifact_dir, spill_threshold)
+        self.max_jobs = max_jobs or int(os.environ.get("JOB_STORE_MAX_JOBS", DEFAULT_MAX_JOBS))
+        self.max_bytes = max_bytes or int(os.environ.get("JOB_STORE_MAX_BYTES", DEFAULT_MAX_BYTES))
+        # Ordered least to most recently used
+        self._jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._expiry: Dict[str, float] = {}
+        self._created: Dict[str, float] = {}
+        self._sizes: Dict[str, int] = {}
+        self._resident_bytes = 0
+        self._evictions = 0
+        self._lock = threading.Lock()
+
+    def _live(self, job_id: str, now: float) -> bool:
+        return job_id in self._jobs and self._expiry[job_id] > now
+
+    def _resize(self, job_id: str) -> None:
+        size = len(json.dumps(self._jobs[job_id], default=str))
+        self._resident_bytes += size - self._sizes.get(job_id, 0)
+        self._sizes[job_id] = size
+
+    def _remove(self, job_id: str) -> bool:
+        self._expiry.pop(job_id, None)
+        self._created.pop(job_id, None)
+        self._resident_bytes -= self._sizes.pop(job_id, 0)
+        return self._jobs.pop(job_id, None) is not None
+
+    def _evict(self) -> List[str]:
+        """Drop least recently used finished jobs until the store is within its bounds"""
+        evicted = []
+        for job_id in list(self._jobs):
+            if len(self._jobs) <= self.max_jobs and self._resident_bytes <= self.max_bytes:
+                break
+            if self._jobs[job_id].get("status") in _ACTIVE_STATUSES:
+                continue
+            self._remove(job_id)
+            evicted.append(job_id)
+        self._evictions += len(evicted)
+        return evicted
+
+    def _store_fields(self, job_id: str, fields: Dict[str, Any]) -> Dict[str, Any]:
+        if fields.get("result") is not None:
+            fields = {**fields, "result": self._spill_result(job_id, fields["result"])}
+        return fields
+
+    def create(self, job_id: str, **fields: Any) -> Dict[str, Any]:
+        now = time.time()
+        job = {"status": "processing", "progress": 0.0, "error": None, "result": None, **fields}
+        stored = self._store_fields(job_id, job)
+        with self._lock:
+            self._remove(job_id)
+            self._jobs[job_id] = stored
+            self._expiry[job_id] = self._expires_at(now)
+            self._created[job_id] = now
+            self._resize(job_id)
+            evicted = self._evict()
+        for evicted_id in evicted:
+            self._delete_artifacts(evicted_id)
+        return dict(job)
+
+    def get(self, job_id: str, with_artifacts: bool = True) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            if not self._live(job_id, time.time()):
+                return None
+            self._jobs.move_to_end(job_id)
+            job = dict(self._jobs[job_id])
+        if with_artifacts:
+            job["result"] = self._load_result(job_id, job["result"])
+        return job
+
+    def update(self, job_id: str, **fields: Any) -> bool:
+        now = time.time()
+        with self._lock:
+            if not self._live(job_id, now):
+                return False
+        stored = self._store_fields(job_id, fields)
+        with self._lock:
+            if not self._live(job_id, now):
+                return False
+            self._jobs[job_id].update(stored)
+            self._jobs.move_to_end(job_id)
+            self._expiry[job_id] = self._expires_at(now)
+            self._resize(job_id)
+            evicted = self._evict()
+        for evicted_id in evicted:
+            self._delete_artifacts(evicted_id)
+        return True
+
+    def set_progress(self, job_id: str, progress: float) -> bool:
+        with self._lock:
+            if not self._live(job_id, time.time()):
+                return False
+            job = self._jobs[job_id]
+            if (job.get("progress") or 0.0) >= progress:
+                return False
+            job["progress"] = progress
+            return True
+
+    def delete(self, job_id: str) -> bool:
+        with self._lock:
+            existed = self._remove(job_id)
+        self._delete_artifacts(job_id)
+        return existed
+
+    def find(self, status: Optional[str] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            jobs = [
+                {"job_id": job_id, **job}
+                for job_id, job in self._jobs.items()
+                if self._expiry[job_id] > now and (status is None or job.get("status") == status)
+            ]
+            jobs.sort(key=lambda job: self._created[job["job_id"]], reverse=True)
+        return jobs[:limit]
+
+    def purge_expired(self) -> int:
+        now = time.time()
+        with self._lock:
+            expired = [job_id for job_id, expires_at in self._expiry.items() if expires_at <= now]
+            for job_id in expired:
+                self._remove(job_id)
+        for job_id in expired:
+            self._delete_artifacts(job_id)
+        return len(expired)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = {
+                "kind": self.kind,
+                "backend": "memory",
+                "jobs": len(self._jobs),
+                "max_jobs": self.max_jobs,
+                "resident_bytes": self._resident_bytes,
+                "max_bytes": self.max_bytes,
+                "evictions": self._evictions,
+            }
+        stats["spilled_bytes"] = self._spilled_bytes()
+        return stats
+
+
+metadata = MetaData()
+
+jobs_table = Table(
+    "jobs",
+    metadata,
+    Column("id", String(64), primary_key=True),
+    Column("kind", String(32), nullable=False),
+    Column("status", String(32), nullable=False),
+    Column("progress", Float, nullable=False, default=0.0),
+    Column("error", Text, nullable=True),
+    Column("result", Text, nullable=True),
+    Column("data", Text, nullable=False, default="{}"),
+    # Bytes of the job's result fields spilled to disk
+    Column("spilled_bytes", Integer, nullable=False, default=0),
+    Column("created_at", Float, nullable=False),
+    Column("updated_at", Float, nullable=False),
+    Column("expires_at", Float, nullable=False),
+    Index("ix_jobs_kind_status", "kind", "status"),
+    Index("ix_jobs_kind_created_at", "kind", "created_at"),
+    Index("ix_jobs_expires_at", "expires_at"),
+)
+
+_engines: Dict[str, Engine] = {}
+_engines_lock = threading.Lock()
+
+
+def _configure_sqlite(engine: Engine) -> None:
+    """
+    Make SQLite safe for several worker processes: WAL journaling, a busy
+    timeout, and BEGIN IMMEDIATE so read-modify-write updates are serialized.
+    """
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        # Let SQLAlchemy emit BEGIN itself (see the "begin" listener below)
+        dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA busy_timeout=30000")
+        cursor.close()
+
+    @event.listens_for(engine, "begin")
+    def _on_begin(conn):
+        if conn.get_execution_options().get("sqlite_immediate"):
+            conn.exec_driver_sql("BEGIN IMMEDIATE")
+        else:
+            conn.exec_driver_sql("BEGIN")
+
+
+# Columns added to the jobs table after it was first released: name -> DDL
+_JOBS_ADDED_COLUMNS = {"jobs": {"spilled_bytes": "INTEGER NOT NULL DEFAULT 0"}}
+
+
+def _add_missing_columns(engine: Engine, table: str, columns: Dict[str, str]) -> None:
+    """Add the columns introduced after a database was created to one of its tables"""
+    existing = {column["name"] for column in inspect(engine).get_columns(table)}
+    for name, ddl in columns.items():
+        if name in existing:
+            continue
+        # Another worker may add it first
+        with contextlib.suppress(DBAPIError), engine.begin() as conn:
+            conn.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN {name} {ddl}")
+
+
+_created_schemas: set = set()
+
+
+def get_engine(
+    url: str,
+    schema: MetaData = metadata,
+    added_columns: Optional[Dict[str, Dict[str, str]]] = None,
+) -> Engine:
+    """
+    Return a process-wide engine for a database URL, creating the tables of
+    ``schema`` (the job tables by default) on first use.
+
+    ``added_columns`` ({table: {column: DDL}}) lists the columns added to the
+    schema's tables since their first release; they are added to existing
+    databases that lack them.
+    """
+    with _engines_lock:
+        engine = _engines.get(url)
+        if engine is None:
+            if url.startswith("sqlite"):
+                path = url.split("sqlite:///", 1)[-1]
+                if path and path != ":memory:":
+                    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+                engine = create_engine(url, connect_args={"check_same_thread": False, "timeout": 30})
+                _configure_sqlite(engine)
+            else:
+                engine = create_engine(url, pool_pre_ping=True)
+            _engines[url] = engine
+        if (url, id(schema)) not in _created_schemas:
+            schema.create_all(engine, checkfirst=True)
+            for table, columns in (added_columns or {}).items():
+                _add_missing_columns(engine, table, columns)
+            _created_schemas.add((url, id(schema)))
+        return engine
+
+
+class SQLJobStore(JobStore):
+    """
+    Job store backed by a SQLAlchemy database shared by all workers.
+
+    Besides the TTL, the jobs of a kind are bounded by count and by size
+    (the stored row plus its spilled files): when a write exceeds either
+    bound, finished jobs are evicted least recently updated first. Running
+    jobs are never evicted.
+    """
+
+    # Purge expired rows at most this often (seconds)
+    PURGE_INTERVAL = 300
+
+    def __init__(
+        self,
+        kind: str,
+        url: str,
+        ttl_seconds: Optional[float] = None,
+        max_jobs: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        artifact_dir: Optional[str] = None,
+        spill_threshold: Optional[int] = None,
+    ):
+        super().__init__(kind, ttl_seconds, artifact_dir, spill_threshold)
+        self.max_jobs = max_jobs or int(os.environ.get("JOB_STORE_MAX_JOBS", DEFAULT_MAX_JOBS))
+        self.max_bytes = max_bytes or int(os.environ.get("JOB_STORE_MAX_BYTES", DEFAULT_MAX_BYTES))
+        self.engine = get_engine(url, metadata, _JOBS_ADDED_COLUMNS)
+        self._last_purge = 0.0
+        self._evictions = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _row_to_job(row: Any) -> Dict[str, Any]:
+        """Convert a row to a job dict (spilled result fields are left as references)"""
+        job = json.loads(row.data or "{}")
+        job.update(
+            status=row.status,
+            progress=row.progress,
+            error=row.error,
+            result=json.loads(row.result) if row.result is not None else None,
+        )
+        return job
+
+    def _split_fields(self, job_id: str, fields: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        columns = {}
+        extra = {}
+        for key, value in fields.items():
+            if key == "result":
+                value = self._spill_result(job_id, value)
+                columns["result"] = json.dumps(value, default=str) if value is not None else None
+                columns["spilled_bytes"] = sum(
+                    field["bytes"]
+                    for field in (value.values() if isinstance(value, dict) else ())
+                    if isinstance(field, dict) and _ARTIFACT_KEY in field
+                )
+            elif key in _COLUMN_FIELDS:
+                columns[key] = value
+            else:
+                extra[key] = value
+        return columns, extra
+
+    @contextlib.contextmanager
+    def _write(self) -> Iterator[Connection]:
+        """Transaction that takes the write lock up front (BEGIN IMMEDIATE on SQLite)"""
+        with self.engine.connect() as conn:
+            conn = conn.execution_options(sqlite_immediate=True)
+            with conn.begin():
+                yield conn
+
+    def _size(self):
+        """Size of a job: its stored row and its spilled files"""
+        return (
+            func.coalesce(func.length(jobs_table.c.result), 0)
+            + func.length(jobs_table.c.data)
+            + jobs_table.c.spilled_bytes
+        )
+
+    def _evict(self, conn: Connection, now: float) -> List[str]:
+        """
+        Drop least recently updated finished jobs until the kind is within its
+        bounds (caller holds the write transaction).
+
+        Returns:
+            The IDs of the evicted jobs, whose artifacts are left to the caller
+        """
+        live = (jobs_table.c.kind == self.kind) & (jobs_table.c.expires_at > now)
+        jobs, total = conn.execute(
+            select(func.count(), func.coalesce(func.sum(self._size()), 0)).where(live)
+        ).one()
+        if jobs <= self.max_jobs and total <= self.max_bytes:
+            return []
+        rows = conn.execute(
+            select(jobs_table.c.id, self._size().label("size"))
+            .where(live & jobs_table.c.status.notin_(_ACTIVE_STATUSES))
+            .order_by(jobs_table.c.updated_at)
+        ).all()
+        evicted = []
+        for row in rows:
+            if jobs <= self.max_jobs and total <= self.max_bytes:
+                break
+            conn.execute(
+                delete(jobs_table).where((jobs_table.c.id == row.id) & (jobs_table.c.kind == self.kind))
+            )
+            jobs -= 1
+            total -= row.size
+            evicted.append(row.id)
+        with self._lock:
+            self._evictions += len(evicted)
+        return evicted
+
+    def _maybe_purge(self, now: float) -> None:
+        if now - self._last_purge > self.PURGE_INTERVAL:
+            self._last_purge = now
+            self.purge_expired()
+
+    def create(self, job_id: str, **fields: Any) -> Dict[str, Any]:
+        now = time.time()
+        self._maybe_purge(now)
+        fields = {"status": "processing", "progress": 0.0, "error": None, "result": None, **fields}
+        columns, extra = self._split_fields(job_id, fields)
+        with self._write() as conn:
+            conn.execute(
+                insert(jobs_table).values(
+                    id=job_id,
+                    kind=self.kind,
+                    data=json.dumps(extra, default=str),
+                    created_at=now,
+                    updated_at=now,
+                    expires_at=self._expires_at(now),
+                    **columns,
+                )
+            )
+            evicted = self._evict(conn, now)
+        for evicted_id in evicted:
+            self._delete_artifacts(evicted_id)
+        return fields
+
+    def _live_clause(self, job_id: str, now: float):
+        return (
+            (jobs_table.c.id == job_id)
+            & (jobs_table.c.kind == self.kind)
+            & (jobs_table.c.expires_at > now)
+        )
+
+    def get(self, job_id: str, with_artifacts: bool = True) -> Optional[Dict[str, Any]]:
+        with self.engine.connect() as conn:
+            row = conn.execute(
+                select(jobs_table).where(self._live_clause(job_id, time.time()))
+            ).first()
+        if row is None:
+            return None
+        job = self._row_to_job(row)
+        if with_artifacts:
+            job["result"] = self._load_result(job_id, job["result"])
+        return job
+
+    def update(self, job_id: str, **fields: Any) -> bool:
+        now = time.time()
+        columns, extra = self._split_fields(job_id, fields)
+        values = {**columns, "updated_at": now, "expires_at": self._expires_at(now)}
+        with self._write() as conn:
+            if extra:
+                # Read-modify-write of the JSON column inside the (immediate) transaction
+                current = conn.execute(
+                    select(jobs_table.c.data).where(self._live_clause(job_id, now))
+                ).scalar()
+                if current is None:
+                    return False
+                values["data"] = json.dumps({**json.loads(current), **extra}, default=str)
+            result = conn.execute(
+                update(jobs_table).where(self._live_clause(job_id, now)).values(**values)
+            )
+            evicted = self._evict(conn, now) if result.rowcount else []
+        for evicted_id in evicted:
+            self._delete_artifacts(evicted_id)
+        return result.rowcount > 0
+
+    def set_progress(self, job_id: str, progress: float) -> bool:
+        now = time.time()
+        with self._write() as conn:
+            result = conn.execute(
+                update(jobs_table)
+                .where(self._live_clause(job_id, now) & (jobs_table.c.progress < progress))
+                .values(progress=progress, updated_at=now)
+            )
+        return result.rowcount > 0
+
+    def delete(self, job_id: str) -> bool:
+        with self._write() as conn:
+            result = conn.execute(
+                delete(jobs_table).where(
+                    (jobs_table.c.id == job_id) & (jobs_table.c.kind == self.kind)
+                )
+            )
+        self._delete_artifacts(job_id)
+        return result.rowcount > 0
+
+    def find(self, status: Optional[str] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        clause = (jobs_table.c.kind == self.kind) & (jobs_table.c.expires_at > time.time())
+        if status is not None:
+            clause = clause & (jobs_table.c.status == status)
+        with self.engine.connect() as conn:
+            rows = conn.execute(
+                select(jobs_table)
+                .where(clause)
+                .order_by(jobs_table.c.created_at.desc())
+                .limit(limit)
+            ).all()
+        return [{"job_id": row.id, **self._row_to_job(row)} for row in rows]
+
+    def purge_expired(self) -> int:
+        expired_clause = (jobs_table.c.kind == self.kind) & (jobs_table.c.expires_at <= time.time())
+        with self._write() as conn:
+            expired = conn.execute(select(jobs_table.c.id).where(expired_clause)).scalars().all()
+            conn.execute(delete(jobs_table).where(expired_clause))
+        for job_id in expired:
+            self._delete_artifacts(job_id)
+        return len(expired)
+
+    def stats(self) -> Dict[str, Any]:
+        clause = (jobs_table.c.kind == self.kind) & (jobs_table.c.expires_at > time.time())
+        with self.engine.connect() as conn:
+            jobs, stored_bytes = conn.execute(
+                select(
+                    func.count(),
+                    func.coalesce(
+                        func.sum(
+                            func.coalesce(func.length(jobs_table.c.result), 0)
+                            + func.length(jobs_table.c.data)
+                        ),
+                        0,
+                    ),
+                ).where(clause)
+            ).one()
+        with self._lock:
+            evictions = self._evictions
+        return {
+            "kind": self.kind,
+            "backend": self.engine.dialect.name,
+            "jobs": jobs,
+            "max_jobs": self.max_jobs,
+            # Jobs are not held in worker memory; this is their size in the database
+            "stored_bytes": int(stored_bytes),
+            "spilled_bytes": self._spilled_bytes(),
+            "max_bytes": self.max_bytes,
+            # Evictions made by this worker
+            "evictions": evictions,
+        }
+
+
+def create_job_store(kind: str, url: Optional[str] = None) -> JobStore:
+    """
+    Create the job store for a kind of job, using JOB_STORE_URL unless a URL is given.
+
+    Args:
+        kind: Job kind, e.g. "pipeline" or "geometry"
+        url: Optional SQLAlchemy URL, or "memory" for the in-memory store
+
+    Returns:
+        A JobStore instance
+    """
+    url = url or os.environ.get("JOB_STORE_URL", DEFAULT_JOB_STORE_URL)
+    if url == "memory":
+        return InMemoryJobStore(kind)
+    return SQLJobStore(kind, url)
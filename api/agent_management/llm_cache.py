@@ -0,0 +1,357 @@
+"""
+LLM Cache Module - Content-addressed cache of LLM responses.
+
+Many of our LLM calls are deterministic or nearly so (molecular formulas at
+temperature 0.1, query interpretation, domain validation, diagram plans), and
+repeat traffic sends the same prompts over and over. Requests that set
+``cache_namespace`` are answered from this cache when an identical request
+was answered before:
+
+- Entries are keyed on a hash of the provider, model, system and user prompt,
+  sampling parameters and, for structured requests, the response model's
+  JSON schema, so changing a prompt or a schema never returns a stale shape
+- A per-process LRU sits in front of a SQLite table shared by all workers
+- Each namespace (usually one per agent call site) has its own TTL
+- Every few minutes a write also drops the expired rows and, beyond the size
+  limit, the least recently used ones. Reads update an entry's last use at
+  most once a minute, so cache hits rarely take the SQLite write lock
+
+Caching is opt-in per request; requests without a namespace never touch it.
+
+Configuration (environment):
+
+- ``LLM_CACHE_ENABLED``: set to ``0`` to bypass the cache entirely (default: on)
+- ``LLM_CACHE_URL``: SQLAlchemy URL of the disk tier, or ``memory`` for the
+  in-process LRU only (default: SQLite file under ``api/data/``)
+- ``LLM_CACHE_MAX_ENTRIES``: size of the in-memory LRU (default: 1000)
+- ``LLM_CACHE_MAX_BYTES``: size of the cached values the disk tier is kept
+  under (default: 256 MB)
+- ``LLM_CACHE_TTL_SECONDS``: TTL of namespaces without their own (default: 1 day)
+- ``LLM_CACHE_TTL_<NAMESPACE>``: TTL of one namespace, e.g.
+  ``LLM_CACHE_TTL_MOLECULAR_FORMULA=86400``
+"""
+
+import contextlib
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, Optional, Tuple, Type
+
+from pydantic import BaseModel
+from sqlalchemy import Column, Float, Index, MetaData, String, Table, Text, delete, func, select, update
+from sqlalchemy.engine import Connection, Engine
+
+from agent_management.job_store import DATA_DIR, get_engine
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_URL = "sqlite:///" + os.path.join(DATA_DIR, "llm_cache.sqlite3")
+DEFAULT_CACHE_MAX_ENTRIES = 1000
+DEFAULT_CACHE_MAX_BYTES = 256 * 1024 * 1024
+DEFAULT_CACHE_TTL_SECONDS = 24 * 60 * 60
+
+# An entry's last use is written back at most this often
+TOUCH_INTERVAL_SECONDS = 60.0
+
+# TTLs of the namespaces used by the agents
+DEFAULT_CACHE_TTLS = {
+    "molecular_formula": 30 * 24 * 60 * 60,
+    "interpret_query": 7 * 24 * 60 * 60,
+    "domain_validator": 7 * 24 * 60 * 60,
+    "diagram_plan": 24 * 60 * 60,
+}
+
+cache_metadata = MetaData()
+
+llm_cache_table = Table(
+    "llm_cache",
+    cache_metadata,
+    Column("key", String(64), primary_key=True),
+    Column("namespace", String(64), nullable=False),
+    Column("value", Text, nullable=False),
+    Column("created_at", Float, nullable=False),
+    Column("expires_at", Float, nullable=False),
+    Column("last_used_at", Float, nullable=False, default=0.0),
+    Index("ix_llm_cache_expires_at", "expires_at"),
+    Index("ix_llm_cache_last_used_at", "last_used_at"),
+)
+
+# Columns added to the cache table after it was first released: name -> DDL
+_ADDED_COLUMNS = {"llm_cache": {"last_used_at": "FLOAT NOT NULL DEFAULT 0"}}
+
+
+def schema_hash(response_model: Optional[Type[BaseModel]]) -> str:
+    """Hash of a response model's JSON schema ("" for plain text requests)"""
+    if response_model is None:
+        return ""
+    schema = json.dumps(response_model.model_json_schema(), sort_keys=True)
+    return hashlib.sha256(schema.encode("utf-8")).hexdigest()
+
+
+def cache_key(request: Any) -> str:
+    """
+    Content address of a prepared LLMRequest or StructuredLLMRequest.
+
+    Args:
+        request: Request whose llm_config has been filled in
+
+    Returns:
+        Hex digest identifying the request
+    """
+    config = request.llm_config
+    parts = {
+        "namespace": request.cache_namespace,
+        "provider": getattr(config, "provider", None),
+        "model": getattr(config, "model_name", None),
+        "system": request.system_prompt,
+        "user": request.user_prompt,
+        "temperature": request.temperature,
+        "max_tokens": request.max_tokens,
+        "top_p": request.top_p,
+        "params": request.additional_params,
+        "schema": schema_hash(getattr(request, "response_model", None)),
+    }
+    raw = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def namespace_ttl(namespace: str) -> float:
+    """TTL in seconds of a cache namespace"""
+    override = os.environ.get(f"LLM_CACHE_TTL_{namespace.upper()}")
+    if override is not None:
+        return float(override)
+    if namespace in DEFAULT_CACHE_TTLS:
+        return float(DEFAULT_CACHE_TTLS[namespace])
+    return float(os.environ.get("LLM_CACHE_TTL_SECONDS", DEFAULT_CACHE_TTL_SECONDS))
+
+
+class LLMCache:
+    """Two-tier (in-memory LRU + size-bounded SQL LRU) cache of serialized LLM responses"""
+
+    # Purge expired and excess rows at most this often (seconds)
+    PURGE_INTERVAL = 300
+
+    def __init__(
+        self,
+        url: Optional[str] = None,
+        max_entries: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+    ):
+        self.max_entries = max_entries or int(
+            os.environ.get("LLM_CACHE_MAX_ENTRIES", DEFAULT_CACHE_MAX_ENTRIES)
+        )
+        self.max_bytes = max_bytes or int(os.environ.get("LLM_CACHE_MAX_BYTES", DEFAULT_CACHE_MAX_BYTES))
+        url = url or os.environ.get("LLM_CACHE_URL", DEFAULT_CACHE_URL)
+        self._engine: Optional[Engine] = (
+            None if url == "memory" else get_engine(url, cache_metadata, _ADDED_COLUMNS)
+        )
+        self._lock = threading.Lock()
+        # key -> (value, expires_at, last use written to disk)
+        self._memory: "OrderedDict[str, Tuple[str, float, float]]" = OrderedDict()
+        self._metrics: Dict[str, Dict[str, int]] = {}
+        self._last_purge = 0.0
+        self._evictions = 0
+
+    def _count(self, namespace: str, metric: str) -> None:
+        counters = self._metrics.setdefault(
+            namespace, {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0}
+        )
+        counters[metric] += 1
+
+    def _remember(self, key: str, value: str, expires_at: float, touched_at: float) -> None:
+        """Put an entry into the LRU tier (caller holds the lock)"""
+        self._memory[key] = (value, expires_at, touched_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    @contextlib.contextmanager
+    def _write(self) -> Iterator[Connection]:
+        """Transaction that takes the write lock up front (BEGIN IMMEDIATE on SQLite)"""
+        with self._engine.connect() as conn:
+            conn = conn.execution_options(sqlite_immediate=True)
+            with conn.begin():
+                yield conn
+
+    def _touch(self, key: str, now: float) -> None:
+        """Write an entry's last use back to the disk tier, for its LRU order"""
+        try:
+            with self._write() as conn:
+                conn.execute(
+                    update(llm_cache_table).where(llm_cache_table.c.key == key).values(last_used_at=now)
+                )
+        except Exception as e:
+            logger.warning(f"Could not update LLM cache entry: {e}")
+
+    def get(self, key: str, namespace: str) -> Optional[str]:
+        """Return the cached value for a key, or None on a miss"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and entry[1] <= now:
+                del self._memory[key]
+                entry = None
+            if entry is not None:
+                self._memory.move_to_end(key)
+                self._count(namespace, "memory_hits")
+                # Entries served from memory must not age out of the disk tier either
+                stale = self._engine is not None and now - entry[2] > TOUCH_INTERVAL_SECONDS
+                if stale:
+                    self._memory[key] = (entry[0], entry[1], now)
+        if entry is not None:
+            if stale:
+                self._touch(key, now)
+            return entry[0]
+
+        row = None
+        if self._engine is not None:
+            with self._engine.connect() as conn:
+                row = conn.execute(
+                    select(
+                        llm_cache_table.c.value, llm_cache_table.c.expires_at, llm_cache_table.c.last_used_at
+                    ).where(llm_cache_table.c.key == key, llm_cache_table.c.expires_at > now)
+                ).first()
+
+        with self._lock:
+            if row is None:
+                self._count(namespace, "misses")
+                return None
+            stale = now - row.last_used_at > TOUCH_INTERVAL_SECONDS
+            self._remember(key, row.value, row.expires_at, now if stale else row.last_used_at)
+            self._count(namespace, "disk_hits")
+        if stale:
+            self._touch(key, now)
+        return row.value
+
+    def put(self, key: str, namespace: str, value: str) -> None:
+        """Store a value under a key with the namespace's TTL"""
+        now = time.time()
+        expires_at = now + namespace_ttl(namespace)
+        with self._lock:
+            self._remember(key, value, expires_at, now)
+            self._count(namespace, "stores")
+        if self._engine is None:
+            return
+        try:
+            with self._write() as conn:
+                conn.execute(delete(llm_cache_table).where(llm_cache_table.c.key == key))
+                conn.execute(
+                    llm_cache_table.insert().values(
+                        key=key,
+                        namespace=namespace,
+                        value=value,
+                        created_at=now,
+                        expires_at=expires_at,
+                        last_used_at=now,
+                    )
+                )
+            self._maybe_purge(now)
+        except Exception as e:
+            # A failed disk write only costs a future cache miss
+            logger.warning(f"Could not persist LLM cache entry: {e}")
+
+    def _maybe_purge(self, now: float) -> None:
+        if now - self._last_purge > self.PURGE_INTERVAL:
+            self._last_purge = now
+            self.purge_expired()
+            self.evict()
+
+    def purge_expired(self) -> int:
+        """Drop expired entries from both tiers. Returns the number of disk rows removed"""
+        now = time.time()
+        with self._lock:
+            for key in [key for key, (_, expires_at, _) in self._memory.items() if expires_at <= now]:
+                del self._memory[key]
+        if self._engine is None:
+            return 0
+        with self._write() as conn:
+            return conn.execute(delete(llm_cache_table).where(llm_cache_table.c.expires_at <= now)).rowcount
+
+    def evict(self) -> int:
+        """
+        Drop the least recently used disk rows while the disk tier is over its
+        size limit.
+
+        Returns:
+            The number of rows evicted
+        """
+        if self._engine is None:
+            return 0
+        table = llm_cache_table
+        with self._write() as conn:
+            total = conn.execute(select(func.coalesce(func.sum(func.length(table.c.value)), 0))).scalar()
+            if total <= self.max_bytes:
+                return 0
+            rows = conn.execute(
+                select(table.c.key, func.length(table.c.value).label("size")).order_by(table.c.last_used_at)
+            ).all()
+            evicted = 0
+            for row in rows:
+                if total <= self.max_bytes:
+                    break
+                conn.execute(delete(table).where(table.c.key == row.key))
+                total -= row.size
+                evicted += 1
+        with self._lock:
+            self._evictions += evicted
+        return evicted
+
+    def clear(self) -> None:
+        """Forget every entry and reset the metrics"""
+        with self._lock:
+            self._memory.clear()
+            self._metrics.clear()
+        if self._engine is not None:
+            with self._write() as conn:
+                conn.execute(delete(llm_cache_table))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            namespaces = {name: dict(counters) for name, counters in self._metrics.items()}
+            memory_entries = len(self._memory)
+            evictions = self._evictions
+        totals = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0}
+        for counters in namespaces.values():
+            for metric, value in counters.items():
+                totals[metric] += value
+        for counters in list(namespaces.values()) + [totals]:
+            lookups = counters["memory_hits"] + counters["disk_hits"] + counters["misses"]
+            hits = counters["memory_hits"] + counters["disk_hits"]
+            counters["hit_rate"] = round(hits / lookups, 3) if lookups else 0.0
+        stats: Dict[str, Any] = {
+            "enabled": cache_enabled(),
+            "memory_entries": memory_entries,
+            "max_entries": self.max_entries,
+            "disk": self._engine is not None,
+            **totals,
+            "namespaces": namespaces,
+        }
+        if self._engine is not None:
+            with self._engine.connect() as conn:
+                stats["disk_entries"], stats["disk_bytes"] = conn.execute(
+                    select(func.count(), func.coalesce(func.sum(func.length(llm_cache_table.c.value)), 0))
+                ).one()
+            stats["max_bytes"] = self.max_bytes
+            stats["evictions"] = evictions
+        return stats
+
+
+def cache_enabled() -> bool:
+    return os.environ.get("LLM_CACHE_ENABLED", "1").lower() not in ("0", "false", "no")
+
+
+_cache: Optional[LLMCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_llm_cache() -> LLMCache:
+    """Return the process-wide cache, creating it on first use"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = LLMCache()
+        return _cache
@@ -3,14 +3,35 @@ LLM Service Module - Handles interactions with various LLM providers (OpenAI, An
 """
 
 from abc import ABC, abstractmethod
-from typing import Dict, List, Optional, TypeVar, Type, Any, Union, Generic, Literal
+from typing import Dict, List, Optional, TypeVar, Type, Any, Union, Generic, Literal, Iterator, AsyncIterator
+import asyncio
+import contextlib
 import os
 import json
+import time
 from enum import Enum
 from dataclasses import dataclass
 from dotenv import load_dotenv
 from pydantic import BaseModel, Field
 
+from agent_management.circuit_breaker import (
+    CircuitOpenError,
+    breakers_enabled,
+    circuit_breakers,
+    is_provider_failure,
+)
+from agent_management.execution_pool import (
+    OperationCancelled,
+    PoolType,
+    raise_if_cancelled,
+    run_blocking,
+    sleep_unless_cancelled,
+)
+from agent_management.llm_cache import cache_enabled, cache_key, get_llm_cache
+from agent_management.model_performance import model_performance
+from agent_management.rate_limiter import estimate_tokens, get_rate_limiter, rate_limiting_enabled
+from agent_management.usage_tracker import usage_tracker
+
 # Load environment variables from .env file
 load_dotenv()
 
@@ -33,6 +54,8 @@ class ProviderType(str, Enum):
     OPENAI = "openai"
     ANTHROPIC = "anthropic"
     GROQ = "groq"
+    # Recorded responses served offline (see providers/replay_provider.py)
+    REPLAY = "replay"
 
 class LLMModelConfig(BaseModel):
     """Configuration for an LLM model"""
@@ -56,6 +79,9 @@ class LLMRequest(BaseModel):
     top_p: Optional[float] = None
     stream: bool = False
     additional_params: Dict[str, Any] = Field(default_factory=dict)
+    # Opt-in response caching: identical requests in the same namespace are
+    # answered from the LLM cache (see llm_cache.py)
+    cache_namespace: Optional[str] = None
 
 class ResponseFormat(BaseModel):
     """Response format configuration"""
@@ -73,6 +99,38 @@ class LLMResponse:
     model: str
     usage: Dict[str, int]
 
+@dataclass
+class LLMStreamChunk:
+    """
+    One piece of a streamed response. Every chunk but the last carries a text
+    delta; the last one carries the complete content and the token usage.
+    """
+    delta: str = ""
+    content: Optional[str] = None
+    usage: Optional[Dict[str, int]] = None
+
+    @property
+    def is_final(self) -> bool:
+        return self.usage is not None
+
+def collect_stream(chunks: Iterator[LLMStreamChunk], model: str) -> LLMResponse:
+    """Consume a stream of chunks into a single LLMResponse"""
+    parts: List[str] = []
+    for chunk in chunks:
+        if chunk.is_final:
+            return LLMResponse(content=chunk.content or "".join(parts), model=model, usage=chunk.usage)
+        parts.append(chunk.delta)
+    raise ValueError("Stream ended without a final chunk")
+
+async def acollect_stream(chunks: AsyncIterator[LLMStreamChunk], model: str) -> LLMResponse:
+    """Async counterpart of collect_stream"""
+    parts: List[str] = []
+    async for chunk in chunks:
+        if chunk.is_final:
+            return LLMResponse(content=chunk.content or "".join(parts), model=model, usage=chunk.usage)
+        parts.append(chunk.delta)
+    raise ValueError("Stream ended without a final chunk")
+
 class LLMProvider(ABC):
     """Abstract base class for LLM providers"""
     
@@ -86,15 +144,52 @@ class LLMProvider(ABC):
         """Generate a structured response from the LLM"""
         pass
 
+    @abstractmethod
+    async def agenerate(self, request: LLMRequest) -> LLMResponse:
+        """Generate a response from the LLM using the provider's async client"""
+        pass
+
+    @abstractmethod
+    async def agenerate_structured(self, request: StructuredLLMRequest[T]) -> T:
+        """Generate a structured response from the LLM using the provider's async client"""
+        pass
+
+    def stream(self, request: LLMRequest) -> Iterator[LLMStreamChunk]:
+        """
+        Stream a response as text deltas followed by a final chunk with the usage.
+        Providers without native streaming deliver the whole response as one delta.
+        """
+        response = self.generate(request)
+        yield LLMStreamChunk(delta=response.content)
+        yield LLMStreamChunk(content=response.content, usage=response.usage)
+
+    async def astream(self, request: LLMRequest) -> AsyncIterator[LLMStreamChunk]:
+        """Async counterpart of stream()"""
+        response = await self.agenerate(request)
+        yield LLMStreamChunk(delta=response.content)
+        yield LLMStreamChunk(content=response.content, usage=response.usage)
+
 class LLMService:
     """Main service class for interacting with LLM providers"""
     
-    def __init__(self, config: LLMModelConfig):
+    def __init__(self, config: LLMModelConfig, agent: Optional[str] = None):
         self.config = config
+        # Agent this service works for, used to tag usage records
+        self.agent = agent
         self._provider = self._create_provider(config)
 
     def _create_provider(self, config: LLMModelConfig) -> LLMProvider:
-        """Create the appropriate provider based on configuration"""
+        """Create the appropriate provider based on configuration and LLM_REPLAY_MODE"""
+        from .providers.replay_provider import RecordingProvider, ReplayProvider, replay_mode
+
+        mode = replay_mode()
+        if config.provider == ProviderType.REPLAY or mode == "replay":
+            return ReplayProvider()
+        provider = self._create_api_provider(config)
+        return RecordingProvider(provider) if mode == "record" else provider
+
+    def _create_api_provider(self, config: LLMModelConfig) -> LLMProvider:
+        """Create the provider that calls the configured API"""
         if config.provider == ProviderType.OPENAI:
             from .providers.openai_provider import OpenAIProvider
             return OpenAIProvider(api_key=config.api_key)
@@ -107,8 +202,8 @@ class LLMService:
         else:
             raise ValueError(f"Unsupported provider type: {config.provider}")
 
-    def generate(self, request: Union[str, LLMRequest]) -> LLMResponse:
-        """Generate a response from the LLM"""
+    def _prepare_request(self, request: Union[str, LLMRequest]) -> LLMRequest:
+        """Wrap plain prompts in an LLMRequest and fill in the service's config"""
         if isinstance(request, str):
             request = LLMRequest(
                 user_prompt=request,
@@ -116,14 +211,254 @@ class LLMService:
             )
         elif request.llm_config is None:
             request.llm_config = self.config
-            
-        return self._provider.generate(request)
+        return request
+
+    @staticmethod
+    def _cacheable(request: LLMRequest) -> bool:
+        """Whether a prepared request opted in to the response cache"""
+        return bool(request.cache_namespace) and cache_enabled()
+
+    def _cached(self, request: LLMRequest) -> Optional[str]:
+        """Cached serialized response for a prepared request, if it opted in"""
+        if not self._cacheable(request):
+            return None
+        return get_llm_cache().get(cache_key(request), request.cache_namespace)
+
+    def _store(self, request: LLMRequest, value: str) -> None:
+        if self._cacheable(request):
+            get_llm_cache().put(cache_key(request), request.cache_namespace, value)
+
+    def _cached_response(self, request: LLMRequest) -> Optional[LLMResponse]:
+        cached = self._cached(request)
+        return LLMResponse(**json.loads(cached)) if cached is not None else None
+
+    def _store_response(self, request: LLMRequest, response: LLMResponse) -> None:
+        self._store(request, json.dumps(
+            {"content": response.content, "model": response.model, "usage": response.usage}
+        ))
+
+    def _cached_structured(self, request: StructuredLLMRequest[T]) -> Optional[T]:
+        cached = self._cached(request)
+        return request.response_model.model_validate_json(cached) if cached is not None else None
+
+    def _store_structured(self, request: StructuredLLMRequest[T], result: T) -> None:
+        if isinstance(result, BaseModel):
+            self._store(request, result.model_dump_json())
+
+    # The cache is synchronous SQLAlchemy: the async paths reach it through
+    # the STORE pool, and only for requests that opted in
+
+    async def _acached_response(self, request: LLMRequest) -> Optional[LLMResponse]:
+        if not self._cacheable(request):
+            return None
+        return await run_blocking(PoolType.STORE, self._cached_response, request)
+
+    async def _astore_response(self, request: LLMRequest, response: LLMResponse) -> None:
+        if self._cacheable(request):
+            await run_blocking(PoolType.STORE, self._store_response, request, response)
+
+    async def _acached_structured(self, request: StructuredLLMRequest[T]) -> Optional[T]:
+        if not self._cacheable(request):
+            return None
+        return await run_blocking(PoolType.STORE, self._cached_structured, request)
+
+    async def _astore_structured(self, request: StructuredLLMRequest[T], result: T) -> None:
+        if self._cacheable(request):
+            await run_blocking(PoolType.STORE, self._store_structured, request, result)
+
+    def _track(self, request: LLMRequest, operation: str):
+        """Usage record context for one call of a prepared request"""
+        config = request.llm_config
+        return usage_tracker.track(config.provider, config.model_name, operation, agent=self.agent)
+
+    def _reserve(self, request: LLMRequest, record):
+        """Reserve rate limiter capacity for the provider call of a prepared request"""
+        if not rate_limiting_enabled():
+            return None
+        config = request.llm_config
+        reservation = get_rate_limiter().reserve(config.provider, config.model_name, estimate_tokens(request))
+        if reservation is not None:
+            record.throttled_ms = round(reservation.wait * 1000, 1)
+        return reservation
+
+    @contextlib.contextmanager
+    def _throttle(self, request: LLMRequest, record) -> Iterator[None]:
+        """
+        Wait for the rate limits of the model before the provider call, then
+        settle the reserved tokens against the usage the call reported.
+        """
+        reservation = self._reserve(request, record)
+        if reservation is None:
+            yield
+            return
+        try:
+            if reservation.wait > 0:
+                sleep_unless_cancelled(reservation.wait)
+        except BaseException:
+            reservation.cancel()
+            raise
+        try:
+            yield
+        finally:
+            reservation.settle(record.total_tokens)
+
+    @contextlib.asynccontextmanager
+    async def _athrottle(self, request: LLMRequest, record) -> AsyncIterator[None]:
+        """
+        Async version of _throttle. The shared buckets are read and written on
+        the STORE pool; refunds are shielded so they complete even when the
+        call is cancelled.
+        """
+        if not rate_limiting_enabled():
+            yield
+            return
+        reservation = await run_blocking(PoolType.STORE, self._reserve, request, record)
+        if reservation is None:
+            yield
+            return
+        try:
+            if reservation.wait > 0:
+                await asyncio.sleep(reservation.wait)
+        except BaseException:
+            await asyncio.shield(run_blocking(PoolType.STORE, reservation.cancel))
+            raise
+        try:
+            yield
+        finally:
+            await asyncio.shield(run_blocking(PoolType.STORE, reservation.settle, record.total_tokens))
+
+    @contextlib.contextmanager
+    def _guard(self, request: LLMRequest, record) -> Iterator[None]:
+        """
+        Circuit breaker around the provider call of a prepared request: raises
+        CircuitOpenError while the model's circuit is open, and reports how
+        the call went (including the retries it needed) otherwise. The call's
+        duration and outcome also go to the model performance statistics.
+        """
+        config = request.llm_config
+        breaker = None
+        if breakers_enabled():
+            breaker = circuit_breakers.get(config.provider, config.model_name)
+            if not breaker.acquire():
+                raise CircuitOpenError(f"Circuit for {breaker.name} is open; skipping the provider call")
+        started = time.perf_counter()
+        try:
+            yield
+        except (asyncio.CancelledError, OperationCancelled, GeneratorExit):
+            if breaker is not None:
+                breaker.release()
+            raise
+        except Exception as e:
+            duration = time.perf_counter() - started
+            model_performance.record(config.model_name, duration, True, agent=record.agent)
+            if breaker is not None:
+                # Errors that aren't about the provider's health (bad requests,
+                # invalid output) still mean the provider answered
+                breaker.record(is_provider_failure(e), duration, record.retries)
+            raise
+        else:
+            duration = time.perf_counter() - started
+            model_performance.record(config.model_name, duration, False, agent=record.agent)
+            if breaker is not None:
+                breaker.record(False, duration, record.retries)
+
+    def generate(self, request: Union[str, LLMRequest]) -> LLMResponse:
+        """Generate a response from the LLM"""
+        # Don't spend tokens on work whose caller has been cancelled
+        raise_if_cancelled()
+        request = self._prepare_request(request)
+        with self._track(request, "generate") as record:
+            cached = self._cached_response(request)
+            if cached is not None:
+                record.cached = True
+                return cached
+            with self._throttle(request, record), self._guard(request, record):
+                if request.stream:
+                    response = collect_stream(self._provider.stream(request), request.llm_config.model_name)
+                else:
+                    response = self._provider.generate(request)
+                record.set_usage(response.usage)
+        self._store_response(request, response)
+        return response
 
     def generate_structured(self, request: StructuredLLMRequest[T]) -> T:
         """Generate a structured response from the LLM"""
-        if request.llm_config is None:
-            request.llm_config = self.config
-        return self._provider.generate_structured(request)
+        raise_if_cancelled()
+        request = self._prepare_request(request)
+        # Providers report the usage of structured calls themselves (report_usage)
+        with self._track(request, "generate_structured") as record:
+            cached = self._cached_structured(request)
+            if cached is not None:
+                record.cached = True
+                return cached
+            result = self._call_structured(request, record)
+        self._store_structured(request, result)
+        return result
+
+    def _call_structured(self, request: StructuredLLMRequest[T], record) -> T:
+        """Provider call of a prepared structured request that missed the cache"""
+        with self._throttle(request, record), self._guard(request, record):
+            return self._provider.generate_structured(request)
+
+    async def agenerate(self, request: Union[str, LLMRequest]) -> LLMResponse:
+        """Generate a response from the LLM without blocking the event loop"""
+        request = self._prepare_request(request)
+        with self._track(request, "generate") as record:
+            cached = await self._acached_response(request)
+            if cached is not None:
+                record.cached = True
+                return cached
+            async with self._athrottle(request, record):
+                with self._guard(request, record):
+                    if request.stream:
+                        response = await acollect_stream(self._provider.astream(request), request.llm_config.model_name)
+                    else:
+                        response = await self._provider.agenerate(request)
+                    record.set_usage(response.usage)
+        await self._astore_response(request, response)
+        return response
+
+    async def agenerate_structured(self, request: StructuredLLMRequest[T]) -> T:
+        """Generate a structured response from the LLM without blocking the event loop"""
+        request = self._prepare_request(request)
+        with self._track(request, "generate_structured") as record:
+            cached = await self._acached_structured(request)
+            if cached is not None:
+                record.cached = True
+                return cached
+            result = await self._acall_structured(request, record)
+        await self._astore_structured(request, result)
+        return result
+
+    async def _acall_structured(self, request: StructuredLLMRequest[T], record) -> T:
+        """Async version of _call_structured"""
+        async with self._athrottle(request, record):
+            with self._guard(request, record):
+                return await self._provider.agenerate_structured(request)
+
+    def stream(self, request: Union[str, LLMRequest]) -> Iterator[LLMStreamChunk]:
+        """Stream a response from the LLM as it is generated (never cached)"""
+        raise_if_cancelled()
+        request = self._prepare_request(request)
+        with self._track(request, "stream") as record, self._throttle(request, record), self._guard(request, record):
+            for chunk in self._provider.stream(request):
+                if chunk.is_final:
+                    record.set_usage(chunk.usage)
+                yield chunk
+
+    async def astream(self, request: Union[str, LLMRequest]) -> AsyncIterator[LLMStreamChunk]:
+        """
+        Stream a response without blocking the event loop. Closing the iterator
+        (e.g. when the HTTP client disconnects) aborts the provider request.
+        """
+        request = self._prepare_request(request)
+        with self._track(request, "stream") as record:
+            async with self._athrottle(request, record):
+                with self._guard(request, record):
+                    async for chunk in self._provider.astream(request):
+                        if chunk.is_final:
+                            record.set_usage(chunk.usage)
+                        yield chunk
 
 # Example usage with ThreeGroup from models.py 
 from agent_management.models import ThreeGroup
@@ -7,6 +7,7 @@ from enum import Enum, auto
 from pydantic import BaseModel, Field
 from agent_management.models import ModelRegistry
 from agent_management.llm_service import LLMService, LLMModelConfig, ProviderType
+from agent_management.model_performance import ModelPerformance, model_performance
 
 class ModelCategory(str, Enum):
     """Categories of LLM models by capability"""
@@ -232,12 +233,13 @@ def register_models():
     )
 
 # Helper functions for working with models
-def get_llm_service(model_name: str) -> LLMService:
+def get_llm_service(model_name: str, agent: Optional[str] = None) -> LLMService:
     """
     Create an LLM service instance for a specific model.
     
     Args:
         model_name: The registered model name
+        agent: Optional agent type the service works for (tags its usage records)
         
     Returns:
         An initialized LLMService instance
@@ -255,7 +257,7 @@ def get_llm_service(model_name: str) -> LLMService:
     )
     
     # Create and return the LLM service
-    return LLMService(config=llm_config)
+    return LLMService(config=llm_config, agent=agent)
 
 def get_default_model_for_use_case(use_case: str) -> str:
     """
@@ -312,5 +314,19 @@ def get_models_by_category(category: ModelCategory) -> List[str]:
     
     return matching_models
 
+def get_model_performance(model_name: str, agent: Optional[str] = None) -> Optional[ModelPerformance]:
+    """
+    Get the recent latency and error rate of a model, as measured by this worker.
+    
+    Args:
+        model_name: The registered model name
+        agent: Optional agent type whose calls to summarize
+        
+    Returns:
+        The model's performance, or None if it (or the agent) hasn't made
+        enough calls recently
+    """
+    return model_performance.performance(model_name, agent)
+
 # Initialize the model registry
 register_models()
\ No newline at end of file
@@ -0,0 +1,137 @@
+"""
+Model Performance Module - Rolling latency and error statistics per model.
+
+LLMService records the duration and outcome of every provider call (cache
+hits and time spent waiting on the rate limiter are not calls). Samples are
+kept per model and per agent/model pair, because a caption call and a
+geometry call on the same model take very different times.
+create_agent_llm_service uses the statistics to route agents with a latency
+SLO (see agent_model_config.py) to a model that currently meets it.
+
+Statistics are kept per worker process.
+
+Configuration (environment):
+
+- ``MODEL_STATS_WINDOW``: samples kept per model (default: 200)
+- ``MODEL_STATS_MAX_AGE_SECONDS``: how long samples are remembered (default: 900)
+- ``MODEL_STATS_MIN_SAMPLES``: samples needed before a model is judged (default: 10)
+"""
+
+import math
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, Optional, Tuple
+
+DEFAULT_WINDOW = 200
+DEFAULT_MAX_AGE_SECONDS = 15 * 60
+DEFAULT_MIN_SAMPLES = 10
+
+
+@dataclass
+class ModelPerformance:
+    """Recent performance of a model (optionally for one agent)"""
+    samples: int
+    p50_ms: Optional[float]
+    p95_ms: Optional[float]
+    error_rate: float
+
+
+def _percentile(ordered: list, fraction: float) -> float:
+    return ordered[min(len(ordered) - 1, math.ceil(fraction * len(ordered)) - 1)]
+
+
+class ModelPerformanceTracker:
+    """Thread-safe rolling windows of (timestamp, seconds, failed) per model and agent/model"""
+
+    def __init__(
+        self,
+        window: Optional[int] = None,
+        max_age: Optional[float] = None,
+        min_samples: Optional[int] = None,
+    ):
+        self.window = window or int(os.environ.get("MODEL_STATS_WINDOW", DEFAULT_WINDOW))
+        self.max_age = max_age or float(os.environ.get("MODEL_STATS_MAX_AGE_SECONDS", DEFAULT_MAX_AGE_SECONDS))
+        self.min_samples = (
+            min_samples if min_samples is not None
+            else int(os.environ.get("MODEL_STATS_MIN_SAMPLES", DEFAULT_MIN_SAMPLES))
+        )
+        self._lock = threading.Lock()
+        # (model, agent or None) -> samples
+        self._samples: Dict[Tuple[str, Optional[str]], Deque[Tuple[float, float, bool]]] = {}
+
+    def record(self, model: str, seconds: float, failed: bool, agent: Optional[str] = None) -> None:
+        """
+        Record one provider call.
+
+        Args:
+            model: Model name
+            seconds: Duration of the call
+            failed: Whether it raised
+            agent: Agent that made the call, if known
+        """
+        sample = (time.time(), seconds, failed)
+        keys = [(model, None)] + ([(model, agent)] if agent else [])
+        with self._lock:
+            for key in keys:
+                samples = self._samples.get(key)
+                if samples is None:
+                    samples = self._samples[key] = deque(maxlen=self.window)
+                samples.append(sample)
+
+    def _summarize(self, key: Tuple[str, Optional[str]], now: float) -> ModelPerformance:
+        """Performance over the recent samples of a key (caller holds the lock)"""
+        samples = self._samples.get(key, ())
+        while samples and now - samples[0][0] > self.max_age:
+            samples.popleft()
+        latencies = sorted(seconds * 1000 for _, seconds, failed in samples if not failed)
+        failures = sum(1 for _, _, failed in samples if failed)
+        return ModelPerformance(
+            samples=len(samples),
+            p50_ms=round(_percentile(latencies, 0.5), 1) if latencies else None,
+            p95_ms=round(_percentile(latencies, 0.95), 1) if latencies else None,
+            error_rate=round(failures / len(samples), 4) if samples else 0.0,
+        )
+
+    def performance(self, model: str, agent: Optional[str] = None) -> Optional[ModelPerformance]:
+        """
+        Recent performance of a model, or of the agent's own calls to it.
+
+        An agent's calls are judged on their own: the model-wide numbers mix
+        in other agents' calls, which can take very different times.
+
+        Args:
+            model: Model name
+            agent: Agent whose calls to summarize, or None for all calls
+
+        Returns:
+            The performance, or None without enough samples
+        """
+        now = time.time()
+        with self._lock:
+            performance = self._summarize((model, agent), now)
+        return performance if performance.samples >= self.min_samples else None
+
+    def stats(self) -> Dict[str, Any]:
+        """Performance of every model, with a breakdown per agent"""
+        now = time.time()
+        result: Dict[str, Any] = {}
+        with self._lock:
+            for model, agent in sorted(self._samples, key=lambda key: (key[0], key[1] or "")):
+                summary = vars(self._summarize((model, agent), now))
+                entry = result.setdefault(model, {"by_agent": {}})
+                if agent is None:
+                    entry.update(summary)
+                else:
+                    entry["by_agent"][agent] = summary
+        return result
+
+    def clear(self) -> None:
+        with self._lock:
+            self._samples.clear()
+
+
+# Process-wide tracker fed by LLMService
+model_performance = ModelPerformanceTracker()
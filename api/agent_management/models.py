@@ -192,6 +192,15 @@ class SceneScript(BaseModel):
         description="Sequence of time points in the scene"
     )
 
+    def timeline(self) -> str:
+        """The time points as prompt text: timecode, highlighted atoms and caption of each"""
+        return "\n\n".join(
+            f"TIMECODE {point.timecode}:\n"
+            + (f"ATOMS: {', '.join(point.atoms)}\n" if point.atoms else "")
+            + f"CAPTION: {point.caption}"
+            for point in self.content
+        )
+
 
 class SceneObject(BaseModel):
     """Model for a discrete 3D object needed in the scene"""
@@ -221,6 +230,21 @@ class OrchestrationPlan(BaseModel):
     )
 
 
+class TestQuestion(BaseModel):
+    """Model for a multiple choice question about a scene"""
+
+    question: str = Field(description="The question text")
+    choices: List[str] = Field(description="Four possible answers")
+    correct_answer: str = Field(description="The correct answer (one of the choices)")
+    explanation: str = Field(description="Why the answer is correct")
+
+
+class TestQuestionSet(BaseModel):
+    """Model for the test questions generated for a scene script"""
+
+    questions: List[TestQuestion] = Field(description="Multiple choice questions")
+
+
 class AnimationKeyframe(BaseModel):
     """Model for an animation keyframe"""
 
@@ -0,0 +1,178 @@
+"""
+Molecular Index Module - Local fast path for molecular prompt validation.
+
+Every generation endpoint gates its work on DomainValidator.is_molecular,
+which used to be an LLM round-trip of a second or more even for prompts like
+"show me caffeine". Many prompts are obviously molecular, so they are first
+matched against a local index:
+
+1. Known compound names (common names of the molecules students ask for)
+2. Molecular formulas whose symbols are all real elements (``H2O``, ``NaCl``)
+3. SMILES strings that RDKit parses (``CC(=O)OC1=CC=CC=C1C(=O)O``)
+4. Structural vocabulary ("molecule", "chemical structure", ...)
+
+A prompt is only matched when these make up the whole request, apart from a
+display verb and filler words ("draw caffeine", "show me the structure of
+NaCl"). The LLM also rejects harmful or off-topic prompts, so a compound
+named inside a longer request ("how do I make ...", "the water cycle") is
+left to it.
+
+The index only ever answers "yes": anything it doesn't recognise is ambiguous
+and still goes to the LLM, whose verdicts are kept in the LLM cache
+(``domain_validator`` namespace), so repeated ambiguous prompts stay cheap.
+
+Set ``DOMAIN_VALIDATOR_FAST_PATH=0`` to always ask the LLM.
+"""
+
+import os
+import re
+import threading
+from typing import Dict, Optional
+
+from rdkit import Chem, RDLogger
+
+# Common names that are unambiguously molecules. Names that double as everyday
+# words ("lead", "water", "diamond", "ATP") and controlled substances are left
+# to the LLM.
+KNOWN_COMPOUNDS = frozenset({
+    "caffeine", "aspirin", "ethanol", "methanol", "methane", "ethane", "propane",
+    "butane", "pentane", "hexane", "octane", "benzene", "toluene", "phenol", "acetone",
+    "ammonia", "glucose", "fructose", "sucrose", "lactose", "cellulose", "glycogen", "carbon dioxide", "carbon monoxide", "nitrous oxide", "nitric oxide",
+    "nitrogen dioxide", "sulfur dioxide", "hydrogen peroxide", "hydrogen sulfide",
+    "sulfuric acid", "hydrochloric acid", "nitric acid", "acetic acid", "citric acid",
+    "formic acid", "lactic acid", "ascorbic acid", "phosphoric acid", "carbonic acid",
+    "sodium chloride", "sodium bicarbonate", "sodium hydroxide", "potassium chloride",
+    "calcium carbonate", "ethylene", "acetylene", "propylene", "styrene", "naphthalene",
+    "cyclohexane", "cyclopropane", "formaldehyde", "acetaldehyde", "chloroform",
+    "dichloromethane", "glycerol", "urea", "cholesterol", "testosterone", "estrogen",
+    "estradiol", "dopamine", "serotonin", "epinephrine", "norepinephrine",
+    "melatonin", "histamine", "acetylcholine", "insulin", "hemoglobin", "myoglobin",
+    "chlorophyll", "nadh", "adenine", "guanine", "cytosine",
+    "thymine", "uracil", "glycine", "alanine", "valine", "leucine", "isoleucine", "proline",
+    "serine", "threonine", "cysteine", "methionine", "tryptophan", "tyrosine",
+    "phenylalanine", "histidine", "lysine", "arginine", "glutamine", "glutamate",
+    "aspartate", "asparagine", "nicotine", "capsaicin",
+    "menthol", "vanillin", "ibuprofen", "paracetamol", "acetaminophen", "penicillin",
+    "amoxicillin", "theobromine", "quinine", "taurine", "retinol", "beta-carotene",
+    "carotene", "buckminsterfullerene", "fullerene", "graphene", "cyclodextrin",
+    "18-crown-6", "crown ether", "ferrocene", "cisplatin", "dinitrogen", "dioxygen",
+    "hydrazine", "borane", "diborane", "silane", "phosphine",
+})
+
+# Words that only occur in prompts about molecular structure
+STRUCTURAL_TERMS = frozenset({
+    "molecule", "molecules", "molecular", "chemical structure", "structural formula",
+    "lewis structure", "ball-and-stick", "ball and stick", "space-filling", "isomer",
+    "isomers", "enantiomer", "stereoisomer", "covalent bond", "ionic bond", "hydrogen bond",
+    "double bond", "triple bond", "functional group", "crystal lattice", "amino acid",
+    "nucleotide", "polymer", "monomer",
+})
+
+# Words a request to see a molecule can add around it
+DISPLAY_VERBS = frozenset({
+    "show", "draw", "display", "render", "visualize", "visualise", "animate", "build", "depict",
+})
+FILLER_WORDS = frozenset({
+    "me", "a", "an", "the", "of", "please", "its", "3d", "2d", "model", "structure",
+})
+
+# Short formulas that the generic formula rule rejects as possible words
+KNOWN_FORMULAS = frozenset({"CO", "NO", "HF", "HCN", "KOH", "NaOH", "CH4", "NH3", "O2", "N2", "H2"})
+
+ELEMENT_SYMBOLS = frozenset(Chem.GetPeriodicTable().GetElementSymbol(n) for n in range(1, 119))
+
+FORMULA_PATTERN = re.compile(r"^(?:\(?([A-Z][a-z]?)\d*\)?\d*)+$")
+FORMULA_ELEMENT = re.compile(r"[A-Z][a-z]?")
+SMILES_CHARS = re.compile(r"^[A-Za-z0-9@+\-\[\]()=#$/\\%.:*]+$")
+SMILES_SYNTAX = re.compile(r"[=#()\[\]@/\\]|\d")
+
+MAX_NGRAM = 3
+
+# Counters of how prompts were decided, exposed by stats()
+_stats_lock = threading.Lock()
+_stats: Dict[str, int] = {"name": 0, "formula": 0, "smiles": 0, "term": 0, "ambiguous": 0}
+
+
+def fast_path_enabled() -> bool:
+    return os.environ.get("DOMAIN_VALIDATOR_FAST_PATH", "1").lower() not in ("0", "false", "no")
+
+
+def is_formula(token: str) -> bool:
+    """Whether a token is a molecular formula built from real element symbols"""
+    if token in KNOWN_FORMULAS:
+        return True
+    if not FORMULA_PATTERN.match(token):
+        return False
+    symbols = FORMULA_ELEMENT.findall(token)
+    if len(symbols) < 2 or not all(symbol in ELEMENT_SYMBOLS for symbol in symbols):
+        return False
+    # Without a count or a two-letter symbol, tokens like "OK" or "CNN" are
+    # more likely acronyms than formulas
+    return any(char.isdigit() for char in token) or any(len(symbol) == 2 for symbol in symbols)
+
+
+def is_smiles(token: str) -> bool:
+    """Whether a token is a SMILES string (bonds, branches, rings or brackets required)"""
+    if len(token) < 3 or not SMILES_CHARS.match(token) or not SMILES_SYNTAX.search(token):
+        return False
+    if token.isdigit():
+        return False
+    RDLogger.DisableLog("rdApp.*")
+    try:
+        return Chem.MolFromSmiles(token) is not None
+    finally:
+        RDLogger.EnableLog("rdApp.*")
+
+
+def match_molecular(prompt: str) -> Optional[str]:
+    """
+    Match a prompt against the local index.
+
+    Args:
+        prompt: The user prompt
+
+    Returns:
+        The tier that recognised the prompt ("name", "formula", "smiles" or
+        "term"), or None if the prompt is ambiguous and needs the LLM
+    """
+    tokens = [token.strip(".,;:!?\"'") for token in prompt.split()]
+    tokens = [token for token in tokens if token]
+
+    # Every word must be part of a recognised name, formula, SMILES or term,
+    # or be a display verb or filler word
+    words = [token.lower() for token in tokens]
+    found = set()
+    i = 0
+    while i < len(words):
+        for n in range(min(MAX_NGRAM, len(words) - i), 0, -1):
+            phrase = " ".join(words[i:i + n])
+            if phrase in KNOWN_COMPOUNDS:
+                found.add("name")
+                break
+            if phrase in STRUCTURAL_TERMS:
+                found.add("term")
+                break
+        else:
+            n = 1
+            if is_formula(tokens[i]):
+                found.add("formula")
+            elif is_smiles(tokens[i]):
+                found.add("smiles")
+            elif words[i] not in DISPLAY_VERBS and words[i] not in FILLER_WORDS:
+                found.clear()
+                break
+        i += n
+    tier = next((tier for tier in ("name", "formula", "smiles", "term") if tier in found), None)
+
+    with _stats_lock:
+        _stats[tier or "ambiguous"] += 1
+    return tier
+
+
+def stats() -> Dict[str, int]:
+    with _stats_lock:
+        counts = dict(_stats)
+    local = sum(value for key, value in counts.items() if key != "ambiguous")
+    total = local + counts["ambiguous"]
+    counts["local_rate"] = round(local / total, 3) if total else 0.0
+    return counts
@@ -2,51 +2,77 @@
 Anthropic provider implementation for LLM service.
 """
 
+import contextlib
+import itertools
 import json
 from typing import Dict, Any, TypeVar, Type, List, Optional, Union, cast
-import httpx
-from anthropic import Anthropic, HUMAN_PROMPT, AI_PROMPT
-from ..llm_service import LLMProvider, LLMRequest, LLMResponse, StructuredLLMRequest, T, MessageRole
+from anthropic import Anthropic, AsyncAnthropic, HUMAN_PROMPT, AI_PROMPT
+from ..llm_service import LLMProvider, LLMRequest, LLMResponse, LLMStreamChunk, StructuredLLMRequest, T, MessageRole
+from .client_pool import client_pool
+from ..usage_tracker import report_usage, usage_from
+from .retry_policy import default_retry_policy
 import time
+import asyncio
 import logging
-from typing import TypeVar, Generic, Optional, Dict, Any, List, Union, Callable
+from typing import TypeVar, Generic, Optional, Dict, Any, List, Union, Callable, Iterator, AsyncIterator
 import os
 
+# Anthropic only caches prefixes of at least 1024 tokens (2048 for Haiku) and
+# ignores the marker on shorter ones; system prompts clearly below that are
+# sent as plain text
+PROMPT_CACHE_MIN_CHARS = int(os.environ.get("ANTHROPIC_PROMPT_CACHE_MIN_CHARS", 3000))
+
+
+def prompt_caching_enabled() -> bool:
+    """Whether long system prompts are marked for Anthropic prompt caching (PROMPT_CACHING_ENABLED)"""
+    return os.environ.get("PROMPT_CACHING_ENABLED", "1").lower() not in ("0", "false", "no", "off")
+
 class AnthropicProvider(LLMProvider):
     """Anthropic-specific implementation"""
     
-    MAX_RETRIES = 3  # Maximum number of retry attempts
-    INITIAL_RETRY_DELAY = 1  # Initial delay in seconds
-    
     def __init__(self, api_key: Optional[str] = None):
         """Initialize the Anthropic provider with API key"""
         self.api_key = api_key or os.environ.get("ANTHROPIC_API_KEY")
         if not self.api_key:
             raise ValueError("Anthropic API key is required")
         
-        transport = httpx.HTTPTransport(retries=3)
-        client = httpx.Client(transport=transport)
-        self.client = Anthropic(
-            api_key=self.api_key,
-            http_client=client
+        # Clients (and their connection pools, which retry failed connects)
+        # are shared by every provider instance; request retries are handled
+        # by retry_policy, not by the SDK, for messages.create and for
+        # opening message streams alike
+        self.client = client_pool.get(
+            "anthropic",
+            self.api_key,
+            lambda http_client: Anthropic(api_key=self.api_key, http_client=http_client, max_retries=0),
         )
+        self._async_client = None
+        self.retry_policy = default_retry_policy
         self.logger = logging.getLogger(__name__)
+
+    @property
+    def async_client(self) -> AsyncAnthropic:
+        """The shared async client for the running event loop"""
+        if self._async_client is not None:
+            return self._async_client
+        return client_pool.get_async(
+            "anthropic",
+            self.api_key,
+            lambda http_client: AsyncAnthropic(api_key=self.api_key, http_client=http_client, max_retries=0),
+        )
         
     def _get_token_usage_from_stream(self, stream):
-        """Extract token usage from stream if available"""
-        if hasattr(stream, "usage"):
-            return {
-                "prompt_tokens": stream.usage.input_tokens,
-                "completion_tokens": stream.usage.output_tokens,
-                "total_tokens": stream.usage.input_tokens + stream.usage.output_tokens
-            }
-        else:
-            # Default usage when not available
-            return {
-                "prompt_tokens": 0,
-                "completion_tokens": 0,
-                "total_tokens": 0
-            }
+        """Extract token usage (including prompt cache reads and writes) from a message or stream"""
+        return usage_from(getattr(stream, "usage", None))
+
+    @staticmethod
+    def _system_param(system_prompt: str) -> Union[str, List[Dict[str, Any]]]:
+        """
+        The system parameter for a request. Long system prompts are sent as a
+        cache_control block so Anthropic caches them as the request's prefix.
+        """
+        if not prompt_caching_enabled() or len(system_prompt) < PROMPT_CACHE_MIN_CHARS:
+            return system_prompt
+        return [{"type": "text", "text": system_prompt, "cache_control": {"type": "ephemeral"}}]
 
     def _convert_messages(self, request: LLMRequest) -> List[Dict[str, str]]:
         """Convert our message format to Anthropic's format"""
@@ -55,83 +81,110 @@ class AnthropicProvider(LLMProvider):
             "content": request.user_prompt
         }]
 
-    def _call_with_retry(self, func: Callable, *args, **kwargs) -> Any:
+    @contextlib.contextmanager
+    def _open_stream(self, params: Dict[str, Any]) -> Iterator[Any]:
         """
-        Call a function with retry logic and exponential backoff
-        
-        Args:
-            func: The function to call
-            *args: Arguments to pass to the function
-            **kwargs: Keyword arguments to pass to the function
-            
-        Returns:
-            The result of the function call
-            
-        Raises:
-            Exception: If all retry attempts fail
+        Open a message stream through the retry policy and yield it with its events.
+
+        A 429, 529 or 5xx comes back either when the stream is opened or as
+        its first event, so both are retried like messages.create. Errors
+        later in the stream are not retried: part of the response has been
+        consumed by then.
         """
-        retry_count = 0
-        last_exception = None
-        
-        while retry_count < self.MAX_RETRIES:
+        def open_stream():
+            stream = self.client.messages.stream(**params).__enter__()
             try:
-                return func(*args, **kwargs)
-            except Exception as e:
-                last_exception = e
-                error_message = str(e).lower()
-                
-                # Only retry on specific errors that might be temporary
-                if "overloaded" in error_message or "rate limit" in error_message or "timeout" in error_message:
-                    retry_count += 1
-                    if retry_count < self.MAX_RETRIES:
-                        # Calculate exponential backoff delay: 1s, 2s, 4s, etc.
-                        delay = self.INITIAL_RETRY_DELAY * (2 ** (retry_count - 1))
-                        self.logger.warning(f"Anthropic API error: {str(e)}. Retrying in {delay}s (attempt {retry_count}/{self.MAX_RETRIES})")
-                        time.sleep(delay)
-                    else:
-                        self.logger.error(f"Anthropic API error: {str(e)}. Max retries ({self.MAX_RETRIES}) exceeded.")
-                else:
-                    # For other errors, don't retry
-                    break
+                return stream, [next(stream)]
+            except StopIteration:
+                return stream, []
+            except BaseException:
+                stream.close()
+                raise
+
+        stream, first = self.retry_policy.call("Anthropic", open_stream)
+        try:
+            yield stream, itertools.chain(first, stream)
+        finally:
+            stream.close()
+
+    @contextlib.asynccontextmanager
+    async def _aopen_stream(self, params: Dict[str, Any]) -> AsyncIterator[Any]:
+        """Async counterpart of _open_stream"""
+        async def open_stream():
+            stream = await self.async_client.messages.stream(**params).__aenter__()
+            try:
+                return stream, [await stream.__anext__()]
+            except StopAsyncIteration:
+                return stream, []
+            except BaseException:
+                await stream.close()
+                raise
+
+        async def events(stream, first):
+            for event in first:
+                yield event
+            async for event in stream:
+                yield event
+
+        stream, first = await self.retry_policy.acall("Anthropic", open_stream)
+        try:
+            yield stream, events(stream, first)
+        finally:
+            await stream.close()
+
+    @staticmethod
+    def _stream_text(event: Any) -> Optional[str]:
+        """The text delta carried by a streaming event, if any"""
+        if event.type == "content_block_delta" and getattr(event.delta, "type", None) == "text_delta":
+            return event.delta.text
+        return None
+
+    @staticmethod
+    def _collect_stream_event(message: Any, content_parts: List[str]) -> None:
+        """Append the text carried by a streaming event, if any"""
+        if message.type == "content_block":
+            content_parts.append(message.content[0].text)
+        elif message.type == "content_block_delta":
+            if hasattr(message.delta, "text"):
+                content_parts.append(message.delta.text)
+
+    def _build_params(self, request: LLMRequest) -> Dict[str, Any]:
+        """Build the messages parameters for a plain text request"""
+        if not request.llm_config:
+            raise ValueError("LLM configuration is required")
+
+        messages = self._convert_messages(request)
+        
+        # Build parameters dictionary with proper typing
+        params: Dict[str, Any] = {
+            "model": request.llm_config.model_name,
+            "messages": messages,
+            "max_tokens": request.max_tokens or 4096  # Use a smaller default max_tokens
+        }
         
-        # If we get here, all retries failed or the error wasn't retryable
-        raise last_exception
+        # Add system prompt as a top-level parameter if provided
+        if request.system_prompt:
+            params["system"] = self._system_param(request.system_prompt)
+        
+        # Add optional parameters
+        if request.temperature is not None:
+            params["temperature"] = request.temperature
+        if request.top_p is not None:
+            params["top_p"] = request.top_p
+        return params
 
     def generate(self, request: LLMRequest) -> LLMResponse:
         """Generate a response using Anthropic's API"""
         try:
-            if not request.llm_config:
-                raise ValueError("LLM configuration is required")
-
-            messages = self._convert_messages(request)
-            
-            # Build parameters dictionary with proper typing
-            params: Dict[str, Any] = {
-                "model": request.llm_config.model_name,
-                "messages": messages,
-                "max_tokens": request.max_tokens or 4096  # Use a smaller default max_tokens
-            }
-            
-            # Add system prompt as a top-level parameter if provided
-            if request.system_prompt:
-                params["system"] = request.system_prompt
-            
-            # Add optional parameters
-            if request.temperature is not None:
-                params["temperature"] = request.temperature
-            if request.top_p is not None:
-                params["top_p"] = request.top_p
+            params = self._build_params(request)
             
             # Use streaming for large token requests
             if params["max_tokens"] > 4096:
                 content_parts = []
-                with self.client.messages.stream(**params) as stream:
-                    for message in stream:
-                        if message.type == "content_block":
-                            content_parts.append(message.content[0].text)
-                        elif message.type == "content_block_delta":
-                            if hasattr(message.delta, "text"):
-                                content_parts.append(message.delta.text)
+                with self._open_stream(params) as (stream, events):
+                    for message in events:
+                        self._collect_stream_event(message, content_parts)
+                    final_message = stream.get_final_message()
                 
                 if not content_parts:
                     raise ValueError("No response content received from Anthropic")
@@ -140,11 +193,11 @@ class AnthropicProvider(LLMProvider):
                 return LLMResponse(
                     content=content,
                     model=request.llm_config.model_name,
-                    usage=self._get_token_usage_from_stream(stream)
+                    usage=self._get_token_usage_from_stream(final_message)
                 )
             else:
                 # Use non-streaming for shorter responses
-                response = self._call_with_retry(self.client.messages.create, **params)
+                response = self.retry_policy.call("Anthropic", self.client.messages.create, **params)
                 
                 if not response.content or not response.content[0].text:
                     raise ValueError("No response content received from Anthropic")
@@ -158,45 +211,155 @@ class AnthropicProvider(LLMProvider):
             self.logger.error(f"Anthropic API error: {str(e)}")
             raise Exception(f"Anthropic API error: {str(e)}")
 
-    def generate_structured(self, request: StructuredLLMRequest[T]) -> T:
-        """Generate a structured response using Anthropic's API"""
+    async def agenerate(self, request: LLMRequest) -> LLMResponse:
+        """Generate a response using Anthropic's async client"""
         try:
-            if not request.llm_config:
-                raise ValueError("LLM configuration is required")
-
-            # Add JSON structure requirement to the system prompt
-            system_prompt = (request.system_prompt or "") + "\nYou must respond with valid JSON that matches the required schema. Do not include any explanatory text, only output the JSON object."
+            params = self._build_params(request)
+            
+            if params["max_tokens"] > 4096:
+                content_parts = []
+                async with self._aopen_stream(params) as (stream, events):
+                    async for message in events:
+                        self._collect_stream_event(message, content_parts)
+                    final_message = await stream.get_final_message()
+                
+                if not content_parts:
+                    raise ValueError("No response content received from Anthropic")
+                
+                return LLMResponse(
+                    content="".join(content_parts),
+                    model=request.llm_config.model_name,
+                    usage=self._get_token_usage_from_stream(final_message)
+                )
             
-            messages = self._convert_messages(LLMRequest(
-                system_prompt=None,  # We'll pass this as a top-level parameter
-                user_prompt=request.user_prompt,
-                llm_config=request.llm_config
-            ))
+            response = await self.retry_policy.acall("Anthropic", self.async_client.messages.create, **params)
             
-            # Build parameters dictionary with proper typing
-            params: Dict[str, Any] = {
-                "model": request.llm_config.model_name,
-                "messages": messages,
-                "system": system_prompt,  # Pass system prompt as top-level parameter
-                "max_tokens": request.max_tokens or 20000  # Use a smaller default max_tokens
-            }
+            if not response.content or not response.content[0].text:
+                raise ValueError("No response content received from Anthropic")
+            
+            return LLMResponse(
+                content=response.content[0].text,
+                model=request.llm_config.model_name,
+                usage=self._get_token_usage_from_stream(response)
+            )
+        except Exception as e:
+            self.logger.error(f"Anthropic API error: {str(e)}")
+            raise Exception(f"Anthropic API error: {str(e)}")
+
+    def stream(self, request: LLMRequest) -> Iterator[LLMStreamChunk]:
+        """Stream a response using Anthropic's API"""
+        try:
+            content_parts: List[str] = []
+            with self._open_stream(self._build_params(request)) as (stream, events):
+                for text in map(self._stream_text, events):
+                    if text:
+                        content_parts.append(text)
+                        yield LLMStreamChunk(delta=text)
+                final_message = stream.get_final_message()
+
+            if not content_parts:
+                raise ValueError("No response content received from Anthropic")
+            yield LLMStreamChunk(
+                content="".join(content_parts),
+                usage=self._get_token_usage_from_stream(final_message)
+            )
+        except Exception as e:
+            self.logger.error(f"Anthropic API error: {str(e)}")
+            raise Exception(f"Anthropic API error: {str(e)}")
+
+    async def astream(self, request: LLMRequest) -> AsyncIterator[LLMStreamChunk]:
+        """Stream a response using Anthropic's async client"""
+        try:
+            content_parts: List[str] = []
+            async with self._aopen_stream(self._build_params(request)) as (stream, events):
+                async for event in events:
+                    text = self._stream_text(event)
+                    if text:
+                        content_parts.append(text)
+                        yield LLMStreamChunk(delta=text)
+                final_message = await stream.get_final_message()
+
+            if not content_parts:
+                raise ValueError("No response content received from Anthropic")
+            yield LLMStreamChunk(
+                content="".join(content_parts),
+                usage=self._get_token_usage_from_stream(final_message)
+            )
+        except Exception as e:
+            self.logger.error(f"Anthropic API error: {str(e)}")
+            raise Exception(f"Anthropic API error: {str(e)}")
+
+    def _build_structured_params(self, request: StructuredLLMRequest[T]) -> Dict[str, Any]:
+        """Build the messages parameters for a structured (JSON) request"""
+        if not request.llm_config:
+            raise ValueError("LLM configuration is required")
+
+        # Add JSON structure requirement to the system prompt
+        system_prompt = (request.system_prompt or "") + "\nYou must respond with valid JSON that matches the required schema. Do not include any explanatory text, only output the JSON object."
+        
+        messages = self._convert_messages(LLMRequest(
+            system_prompt=None,  # We'll pass this as a top-level parameter
+            user_prompt=request.user_prompt,
+            llm_config=request.llm_config
+        ))
+        
+        # Build parameters dictionary with proper typing
+        params: Dict[str, Any] = {
+            "model": request.llm_config.model_name,
+            "messages": messages,
+            "system": self._system_param(system_prompt),  # Pass system prompt as top-level parameter
+            "max_tokens": request.max_tokens or 20000  # Use a smaller default max_tokens
+        }
+        
+        # Add optional parameters
+        if request.temperature is not None:
+            params["temperature"] = request.temperature
+        if request.top_p is not None:
+            params["top_p"] = request.top_p
+        return params
+
+    def _parse_structured_content(self, request: StructuredLLMRequest[T], content: str) -> T:
+        """Extract the JSON object from a response and validate it against the response model"""
+        if not content:
+            raise ValueError("Empty response content from Anthropic")
+        
+        # Clean up the response to extract JSON
+        content = content.strip()
+        
+        # Sometimes Anthropic might wrap the JSON in markdown code blocks
+        if "```json" in content:
+            content = content.split("```json")[1].split("```")[0].strip()
+        elif "```" in content:
+            content = content.split("```")[1].strip()
+        
+        # Try to find JSON object if there's additional text
+        try:
+            # Find the first '{' and last '}'
+            start = content.find('{')
+            end = content.rfind('}')
+            if start != -1 and end != -1:
+                content = content[start:end + 1]
+        except:
+            pass
             
-            # Add optional parameters
-            if request.temperature is not None:
-                params["temperature"] = request.temperature
-            if request.top_p is not None:
-                params["top_p"] = request.top_p
+        try:
+            json_response = json.loads(content)
+            return request.response_model.model_validate(json_response)
+        except json.JSONDecodeError as json_err:
+            raise ValueError(f"Failed to parse JSON response: {str(json_err)}. Response content: {content}")
+
+    def generate_structured(self, request: StructuredLLMRequest[T]) -> T:
+        """Generate a structured response using Anthropic's API"""
+        try:
+            params = self._build_structured_params(request)
             
             # Use streaming for large token requests
             if params["max_tokens"] > 8192:
                 content_parts = []
-                with self.client.messages.stream(**params) as stream:
-                    for message in stream:
-                        if message.type == "content_block":
-                            content_parts.append(message.content[0].text)
-                        elif message.type == "content_block_delta":
-                            if hasattr(message.delta, "text"):
-                                content_parts.append(message.delta.text)
+                with self._open_stream(params) as (stream, events):
+                    for message in events:
+                        self._collect_stream_event(message, content_parts)
+                    report_usage(self._get_token_usage_from_stream(stream.get_final_message()))
                 
                 if not content_parts:
                     raise ValueError("No response content received from Anthropic")
@@ -204,39 +367,43 @@ class AnthropicProvider(LLMProvider):
                 content = "".join(content_parts)
             else:
                 # Use non-streaming for shorter responses
-                response = self.client.messages.create(**params)
+                response = self.retry_policy.call("Anthropic", self.client.messages.create, **params)
+                report_usage(self._get_token_usage_from_stream(response))
                 
                 if not response.content or not response.content[0].text:
                     raise ValueError("No response content received from Anthropic")
                 
                 content = response.content[0].text
             
-            if not content:
-                raise ValueError("Empty response content from Anthropic")
-            
-            # Clean up the response to extract JSON
-            content = content.strip()
-            
-            # Sometimes Anthropic might wrap the JSON in markdown code blocks
-            if "```json" in content:
-                content = content.split("```json")[1].split("```")[0].strip()
-            elif "```" in content:
-                content = content.split("```")[1].strip()
+            return self._parse_structured_content(request, content)
+        except Exception as e:
+            raise Exception(f"Anthropic structured output error: {str(e)}")
+
+    async def agenerate_structured(self, request: StructuredLLMRequest[T]) -> T:
+        """Generate a structured response using Anthropic's async client"""
+        try:
+            params = self._build_structured_params(request)
             
-            # Try to find JSON object if there's additional text
-            try:
-                # Find the first '{' and last '}'
-                start = content.find('{')
-                end = content.rfind('}')
-                if start != -1 and end != -1:
-                    content = content[start:end + 1]
-            except:
-                pass
+            if params["max_tokens"] > 8192:
+                content_parts = []
+                async with self._aopen_stream(params) as (stream, events):
+                    async for message in events:
+                        self._collect_stream_event(message, content_parts)
+                    report_usage(self._get_token_usage_from_stream(await stream.get_final_message()))
                 
-            try:
-                json_response = json.loads(content)
-                return request.response_model.model_validate(json_response)
-            except json.JSONDecodeError as json_err:
-                raise ValueError(f"Failed to parse JSON response: {str(json_err)}. Response content: {content}")
+                if not content_parts:
+                    raise ValueError("No response content received from Anthropic")
+                
+                content = "".join(content_parts)
+            else:
+                response = await self.retry_policy.acall("Anthropic", self.async_client.messages.create, **params)
+                report_usage(self._get_token_usage_from_stream(response))
+                
+                if not response.content or not response.content[0].text:
+                    raise ValueError("No response content received from Anthropic")
+                
+                content = response.content[0].text
+            
+            return self._parse_structured_content(request, content)
         except Exception as e:
             raise Exception(f"Anthropic structured output error: {str(e)}") 
\ No newline at end of file
@@ -0,0 +1,185 @@
+"""
+Client Pool - Process-wide cache of provider SDK clients.
+
+Every LLMService used to build a new OpenAI / Anthropic / Groq client, each
+with its own httpx connection pool, so every request paid for a fresh TCP +
+TLS handshake. Providers now take their clients from this cache instead,
+keyed by provider and API key, and all of them share tuned connection limits
+and keep-alive.
+
+Async clients are additionally keyed by event loop, because httpx.AsyncClient
+connections cannot be shared between loops, and on shutdown each of them is
+closed on its own loop.
+
+Configuration (environment):
+
+- ``LLM_HTTP_MAX_CONNECTIONS``: connections per client (default: 100)
+- ``LLM_HTTP_MAX_KEEPALIVE``: idle connections kept open per client (default: 20)
+- ``LLM_HTTP_KEEPALIVE_EXPIRY``: seconds an idle connection is kept (default: 60)
+"""
+
+import asyncio
+import hashlib
+import inspect
+import logging
+import os
+import threading
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_CONNECTIONS = 100
+DEFAULT_MAX_KEEPALIVE = 20
+DEFAULT_KEEPALIVE_EXPIRY = 60.0
+
+# Connection-level retries (failed connects only, never a sent request)
+CONNECT_RETRIES = 3
+
+# Seconds to wait for an async client to close on another event loop
+ASYNC_CLOSE_TIMEOUT = 5.0
+
+
+def http_limits() -> httpx.Limits:
+    """Connection pool limits shared by all provider clients"""
+    return httpx.Limits(
+        max_connections=int(os.environ.get("LLM_HTTP_MAX_CONNECTIONS", DEFAULT_MAX_CONNECTIONS)),
+        max_keepalive_connections=int(os.environ.get("LLM_HTTP_MAX_KEEPALIVE", DEFAULT_MAX_KEEPALIVE)),
+        keepalive_expiry=float(os.environ.get("LLM_HTTP_KEEPALIVE_EXPIRY", DEFAULT_KEEPALIVE_EXPIRY)),
+    )
+
+
+def create_http_client() -> httpx.Client:
+    """Create a pooled httpx client for a sync SDK client"""
+    transport = httpx.HTTPTransport(retries=CONNECT_RETRIES, limits=http_limits())
+    return httpx.Client(transport=transport, follow_redirects=True)
+
+
+def create_async_http_client() -> httpx.AsyncClient:
+    """Create a pooled httpx client for an async SDK client"""
+    transport = httpx.AsyncHTTPTransport(retries=CONNECT_RETRIES, limits=http_limits())
+    return httpx.AsyncClient(transport=transport, follow_redirects=True)
+
+
+async def _aclose_client(client: Any) -> None:
+    """Close an async SDK client (close()) or httpx client (aclose())"""
+    close = getattr(client, "aclose", None) or client.close
+    result = close()
+    if inspect.isawaitable(result):
+        await result
+
+
+async def aclose_on_their_loops(clients: Iterable[Tuple[asyncio.AbstractEventLoop, Any]]) -> None:
+    """
+    Close async clients, each on the event loop it was created on: directly
+    on the running loop, from the loop's thread on other running loops.
+    Clients of loops that have stopped can't be closed any more and are dropped.
+
+    Args:
+        clients: (loop, client) pairs
+    """
+    running = asyncio.get_running_loop()
+    for loop, client in clients:
+        try:
+            if loop is running:
+                await _aclose_client(client)
+            elif loop.is_running():
+                future = asyncio.run_coroutine_threadsafe(_aclose_client(client), loop)
+                await asyncio.wait_for(asyncio.wrap_future(future), ASYNC_CLOSE_TIMEOUT)
+        except Exception as e:
+            logger.warning(f"Error closing async client: {e}")
+
+
+def _key_fingerprint(api_key: Optional[str]) -> str:
+    """Cache key for an API key that doesn't keep the key itself in plain sight"""
+    return hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()[:16]
+
+
+class ClientPool:
+    """Thread-safe cache of SDK clients keyed by provider and API key"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._clients: Dict[Tuple[str, str], Any] = {}
+        self._async_clients: Dict[Tuple[str, str, int], Tuple[asyncio.AbstractEventLoop, Any]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, provider: str, api_key: Optional[str], factory: Callable[[httpx.Client], Any]) -> Any:
+        """
+        Return the cached sync client for a provider and API key, creating it on first use.
+
+        Args:
+            provider: Provider name, e.g. "openai"
+            api_key: The API key the client authenticates with
+            factory: Builds the SDK client around the given pooled httpx client
+
+        Returns:
+            The shared SDK client
+        """
+        key = (provider, _key_fingerprint(api_key))
+        with self._lock:
+            client = self._clients.get(key)
+            if client is not None:
+                self.hits += 1
+                return client
+            self.misses += 1
+            client = factory(create_http_client())
+            self._clients[key] = client
+            return client
+
+    def get_async(
+        self, provider: str, api_key: Optional[str], factory: Callable[[httpx.AsyncClient], Any]
+    ) -> Any:
+        """
+        Return the cached async client for a provider and API key on the running event loop.
+
+        Clients of loops that have been closed are dropped.
+        """
+        loop = asyncio.get_running_loop()
+        key = (provider, _key_fingerprint(api_key), id(loop))
+        with self._lock:
+            entry = self._async_clients.get(key)
+            if entry is not None and entry[0] is loop:
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            for stale_key in [k for k, (l, _) in self._async_clients.items() if l.is_closed()]:
+                del self._async_clients[stale_key]
+            client = factory(create_async_http_client())
+            self._async_clients[key] = (loop, client)
+            return client
+
+    def close(self) -> None:
+        """Close the sync clients and forget all clients (used on application shutdown)"""
+        with self._lock:
+            clients = list(self._clients.values())
+            self._clients.clear()
+            self._async_clients.clear()
+        for client in clients:
+            try:
+                client.close()
+            except Exception as e:
+                logger.warning(f"Error closing provider client: {e}")
+
+    async def aclose(self) -> None:
+        """Close all clients, async ones on their own event loop (used on application shutdown)"""
+        with self._lock:
+            async_clients = list(self._async_clients.values())
+            self._async_clients.clear()
+        self.close()
+        await aclose_on_their_loops(async_clients)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "clients": len(self._clients),
+                "async_clients": len(self._async_clients),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+# Process-wide pool used by all providers
+client_pool = ClientPool()
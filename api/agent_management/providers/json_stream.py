@@ -0,0 +1,323 @@
+"""
+Incremental, tolerant JSON extraction for model output.
+
+Models asked for a JSON object often wrap it in a fenced block or a sentence
+of preamble, quote with single quotes, leave trailing commas or write
+JavaScript such as ``Math.PI / 2``. IncrementalJSONParser repairs all of these
+in a single left-to-right scan, so it can be fed the deltas of a stream and
+hands back the parsed object as soon as its closing brace arrives.
+"""
+
+import ast
+import json
+import math
+import operator
+import re
+from typing import Any, List, Optional
+
+# Bare (unquoted) words a model may use for JSON literals
+_BARE_LITERALS = {
+    "true": "true",
+    "false": "false",
+    "null": "null",
+    "True": "true",
+    "False": "false",
+    "None": "null",
+    "undefined": "null",
+    "NaN": "null",
+}
+
+_JSON_NUMBER = re.compile(r"-?(?:0|[1-9]\d*)(?:\.\d+)?(?:[eE][+-]?\d+)?")
+
+# Characters that end a run of plain string content, per quote character
+_STRING_SPECIALS = {
+    '"': re.compile(r'["\\]'),
+    "'": re.compile(r"['\"\\]"),
+}
+
+_OPERATORS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.Mod: operator.mod,
+    ast.Pow: operator.pow,
+    ast.USub: operator.neg,
+    ast.UAdd: operator.pos,
+}
+
+_MATH_NAMES = {"PI": math.pi, "E": math.e, "SQRT2": math.sqrt(2), "LN2": math.log(2), "LN10": math.log(10)}
+
+_MATH_FUNCTIONS = {
+    name: getattr(math, name)
+    for name in ("sqrt", "sin", "cos", "tan", "asin", "acos", "atan", "atan2", "exp", "log", "floor", "ceil")
+}
+_MATH_FUNCTIONS.update({"abs": abs, "min": min, "max": max, "round": round, "pow": pow})
+
+
+class IncompleteJSONError(ValueError):
+    """Raised when the text ends before a complete JSON object"""
+
+
+def _evaluate(node: ast.AST) -> float:
+    """Evaluate a small arithmetic expression over numbers and JavaScript Math members"""
+    if isinstance(node, ast.Expression):
+        return _evaluate(node.body)
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) and not isinstance(node.value, bool):
+        return node.value
+    if isinstance(node, ast.Attribute) and isinstance(node.value, ast.Name) and node.value.id == "Math":
+        return _MATH_NAMES[node.attr]
+    if isinstance(node, ast.UnaryOp) and type(node.op) in _OPERATORS:
+        return _OPERATORS[type(node.op)](_evaluate(node.operand))
+    if isinstance(node, ast.BinOp) and type(node.op) in _OPERATORS:
+        left, right = _evaluate(node.left), _evaluate(node.right)
+        if isinstance(node.op, ast.Pow) and abs(right) > 64:
+            raise ValueError("Exponent too large")
+        return _OPERATORS[type(node.op)](left, right)
+    if (
+        isinstance(node, ast.Call)
+        and isinstance(node.func, ast.Attribute)
+        and isinstance(node.func.value, ast.Name)
+        and node.func.value.id == "Math"
+        and not node.keywords
+    ):
+        return _MATH_FUNCTIONS[node.func.attr](*[_evaluate(arg) for arg in node.args])
+    raise ValueError(f"Unsupported expression: {ast.dump(node)}")
+
+
+def _bare_value(token: str) -> str:
+    """
+    Turn an unquoted value into JSON.
+
+    Args:
+        token: The unquoted value, e.g. ``true``, ``.5`` or ``Math.PI / 2``
+
+    Returns:
+        The JSON text for the value
+    """
+    if token in _BARE_LITERALS:
+        return _BARE_LITERALS[token]
+    if _JSON_NUMBER.fullmatch(token):
+        return token
+    try:
+        value = _evaluate(ast.parse(token, mode="eval"))
+        if isinstance(value, float) and not math.isfinite(value):
+            return "null"
+        return json.dumps(value)
+    except (SyntaxError, ValueError, KeyError, TypeError, ArithmeticError, RecursionError):
+        pass
+    if "Math." in token:
+        # A JavaScript expression we can't evaluate (e.g. Math.random())
+        return "0"
+    # An unquoted string
+    return json.dumps(token)
+
+
+class IncrementalJSONParser:
+    """
+    Single-pass extractor for the first JSON object in a model's output.
+
+    Text before the object (a preamble, a ``` fence or a DeepSeek <think>
+    block) is skipped, and the object itself is rewritten to strict JSON as it
+    is scanned: single-quoted strings are requoted, trailing commas dropped,
+    unquoted keys quoted and bare JavaScript expressions evaluated. Anything
+    after the closing brace is ignored.
+
+    Usage:
+        parser = IncrementalJSONParser()
+        for delta in stream:
+            if parser.feed(delta):
+                break
+        value = parser.finish()
+    """
+
+    def __init__(self):
+        self.done = False
+        self.value: Any = None
+        self._out: List[str] = []
+        self._closers: List[str] = []
+        self._quote: Optional[str] = None
+        self._escape = False
+        self._bare: List[str] = []
+        self._bare_parens = 0
+        self._pending_comma = False
+        self._thinking = False
+        # The last few preamble characters, to spot tags split across deltas
+        self._tail = ""
+
+    def feed(self, text: str) -> bool:
+        """
+        Scan the next piece of text.
+
+        Args:
+            text: The next delta of the model output
+
+        Returns:
+            True once the object is complete (its value is in ``self.value``)
+
+        Raises:
+            ValueError: If the complete object still isn't valid JSON
+        """
+        i, end = 0, len(text)
+        while i < end and not self.done:
+            if not self._closers:
+                i = self._skip_preamble(text, i)
+                if i < end:
+                    self._closers.append("}")
+                    self._out.append("{")
+                    i += 1
+            elif self._quote:
+                i = self._scan_string(text, i)
+            else:
+                self._scan_structure(text[i])
+                i += 1
+        return self.done
+
+    def finish(self) -> Any:
+        """
+        Return the parsed object once all the text has been fed.
+
+        Raises:
+            IncompleteJSONError: If the text ended before the object was complete
+        """
+        if not self.done:
+            if not self._out:
+                raise IncompleteJSONError("No JSON object found in the response")
+            raise IncompleteJSONError("The response ended before the JSON object was complete")
+        return self.value
+
+    def _skip_preamble(self, text: str, i: int) -> int:
+        """Skip text before the object; returns the index of its opening brace or len(text)"""
+        while i < len(text):
+            combined = self._tail + text[i:]
+            offset = len(self._tail)
+            if self._thinking:
+                close = combined.find("</think>")
+                if close < 0:
+                    self._tail = combined[-7:]
+                    return len(text)
+                self._thinking = False
+                self._tail = ""
+                i += close + len("</think>") - offset
+                continue
+            brace = combined.find("{", offset)
+            think = combined.find("<think>")
+            if think >= 0 and (brace < 0 or think < brace):
+                # Reasoning models may sketch JSON while thinking; skip all of it
+                self._thinking = True
+                self._tail = ""
+                i += think + len("<think>") - offset
+                continue
+            self._tail = ""
+            if brace >= 0:
+                return i + brace - offset
+            self._tail = combined[-6:]
+            return len(text)
+        return i
+
+    def _scan_string(self, text: str, i: int) -> int:
+        """Copy string content up to the next special character; returns the new index"""
+        out = self._out
+        if self._escape:
+            self._escape = False
+            # An escaped single quote is just a quote inside a double-quoted string
+            out.append("'" if text[i] == "'" else "\\" + text[i])
+            return i + 1
+
+        match = _STRING_SPECIALS[self._quote].search(text, i)
+        stop = match.start() if match else len(text)
+        if stop > i:
+            out.append(text[i:stop])
+        if not match:
+            return stop
+
+        char = text[stop]
+        if char == "\\":
+            self._escape = True
+        elif char == self._quote:
+            self._quote = None
+            out.append('"')
+        else:
+            # A double quote inside a single-quoted string
+            out.append('\\"')
+        return stop + 1
+
+    def _scan_structure(self, char: str) -> None:
+        """Handle one character between strings"""
+        if self._bare_parens:
+            # Inside the arguments of an expression such as Math.atan2(1, 2)
+            self._bare.append(char)
+            if char == "(":
+                self._bare_parens += 1
+            elif char == ")":
+                self._bare_parens -= 1
+        elif char in "\"'":
+            self._flush_bare()
+            self._emit('"')
+            self._quote = char
+        elif char in "{[":
+            self._flush_bare()
+            self._emit(char)
+            self._closers.append("}" if char == "{" else "]")
+        elif char in "}]":
+            self._flush_bare()
+            # A trailing comma before a closing bracket is dropped
+            self._pending_comma = False
+            self._out.append(self._closers.pop())
+            if not self._closers:
+                self._complete()
+        elif char == ",":
+            self._flush_bare()
+            if len(self._out) > 1 and self._out[-1] not in "{[":
+                self._pending_comma = True
+        elif char == ":":
+            self._flush_bare(key=True)
+            self._out.append(":")
+        elif char.isspace() and not self._bare:
+            pass
+        else:
+            if char == "(":
+                self._bare_parens += 1
+            self._bare.append(char)
+
+    def _emit(self, text: str) -> None:
+        """Append a value or opening token, writing a deferred comma first"""
+        if self._pending_comma:
+            self._out.append(",")
+            self._pending_comma = False
+        self._out.append(text)
+
+    def _flush_bare(self, key: bool = False) -> None:
+        """Write the unquoted token collected since the last structural character"""
+        token = "".join(self._bare).strip()
+        self._bare.clear()
+        self._bare_parens = 0
+        if token:
+            self._emit(json.dumps(token) if key else _bare_value(token))
+
+    def _complete(self) -> None:
+        """Parse the rewritten object"""
+        text = "".join(self._out)
+        try:
+            self.value = json.loads(text, strict=False)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid JSON in response: {e}\n\nJSON: {text}") from e
+        self.done = True
+
+
+def extract_json(text: str) -> Any:
+    """
+    Extract the first JSON object from a complete piece of model output.
+
+    Args:
+        text: The model output
+
+    Returns:
+        The parsed object
+
+    Raises:
+        ValueError: If no complete, valid object is found
+    """
+    parser = IncrementalJSONParser()
+    parser.feed(text)
+    return parser.finish()
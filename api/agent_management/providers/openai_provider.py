@@ -3,11 +3,14 @@ OpenAI provider implementation for LLM service.
 """
 
 import json
-from typing import Dict, Any, TypeVar, Type, List, Optional, Union, cast, Literal
+from typing import Dict, Any, TypeVar, Type, List, Optional, Union, cast, Literal, Iterator, AsyncIterator
 from openai.types.chat import ChatCompletion, ChatCompletionMessage, ChatCompletionMessageParam
 from openai.types.chat.chat_completion import Choice
 from openai.types import Completion
-from ..llm_service import LLMProvider, LLMRequest, LLMResponse, StructuredLLMRequest, T, MessageRole
+from ..llm_service import LLMProvider, LLMRequest, LLMResponse, LLMStreamChunk, StructuredLLMRequest, T, MessageRole
+from .client_pool import client_pool
+from .retry_policy import default_retry_policy
+from ..usage_tracker import report_usage, usage_from
 import os
 
 class OpenAIProvider(LLMProvider):
@@ -20,8 +23,26 @@ class OpenAIProvider(LLMProvider):
         if not self.api_key:
             raise ValueError("OpenAI API key is required")
             
-        self.client = openai.OpenAI(
-            api_key=self.api_key
+        # Clients (and their connection pools) are shared by every provider instance
+        self.client = client_pool.get(
+            "openai",
+            self.api_key,
+            # Retries are handled by retry_policy, not by the SDK
+            lambda http_client: openai.OpenAI(api_key=self.api_key, http_client=http_client, max_retries=0),
+        )
+        self._async_client = None
+        self.retry_policy = default_retry_policy
+
+    @property
+    def async_client(self):
+        """The shared async client for the running event loop"""
+        if self._async_client is not None:
+            return self._async_client
+        import openai
+        return client_pool.get_async(
+            "openai",
+            self.api_key,
+            lambda http_client: openai.AsyncOpenAI(api_key=self.api_key, http_client=http_client, max_retries=0),
         )
 
     def _convert_messages(self, request: LLMRequest) -> List[ChatCompletionMessageParam]:
@@ -38,100 +59,199 @@ class OpenAIProvider(LLMProvider):
         })
         return messages
 
+    def _build_params(self, request: LLMRequest) -> Dict[str, Any]:
+        """Build the chat completion parameters shared by sync and async calls"""
+        if not request.llm_config:
+            raise ValueError("LLM configuration is required")
+
+        messages = self._convert_messages(request)
+        
+        # Build parameters dictionary with proper typing
+        params: Dict[str, Any] = {
+            "model": request.llm_config.model_name,
+            "messages": messages,
+        }
+        
+        # Only add parameters if the model supports them (o* models don't support these)
+        if not request.llm_config.model_name.startswith("o"):
+            params["temperature"] = request.temperature
+            if request.max_tokens is not None:
+                params["max_tokens"] = request.max_tokens
+            if request.top_p is not None:
+                params["top_p"] = request.top_p
+        return params
+
+    def _to_llm_response(self, request: LLMRequest, response: Any) -> LLMResponse:
+        """Convert a chat completion into an LLMResponse"""
+        # Cast the response to ChatCompletion since we know it's not a stream
+        completion = cast(ChatCompletion, response)
+        
+        if not completion.choices or not completion.choices[0].message or not completion.choices[0].message.content:
+            raise ValueError("No response content received from OpenAI")
+        
+        return LLMResponse(
+            content=completion.choices[0].message.content,
+            model=request.llm_config.model_name,
+            usage=usage_from(completion.usage)
+        )
+
     def generate(self, request: LLMRequest) -> LLMResponse:
         """Generate a response using OpenAI's API"""
         try:
-            if not request.llm_config:
-                raise ValueError("LLM configuration is required")
+            params = self._build_params(request)
+            response = self.retry_policy.call("OpenAI", self.client.chat.completions.create, **params)
+            return self._to_llm_response(request, response)
+        except Exception as e:
+            raise Exception(f"OpenAI API error: {str(e)}")
 
-            messages = self._convert_messages(request)
-            
-            # Build parameters dictionary with proper typing
-            params: Dict[str, Any] = {
-                "model": request.llm_config.model_name,
-                "messages": messages,
-                "stream": request.stream
-            }
-            
-            # Only add parameters if the model supports them (o* models don't support these)
-            if not request.llm_config.model_name.startswith("o"):
-                params["temperature"] = request.temperature
-                if request.max_tokens is not None:
-                    params["max_tokens"] = request.max_tokens
-                if request.top_p is not None:
-                    params["top_p"] = request.top_p
-            
-            response = self.client.chat.completions.create(**params)
-            
-            # Cast the response to ChatCompletion since we know it's not a stream
-            completion = cast(ChatCompletion, response)
-            
-            if not completion.choices or not completion.choices[0].message or not completion.choices[0].message.content:
+    async def agenerate(self, request: LLMRequest) -> LLMResponse:
+        """Generate a response using OpenAI's async client"""
+        try:
+            params = self._build_params(request)
+            response = await self.retry_policy.acall("OpenAI", self.async_client.chat.completions.create, **params)
+            return self._to_llm_response(request, response)
+        except Exception as e:
+            raise Exception(f"OpenAI API error: {str(e)}")
+
+    def _build_stream_params(self, request: LLMRequest) -> Dict[str, Any]:
+        """Chat completion parameters for a streamed call that reports usage at the end"""
+        params = self._build_params(request)
+        params["stream"] = True
+        params["stream_options"] = {"include_usage": True}
+        return params
+
+    @staticmethod
+    def _read_chunk(chunk: Any) -> tuple:
+        """Return the text delta and the usage (only set on the last chunk) of a stream chunk"""
+        delta = ""
+        if chunk.choices and chunk.choices[0].delta and chunk.choices[0].delta.content:
+            delta = chunk.choices[0].delta.content
+        usage = None
+        if getattr(chunk, "usage", None):
+            usage = usage_from(chunk.usage)
+        return delta, usage
+
+    def stream(self, request: LLMRequest) -> Iterator[LLMStreamChunk]:
+        """Stream a response using OpenAI's API"""
+        try:
+            content_parts: List[str] = []
+            usage = None
+            stream = self.retry_policy.call(
+                "OpenAI", self.client.chat.completions.create, **self._build_stream_params(request)
+            )
+            with stream:
+                for chunk in stream:
+                    delta, chunk_usage = self._read_chunk(chunk)
+                    usage = chunk_usage or usage
+                    if delta:
+                        content_parts.append(delta)
+                        yield LLMStreamChunk(delta=delta)
+            if not content_parts:
                 raise ValueError("No response content received from OpenAI")
-            
-            return LLMResponse(
-                content=completion.choices[0].message.content,
-                model=request.llm_config.model_name,
-                usage={
-                    "prompt_tokens": completion.usage.prompt_tokens if completion.usage else 0,
-                    "completion_tokens": completion.usage.completion_tokens if completion.usage else 0,
-                    "total_tokens": completion.usage.total_tokens if completion.usage else 0
-                }
+            yield LLMStreamChunk(
+                content="".join(content_parts),
+                usage=usage or {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
             )
         except Exception as e:
             raise Exception(f"OpenAI API error: {str(e)}")
 
+    async def astream(self, request: LLMRequest) -> AsyncIterator[LLMStreamChunk]:
+        """Stream a response using OpenAI's async client"""
+        try:
+            content_parts: List[str] = []
+            usage = None
+            stream = await self.retry_policy.acall(
+                "OpenAI", self.async_client.chat.completions.create, **self._build_stream_params(request)
+            )
+            async with stream:
+                async for chunk in stream:
+                    delta, chunk_usage = self._read_chunk(chunk)
+                    usage = chunk_usage or usage
+                    if delta:
+                        content_parts.append(delta)
+                        yield LLMStreamChunk(delta=delta)
+            if not content_parts:
+                raise ValueError("No response content received from OpenAI")
+            yield LLMStreamChunk(
+                content="".join(content_parts),
+                usage=usage or {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+            )
+        except Exception as e:
+            raise Exception(f"OpenAI API error: {str(e)}")
+
+    def _build_structured_params(self, request: StructuredLLMRequest[T]) -> Dict[str, Any]:
+        """Build the .parse() parameters shared by sync and async calls"""
+        if not request.llm_config:
+            raise ValueError("LLM configuration is required")
+
+        messages = self._convert_messages(request)
+        
+        # Parameters for the .parse() method might differ slightly or some might be implicit.
+        # Temperature, max_tokens, top_p are typically part of the create/parse call.
+        params: Dict[str, Any] = {
+            "model": request.llm_config.model_name,
+            "messages": messages,
+            "response_format": request.response_model, # Pass Pydantic model directly
+            # stream is not typically used with .parse() as it expects a full response to parse.
+            # If streaming with parsing is needed, SDK might have other utilities or it needs custom handling.
+        }
+
+        # Add temperature, max_tokens, top_p if applicable and supported by .parse()
+        # (Consult SDK docs for .parse() specific parameters)
+        if not request.llm_config.model_name.startswith("o"):
+            params["temperature"] = request.temperature
+            if request.max_tokens is not None:
+                params["max_tokens"] = request.max_tokens # Check if .parse() supports this
+            if request.top_p is not None:
+                params["top_p"] = request.top_p # Check if .parse() supports this
+        return params
+
+    def _extract_parsed(self, request: StructuredLLMRequest[T], completion_parse_result: Any) -> T:
+        """Pull the parsed Pydantic object out of a .parse() result"""
+        report_usage(usage_from(getattr(completion_parse_result, "usage", None)))
+        # The .parse() method should return a result where the parsed Pydantic object is accessible.
+        # Based on search results, it might be in: completion.choices[0].message.parsed
+        if not completion_parse_result.choices or \
+           not completion_parse_result.choices[0].message or \
+           not hasattr(completion_parse_result.choices[0].message, 'parsed') or \
+           completion_parse_result.choices[0].message.parsed is None:
+            raise ValueError("No parsed structured content received from OpenAI using .parse()")
+        
+        # The .parsed attribute should already be an instance of request.response_model (T)
+        parsed_object = completion_parse_result.choices[0].message.parsed
+        
+        # Ensure it's the correct type (though .parse() should handle this)
+        if not isinstance(parsed_object, request.response_model):
+             raise TypeError(
+                f"Parsed object is not of type {request.response_model.__name__}. "
+                f"Got {type(parsed_object).__name__}."
+            )
+        
+        return cast(T, parsed_object) # Cast for type safety, though it should already be T
+
     def generate_structured(self, request: StructuredLLMRequest[T]) -> T:
         """Generate a structured response using OpenAI's API with client.beta.chat.completions.parse."""
         try:
-            if not request.llm_config:
-                raise ValueError("LLM configuration is required")
-
-            messages = self._convert_messages(request)
-            
-            # Parameters for the .parse() method might differ slightly or some might be implicit.
-            # Temperature, max_tokens, top_p are typically part of the create/parse call.
-            params: Dict[str, Any] = {
-                "model": request.llm_config.model_name,
-                "messages": messages,
-                "response_format": request.response_model, # Pass Pydantic model directly
-                # stream is not typically used with .parse() as it expects a full response to parse.
-                # If streaming with parsing is needed, SDK might have other utilities or it needs custom handling.
-            }
-
-            # Add temperature, max_tokens, top_p if applicable and supported by .parse()
-            # (Consult SDK docs for .parse() specific parameters)
-            if not request.llm_config.model_name.startswith("o"):
-                params["temperature"] = request.temperature
-                if request.max_tokens is not None:
-                    params["max_tokens"] = request.max_tokens # Check if .parse() supports this
-                if request.top_p is not None:
-                    params["top_p"] = request.top_p # Check if .parse() supports this
+            params = self._build_structured_params(request)
 
             # Using client.beta.chat.completions.parse
-            completion_parse_result = self.client.beta.chat.completions.parse(**params)
-            
-            # The .parse() method should return a result where the parsed Pydantic object is accessible.
-            # Based on search results, it might be in: completion.choices[0].message.parsed
-            if not completion_parse_result.choices or \
-               not completion_parse_result.choices[0].message or \
-               not hasattr(completion_parse_result.choices[0].message, 'parsed') or \
-               completion_parse_result.choices[0].message.parsed is None:
-                raise ValueError("No parsed structured content received from OpenAI using .parse()")
-            
-            # The .parsed attribute should already be an instance of request.response_model (T)
-            parsed_object = completion_parse_result.choices[0].message.parsed
-            
-            # Ensure it's the correct type (though .parse() should handle this)
-            if not isinstance(parsed_object, request.response_model):
-                 raise TypeError(
-                    f"Parsed object is not of type {request.response_model.__name__}. "
-                    f"Got {type(parsed_object).__name__}."
-                )
-            
-            return cast(T, parsed_object) # Cast for type safety, though it should already be T
+            completion_parse_result = self.retry_policy.call(
+                "OpenAI", self.client.beta.chat.completions.parse, **params
+            )
+            return self._extract_parsed(request, completion_parse_result)
 
         except Exception as e:
             # Catch specific OpenAI API errors if possible for better error reporting
             # For now, a general catch with a clear message.
-            raise Exception(f"OpenAI structured output error (using .parse()): {str(e)}") 
\ No newline at end of file
+            raise Exception(f"OpenAI structured output error (using .parse()): {str(e)}")
+
+    async def agenerate_structured(self, request: StructuredLLMRequest[T]) -> T:
+        """Generate a structured response using OpenAI's async client"""
+        try:
+            params = self._build_structured_params(request)
+            completion_parse_result = await self.retry_policy.acall(
+                "OpenAI", self.async_client.beta.chat.completions.parse, **params
+            )
+            return self._extract_parsed(request, completion_parse_result)
+        except Exception as e:
+            raise Exception(f"OpenAI structured output error (using .parse()): {str(e)}")
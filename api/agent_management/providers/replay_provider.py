@@ -0,0 +1,360 @@
+"""
+Replay provider implementation for LLM service.
+
+Serves recorded LLM responses from a fixture store instead of calling a
+provider, with synthetic latency, so the pipeline can be load- and
+latency-tested offline, deterministically and for free. The recording side
+wraps a real provider and saves every response it returns into the store.
+
+Modes (``LLM_REPLAY_MODE``):
+
+- ``off`` (default): real providers are used
+- ``record``: real providers are used and every response is saved
+- ``replay``: every LLMService uses the replay provider; no network calls
+  and no API keys are needed
+
+An LLMModelConfig with ``provider=ProviderType.REPLAY`` always replays.
+
+Fixtures are JSON files named by the request's content address (the same
+key the LLM cache uses). A request without an exact fixture gets one
+recorded for the same kind of request: the same response model for
+structured calls, the same system prompt (the agents' static prefixes) for
+text calls. Set ``LLM_REPLAY_STRICT=1`` to fail on anything but exact
+matches.
+
+Latency (``LLM_REPLAY_LATENCY``):
+
+- ``recorded`` (default): the duration measured when the fixture was recorded
+- ``none``: no delay
+- ``fixed:<seconds>``
+- ``uniform:<low>,<high>``
+- ``lognormal:<median seconds>,<sigma>``
+
+``LLM_REPLAY_LATENCY_SCALE`` multiplies every delay and ``LLM_REPLAY_SEED``
+seeds the random distributions. Fixtures are stored in ``LLM_FIXTURES_DIR``
+(default: ``api/data/llm_fixtures``).
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import math
+import os
+import random
+import re
+import threading
+import time
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional
+
+from ..execution_pool import sleep_unless_cancelled
+from ..job_store import DATA_DIR
+from ..llm_cache import cache_key, schema_hash
+from ..llm_service import LLMProvider, LLMRequest, LLMResponse, LLMStreamChunk, StructuredLLMRequest, T
+from ..usage_tracker import current_call, report_usage
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FIXTURES_DIR = os.path.join(DATA_DIR, "llm_fixtures")
+REPLAY_MODES = ("off", "record", "replay")
+
+
+def replay_mode() -> str:
+    """The configured LLM_REPLAY_MODE ("off", "record" or "replay")"""
+    mode = os.environ.get("LLM_REPLAY_MODE", "off").lower()
+    if mode not in REPLAY_MODES:
+        raise ValueError(f"LLM_REPLAY_MODE must be one of {', '.join(REPLAY_MODES)}, not '{mode}'")
+    return mode
+
+
+class ReplayMissError(LookupError):
+    """No recorded fixture matches a replayed request"""
+    pass
+
+
+def match_key(request: LLMRequest) -> str:
+    """Key of the kind of request, used when there is no exact fixture"""
+    response_model = getattr(request, "response_model", None)
+    if response_model is not None:
+        return f"structured:{schema_hash(response_model)}"
+    system = hashlib.sha256((request.system_prompt or "").encode("utf-8")).hexdigest()
+    return f"text:{system}"
+
+
+class FixtureStore:
+    """Directory of recorded responses, one JSON file per request key"""
+
+    def __init__(self, directory: Optional[str] = None):
+        self.directory = directory or os.environ.get("LLM_FIXTURES_DIR", DEFAULT_FIXTURES_DIR)
+        self._lock = threading.Lock()
+        self._fixtures: Optional[Dict[str, Dict[str, Any]]] = None
+        self._by_match: Dict[str, List[str]] = {}
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        """Read the directory once; later saves keep the index current"""
+        if self._fixtures is None:
+            fixtures: Dict[str, Dict[str, Any]] = {}
+            if os.path.isdir(self.directory):
+                for name in sorted(os.listdir(self.directory)):
+                    if not name.endswith(".json"):
+                        continue
+                    try:
+                        with open(os.path.join(self.directory, name), encoding="utf-8") as f:
+                            fixture = json.load(f)
+                    except (OSError, ValueError) as e:
+                        logger.warning(f"Skipping unreadable LLM fixture {name}: {e}")
+                        continue
+                    fixtures[fixture["key"]] = fixture
+            self._fixtures = fixtures
+            self._by_match = {}
+            for key, fixture in fixtures.items():
+                self._by_match.setdefault(fixture["match"], []).append(key)
+        return self._fixtures
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self._load().get(key)
+
+    def similar(self, match: str) -> List[Dict[str, Any]]:
+        """Fixtures recorded for the same kind of request, in a stable order"""
+        with self._lock:
+            fixtures = self._load()
+            return [fixtures[key] for key in sorted(self._by_match.get(match, []))]
+
+    def save(self, fixture: Dict[str, Any]) -> None:
+        """Write a fixture atomically and add it to the index"""
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{fixture['key']}.json")
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(fixture, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, path)
+        with self._lock:
+            fixtures = self._load()
+            if fixture["key"] not in fixtures:
+                self._by_match.setdefault(fixture["match"], []).append(fixture["key"])
+            fixtures[fixture["key"]] = fixture
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._load())
+
+
+_stores: Dict[str, FixtureStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_fixture_store(directory: Optional[str] = None) -> FixtureStore:
+    """Shared store for a fixtures directory"""
+    directory = directory or os.environ.get("LLM_FIXTURES_DIR", DEFAULT_FIXTURES_DIR)
+    with _stores_lock:
+        if directory not in _stores:
+            _stores[directory] = FixtureStore(directory)
+        return _stores[directory]
+
+
+def latency_model(spec: Optional[str] = None, seed: Optional[int] = None) -> Callable[[Optional[float]], float]:
+    """
+    Build a function returning the synthetic delay of a replayed call.
+
+    Args:
+        spec: Latency spec (see the module docstring); LLM_REPLAY_LATENCY by default
+        seed: Seed of the random distributions; LLM_REPLAY_SEED by default
+
+    Returns:
+        Function from the recorded duration in seconds (None if unknown) to a delay in seconds
+    """
+    spec = (spec or os.environ.get("LLM_REPLAY_LATENCY", "recorded")).strip().lower()
+    scale = float(os.environ.get("LLM_REPLAY_LATENCY_SCALE", 1.0))
+    if seed is None and os.environ.get("LLM_REPLAY_SEED"):
+        seed = int(os.environ["LLM_REPLAY_SEED"])
+    rng = random.Random(seed)
+    rng_lock = threading.Lock()
+
+    kind, _, args = spec.partition(":")
+    values = [float(value) for value in args.split(",") if value.strip()]
+
+    def sample(draw: Callable[[], float]) -> float:
+        with rng_lock:
+            return draw()
+
+    if kind == "none":
+        base: Callable[[Optional[float]], float] = lambda recorded: 0.0
+    elif kind == "recorded":
+        base = lambda recorded: recorded or 0.0
+    elif kind == "fixed" and len(values) == 1:
+        base = lambda recorded: values[0]
+    elif kind == "uniform" and len(values) == 2:
+        base = lambda recorded: sample(lambda: rng.uniform(values[0], values[1]))
+    elif kind == "lognormal" and len(values) == 2:
+        base = lambda recorded: sample(lambda: rng.lognormvariate(math.log(values[0]), values[1]))
+    else:
+        raise ValueError(f"Invalid LLM_REPLAY_LATENCY spec: '{spec}'")
+
+    return lambda recorded: max(0.0, base(recorded) * scale)
+
+
+class ReplayProvider(LLMProvider):
+    """Serves recorded responses with synthetic latency; never uses the network"""
+
+    def __init__(self, store: Optional[FixtureStore] = None, latency: Optional[Callable[[Optional[float]], float]] = None):
+        self.store = store or get_fixture_store()
+        self.latency = latency or latency_model()
+        self.strict = os.environ.get("LLM_REPLAY_STRICT", "0").lower() in ("1", "true", "yes", "on")
+
+    def _fixture(self, request: LLMRequest) -> Dict[str, Any]:
+        """The exact fixture of a request, or one recorded for the same kind of request"""
+        fixture = self.store.get(cache_key(request))
+        if fixture is not None:
+            return fixture
+        if not self.strict:
+            similar = self.store.similar(match_key(request))
+            if similar:
+                # Deterministic choice, so repeated runs replay the same responses
+                digest = int(hashlib.sha256(request.user_prompt.encode("utf-8")).hexdigest(), 16)
+                return similar[digest % len(similar)]
+        raise ReplayMissError(
+            f"No recorded LLM response for this request in {self.store.directory}. "
+            f"Record one with LLM_REPLAY_MODE=record."
+        )
+
+    def _delay(self, fixture: Dict[str, Any]) -> float:
+        recorded_ms = fixture.get("duration_ms")
+        return self.latency(recorded_ms / 1000 if recorded_ms is not None else None)
+
+    def _to_llm_response(self, request: LLMRequest, fixture: Dict[str, Any]) -> LLMResponse:
+        return LLMResponse(
+            content=fixture["content"],
+            model=request.llm_config.model_name if request.llm_config else fixture.get("model", "replay"),
+            usage=fixture.get("usage") or {},
+        )
+
+    def _to_structured(self, request: StructuredLLMRequest[T], fixture: Dict[str, Any]) -> T:
+        report_usage(fixture.get("usage"))
+        return request.response_model.model_validate_json(fixture["content"])
+
+    def generate(self, request: LLMRequest) -> LLMResponse:
+        fixture = self._fixture(request)
+        sleep_unless_cancelled(self._delay(fixture))
+        return self._to_llm_response(request, fixture)
+
+    def generate_structured(self, request: StructuredLLMRequest[T]) -> T:
+        fixture = self._fixture(request)
+        sleep_unless_cancelled(self._delay(fixture))
+        return self._to_structured(request, fixture)
+
+    async def agenerate(self, request: LLMRequest) -> LLMResponse:
+        fixture = self._fixture(request)
+        await asyncio.sleep(self._delay(fixture))
+        return self._to_llm_response(request, fixture)
+
+    async def agenerate_structured(self, request: StructuredLLMRequest[T]) -> T:
+        fixture = self._fixture(request)
+        await asyncio.sleep(self._delay(fixture))
+        return self._to_structured(request, fixture)
+
+    @staticmethod
+    def _pieces(content: str) -> List[str]:
+        """Split content into word-sized deltas"""
+        return re.findall(r"\S+\s*|\s+", content) or [""]
+
+    def stream(self, request: LLMRequest) -> Iterator[LLMStreamChunk]:
+        """Replay a response as word-sized deltas spread over the synthetic latency"""
+        fixture = self._fixture(request)
+        pieces = self._pieces(fixture["content"])
+        step = self._delay(fixture) / len(pieces)
+        for piece in pieces:
+            sleep_unless_cancelled(step)
+            yield LLMStreamChunk(delta=piece)
+        yield LLMStreamChunk(content=fixture["content"], usage=fixture.get("usage") or {})
+
+    async def astream(self, request: LLMRequest) -> AsyncIterator[LLMStreamChunk]:
+        fixture = self._fixture(request)
+        pieces = self._pieces(fixture["content"])
+        step = self._delay(fixture) / len(pieces)
+        for piece in pieces:
+            await asyncio.sleep(step)
+            yield LLMStreamChunk(delta=piece)
+        yield LLMStreamChunk(content=fixture["content"], usage=fixture.get("usage") or {})
+
+
+class RecordingProvider(LLMProvider):
+    """Wraps a real provider and saves every response it returns as a fixture"""
+
+    def __init__(self, provider: LLMProvider, store: Optional[FixtureStore] = None):
+        self.provider = provider
+        self.store = store or get_fixture_store()
+
+    def __getattr__(self, name: str) -> Any:
+        # Provider-specific attributes (client, retry_policy, ...) stay reachable
+        return getattr(self.provider, name)
+
+    def _save(self, request: LLMRequest, operation: str, content: str,
+              usage: Optional[Dict[str, int]], started: float) -> None:
+        config = request.llm_config
+        try:
+            self.store.save({
+                "key": cache_key(request),
+                "match": match_key(request),
+                "operation": operation,
+                "provider": getattr(config, "provider", None),
+                "model": getattr(config, "model_name", None),
+                "content": content,
+                "usage": usage or {},
+                "duration_ms": round((time.perf_counter() - started) * 1000, 1),
+                "recorded_at": time.time(),
+            })
+        except OSError as e:
+            # Recording must never break the real call
+            logger.warning(f"Could not record LLM fixture: {e}")
+
+    def generate(self, request: LLMRequest) -> LLMResponse:
+        started = time.perf_counter()
+        response = self.provider.generate(request)
+        self._save(request, "generate", response.content, response.usage, started)
+        return response
+
+    @staticmethod
+    def _reported_usage() -> Optional[Dict[str, int]]:
+        """Usage the wrapped provider reported for the current structured call"""
+        record = current_call()
+        if record is None:
+            return None
+        return {
+            "prompt_tokens": record.prompt_tokens,
+            "completion_tokens": record.completion_tokens,
+            "total_tokens": record.total_tokens,
+            "cached_tokens": record.cached_tokens,
+        }
+
+    def generate_structured(self, request: StructuredLLMRequest[T]) -> T:
+        started = time.perf_counter()
+        result = self.provider.generate_structured(request)
+        self._save(request, "generate_structured", result.model_dump_json(), self._reported_usage(), started)
+        return result
+
+    async def agenerate(self, request: LLMRequest) -> LLMResponse:
+        started = time.perf_counter()
+        response = await self.provider.agenerate(request)
+        self._save(request, "generate", response.content, response.usage, started)
+        return response
+
+    async def agenerate_structured(self, request: StructuredLLMRequest[T]) -> T:
+        started = time.perf_counter()
+        result = await self.provider.agenerate_structured(request)
+        self._save(request, "generate_structured", result.model_dump_json(), self._reported_usage(), started)
+        return result
+
+    def stream(self, request: LLMRequest) -> Iterator[LLMStreamChunk]:
+        started = time.perf_counter()
+        for chunk in self.provider.stream(request):
+            if chunk.is_final:
+                self._save(request, "generate", chunk.content, chunk.usage, started)
+            yield chunk
+
+    async def astream(self, request: LLMRequest) -> AsyncIterator[LLMStreamChunk]:
+        started = time.perf_counter()
+        async for chunk in self.provider.astream(request):
+            if chunk.is_final:
+                self._save(request, "generate", chunk.content, chunk.usage, started)
+            yield chunk
@@ -0,0 +1,242 @@
+"""
+Retry Policy - One retry/backoff policy shared by all LLM providers.
+
+Errors are classified by type and HTTP status instead of by matching their
+message: rate limits (429), overloaded providers (529/503), server errors
+(5xx), timeouts and connection failures are retried; client errors (400,
+401, 404, ...) and validation problems are not.
+
+Delays grow exponentially with full jitter, so retries from many concurrent
+calls don't arrive in lockstep. A ``Retry-After`` (or ``retry-after-ms``)
+header from the provider takes precedence over the computed delay.
+
+Async calls sleep with asyncio.sleep, so a retry never holds an event loop
+or executor thread. Blocking calls sleep in their executor thread but wake
+up and give up as soon as the caller is cancelled.
+
+The SDK clients' own retries are disabled (see the providers), so this
+policy is the only one in effect.
+
+Configuration (environment):
+
+- ``LLM_RETRY_MAX_ATTEMPTS``: attempts per call, including the first (default: 3)
+- ``LLM_RETRY_BASE_DELAY``: delay cap before the first retry in seconds (default: 1)
+- ``LLM_RETRY_MAX_DELAY``: largest delay between attempts in seconds (default: 30)
+"""
+
+import asyncio
+import email.utils
+import logging
+import os
+import random
+import time
+from dataclasses import dataclass
+from enum import Enum
+from typing import Any, Awaitable, Callable, Optional, TypeVar
+
+import httpx
+
+from ..execution_pool import sleep_unless_cancelled
+from ..usage_tracker import record_retry
+
+logger = logging.getLogger(__name__)
+
+R = TypeVar("R")
+
+DEFAULT_MAX_ATTEMPTS = 3
+DEFAULT_BASE_DELAY = 1.0
+DEFAULT_MAX_DELAY = 30.0
+
+
+class ErrorKind(str, Enum):
+    """Classification of a failed provider call"""
+    RATE_LIMIT = "rate_limit"
+    OVERLOADED = "overloaded"
+    SERVER = "server"
+    TIMEOUT = "timeout"
+    CONNECTION = "connection"
+    CLIENT = "client"
+    OTHER = "other"
+
+
+RETRYABLE_KINDS = frozenset({
+    ErrorKind.RATE_LIMIT,
+    ErrorKind.OVERLOADED,
+    ErrorKind.SERVER,
+    ErrorKind.TIMEOUT,
+    ErrorKind.CONNECTION,
+})
+
+
+def _sdk_error_types(name: str) -> tuple:
+    """The exception class called ``name`` of every installed provider SDK"""
+    types = []
+    for module_name in ("openai", "anthropic", "groq"):
+        try:
+            module = __import__(module_name)
+        except ImportError:
+            continue
+        error_type = getattr(module, name, None)
+        if isinstance(error_type, type):
+            types.append(error_type)
+    return tuple(types)
+
+
+# Timeouts subclass connection errors in the SDKs, so they are checked first
+SDK_TIMEOUT_ERRORS = _sdk_error_types("APITimeoutError")
+SDK_CONNECTION_ERRORS = _sdk_error_types("APIConnectionError")
+
+
+# Error types of Anthropic stream error events
+STREAM_ERROR_KINDS = {
+    "rate_limit_error": ErrorKind.RATE_LIMIT,
+    "overloaded_error": ErrorKind.OVERLOADED,
+    "api_error": ErrorKind.SERVER,
+    "timeout_error": ErrorKind.TIMEOUT,
+}
+
+
+def classify_error(error: BaseException) -> ErrorKind:
+    """Classify a provider error by its type and HTTP status"""
+    if isinstance(error, SDK_TIMEOUT_ERRORS) or isinstance(error, (httpx.TimeoutException, asyncio.TimeoutError)):
+        return ErrorKind.TIMEOUT
+    if isinstance(error, SDK_CONNECTION_ERRORS) or isinstance(error, (httpx.TransportError, ConnectionError)):
+        return ErrorKind.CONNECTION
+
+    status = getattr(error, "status_code", None)
+    if status is None and isinstance(error, httpx.HTTPStatusError):
+        status = error.response.status_code
+    if isinstance(status, int):
+        if status == 429:
+            return ErrorKind.RATE_LIMIT
+        if status in (503, 529):
+            return ErrorKind.OVERLOADED
+        if status == 408:
+            return ErrorKind.TIMEOUT
+        if status >= 500:
+            return ErrorKind.SERVER
+        if status >= 400:
+            return ErrorKind.CLIENT
+    # Errors sent as an event of an already open stream carry the stream's
+    # HTTP status (200); their body says what went wrong
+    body = getattr(error, "body", None)
+    if isinstance(body, dict) and isinstance(body.get("error"), dict):
+        kind = STREAM_ERROR_KINDS.get(body["error"].get("type"))
+        if kind is not None:
+            return kind
+    return ErrorKind.OTHER
+
+
+def retry_after_seconds(error: BaseException) -> Optional[float]:
+    """The delay a provider asked for in Retry-After / retry-after-ms, if any"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+
+    retry_after_ms = headers.get("retry-after-ms")
+    if retry_after_ms:
+        try:
+            return max(0.0, float(retry_after_ms) / 1000)
+        except ValueError:
+            pass
+
+    retry_after = headers.get("retry-after")
+    if not retry_after:
+        return None
+    try:
+        return max(0.0, float(retry_after))
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(retry_after)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+@dataclass
+class RetryPolicy:
+    """Jittered exponential backoff for retryable provider errors"""
+    max_attempts: int = DEFAULT_MAX_ATTEMPTS
+    base_delay: float = DEFAULT_BASE_DELAY
+    max_delay: float = DEFAULT_MAX_DELAY
+
+    @classmethod
+    def from_env(cls) -> "RetryPolicy":
+        return cls(
+            max_attempts=int(os.environ.get("LLM_RETRY_MAX_ATTEMPTS", DEFAULT_MAX_ATTEMPTS)),
+            base_delay=float(os.environ.get("LLM_RETRY_BASE_DELAY", DEFAULT_BASE_DELAY)),
+            max_delay=float(os.environ.get("LLM_RETRY_MAX_DELAY", DEFAULT_MAX_DELAY)),
+        )
+
+    def should_retry(self, error: BaseException, attempt: int) -> bool:
+        """Whether a call that failed on the given (1-based) attempt should be retried"""
+        return attempt < self.max_attempts and classify_error(error) in RETRYABLE_KINDS
+
+    def delay_for(self, error: BaseException, attempt: int) -> float:
+        """Seconds to wait after the given (1-based) failed attempt"""
+        requested = retry_after_seconds(error)
+        if requested is not None:
+            return min(requested, self.max_delay)
+        # Full jitter: uniformly random up to the exponential cap
+        cap = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        return random.uniform(0, cap)
+
+    def _next_delay(self, provider: str, error: BaseException, attempt: int) -> Optional[float]:
+        """Log the failure and return the delay before the next attempt, or None to give up"""
+        if not self.should_retry(error, attempt):
+            if attempt > 1:
+                logger.error(f"{provider} API error: {error}. Giving up after {attempt} attempts.")
+            return None
+        delay = self.delay_for(error, attempt)
+        logger.warning(
+            f"{provider} API error ({classify_error(error).value}): {error}. "
+            f"Retrying in {delay:.2f}s (attempt {attempt + 1}/{self.max_attempts})"
+        )
+        record_retry()
+        return delay
+
+    def call(self, provider: str, func: Callable[..., R], *args: Any, **kwargs: Any) -> R:
+        """
+        Call a blocking provider function, retrying retryable errors.
+
+        Args:
+            provider: Provider name for log messages, e.g. "OpenAI"
+            func: The SDK call
+            *args: Positional arguments for func
+            **kwargs: Keyword arguments for func
+
+        Returns:
+            The result of the first successful attempt
+
+        Raises:
+            The last error when it isn't retryable or attempts are exhausted
+        """
+        attempt = 1
+        while True:
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                delay = self._next_delay(provider, e, attempt)
+                if delay is None:
+                    raise
+            sleep_unless_cancelled(delay)
+            attempt += 1
+
+    async def acall(self, provider: str, func: Callable[..., Awaitable[R]], *args: Any, **kwargs: Any) -> R:
+        """Async counterpart of call() that waits with asyncio.sleep"""
+        attempt = 1
+        while True:
+            try:
+                return await func(*args, **kwargs)
+            except Exception as e:
+                delay = self._next_delay(provider, e, attempt)
+                if delay is None:
+                    raise
+            await asyncio.sleep(delay)
+            attempt += 1
+
+
+# Policy used by all providers
+default_retry_policy = RetryPolicy.from_env()
@@ -0,0 +1,436 @@
+"""
+PubChem Client - One pooled HTTP client for all PubChem traffic.
+
+PubChemAgent used to make a dozen ``requests.get`` calls per query without a
+session, and ``pubchempy`` opens a new urllib connection for every
+``Compound.from_cid``, so each lookup paid for a TCP + TLS handshake to
+pubchem.ncbi.nlm.nih.gov. All PubChem requests now go through this client:
+one keep-alive connection pool per process (HTTP/2 when the ``h2`` package is
+installed), with a sync API for the agents running on the PUBCHEM pool and an
+async API for code on the event loop.
+
+Compound records are fetched as PUG REST JSON and wrapped in
+``pubchempy.Compound``, so callers keep the pubchempy interface; the extra
+synonyms lookup goes through the pool too. Records, synonyms and SDFs are
+read through the CID-keyed cache in compound_cache.py; the cache is
+synchronous SQLite, so these lookups only have a sync API, for code on the
+PUBCHEM pool.
+
+Every call is timed and counted per PUG operation (e.g. ``cid/SDF``), together
+with the number of connections opened, so the executor-stats endpoint shows
+latency and how well connections are being reused.
+
+Async clients are keyed by event loop, like the LLM provider clients in
+providers/client_pool.py, and like them are closed on their own loop at
+shutdown (aclose()).
+
+Configuration (environment):
+
+- ``PUBCHEM_BASE_URL``: REST root (default: https://pubchem.ncbi.nlm.nih.gov/rest)
+- ``PUBCHEM_TIMEOUT_SECONDS``: per-request timeout (default: 30)
+- ``PUBCHEM_HTTP_MAX_CONNECTIONS``: connections per client (default: 10)
+- ``PUBCHEM_HTTP_MAX_KEEPALIVE``: idle connections kept open (default: 10)
+- ``PUBCHEM_HTTP_KEEPALIVE_EXPIRY``: seconds an idle connection is kept (default: 60)
+- ``PUBCHEM_HTTP2``: set to 0 to use HTTP/1.1 even when ``h2`` is installed
+"""
+
+import asyncio
+import importlib.util
+import json
+import logging
+import math
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+import httpx
+import pubchempy as pcp
+
+from agent_management.compound_cache import compound_cache_enabled, get_compound_cache
+from agent_management.providers.client_pool import aclose_on_their_loops
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BASE_URL = "https://pubchem.ncbi.nlm.nih.gov/rest"
+DEFAULT_TIMEOUT_SECONDS = 30.0
+# PubChem asks for at most 5 requests/s per user, so a small pool is plenty
+DEFAULT_MAX_CONNECTIONS = 10
+DEFAULT_MAX_KEEPALIVE = 10
+DEFAULT_KEEPALIVE_EXPIRY = 60.0
+
+# Connection-level retries (failed connects only, never a sent request)
+CONNECT_RETRIES = 3
+
+# Latency samples kept per operation
+LATENCY_WINDOW = 500
+
+
+class CompoundNotFoundError(LookupError):
+    """PubChem has no record for the requested CID"""
+
+
+def http2_enabled() -> bool:
+    """HTTP/2 is used unless disabled, provided the h2 package is installed"""
+    if os.environ.get("PUBCHEM_HTTP2", "1").lower() in ("0", "false", "no", "off"):
+        return False
+    return importlib.util.find_spec("h2") is not None
+
+
+def http_limits() -> httpx.Limits:
+    """Connection pool limits for the PubChem clients"""
+    return httpx.Limits(
+        max_connections=int(os.environ.get("PUBCHEM_HTTP_MAX_CONNECTIONS", DEFAULT_MAX_CONNECTIONS)),
+        max_keepalive_connections=int(os.environ.get("PUBCHEM_HTTP_MAX_KEEPALIVE", DEFAULT_MAX_KEEPALIVE)),
+        keepalive_expiry=float(os.environ.get("PUBCHEM_HTTP_KEEPALIVE_EXPIRY", DEFAULT_KEEPALIVE_EXPIRY)),
+    )
+
+
+def operation_name(path: str) -> str:
+    """
+    Metrics label for a request path, without the identifier.
+
+    Args:
+        path: Path below the REST root, e.g. "pug/compound/cid/962/SDF"
+
+    Returns:
+        The label, e.g. "cid/SDF"
+    """
+    parts = [part for part in path.split("?")[0].split("/") if part]
+    if len(parts) >= 4 and parts[0] == "pug":
+        return "/".join([parts[2]] + parts[4:])
+    return parts[0] if parts else ""
+
+
+def _percentile(ordered: list, fraction: float) -> float:
+    return ordered[min(len(ordered) - 1, math.ceil(fraction * len(ordered)) - 1)]
+
+
+class _Compound(pcp.Compound):
+    """pubchempy Compound whose synonyms lookup goes through the shared client"""
+
+    def __init__(self, record: Dict[str, Any], client: "PubChemClient"):
+        super().__init__(record)
+        self._client = client
+
+    @property
+    def synonyms(self) -> Optional[List[str]]:
+        if not hasattr(self, "_synonyms"):
+            self._synonyms = self._client.synonyms(self.cid) if self.cid else None
+        return self._synonyms
+
+
+class PubChemClient:
+    """Thread-safe pooled access to the PubChem REST API"""
+
+    def __init__(
+        self,
+        base_url: Optional[str] = None,
+        timeout: Optional[float] = None,
+        transport: Optional[httpx.BaseTransport] = None,
+        async_transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        """
+        Args:
+            base_url: REST root; defaults to PUBCHEM_BASE_URL
+            timeout: Per-request timeout in seconds; defaults to PUBCHEM_TIMEOUT_SECONDS
+            transport: Sync transport to use instead of a pooled one (tests)
+            async_transport: Async transport to use instead of a pooled one (tests)
+        """
+        self.base_url = (base_url or os.environ.get("PUBCHEM_BASE_URL", DEFAULT_BASE_URL)).rstrip("/")
+        self.timeout = timeout or float(os.environ.get("PUBCHEM_TIMEOUT_SECONDS", DEFAULT_TIMEOUT_SECONDS))
+        self._transport = transport
+        self._async_transport = async_transport
+        self._lock = threading.Lock()
+        self._client: Optional[httpx.Client] = None
+        self._async_clients: Dict[int, Tuple[asyncio.AbstractEventLoop, httpx.AsyncClient]] = {}
+        # operation -> latency samples (ms), and operation -> counters
+        self._latencies: Dict[str, Deque[float]] = {}
+        self._counts: Dict[str, Dict[str, int]] = {}
+        self.connections_opened = 0
+        self.http_versions: Dict[str, int] = {}
+
+    def _client_options(self) -> Dict[str, Any]:
+        return {
+            "base_url": self.base_url,
+            "timeout": self.timeout,
+            "follow_redirects": True,
+            "headers": {"User-Agent": "sci-vis-ai-server"},
+        }
+
+    def _sync_client(self) -> httpx.Client:
+        with self._lock:
+            if self._client is None:
+                http2 = http2_enabled()
+                transport = self._transport or httpx.HTTPTransport(
+                    retries=CONNECT_RETRIES, limits=http_limits(), http2=http2
+                )
+                self._client = httpx.Client(transport=transport, **self._client_options())
+            return self._client
+
+    def _async_client(self) -> httpx.AsyncClient:
+        """The async client of the running event loop (clients of closed loops are dropped)"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            entry = self._async_clients.get(id(loop))
+            if entry is not None and entry[0] is loop:
+                return entry[1]
+            for stale in [key for key, (l, _) in self._async_clients.items() if l.is_closed()]:
+                del self._async_clients[stale]
+            transport = self._async_transport or httpx.AsyncHTTPTransport(
+                retries=CONNECT_RETRIES, limits=http_limits(), http2=http2_enabled()
+            )
+            client = httpx.AsyncClient(transport=transport, **self._client_options())
+            self._async_clients[id(loop)] = (loop, client)
+            return client
+
+    def _trace(self, event: str, info: Dict[str, Any]) -> None:
+        """httpcore trace hook: counts the connections actually opened"""
+        if event == "connection.connect_tcp.complete":
+            with self._lock:
+                self.connections_opened += 1
+
+    async def _atrace(self, event: str, info: Dict[str, Any]) -> None:
+        self._trace(event, info)
+
+    def _record(self, path: str, started: float, response: Optional[httpx.Response]) -> None:
+        operation = operation_name(path)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with self._lock:
+            counts = self._counts.setdefault(operation, {"calls": 0, "errors": 0})
+            counts["calls"] += 1
+            if response is None or response.status_code >= 500:
+                counts["errors"] += 1
+            if response is not None:
+                latencies = self._latencies.get(operation)
+                if latencies is None:
+                    latencies = self._latencies[operation] = deque(maxlen=LATENCY_WINDOW)
+                latencies.append(elapsed_ms)
+                self.http_versions[response.http_version] = self.http_versions.get(response.http_version, 0) + 1
+
+    def get(self, path: str, params: Optional[Dict[str, Any]] = None) -> httpx.Response:
+        """
+        GET a path below the REST root on the shared connection pool.
+
+        Args:
+            path: e.g. "pug/compound/cid/962/SDF"; identifiers must already be URL-quoted
+            params: Optional query parameters
+
+        Returns:
+            The response, whatever its status
+        """
+        started = time.perf_counter()
+        response = None
+        try:
+            response = self._sync_client().get(path, params=params, extensions={"trace": self._trace})
+            return response
+        finally:
+            self._record(path, started, response)
+
+    async def aget(self, path: str, params: Optional[Dict[str, Any]] = None) -> httpx.Response:
+        """Async version of get, on a pool owned by the running event loop"""
+        started = time.perf_counter()
+        response = None
+        try:
+            response = await self._async_client().get(path, params=params, extensions={"trace": self._atrace})
+            return response
+        finally:
+            self._record(path, started, response)
+
+    @staticmethod
+    def _json_or_none(response: httpx.Response) -> Optional[Dict[str, Any]]:
+        """Parsed body of a successful response, None when PubChem has no match"""
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        return response.json()
+
+    def get_json(self, path: str, params: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """
+        GET a JSON resource.
+
+        Returns:
+            The parsed body, or None if PubChem answered 404 (no match)
+
+        Raises:
+            httpx.HTTPStatusError: For any other non-2xx status
+        """
+        return self._json_or_none(self.get(path, params))
+
+    async def aget_json(self, path: str, params: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """Async version of get_json"""
+        return self._json_or_none(await self.aget(path, params))
+
+    @staticmethod
+    def _cached(cid: int, kind: str) -> Optional[str]:
+        """Cached data of a CID ("" if PubChem has none), None on a miss or with the cache off"""
+        return get_compound_cache().get(cid, kind) if compound_cache_enabled() else None
+
+    @staticmethod
+    def _store(cid: int, kind: str, value: str) -> None:
+        if compound_cache_enabled():
+            get_compound_cache().put(cid, kind, value)
+
+    def _read_through(self, cid: int, kind: str, fetch: Callable[[], Optional[str]]) -> Optional[str]:
+        """
+        Cached data of a CID, fetched and cached on a miss.
+
+        Args:
+            cid: PubChem compound ID
+            kind: Cache kind (see compound_cache.KINDS)
+            fetch: Returns the data, "" if PubChem has none, or None on a
+                transient failure (which is not cached)
+
+        Returns:
+            The data, or None if there is none
+        """
+        cached = self._cached(cid, kind)
+        if cached is not None:
+            return cached or None
+        value = fetch()
+        if value is not None:
+            self._store(cid, kind, value)
+        return value or None
+
+    @staticmethod
+    def _records_path(cids: List[int]) -> str:
+        return f"pug/compound/cid/{','.join(str(int(cid)) for cid in cids)}/JSON"
+
+    def _cached_records(self, cids: List[int]) -> Tuple[Dict[int, Dict[str, Any]], List[int]]:
+        """Records of the CIDs found in the cache, and the CIDs still to fetch"""
+        records, missing = {}, []
+        for cid in cids:
+            cached = self._cached(cid, "record")
+            if cached:
+                records[int(cid)] = json.loads(cached)
+            else:
+                missing.append(cid)
+        return records, missing
+
+    def _merge(
+        self, cids: List[int], records: Dict[int, Dict[str, Any]], data: Optional[Dict[str, Any]]
+    ) -> List[pcp.Compound]:
+        """Cache the fetched records and wrap all of them, in the requested order"""
+        for record in (data or {}).get("PC_Compounds", []):
+            cid = record["id"]["id"]["cid"]
+            records[cid] = record
+            self._store(cid, "record", json.dumps(record))
+        compounds = [_Compound(records[int(cid)], self) for cid in cids if int(cid) in records]
+        if not compounds:
+            raise CompoundNotFoundError(f"No PubChem record for CID {', '.join(map(str, cids))}")
+        return compounds
+
+    def compounds(self, cids: List[int]) -> List[pcp.Compound]:
+        """
+        Records of several CIDs, from the cache or in one request.
+
+        Args:
+            cids: PubChem compound IDs
+
+        Returns:
+            pubchempy Compounds of the CIDs PubChem has, in the requested order
+
+        Raises:
+            CompoundNotFoundError: If PubChem has none of them
+        """
+        if not cids:
+            return []
+        records, missing = self._cached_records(cids)
+        data = self.get_json(self._records_path(missing)) if missing else None
+        return self._merge(cids, records, data)
+
+    def compound(self, cid: int) -> pcp.Compound:
+        """Replacement for ``pcp.Compound.from_cid`` on the shared pool"""
+        return self.compounds([cid])[0]
+
+    def synonyms(self, cid: int) -> List[str]:
+        """Ranked synonyms of a CID (empty if PubChem has none)"""
+
+        def fetch() -> str:
+            data = self.get_json(f"pug/compound/cid/{int(cid)}/synonyms/JSON")
+            if not data:
+                return ""
+            return json.dumps(data["InformationList"]["Information"][0].get("Synonym", []))
+
+        cached = self._read_through(cid, "synonyms", fetch)
+        return json.loads(cached) if cached else []
+
+    @staticmethod
+    def _sdf_request(cid: int, three_d: bool) -> Tuple[str, str, Optional[Dict[str, Any]]]:
+        """Cache kind, path and query parameters of an SDF"""
+        if three_d:
+            return "sdf_3d", f"pug/compound/cid/{int(cid)}/SDF", {"record_type": "3d"}
+        return "sdf_2d", f"pug/compound/cid/{int(cid)}/SDF", None
+
+    @staticmethod
+    def _sdf_text(response: httpx.Response) -> Optional[str]:
+        if response.status_code == 200:
+            return response.text
+        if response.status_code == 404:
+            return ""
+        logger.warning(f"PubChem SDF request failed with status {response.status_code}")
+        return None
+
+    def sdf(self, cid: int, three_d: bool = False) -> Optional[str]:
+        """
+        SDF of a CID, from the cache or PubChem.
+
+        Args:
+            cid: PubChem compound ID
+            three_d: Fetch the 3D conformer instead of the 2D depiction
+
+        Returns:
+            The SDF text, or None if PubChem has none or the request failed
+        """
+        kind, path, params = self._sdf_request(cid, three_d)
+        return self._read_through(cid, kind, lambda: self._sdf_text(self.get(path, params)))
+
+    def cids_by_formula(self, formula: str, max_results: int = 5) -> List[int]:
+        """CIDs with the given molecular formula (PubChem's synchronous fastformula search)"""
+        data = self.get_json(f"pug/compound/fastformula/{formula}/cids/JSON")
+        if not data:
+            return []
+        return data.get("IdentifierList", {}).get("CID", [])[:max_results]
+
+    def stats(self) -> Dict[str, Any]:
+        """Calls, errors and latency per operation, plus connection reuse"""
+        with self._lock:
+            operations = {}
+            for operation, counts in sorted(self._counts.items()):
+                latencies = sorted(self._latencies.get(operation, ()))
+                operations[operation] = {
+                    **counts,
+                    "p50_ms": round(_percentile(latencies, 0.5), 1) if latencies else None,
+                    "p95_ms": round(_percentile(latencies, 0.95), 1) if latencies else None,
+                }
+            calls = sum(counts["calls"] for counts in self._counts.values())
+            return {
+                "calls": calls,
+                "connections_opened": self.connections_opened,
+                "http_versions": dict(self.http_versions),
+                "http2": http2_enabled(),
+                "operations": operations,
+            }
+
+    def close(self) -> None:
+        """Close the sync client (aclose() closes the async ones too)"""
+        with self._lock:
+            client, self._client = self._client, None
+        if client is not None:
+            try:
+                client.close()
+            except Exception as e:
+                logger.warning(f"Error closing PubChem client: {e}")
+
+    async def aclose(self) -> None:
+        """Close every client, async ones on their own event loop (used on application shutdown)"""
+        with self._lock:
+            async_clients = list(self._async_clients.values())
+            self._async_clients.clear()
+        self.close()
+        await aclose_on_their_loops(async_clients)
+
+
+# Process-wide client used by PubChemAgent
+pubchem_client = PubChemClient()
@@ -0,0 +1,341 @@
+"""
+Rate Limiter Module - Token buckets per provider and model, shared by all workers.
+
+Geometry fan-out, diagram jobs and pipeline jobs all draw on the same OpenAI,
+Anthropic and Groq accounts, and uncoordinated bursts end in 429 storms and
+retry sleeps. LLMService reserves capacity before every provider call
+instead, from two buckets per limit:
+
+- a request bucket, refilled at the configured requests per minute
+- a token bucket, refilled at the configured tokens per minute. A call is
+  charged its estimated prompt plus max_tokens up front, the way providers
+  count it, and the estimate is settled against the real usage afterwards
+
+A call that finds a bucket short reserves its turn and waits until then, so
+callers queue up behind the limit in order and throughput stays just under
+it instead of oscillating between bursts and failures.
+
+Buckets live in a SQLite table shared by the uvicorn workers on the host (or
+in memory, per process, with ``RATE_LIMIT_URL=memory``). Only configured
+limits apply: a provider or model without one is never throttled.
+
+Configuration (environment):
+
+- ``RATE_LIMIT_ENABLED``: set to ``0`` to disable rate limiting (default: on)
+- ``RATE_LIMIT_URL``: SQLAlchemy URL of the bucket table, or ``memory``
+  (default: SQLite file under ``api/data/``)
+- ``RATE_LIMIT_<PROVIDER>_RPM`` / ``RATE_LIMIT_<PROVIDER>_TPM``: requests /
+  tokens per minute shared by all of a provider's models, e.g.
+  ``RATE_LIMIT_GROQ_RPM=30``
+- ``RATE_LIMIT_<PROVIDER>_<MODEL>_RPM`` / ``..._TPM``: limits of one model,
+  with the model name upper-cased and other characters replaced by ``_``,
+  e.g. ``RATE_LIMIT_OPENAI_GPT_4O_TPM=30000``
+- ``RATE_LIMIT_BURST_SECONDS``: seconds of the limit a full bucket holds
+  (default: 10)
+- ``RATE_LIMIT_MAX_WAIT_SECONDS``: longest a call may wait for capacity
+  before failing with RateLimitExceeded (default: 120)
+"""
+
+import contextlib
+import logging
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import Column, Float, MetaData, String, Table, delete, select
+from sqlalchemy.engine import Connection, Engine
+
+from agent_management.job_store import DATA_DIR, get_engine
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RATE_LIMIT_URL = "sqlite:///" + os.path.join(DATA_DIR, "rate_limits.sqlite3")
+DEFAULT_BURST_SECONDS = 10.0
+DEFAULT_MAX_WAIT_SECONDS = 120.0
+
+# Completion tokens assumed for requests that don't set max_tokens
+DEFAULT_COMPLETION_TOKENS = 1000
+
+rate_limit_metadata = MetaData()
+
+rate_limit_table = Table(
+    "rate_limit_buckets",
+    rate_limit_metadata,
+    Column("key", String(160), primary_key=True),
+    Column("level", Float, nullable=False),
+    Column("updated_at", Float, nullable=False),
+)
+
+
+class RateLimitExceeded(RuntimeError):
+    """Raised when a call would have to wait longer than the allowed maximum"""
+
+
+def rate_limiting_enabled() -> bool:
+    return os.environ.get("RATE_LIMIT_ENABLED", "1").lower() not in ("0", "false", "no")
+
+
+def _env_name(value: str) -> str:
+    return re.sub(r"[^A-Z0-9]+", "_", value.upper()).strip("_")
+
+
+def _env_float(name: str, default: Optional[float] = None) -> Optional[float]:
+    value = os.environ.get(name)
+    return float(value) if value else default
+
+
+@dataclass(frozen=True)
+class Bucket:
+    """One token bucket: ``capacity`` units, refilled at ``rate`` units per second"""
+    key: str
+    capacity: float
+    rate: float
+
+
+def configured_buckets(provider: str, model: str) -> Tuple[List[Bucket], List[Bucket]]:
+    """
+    Return the request and token buckets that apply to a provider/model.
+
+    Args:
+        provider: Provider name, e.g. "openai"
+        model: Model name
+
+    Returns:
+        (request buckets, token buckets); both empty if no limit is configured
+    """
+    burst = _env_float("RATE_LIMIT_BURST_SECONDS", DEFAULT_BURST_SECONDS)
+    buckets: Dict[str, List[Bucket]] = {"RPM": [], "TPM": []}
+    for scope, prefix in (
+        (provider, f"RATE_LIMIT_{_env_name(provider)}"),
+        (f"{provider}:{model}", f"RATE_LIMIT_{_env_name(provider)}_{_env_name(model)}"),
+    ):
+        for unit in ("RPM", "TPM"):
+            per_minute = _env_float(f"{prefix}_{unit}")
+            if per_minute and per_minute > 0:
+                rate = per_minute / 60.0
+                # A full bucket holds `burst` seconds of the limit, but never less than one request
+                capacity = max(rate * burst, 1.0)
+                buckets[unit].append(Bucket(f"{scope}:{unit.lower()}", capacity, rate))
+    return buckets["RPM"], buckets["TPM"]
+
+
+def estimate_tokens(request: Any) -> int:
+    """Tokens a request is charged before the call: its prompt (~4 characters a token) plus max_tokens"""
+    characters = len(request.system_prompt or "") + len(request.user_prompt or "")
+    return characters // 4 + (request.max_tokens or DEFAULT_COMPLETION_TOKENS)
+
+
+class Reservation:
+    """Capacity taken from the buckets for one call"""
+
+    def __init__(
+        self,
+        limiter: "RateLimiter",
+        request_buckets: List[Bucket],
+        token_buckets: List[Bucket],
+        tokens: int,
+        wait: float,
+        ready_at: float,
+    ):
+        self.limiter = limiter
+        self.request_buckets = request_buckets
+        self.token_buckets = token_buckets
+        self.tokens = tokens
+        # Seconds until the reserved capacity is available, and the time it is
+        self.wait = wait
+        self.ready_at = ready_at
+        self._done = False
+
+    def settle(self, used_tokens: int) -> None:
+        """Give back the estimated tokens the call didn't use (or charge the excess)"""
+        if self._done:
+            return
+        self._done = True
+        if self.token_buckets and used_tokens != self.tokens:
+            self.limiter._refund([(bucket, self.tokens - used_tokens) for bucket in self.token_buckets])
+
+    def cancel(self) -> None:
+        """Give back everything, for a call that was never made"""
+        if self._done:
+            return
+        self._done = True
+        self.limiter._refund(
+            [(bucket, 1) for bucket in self.request_buckets]
+            + [(bucket, self.tokens) for bucket in self.token_buckets]
+        )
+
+
+class RateLimiter:
+    """Token buckets in a SQL table shared by all workers, or in memory"""
+
+    def __init__(self, url: Optional[str] = None):
+        self.url = url or os.environ.get("RATE_LIMIT_URL", DEFAULT_RATE_LIMIT_URL)
+        self.shared = self.url != "memory"
+        # Created on first use, so workers without configured limits never open the database
+        self._engine: Optional[Engine] = None
+        self._lock = threading.Lock()
+        # key -> (level, updated_at), the buckets when there is no database
+        self._memory: Dict[str, Tuple[float, float]] = {}
+        # key -> {"reservations", "waited", "wait_seconds", "rejected"}, this worker's view
+        self._metrics: Dict[str, Dict[str, float]] = {}
+
+    @contextlib.contextmanager
+    def _buckets(self) -> Iterator[Tuple[Dict[str, Tuple[float, float]], Optional[Connection]]]:
+        """Locked view of the bucket states; changes made to the dict are written back"""
+        if not self.shared:
+            with self._lock:
+                yield self._memory, None
+            return
+        if self._engine is None:
+            self._engine = get_engine(self.url, rate_limit_metadata)
+        # BEGIN IMMEDIATE serializes the read-modify-write across workers on SQLite
+        with self._engine.connect() as conn:
+            conn = conn.execution_options(sqlite_immediate=True)
+            with conn.begin():
+                yield {}, conn
+
+    @staticmethod
+    def _load(states: Dict[str, Tuple[float, float]], conn: Optional[Connection], keys: List[str]) -> None:
+        if conn is None:
+            return
+        rows = conn.execute(
+            select(rate_limit_table.c.key, rate_limit_table.c.level, rate_limit_table.c.updated_at).where(
+                rate_limit_table.c.key.in_(keys)
+            )
+        )
+        for row in rows:
+            states[row.key] = (row.level, row.updated_at)
+
+    @staticmethod
+    def _save(states: Dict[str, Tuple[float, float]], conn: Optional[Connection], keys: List[str]) -> None:
+        if conn is None:
+            return
+        conn.execute(delete(rate_limit_table).where(rate_limit_table.c.key.in_(keys)))
+        conn.execute(
+            rate_limit_table.insert(),
+            [{"key": key, "level": states[key][0], "updated_at": states[key][1]} for key in keys],
+        )
+
+    @staticmethod
+    def _level(states: Dict[str, Tuple[float, float]], bucket: Bucket, now: float) -> float:
+        """The bucket's level after refilling it up to now (a new bucket starts full)"""
+        level, updated_at = states.get(bucket.key, (bucket.capacity, now))
+        return min(bucket.capacity, level + max(0.0, now - updated_at) * bucket.rate)
+
+    def _count(self, key: str, metric: str, amount: float = 1) -> None:
+        """Bump a counter (caller holds the lock)"""
+        counters = self._metrics.setdefault(
+            key, {"reservations": 0, "waited": 0, "wait_seconds": 0.0, "rejected": 0}
+        )
+        counters[metric] += amount
+
+    def reserve(self, provider: str, model: str, tokens: int, max_wait: Optional[float] = None) -> Optional[Reservation]:
+        """
+        Take one request and ``tokens`` tokens from the buckets of a provider/model.
+
+        Buckets may go into debt: the returned reservation says how long the
+        caller has to wait until its share has been refilled.
+
+        Args:
+            provider: Provider name
+            model: Model name
+            tokens: Estimated tokens of the call (see estimate_tokens)
+            max_wait: Longest acceptable wait (default: RATE_LIMIT_MAX_WAIT_SECONDS)
+
+        Returns:
+            The reservation, or None if no limit applies
+
+        Raises:
+            RateLimitExceeded: If the wait would be longer than max_wait (nothing is taken)
+        """
+        request_buckets, token_buckets = configured_buckets(str(provider), model)
+        if not request_buckets and not token_buckets:
+            return None
+        if max_wait is None:
+            max_wait = _env_float("RATE_LIMIT_MAX_WAIT_SECONDS", DEFAULT_MAX_WAIT_SECONDS)
+
+        charges = [(bucket, 1) for bucket in request_buckets] + [(bucket, tokens) for bucket in token_buckets]
+        keys = [bucket.key for bucket, _ in charges]
+        with self._buckets() as (states, conn):
+            now = time.time()
+            self._load(states, conn, keys)
+            levels = {bucket.key: self._level(states, bucket, now) - cost for bucket, cost in charges}
+            wait = max(max(0.0, -levels[bucket.key] / bucket.rate) for bucket, _ in charges)
+            rejected = wait > max_wait
+            if not rejected:
+                for key, level in levels.items():
+                    states[key] = (level, now)
+                self._save(states, conn, keys)
+
+        with self._lock:
+            for key in keys:
+                if rejected:
+                    self._count(key, "rejected")
+                    continue
+                self._count(key, "reservations")
+                if wait > 0:
+                    self._count(key, "waited")
+                    self._count(key, "wait_seconds", wait)
+        if rejected:
+            raise RateLimitExceeded(
+                f"Rate limit of {provider}:{model} would delay the call by {wait:.1f}s "
+                f"(more than {max_wait:.0f}s)"
+            )
+        return Reservation(self, request_buckets, token_buckets, tokens, wait, now + wait)
+
+    def _refund(self, amounts: List[Tuple[Bucket, float]]) -> None:
+        """Put units back into buckets (negative amounts take more out)"""
+        keys = [bucket.key for bucket, _ in amounts]
+        try:
+            with self._buckets() as (states, conn):
+                now = time.time()
+                self._load(states, conn, keys)
+                for bucket, amount in amounts:
+                    states[bucket.key] = (min(bucket.capacity, self._level(states, bucket, now) + amount), now)
+                self._save(states, conn, keys)
+        except Exception as e:
+            # A lost refund only makes the limiter a little more conservative
+            logger.warning(f"Could not settle rate limit reservation: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Level and capacity of the buckets this worker has used, with its wait counters"""
+        with self._lock:
+            metrics = {key: dict(counters) for key, counters in self._metrics.items()}
+        levels: Dict[str, Tuple[float, float]] = {}
+        if metrics:
+            with self._buckets() as (states, conn):
+                self._load(states, conn, list(metrics))
+                levels = dict(states)
+        now = time.time()
+        for key, counters in metrics.items():
+            counters["wait_seconds"] = round(counters["wait_seconds"], 3)
+            if key in levels:
+                level, updated_at = levels[key]
+                counters["level"] = round(level, 1)
+                counters["updated_seconds_ago"] = round(now - updated_at, 1)
+        return {"enabled": rate_limiting_enabled(), "shared": self.shared, "buckets": metrics}
+
+    def clear(self) -> None:
+        """Refill every bucket and reset the counters"""
+        with self._lock:
+            self._memory.clear()
+            self._metrics.clear()
+        if self.shared:
+            with self._buckets() as (_, conn):
+                conn.execute(delete(rate_limit_table))
+
+
+_limiter: Optional[RateLimiter] = None
+_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> RateLimiter:
+    """Return the process-wide rate limiter, creating it on first use"""
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = RateLimiter()
+        return _limiter
@@ -2,7 +2,7 @@
 Scene Packager - Utility to package geometry and animation into a complete Three.js scene.
 """
 
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional
 import re
 from agent_management.models import SceneScript, OrchestrationPlan, AnimationCode, FinalScenePackage
 
@@ -11,13 +11,17 @@ class ScenePackager:
     """
     Takes the output from the geometry and animation agents and packages it into a complete Three.js scene.
     """
+
+    # Marks where the scene script goes in an HTML shell
+    SCRIPT_PLACEHOLDER = "<!-- SCENE_SCRIPT -->"
     
     @staticmethod
     def create_scene_package(
         script: SceneScript,
         orchestration_plan: OrchestrationPlan,
         object_geometries: Dict[str, Dict],
-        animation_code: AnimationCode
+        animation_code: AnimationCode,
+        html_shell: Optional[str] = None
     ) -> FinalScenePackage:
         """
         Create a complete Three.js scene from the generated components.
@@ -27,6 +31,7 @@ class ScenePackager:
             orchestration_plan: The plan of objects needed for the scene
             object_geometries: Dictionary of objects with their generated geometry
             animation_code: Generated animation code
+            html_shell: Optional HTML shell prepared earlier with create_html_shell()
             
         Returns:
             FinalScenePackage: Complete scene package with HTML and JS
@@ -57,7 +62,9 @@ class ScenePackager:
         minimal_js = ScenePackager._create_minimal_js(all_geometry_code, animation_code.code)
         
         # Create the HTML with embedded JavaScript
-        html = ScenePackager._create_html(title, script, js)
+        if html_shell is None:
+            html_shell = ScenePackager.create_html_shell(title, script)
+        html = ScenePackager._embed_script(html_shell, js)
         
         return FinalScenePackage(
             html=html,
@@ -81,14 +88,19 @@ class ScenePackager:
         Returns:
             str: Complete HTML file
         """
-        # Create caption divs from script points
-        caption_divs = []
-        for point in script.content:
-            caption_div = f'        <div class="caption" data-time="{point.timecode}" style="display: none;">{point.caption}</div>'
-            caption_divs.append(caption_div)
-        
-        caption_html = "\n".join(caption_divs)
-        
+        return ScenePackager._embed_script(ScenePackager.create_html_shell(title, script), js_code)
+
+    @staticmethod
+    def _embed_script(html_shell: str, js_code: str = None) -> str:
+        """
+        Insert the scene script into an HTML shell.
+
+        Args:
+            html_shell (str): HTML from create_html_shell()
+            js_code (str, optional): JavaScript code to embed directly in the HTML (if None, will use a script link)
+        Returns:
+            str: Complete HTML file
+        """
         # Determine whether to use embedded JS or external script link
         if js_code:
             script_tag = f"""    <!-- Embedded scene script -->
@@ -98,6 +110,30 @@ class ScenePackager:
         else:
             script_tag = """    <!-- Main scene script -->
     <script src="/static/scene.js"></script>"""
+
+        return html_shell.replace(ScenePackager.SCRIPT_PLACEHOLDER, script_tag, 1)
+
+    @staticmethod
+    def create_html_shell(title: str, script: SceneScript) -> str:
+        """
+        Create the static part of the HTML file (styles, title, captions and controls).
+
+        It only depends on the script and title, so it can be built while the
+        geometry and animation code are still being generated.
+
+        Args:
+            title (str): Scene title
+            script (SceneScript): Script with captions
+        Returns:
+            str: HTML with SCRIPT_PLACEHOLDER where the scene script goes
+        """
+        # Create caption divs from script points
+        caption_divs = []
+        for point in script.content:
+            caption_div = f'        <div class="caption" data-time="{point.timecode}" style="display: none;">{point.caption}</div>'
+            caption_divs.append(caption_div)
+        
+        caption_html = "\n".join(caption_divs)
         
         # Create the HTML template with corrected script paths
         html_template = f"""<!DOCTYPE html>
@@ -204,7 +240,7 @@ class ScenePackager:
     <script src="https://cdn.jsdelivr.net/npm/three@0.128.0/build/three.min.js"></script>
     <!-- OrbitControls add-on (corrected path) -->
     <script src="https://cdn.jsdelivr.net/npm/three@0.128.0/examples/js/controls/OrbitControls.js"></script>
-    {script_tag}
+    {ScenePackager.SCRIPT_PLACEHOLDER}
     </body>
     </html>
     """
@@ -0,0 +1,165 @@
+"""
+Single Flight Module - Coalesces identical requests that are in flight at the same time.
+
+Classroom traffic often sends the same prompt ("show me caffeine") from many
+clients within seconds. Instead of running the LLM + PubChem + RDKit pipeline
+once per client, the first caller runs it and later callers with the same key
+attach to that computation:
+
+- SingleFlight.run() shares the result of a coroutine between concurrent
+  callers of synchronous endpoints
+- InFlightJobs hands later callers of background-job endpoints the job ID of
+  the identical job that is already running
+
+Coalescing only happens within one worker process; it never caches results
+once the computation has finished.
+"""
+
+import asyncio
+import hashlib
+import re
+import threading
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Normalize a prompt so trivially different spellings share a key"""
+    prompt = re.sub(r"\s+", " ", prompt.strip().lower())
+    return prompt.rstrip(" .!?")
+
+
+def flight_key(*parts: Optional[str]) -> str:
+    """Build a coalescing key from e.g. an endpoint name, a model and a prompt"""
+    raw = "\x1f".join("" if part is None else str(part) for part in parts)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class SingleFlight:
+    """Runs at most one coroutine per key at a time and shares its outcome"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights: Dict[Tuple[int, str], "asyncio.Future[Any]"] = {}
+        self._waiters: Dict["asyncio.Future[Any]", int] = {}
+        self.leaders = 0
+        self.followers = 0
+
+    async def run(self, key: str, func: Callable[[], Awaitable[T]]) -> T:
+        """
+        Await func() once for all concurrent callers with the same key.
+
+        The computation runs as its own task, so a caller that disconnects or
+        is cancelled does not cancel it for the others; once every caller is
+        gone, the computation itself is cancelled. Exceptions are raised to
+        every caller.
+
+        Args:
+            key: Coalescing key (see flight_key)
+            func: Zero-argument callable returning the awaitable to share
+
+        Returns:
+            The shared result
+        """
+        loop = asyncio.get_running_loop()
+        # Futures are bound to a loop, so flights are keyed by loop as well
+        flight_id = (id(loop), key)
+        with self._lock:
+            future = self._flights.get(flight_id)
+            if future is None:
+                self.leaders += 1
+                future = loop.create_task(func())
+                self._flights[flight_id] = future
+                future.add_done_callback(lambda _: self._forget(flight_id, future))
+            else:
+                self.followers += 1
+            self._waiters[future] = self._waiters.get(future, 0) + 1
+        try:
+            return await asyncio.shield(future)
+        finally:
+            with self._lock:
+                self._waiters[future] -= 1
+                abandoned = self._waiters[future] == 0
+                if abandoned:
+                    del self._waiters[future]
+            if abandoned and not future.done():
+                future.cancel()
+
+    def _forget(self, flight_id: Tuple[int, str], future: "asyncio.Future[Any]") -> None:
+        with self._lock:
+            if self._flights.get(flight_id) is future:
+                del self._flights[flight_id]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "in_flight": len(self._flights),
+                "leaders": self.leaders,
+                "followers": self.followers,
+            }
+
+
+class InFlightJobs:
+    """Maps coalescing keys to the background job that is computing them"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, str] = {}
+        # job ID -> callers that claimed it and haven't left
+        self._callers: Dict[str, int] = {}
+        self.started = 0
+        self.attached = 0
+
+    def claim(self, key: str, job_id: str) -> Tuple[str, bool]:
+        """
+        Register job_id for key unless an identical job is already running.
+
+        Returns:
+            (job ID to use, whether this caller owns the job)
+        """
+        with self._lock:
+            existing = self._jobs.get(key)
+            if existing is not None:
+                self.attached += 1
+                self._callers[existing] = self._callers.get(existing, 0) + 1
+                return existing, False
+            self._jobs[key] = job_id
+            self._callers[job_id] = 1
+            self.started += 1
+            return job_id, True
+
+    def leave(self, job_id: str) -> int:
+        """
+        Record that a caller stopped waiting for a job.
+
+        Returns:
+            The callers still waiting for it (0 for jobs this process doesn't track)
+        """
+        with self._lock:
+            callers = max(0, self._callers.get(job_id, 0) - 1)
+            if job_id in self._callers:
+                self._callers[job_id] = callers
+            return callers
+
+    def release(self, key: str, job_id: str) -> None:
+        """Forget a finished job so the next identical request starts a new one"""
+        with self._lock:
+            if self._jobs.get(key) == job_id:
+                del self._jobs[key]
+            self._callers.pop(job_id, None)
+
+    def release_job(self, job_id: str) -> None:
+        """Forget a job regardless of its key (e.g. when it is cancelled before it starts)"""
+        with self._lock:
+            for key in [key for key, running_id in self._jobs.items() if running_id == job_id]:
+                del self._jobs[key]
+            self._callers.pop(job_id, None)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "in_flight": len(self._jobs),
+                "started": self.started,
+                "attached": self.attached,
+            }
@@ -0,0 +1,252 @@
+"""
+Stage Graph Module - Runs the stages of a pipeline as a dependency graph.
+
+Each stage is an async callable that receives the values of the stages it
+depends on. A stage starts as soon as all of its dependencies have finished,
+so independent stages (e.g. building the static HTML shell while geometry is
+being generated) overlap instead of running one after another.
+
+Every stage gets its own timing, retries with backoff and optional timeout.
+When a critical stage fails, the stages still running are cancelled and
+StageFailedError is raised; a failed non-critical stage only skips the stages
+that depend on it. Cancelling the task that awaits run() cancels every stage.
+"""
+
+import asyncio
+import inspect
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+StageFunc = Callable[[Dict[str, Any]], Awaitable[Any]]
+# Hooks may be coroutine functions; the stage waits for them
+StageHook = Callable[[str], Optional[Awaitable[None]]]
+FinishHook = Callable[["StageResult"], Optional[Awaitable[None]]]
+
+
+@dataclass
+class Stage:
+    """A node of the graph"""
+    name: str
+    func: StageFunc
+    deps: Sequence[str] = ()
+    retries: int = 0
+    retry_delay: float = 1.0
+    timeout: Optional[float] = None
+    critical: bool = True
+
+
+@dataclass
+class StageResult:
+    """Outcome and timing of one stage"""
+    name: str
+    status: str = "pending"  # success, failed, timeout, skipped or cancelled
+    value: Any = None
+    error: Optional[str] = None
+    attempts: int = 0
+    started_ms: Optional[float] = None
+    duration_ms: Optional[float] = None
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "status": self.status,
+            "error": self.error,
+            "attempts": self.attempts,
+            "started_ms": self.started_ms,
+            "duration_ms": self.duration_ms,
+        }
+
+
+class StageFailedError(Exception):
+    """Raised by StageGraph.run() when a critical stage fails"""
+
+    def __init__(self, stage: str, error: BaseException, results: Dict[str, StageResult]):
+        super().__init__(f"Stage '{stage}' failed: {error}")
+        self.stage = stage
+        self.error = error
+        self.results = results
+
+
+class StageGraph:
+    """Dependency graph of pipeline stages"""
+
+    def __init__(self):
+        self._stages: Dict[str, Stage] = {}
+
+    def add(
+        self,
+        name: str,
+        func: StageFunc,
+        deps: Sequence[str] = (),
+        retries: int = 0,
+        retry_delay: float = 1.0,
+        timeout: Optional[float] = None,
+        critical: bool = True,
+    ) -> "StageGraph":
+        """
+        Add a stage to the graph.
+
+        Args:
+            name: Unique stage name
+            func: Async callable receiving {dependency name: value}
+            deps: Names of the stages that must finish first
+            retries: Extra attempts after a failure or timeout
+            retry_delay: Delay before the first retry, doubled on each further retry
+            timeout: Optional deadline in seconds for each attempt
+            critical: Whether a failure of this stage fails the whole graph
+
+        Returns:
+            The graph, so calls can be chained
+        """
+        if name in self._stages:
+            raise ValueError(f"Duplicate stage: {name}")
+        self._stages[name] = Stage(name, func, tuple(deps), retries, retry_delay, timeout, critical)
+        return self
+
+    @property
+    def stages(self) -> List[str]:
+        return list(self._stages)
+
+    def validate(self) -> None:
+        """Raise ValueError on unknown dependencies or cycles"""
+        for stage in self._stages.values():
+            for dep in stage.deps:
+                if dep not in self._stages:
+                    raise ValueError(f"Stage '{stage.name}' depends on unknown stage '{dep}'")
+
+        visiting, visited = set(), set()
+
+        def visit(name: str) -> None:
+            if name in visited:
+                return
+            if name in visiting:
+                raise ValueError(f"Cycle in stage graph at '{name}'")
+            visiting.add(name)
+            for dep in self._stages[name].deps:
+                visit(dep)
+            visiting.discard(name)
+            visited.add(name)
+
+        for name in self._stages:
+            visit(name)
+
+    async def run(
+        self,
+        on_start: Optional[StageHook] = None,
+        on_finish: Optional[FinishHook] = None,
+    ) -> Dict[str, StageResult]:
+        """
+        Run all stages, each as soon as its dependencies are done.
+
+        Args:
+            on_start: Called (or awaited) with the stage name when a stage starts
+            on_finish: Called (or awaited) with the StageResult when a stage succeeds or fails
+
+        Returns:
+            Results of all stages, keyed by name
+
+        Raises:
+            StageFailedError: If a critical stage fails (remaining stages are cancelled)
+        """
+        self.validate()
+        results = {name: StageResult(name) for name in self._stages}
+        done = {name: asyncio.Event() for name in self._stages}
+        graph_started = time.perf_counter()
+
+        async def run_stage(stage: Stage) -> None:
+            try:
+                for dep in stage.deps:
+                    await done[dep].wait()
+                if any(results[dep].status != "success" for dep in stage.deps):
+                    results[stage.name].status = "skipped"
+                    return
+                await self._run_attempts(stage, results, graph_started, on_start, on_finish)
+            finally:
+                done[stage.name].set()
+
+        tasks = {
+            name: asyncio.create_task(run_stage(stage), name=f"stage:{name}")
+            for name, stage in self._stages.items()
+        }
+        try:
+            pending = set(tasks.values())
+            while pending:
+                finished, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in finished:
+                    task.result()
+                failed = next(
+                    (
+                        r for r in results.values()
+                        if r.status in ("failed", "timeout") and self._stages[r.name].critical
+                    ),
+                    None,
+                )
+                if failed is not None:
+                    raise StageFailedError(failed.name, failed.value, results)
+        finally:
+            for name, task in tasks.items():
+                if not task.done():
+                    task.cancel()
+                    results[name].status = "cancelled"
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+
+        return results
+
+    async def _run_attempts(
+        self,
+        stage: Stage,
+        results: Dict[str, StageResult],
+        graph_started: float,
+        on_start: Optional[StageHook],
+        on_finish: Optional[FinishHook],
+    ) -> None:
+        result = results[stage.name]
+        inputs = {dep: results[dep].value for dep in stage.deps}
+        started = time.perf_counter()
+        result.started_ms = round((started - graph_started) * 1000, 1)
+        result.status = "running"
+        if on_start:
+            await _call_hook(on_start, stage.name)
+
+        delay = stage.retry_delay
+        while True:
+            result.attempts += 1
+            try:
+                if stage.timeout is not None:
+                    value = await asyncio.wait_for(stage.func(inputs), timeout=stage.timeout)
+                else:
+                    value = await stage.func(inputs)
+                result.status = "success"
+                result.value = value
+                break
+            except asyncio.TimeoutError as e:
+                error, status = e, "timeout"
+                message = f"timed out after {stage.timeout}s"
+            except Exception as e:
+                error, status = e, "failed"
+                message = str(e)
+
+            if result.attempts > stage.retries:
+                result.status = status
+                result.error = message
+                # The exception itself is kept for StageFailedError
+                result.value = error
+                break
+            logger.warning(
+                f"Stage '{stage.name}' attempt {result.attempts} failed ({message}); retrying in {delay}s"
+            )
+            await asyncio.sleep(delay)
+            delay *= 2
+
+        result.duration_ms = round((time.perf_counter() - started) * 1000, 1)
+        if on_finish:
+            await _call_hook(on_finish, result)
+
+
+async def _call_hook(hook: Callable[[Any], Optional[Awaitable[None]]], arg: Any) -> None:
+    outcome = hook(arg)
+    if inspect.isawaitable(outcome):
+        await outcome
@@ -0,0 +1,355 @@
+"""
+Usage Tracker Module - Token, cost and latency accounting for LLM calls.
+
+Every call made through LLMService is recorded with its provider, model,
+prompt and completion tokens, wall time, retries and estimated cost, tagged
+with the agent that made it and the pipeline job it belongs to. Records are
+kept in a bounded in-memory ring buffer per worker and aggregated per job,
+per agent and per model by the ``/prompt/usage-stats/`` endpoint.
+
+Tagging uses context variables, so it follows the work into stage tasks and
+into the executor threads (run_blocking copies the caller's context):
+
+    with usage_context(job_id=job_id):
+        await graph.run()
+
+Prompt tokens served from a provider's prompt cache (OpenAI's automatic
+prefix caching, Anthropic's cache_control blocks) are counted separately as
+``cached_tokens`` (and ``cache_write_tokens`` for Anthropic cache writes)
+and priced at the providers' discounted rates.
+
+Providers report what only they can see through the current call:
+report_usage() for the usage of responses that are not returned as an
+LLMResponse (structured output), and record_retry() for each retry.
+
+Configuration (environment):
+
+- ``LLM_USAGE_MAX_RECORDS``: records kept per worker (default: 10000)
+"""
+
+import contextlib
+import contextvars
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import asdict, dataclass, field
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
+
+DEFAULT_MAX_RECORDS = 10000
+
+# USD per million (prompt, completion) tokens, matched by model name prefix
+MODEL_PRICES: Dict[str, Tuple[float, float]] = {
+    "gpt-4.5-preview": (75.0, 150.0),
+    "gpt-4o-mini": (0.15, 0.6),
+    "gpt-4o": (2.5, 10.0),
+    "o1": (15.0, 60.0),
+    "o3-mini": (1.1, 4.4),
+    "claude-3-7-sonnet": (3.0, 15.0),
+    "claude-3-5-sonnet": (3.0, 15.0),
+    "claude-3-5-haiku": (0.8, 4.0),
+    "claude-3-opus": (15.0, 75.0),
+    "llama3-70b-8192": (0.59, 0.79),
+    "llama3-8b-8192": (0.05, 0.08),
+    "llama-3.3-70b": (0.59, 0.79),
+    "llama-3.2-90b-vision": (0.9, 0.9),
+    "mixtral-8x7b-32768": (0.24, 0.24),
+    "gemma-7b-it": (0.07, 0.07),
+    "deepseek-r1-distill-llama-70b": (0.75, 0.99),
+    "qwen-2.5-32b": (0.79, 0.79),
+}
+
+# Price factors of (cache-read, cache-write) prompt tokens relative to the
+# normal prompt price, matched by model name prefix; others use the default
+CACHED_PROMPT_PRICE_FACTORS: Dict[str, Tuple[float, float]] = {
+    "claude": (0.1, 1.25),
+}
+DEFAULT_CACHED_PROMPT_PRICE_FACTORS = (0.5, 1.0)
+
+_job_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("usage_job_id", default=None)
+_agent: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("usage_agent", default=None)
+_current_call: contextvars.ContextVar[Optional["CallRecord"]] = contextvars.ContextVar(
+    "usage_current_call", default=None
+)
+
+
+def _cached_price_factors(model: str) -> Tuple[float, float]:
+    for prefix, factors in CACHED_PROMPT_PRICE_FACTORS.items():
+        if model.startswith(prefix):
+            return factors
+    return DEFAULT_CACHED_PROMPT_PRICE_FACTORS
+
+
+def estimate_cost(
+    model: str,
+    prompt_tokens: int,
+    completion_tokens: int,
+    cached_tokens: int = 0,
+    cache_write_tokens: int = 0,
+) -> Optional[float]:
+    """
+    Estimated USD cost of a call, or None for models without a known price.
+    cached_tokens and cache_write_tokens are the parts of prompt_tokens that
+    were read from or written to the provider's prompt cache.
+    """
+    for prefix, (prompt_price, completion_price) in sorted(
+        MODEL_PRICES.items(), key=lambda item: len(item[0]), reverse=True
+    ):
+        if model.startswith(prefix):
+            read_factor, write_factor = _cached_price_factors(model)
+            uncached = max(0, prompt_tokens - cached_tokens - cache_write_tokens)
+            prompt_cost = prompt_price * (
+                uncached + cached_tokens * read_factor + cache_write_tokens * write_factor
+            )
+            return (prompt_cost + completion_tokens * completion_price) / 1_000_000
+    return None
+
+
+def usage_from(sdk_usage: Any) -> Dict[str, int]:
+    """Normalize an SDK usage object (OpenAI/Groq or Anthropic style) to our usage dict"""
+    if sdk_usage is None:
+        return {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0, "cached_tokens": 0}
+
+    prompt = getattr(sdk_usage, "prompt_tokens", None)
+    if prompt is not None:
+        # OpenAI/Groq: prompt_tokens includes the cached prefix
+        details = getattr(sdk_usage, "prompt_tokens_details", None)
+        cached = getattr(details, "cached_tokens", None) or 0
+        cache_write = 0
+        completion = getattr(sdk_usage, "completion_tokens", 0)
+    else:
+        # Anthropic: input_tokens excludes the tokens read from or written to the cache
+        cached = getattr(sdk_usage, "cache_read_input_tokens", None) or 0
+        cache_write = getattr(sdk_usage, "cache_creation_input_tokens", None) or 0
+        prompt = (getattr(sdk_usage, "input_tokens", 0) or 0) + cached + cache_write
+        completion = getattr(sdk_usage, "output_tokens", 0)
+
+    total = getattr(sdk_usage, "total_tokens", None) or (prompt or 0) + (completion or 0)
+    usage = {
+        "prompt_tokens": prompt or 0,
+        "completion_tokens": completion or 0,
+        "total_tokens": total,
+        "cached_tokens": cached,
+    }
+    if cache_write:
+        usage["cache_write_tokens"] = cache_write
+    return usage
+
+
+@dataclass
+class CallRecord:
+    """Accounting record of one LLM call"""
+    provider: str
+    model: str
+    operation: str
+    agent: Optional[str] = None
+    job_id: Optional[str] = None
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    total_tokens: int = 0
+    cached_tokens: int = 0
+    cache_write_tokens: int = 0
+    duration_ms: float = 0.0
+    # Part of duration_ms spent waiting for rate limiter capacity
+    throttled_ms: float = 0.0
+    retries: int = 0
+    cached: bool = False
+    error: Optional[str] = None
+    cost_usd: Optional[float] = None
+    timestamp: float = field(default_factory=time.time)
+
+    def set_usage(self, usage: Optional[Dict[str, int]]) -> None:
+        if not usage:
+            return
+        self.prompt_tokens = usage.get("prompt_tokens", 0) or 0
+        self.completion_tokens = usage.get("completion_tokens", 0) or 0
+        self.total_tokens = usage.get("total_tokens", 0) or self.prompt_tokens + self.completion_tokens
+        self.cached_tokens = usage.get("cached_tokens", 0) or 0
+        self.cache_write_tokens = usage.get("cache_write_tokens", 0) or 0
+
+
+def current_call() -> Optional[CallRecord]:
+    """The record of the call in progress (None outside a tracked call)"""
+    return _current_call.get()
+
+
+def report_usage(usage: Optional[Dict[str, int]]) -> None:
+    """Attach token usage to the call in progress (no-op outside a tracked call)"""
+    record = _current_call.get()
+    if record is not None:
+        record.set_usage(usage)
+
+
+def record_retry() -> None:
+    """Count a retry of the call in progress (no-op outside a tracked call)"""
+    record = _current_call.get()
+    if record is not None:
+        record.retries += 1
+
+
+@contextlib.contextmanager
+def usage_context(job_id: Optional[str] = None, agent: Optional[str] = None) -> Iterator[None]:
+    """Tag the LLM calls made inside the block with a job ID and/or agent"""
+    tokens = []
+    if job_id is not None:
+        tokens.append((_job_id, _job_id.set(job_id)))
+    if agent is not None:
+        tokens.append((_agent, _agent.set(agent)))
+    try:
+        yield
+    finally:
+        for var, token in reversed(tokens):
+            var.reset(token)
+
+
+def _empty_totals() -> Dict[str, Any]:
+    return {
+        "calls": 0,
+        "cached_calls": 0,
+        "errors": 0,
+        "retries": 0,
+        "prompt_tokens": 0,
+        "completion_tokens": 0,
+        "total_tokens": 0,
+        "cached_tokens": 0,
+        "cache_write_tokens": 0,
+        "cost_usd": 0.0,
+        "total_ms": 0.0,
+        "throttled_ms": 0.0,
+    }
+
+
+def _add(totals: Dict[str, Any], record: CallRecord) -> None:
+    totals["calls"] += 1
+    totals["cached_calls"] += int(record.cached)
+    totals["errors"] += int(record.error is not None)
+    totals["retries"] += record.retries
+    totals["prompt_tokens"] += record.prompt_tokens
+    totals["completion_tokens"] += record.completion_tokens
+    totals["total_tokens"] += record.total_tokens
+    totals["cached_tokens"] += record.cached_tokens
+    totals["cache_write_tokens"] += record.cache_write_tokens
+    totals["cost_usd"] += record.cost_usd or 0.0
+    totals["total_ms"] += record.duration_ms
+    totals["throttled_ms"] += record.throttled_ms
+
+
+def _finish(totals: Dict[str, Any]) -> Dict[str, Any]:
+    totals["cost_usd"] = round(totals["cost_usd"], 6)
+    totals["total_ms"] = round(totals["total_ms"], 1)
+    totals["throttled_ms"] = round(totals["throttled_ms"], 1)
+    totals["avg_ms"] = round(totals["total_ms"] / totals["calls"], 1) if totals["calls"] else 0.0
+    totals["cached_prompt_fraction"] = (
+        round(totals["cached_tokens"] / totals["prompt_tokens"], 4) if totals["prompt_tokens"] else 0.0
+    )
+    return totals
+
+
+class UsageTracker:
+    """Thread-safe, bounded store of CallRecords with aggregation"""
+
+    def __init__(self, max_records: Optional[int] = None):
+        self.max_records = max_records or int(os.environ.get("LLM_USAGE_MAX_RECORDS", DEFAULT_MAX_RECORDS))
+        self._lock = threading.Lock()
+        self._records: Deque[CallRecord] = deque(maxlen=self.max_records)
+
+    @contextlib.contextmanager
+    def track(
+        self, provider: str, model: str, operation: str, agent: Optional[str] = None
+    ) -> Iterator[CallRecord]:
+        """
+        Record one LLM call made inside the block.
+
+        Args:
+            provider: Provider name, e.g. "openai"
+            model: Model name
+            operation: "generate", "generate_structured" or "stream"
+            agent: Agent that owns the LLMService (the usage_context agent is used otherwise)
+
+        Yields:
+            The CallRecord, for setting usage or marking a cache hit
+        """
+        record = CallRecord(
+            provider=provider,
+            model=model,
+            operation=operation,
+            agent=agent or _agent.get(),
+            job_id=_job_id.get(),
+        )
+        token = _current_call.set(record)
+        started = time.perf_counter()
+        try:
+            yield record
+        except BaseException as e:
+            record.error = f"{type(e).__name__}: {e}"[:500]
+            raise
+        finally:
+            try:
+                _current_call.reset(token)
+            except ValueError:
+                # A streaming generator finalized from another context
+                pass
+            record.duration_ms = round((time.perf_counter() - started) * 1000, 1)
+            if not record.cached:
+                record.cost_usd = estimate_cost(
+                    model,
+                    record.prompt_tokens,
+                    record.completion_tokens,
+                    record.cached_tokens,
+                    record.cache_write_tokens,
+                )
+            with self._lock:
+                self._records.append(record)
+
+    def records(self, job_id: Optional[str] = None) -> List[CallRecord]:
+        with self._lock:
+            records = list(self._records)
+        if job_id is not None:
+            records = [record for record in records if record.job_id == job_id]
+        return records
+
+    def summary(self, job_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Aggregate the recorded calls.
+
+        Args:
+            job_id: Only include the calls of this job
+
+        Returns:
+            Totals overall and broken down by job, agent and model
+        """
+        records = self.records(job_id)
+        totals = _empty_totals()
+        groups: Dict[str, Dict[str, Dict[str, Any]]] = {"by_job": {}, "by_agent": {}, "by_model": {}}
+        for record in records:
+            _add(totals, record)
+            for group, key in (
+                ("by_job", record.job_id),
+                ("by_agent", record.agent),
+                ("by_model", record.model),
+            ):
+                if group == "by_job" and key is None:
+                    continue
+                _add(groups[group].setdefault(key or "unknown", _empty_totals()), record)
+
+        return {
+            "records": len(records),
+            "max_records": self.max_records,
+            "totals": _finish(totals),
+            **{
+                group: {key: _finish(values) for key, values in entries.items()}
+                for group, entries in groups.items()
+            },
+        }
+
+    def job_records(self, job_id: str) -> List[Dict[str, Any]]:
+        """The calls of one job, oldest first, as dicts"""
+        return [asdict(record) for record in self.records(job_id)]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._records.clear()
+
+
+# Process-wide tracker used by LLMService
+usage_tracker = UsageTracker()
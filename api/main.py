@@ -59,3 +59,22 @@ app.add_middleware(
 # user management related endpoints
 app.include_router(routers.prompt.router)
 app.include_router(routers.geometry.router)
+
+
+@app.on_event("shutdown")
+def shutdown_blocking_executor():
+    """Release the thread pools used for blocking agent work"""
+    from agent_management.execution_pool import blocking_executor
+    blocking_executor.shutdown(wait=False)
+
+@app.on_event("shutdown")
+async def close_provider_clients():
+    """Close the pooled LLM provider connections, async clients on their own loop"""
+    from agent_management.providers.client_pool import client_pool
+    await client_pool.aclose()
+
+@app.on_event("shutdown")
+async def close_pubchem_client():
+    """Close the pooled PubChem connections, async clients on their own loop"""
+    from agent_management.pubchem_client import pubchem_client
+    await pubchem_client.aclose()
@@ -1,6 +1,7 @@
 from pydantic import BaseModel
-from typing import Optional, Dict, Any, List, Tuple, Literal
-from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks
+from typing import Optional, Dict, Any, List, Tuple, Literal, AsyncIterator, Callable
+from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks, Request
+from fastapi.responses import StreamingResponse
 from agent_management.models import ModelRegistry
 from dependencies.use_llm import use_llm
 from agent_management.agents.geometry_agent import GeometryAgent
@@ -16,14 +17,31 @@ from agent_management.models import (
     AnimationCode,
     FinalScenePackage,
     BaseModelWithConfig,
+    BooleanResponse,
 )
 from agent_management.model_config import ModelInfo, ModelCategory, get_default_model
 from agent_management.agent_factory import AgentFactory
 from agent_management.agent_model_config import AgentType
 from agent_management.scene_packager import ScenePackager
-from agent_management.llm_service import LLMService, LLMModelConfig, ProviderType, StructuredLLMRequest
+from agent_management.llm_service import LLMService, LLMModelConfig, LLMStreamChunk, ProviderType, StructuredLLMRequest
 from agent_management.diagram_renderer import render_diagram
+from agent_management.execution_pool import PoolType, run_blocking, blocking_executor
+from agent_management.job_store import JobStore, create_job_store
+from agent_management.job_events import format_sse, job_event_bus, stream_job_events
+from agent_management.stage_graph import StageGraph, StageResult, StageFailedError
+from agent_management.single_flight import SingleFlight, InFlightJobs, flight_key, normalize_prompt
+from agent_management.job_queue import JobQueue, QueueFullError
+from agent_management.providers.client_pool import client_pool
+from agent_management.pubchem_client import pubchem_client
+from agent_management.llm_cache import get_llm_cache
+from agent_management.compound_cache import get_compound_cache
+from agent_management import hedging, molecular_index
+from agent_management.molecular_index import fast_path_enabled, match_molecular
+from agent_management.usage_tracker import usage_context, usage_tracker
+from agent_management.circuit_breaker import circuit_breakers
+from agent_management.rate_limiter import get_rate_limiter
 import os
+import math
 import asyncio
 import traceback
 from datetime import datetime
@@ -135,6 +153,8 @@ class JobResponse(BaseModel):
     progress: Optional[float] = None
     visualization: Optional[VisualizationData] = None
     error: Optional[str] = None
+    queue_position: Optional[int] = None
+    estimated_wait_seconds: Optional[float] = None
 
     # Add configuration settings for better validation handling
     model_config = {
@@ -154,31 +174,281 @@ class JobResponse(BaseModel):
     }
 
 # Import ModelRegistry and related functions
-from agent_management.model_config import get_default_model, get_llm_service
+from agent_management.model_config import get_default_model, get_llm_service, get_model_performance
+
+# Job stores shared by all workers (see agent_management/job_store.py)
+geometry_jobs: JobStore = create_job_store("geometry")
+
+# Identical prompts in flight at the same time share one computation
+request_flights = SingleFlight()
+pipeline_flights = InFlightJobs()
+
+# Bounded queue that admits pipeline jobs (see PIPELINE_QUEUE_* settings)
+pipeline_queue = JobQueue("pipeline")
+
+# Statuses after which a pipeline job can no longer be cancelled
+FINISHED_JOB_STATUSES = ("completed", "error", "cancelled")
+
+# How often a running job checks the store for a cancellation made on another worker
+CANCEL_POLL_INTERVAL = 2.0
+
+# How often synchronous endpoints check whether their client is still connected
+DISCONNECT_POLL_INTERVAL = 0.5
+pipeline_jobs: JobStore = create_job_store("pipeline")
+
+# Progress reported when each main pipeline stage finishes
+PIPELINE_STAGE_PROGRESS = {
+    "script": 0.3,
+    "orchestration": 0.4,
+    "geometry": 0.7,
+    "animation": 0.8,
+    "packaging": 0.9,
+    "saving": 0.95,
+}
+
+# How a failed stage is described in the job's error message
+PIPELINE_STAGE_ERRORS = {
+    "script": "generating script",
+    "orchestration": "generating orchestration plan",
+    "geometry": "generating geometries",
+    "animation": "generating animation code",
+    "packaging": "packaging scene",
+    "html_shell": "packaging scene",
+    "saving": "saving JS/HTML files",
+}
+
+# The job store is synchronous SQLAlchemy, so async code reaches it through
+# the STORE pool rather than blocking the event loop on disk I/O
+
+async def _get_job(job_id: str, with_artifacts: bool = True) -> Optional[Dict[str, Any]]:
+    """Read a pipeline job from the store off the event loop"""
+    return await run_blocking(PoolType.STORE, pipeline_jobs.get, job_id, with_artifacts=with_artifacts)
+
+async def _enter_stage(job_id: str, stage: str) -> None:
+    """Record the pipeline stage a job is in and notify event stream subscribers"""
+    await run_blocking(PoolType.STORE, pipeline_jobs.update, job_id, stage=stage)
+    job_event_bus.publish(job_id, {"job_id": job_id, "stage": stage})
+
+async def _report_progress(job_id: str, progress: float) -> None:
+    """Raise a job's progress and notify event stream subscribers"""
+    if await run_blocking(PoolType.STORE, pipeline_jobs.set_progress, job_id, progress):
+        job_event_bus.publish(job_id, {"job_id": job_id, "progress": progress})
+
+async def _finish_job(job_id: str, status: str, **fields: Any) -> None:
+    """Store a job's terminal status and notify event stream subscribers"""
+    await run_blocking(PoolType.STORE, pipeline_jobs.update, job_id, status=status, **fields)
+    job_event_bus.publish(job_id, {"job_id": job_id, "status": status})
+
+async def _validate_molecular(prompt: str, model: Optional[str], endpoint: str):
+    """Run the domain validator, sharing the call between identical concurrent requests"""
+    # Prompts the local index recognises are answered without leaving the event loop
+    if fast_path_enabled() and match_molecular(prompt):
+        return BooleanResponse(is_true=True)
+
+    async def validate():
+        domain_validator = AgentFactory.create_domain_validator(model)
+        # Validate off the event loop so slow LLM calls don't stall other
+        # requests; the index has already been checked above
+        return await run_blocking(
+            PoolType.LLM, domain_validator.is_molecular, prompt, use_index=False, endpoint=endpoint
+        )
+
+    return await request_flights.run(
+        flight_key("is_molecular", model, normalize_prompt(prompt)), validate
+    )
+
+async def _start_pipeline_job(prompt: str, model: Optional[str]) -> Tuple[str, bool]:
+    """
+    Queue a pipeline job for a prompt, or attach to the identical job already running.
 
-# Simple in-memory job stores
-# In a production app
-geometry_jobs: Dict[str, Dict[str, Any]] = {}
-pipeline_jobs: Dict[str, Dict[str, Any]] = {}
+    Returns:
+        (job ID, whether a new job was queued)
+
+    Raises:
+        HTTPException: 429 with Retry-After when the job queue is full
+    """
+    import uuid
+
+    key = flight_key("pipeline", model, normalize_prompt(prompt))
+
+    # The job entry is written before the prompt is claimed, so an identical
+    # request that finds the claim can rely on the entry being there
+    new_job_id = str(uuid.uuid4())
+    await run_blocking(
+        PoolType.STORE,
+        pipeline_jobs.create,
+        new_job_id,
+        prompt=prompt,
+        stage="queued",
+        created_at=datetime.now().isoformat(),
+    )
+    job_id, started = pipeline_flights.claim(key, new_job_id)
+    if not started and await _get_job(job_id, with_artifacts=False) is None:
+        # The running job was evicted or expired; start over
+        pipeline_flights.release(key, job_id)
+        job_id, started = pipeline_flights.claim(key, new_job_id)
+    if not started:
+        await run_blocking(PoolType.STORE, pipeline_jobs.delete, new_job_id)
+        return job_id, False
+
+    try:
+        pipeline_queue.submit(
+            job_id,
+            lambda: process_prompt_pipeline_task(
+                job_id=job_id, prompt=prompt, override_model=model, flight=key
+            ),
+        )
+    except QueueFullError as e:
+        await run_blocking(PoolType.STORE, pipeline_jobs.delete, job_id)
+        pipeline_flights.release(key, job_id)
+        raise HTTPException(
+            status_code=429,
+            detail={
+                "message": "Too many visualizations are being generated right now. Please retry later.",
+                "queue_depth": e.depth,
+                "estimated_wait_seconds": round(e.retry_after, 1),
+            },
+            headers={"Retry-After": str(max(1, math.ceil(e.retry_after)))},
+        )
+    return job_id, True
 
 # Background task function for processing prompts
 async def process_prompt_pipeline_task(
-    job_id: str, prompt: str, override_model: Optional[str] = None
+    job_id: str, prompt: str, override_model: Optional[str] = None, flight: Optional[str] = None
 ):
     """
     Background task to process a prompt through the entire pipeline.
-    Updates the pipeline_jobs dictionary with the result when complete.
+    Updates the job in the pipeline_jobs store with the result when complete.
 
     Args:
         job_id: Unique identifier for this job
         prompt: The user's prompt to process
         override_model: Optional model name to override all agents
+        flight: Coalescing key released when the job ends, so identical
+            prompts submitted afterwards start a new job
+    """
+    try:
+        job = await _get_job(job_id, with_artifacts=False)
+        if job is not None and job.get("status") == "cancelled":
+            print(f"[Job {job_id}] Cancelled before it started")
+            return
+
+        # Tag every LLM call of the pipeline with the job for usage accounting
+        with usage_context(job_id=job_id):
+            pipeline = asyncio.ensure_future(_run_prompt_pipeline(job_id, prompt, override_model))
+        watcher = asyncio.ensure_future(_cancel_when_requested(job_id, pipeline))
+        try:
+            await pipeline
+        finally:
+            watcher.cancel()
+    except asyncio.CancelledError:
+        # Cancelled through DELETE /prompt/process/{job_id}, a disconnected
+        # event stream or server shutdown; in-flight LLM calls are aborted
+        print(f"[Job {job_id}] Cancelled")
+        await _mark_cancelled(job_id)
+        raise
+    finally:
+        if flight is not None:
+            pipeline_flights.release(flight, job_id)
+
+def _job_usage(job_id: str) -> Dict[str, Any]:
+    """Token, cost and latency totals of a job's LLM calls, overall and per agent and model"""
+    summary = usage_tracker.summary(job_id)
+    return {key: summary[key] for key in ("totals", "by_agent", "by_model")}
+
+async def _mark_cancelled(job_id: str) -> None:
+    """Record a job as cancelled unless it already finished"""
+    job = await _get_job(job_id, with_artifacts=False)
+    if job is not None and job.get("status") not in FINISHED_JOB_STATUSES:
+        await _finish_job(job_id, status="cancelled", stage="cancelled")
+
+async def _cancel_when_requested(job_id: str, pipeline: "asyncio.Future[Any]") -> None:
+    """Cancel a running pipeline once its job is cancelled in the store (possibly by another worker)"""
+    while not pipeline.done():
+        await asyncio.sleep(CANCEL_POLL_INTERVAL)
+        job = await _get_job(job_id, with_artifacts=False)
+        if job is None or job.get("status") == "cancelled":
+            pipeline.cancel()
+            return
+
+async def _cancel_job(job_id: str) -> bool:
+    """Cancel a pipeline job that has not finished. Returns False if it already finished"""
+    job = await _get_job(job_id, with_artifacts=False)
+    if job is None or job.get("status") in FINISHED_JOB_STATUSES:
+        return False
+    await _finish_job(job_id, status="cancelled", stage="cancelled")
+    # Stops the job right away if this worker runs it; other workers notice the
+    # status within CANCEL_POLL_INTERVAL
+    pipeline_queue.cancel(job_id)
+    pipeline_flights.release_job(job_id)
+    return True
+
+async def _leave_job(job_id: str) -> None:
+    """
+    A client that asked for cancel_on_disconnect went away: cancel the job
+    once no other caller of an identical prompt is waiting for it either.
     """
+    if pipeline_flights.leave(job_id) == 0:
+        await _cancel_job(job_id)
+    else:
+        logger.info(f"Client left job {job_id}; other callers still wait for it")
+
+async def _cancel_on_disconnect(http_request: Request, awaitable: Any) -> Any:
+    """
+    Await work for a synchronous endpoint, cancelling it if the client disconnects.
+
+    Raises:
+        HTTPException: 499 when the client went away
+    """
+    task = asyncio.ensure_future(awaitable)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_INTERVAL)
+            if done:
+                return task.result()
+            if await http_request.is_disconnected():
+                logger.info(f"Client disconnected from {http_request.url.path}; cancelling its work")
+                task.cancel()
+                raise HTTPException(status_code=499, detail="Client closed request")
+    finally:
+        if not task.done():
+            task.cancel()
+
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+async def _code_stream_events(
+    items: AsyncIterator[Any],
+    result_payload: Callable[[Any], Dict[str, Any]],
+    endpoint: str,
+) -> AsyncIterator[str]:
+    """
+    Forward an agent's code stream to the client as Server-Sent Events:
+    - delta: {text} for every piece of generated text
+    - done: the non-streaming endpoint's response body plus the token usage
+    - error: {detail} if generation fails part way
+    """
+    usage = None
+    try:
+        async with blocking_executor.limit(endpoint):
+            async for item in items:
+                if isinstance(item, LLMStreamChunk):
+                    if item.is_final:
+                        usage = item.usage
+                    elif item.delta:
+                        yield format_sse("delta", {"text": item.delta})
+                else:
+                    yield format_sse("done", {**result_payload(item), "usage": usage})
+    except Exception as e:
+        traceback.print_exc()
+        yield format_sse("error", {"detail": str(e)})
+
+async def _run_prompt_pipeline(job_id: str, prompt: str, override_model: Optional[str]):
     try:
         print(f"[Job {job_id}] Starting processing for prompt: {prompt[:50]}...")
 
         # Initialize all agents with appropriate models
         try:
+            await _enter_stage(job_id, "initializing")
             # Create agents using the factory with optimal model selection
             # Validation already happened in the main endpoint
             script_agent = AgentFactory.create_script_agent(override_model)
@@ -190,61 +460,37 @@ async def process_prompt_pipeline_task(
             print(f"[Job {job_id}] All agents initialized successfully")
 
             # Update progress after initialization
-            pipeline_jobs[job_id]["progress"] = 0.1
+            await _report_progress(job_id, 0.1)
         except Exception as e:
             print(f"[Job {job_id}] Error initializing agents: {str(e)}")
-            pipeline_jobs[job_id] = {
-                **pipeline_jobs[job_id],
-                "status": "error",
-                "error": f"Error initializing agents: {str(e)}",
-            }
+            await _finish_job(job_id, status="error", error=f"Error initializing agents: {str(e)}")
             return
 
-        # Step 1: Generate an animation script (validation already done)
-        try:
+        # The pipeline runs as a stage graph: each stage starts as soon as its
+        # inputs are ready, so the HTML shell and the optional test questions
+        # are built while geometry is being generated.
+        async def script_stage(inputs):
             print(f"[Job {job_id}] Generating animation script...")
-            animation_script: SceneScript = script_agent.generate_script(prompt)
+            animation_script: SceneScript = await script_agent.agenerate_script(prompt)
             print(
                 f"[Job {job_id}] Script generated with {len(animation_script.content)} time points"
             )
+            return animation_script
 
-            # Update progress
-            pipeline_jobs[job_id]["progress"] = 0.3
-        except Exception as e:
-            print(f"[Job {job_id}] Error generating script: {str(e)}")
-            pipeline_jobs[job_id] = {
-                **pipeline_jobs[job_id],
-                "status": "error",
-                "error": f"Error generating script: {str(e)}",
-            }
-            return
-
-        # Step 2: Generate an orchestration plan based on the script
-        try:
+        async def orchestration_stage(inputs):
             print(f"[Job {job_id}] Generating orchestration plan...")
-            orchestration_plan = orchestration_agent.generate_orchestration_plan(
-                animation_script
+            orchestration_plan = await orchestration_agent.agenerate_orchestration_plan(
+                inputs["script"]
             )
             print(
                 f"[Job {job_id}] Orchestration plan generated with {len(orchestration_plan.objects)} objects"
             )
+            return orchestration_plan
 
-            # Update progress
-            pipeline_jobs[job_id]["progress"] = 0.4
-        except Exception as e:
-            print(f"[Job {job_id}] Error generating orchestration plan: {str(e)}")
-            pipeline_jobs[job_id] = {
-                **pipeline_jobs[job_id],
-                "status": "error",
-                "error": f"Error generating orchestration plan: {str(e)}",
-            }
-            return
-
-        # Step 3: Generate geometry for all objects in the plan
-        try:
+        async def geometry_stage(inputs):
             print(f"[Job {job_id}] Generating geometry for all objects...")
             object_geometries = await orchestration_agent.generate_geometry_from_plan(
-                orchestration_plan
+                inputs["orchestration"]
             )
 
             # Check if there are any successful geometries
@@ -259,65 +505,48 @@ async def process_prompt_pipeline_task(
                 print(
                     f"[Job {job_id}] Warning: No successful geometries were generated"
                 )
+            return object_geometries
 
-            # Update progress
-            pipeline_jobs[job_id]["progress"] = 0.7
-        except Exception as e:
-            print(f"[Job {job_id}] Error generating geometries: {str(e)}")
-            pipeline_jobs[job_id] = {
-                **pipeline_jobs[job_id],
-                "status": "error",
-                "error": f"Error generating geometries: {str(e)}",
-            }
-            return
+        async def html_shell_stage(inputs):
+            return ScenePackager.create_html_shell(
+                inputs["orchestration"].scene_title, inputs["script"]
+            )
 
-        # Step 4: Generate animation code
-        try:
+        async def test_questions_stage(inputs):
+            print(f"[Job {job_id}] Generating test questions...")
+            questions = await run_blocking(
+                PoolType.LLM, orchestration_agent.generate_test_questions, inputs["script"]
+            )
+            return questions.model_dump()
+
+        async def animation_stage(inputs):
             print(f"[Job {job_id}] Generating animation code...")
-            animation_code = animation_agent.generate_animation_code(
-                script=animation_script,
-                object_geometries=object_geometries,
-                orchestration_plan=orchestration_plan,
+            animation_code = await animation_agent.agenerate_animation_code(
+                script=inputs["script"],
+                object_geometries=inputs["geometry"],
+                orchestration_plan=inputs["orchestration"],
             )
             print(
                 f"[Job {job_id}] Animation code generated with {len(animation_code.keyframes)} keyframes"
             )
+            return animation_code
 
-            # Update progress
-            pipeline_jobs[job_id]["progress"] = 0.8
-        except Exception as e:
-            print(f"[Job {job_id}] Error generating animation code: {str(e)}")
-            pipeline_jobs[job_id] = {
-                **pipeline_jobs[job_id],
-                "status": "error",
-                "error": f"Error generating animation code: {str(e)}",
-            }
-            return
-
-        # Step 5: Package everything into a complete scene
-        try:
+        async def packaging_stage(inputs):
             print(f"[Job {job_id}] Packaging scene...")
-            scene_package = ScenePackager.create_scene_package(
-                script=animation_script,
-                orchestration_plan=orchestration_plan,
-                object_geometries=object_geometries,
-                animation_code=animation_code,
+            scene_package = await run_blocking(
+                PoolType.CPU,
+                ScenePackager.create_scene_package,
+                script=inputs["script"],
+                orchestration_plan=inputs["orchestration"],
+                object_geometries=inputs["geometry"],
+                animation_code=inputs["animation"],
+                html_shell=inputs["html_shell"],
             )
             print(f"[Job {job_id}] Scene packaged successfully")
+            return scene_package
 
-            # Update progress
-            pipeline_jobs[job_id]["progress"] = 0.9
-        except Exception as e:
-            print(f"[Job {job_id}] Error packaging scene: {str(e)}")
-            pipeline_jobs[job_id] = {
-                **pipeline_jobs[job_id],
-                "status": "error",
-                "error": f"Error packaging scene: {str(e)}",
-            }
-            return
-
-        # Save the JS and HTML files to the static directory
-        try:
+        async def saving_stage(inputs):
+            scene_package = inputs["packaging"]
             print(f"[Job {job_id}] Saving JS and HTML files to static directory...")
             static_dir = os.path.join(
                 os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "static"
@@ -328,32 +557,70 @@ async def process_prompt_pipeline_task(
             js_filename = f"scene_{job_id}.js"
             html_filename = f"scene_{job_id}.html"
 
-            # Write the JavaScript to a file (useful for debugging/development)
-            with open(os.path.join(static_dir, js_filename), "w") as f:
-                f.write(scene_package.js)
+            def write_files():
+                # Write the JavaScript to a file (useful for debugging/development)
+                with open(os.path.join(static_dir, js_filename), "w") as f:
+                    f.write(scene_package.js)
 
-            # Write the HTML file with embedded JavaScript
-            with open(os.path.join(static_dir, html_filename), "w") as f:
-                f.write(scene_package.html)
+                # Write the HTML file with embedded JavaScript
+                with open(os.path.join(static_dir, html_filename), "w") as f:
+                    f.write(scene_package.html)
 
+            await run_blocking(PoolType.CPU, write_files)
             print(
                 f"[Job {job_id}] Files saved successfully: JS ({js_filename}), HTML with embedded JS ({html_filename})"
             )
+            return js_filename
+
+        retries = int(os.environ.get("PIPELINE_STAGE_RETRIES", "1"))
+        graph = (
+            StageGraph()
+            .add("script", script_stage, retries=retries)
+            .add("orchestration", orchestration_stage, deps=["script"], retries=retries)
+            .add("geometry", geometry_stage, deps=["orchestration"])
+            .add("html_shell", html_shell_stage, deps=["script", "orchestration"])
+            .add("animation", animation_stage, deps=["script", "orchestration", "geometry"], retries=retries)
+            .add(
+                "packaging",
+                packaging_stage,
+                deps=["script", "orchestration", "geometry", "animation", "html_shell"],
+            )
+            .add("saving", saving_stage, deps=["packaging"])
+        )
+        if os.environ.get("PIPELINE_TEST_QUESTIONS", "").lower() in ("1", "true", "yes"):
+            # Optional extra; a failure here does not fail the visualization
+            graph.add("test_questions", test_questions_stage, deps=["script"], critical=False)
 
-            # Update progress
-            pipeline_jobs[job_id]["progress"] = 0.95
-        except Exception as e:
-            print(f"[Job {job_id}] Error saving JS/HTML files: {str(e)}")
-            pipeline_jobs[job_id] = {
-                **pipeline_jobs[job_id],
-                "status": "error",
-                "error": f"Error saving JS/HTML files: {str(e)}",
-            }
+        async def on_stage_start(stage: str) -> None:
+            if stage in PIPELINE_STAGE_PROGRESS:
+                await _enter_stage(job_id, stage)
+
+        async def on_stage_finish(stage_result: StageResult) -> None:
+            if stage_result.status == "success" and stage_result.name in PIPELINE_STAGE_PROGRESS:
+                await _report_progress(job_id, PIPELINE_STAGE_PROGRESS[stage_result.name])
+            print(
+                f"[Job {job_id}] Stage {stage_result.name} {stage_result.status} "
+                f"in {stage_result.duration_ms}ms ({stage_result.attempts} attempt(s))"
+            )
+
+        try:
+            stage_results = await graph.run(on_start=on_stage_start, on_finish=on_stage_finish)
+        except StageFailedError as e:
+            label = PIPELINE_STAGE_ERRORS.get(e.stage, e.stage)
+            print(f"[Job {job_id}] Error {label}: {str(e.error)}")
+            await _finish_job(
+                job_id,
+                status="error",
+                error=f"Error {label}: {str(e.error)}",
+                stages={name: r.as_dict() for name, r in e.results.items()},
+                usage=_job_usage(job_id),
+            )
             return
 
         # Update job with the completed result
         print(f"[Job {job_id}] Processing complete, storing results")
 
+        scene_package = stage_results["packaging"].value
         result = {
             "html": scene_package.html,
             "js": scene_package.js,
@@ -361,97 +628,70 @@ async def process_prompt_pipeline_task(
             "title": scene_package.title,
             "timecode_markers": scene_package.timecode_markers,
             "total_elements": scene_package.total_elements,
-            "js_filename": js_filename,
-        }
-
-        pipeline_jobs[job_id] = {
-            **pipeline_jobs[job_id],
-            "status": "completed",
-            "progress": 1.0,
-            "result": result,
+            "js_filename": stage_results["saving"].value,
         }
+        if "test_questions" in stage_results and stage_results["test_questions"].status == "success":
+            result["test_questions"] = stage_results["test_questions"].value
+
+        await _finish_job(
+            job_id,
+            status="completed",
+            stage="completed",
+            progress=1.0,
+            result=result,
+            stages={name: r.as_dict() for name, r in stage_results.items()},
+            usage=_job_usage(job_id),
+        )
 
     except Exception as e:
         print(
             f"[Job {job_id}] Unhandled exception in process_prompt_pipeline_task: {str(e)}"
         )
         traceback.print_exc()
-        pipeline_jobs[job_id] = {
-            **pipeline_jobs[job_id],
-            "status": "error",
-            "progress": pipeline_jobs[job_id].get("progress", 0),
-            "error": f"Unhandled error: {str(e)}",
-        }
+        await _finish_job(job_id, status="error", error=f"Unhandled error: {str(e)}")
 
 @router.post("/process/", response_model=dict)
-async def submit_prompt_background(
-    request: PromptRequest, background_tasks: BackgroundTasks
-):
+async def submit_prompt_background(request: PromptRequest):
     """
     Starts the scientific visualization pipeline as a background task and returns immediately.
     This endpoint begins processing the prompt through all pipeline steps but doesn't wait for completion.
 
     Returns a job ID that can be used to check the status of processing.
+    Jobs wait in a bounded queue; when it is full the endpoint responds 429 with Retry-After.
 
     Query parameters:
     - model: Optional specific model to use for all agents
     - preferred_model_category: Optional model category preference
     """
-    # Generate a unique job ID
-    import uuid
-
-    job_id = str(uuid.uuid4())
-
-    # Start the background task with the selected model (if specified)
-    background_tasks.add_task(
-        process_prompt_pipeline_task,
-        job_id=job_id,
-        prompt=request.prompt,
-        override_model=request.model,
-    )
-
-    # Create job entry
-    pipeline_jobs[job_id] = {
-        "status": "processing",
-        "prompt": request.prompt,
-        "created_at": datetime.now().isoformat(),
-        "result": None,
-        "progress": 0.0,  # Initial progress
-    }
+    job_id, started = await _start_pipeline_job(request.prompt, request.model)
 
     # Return immediately with the job ID
     return {
         "job_id": job_id,
         "status": "processing",
-        "message": "Processing started in the background",
-        "progress": 0.0,
+        "message": "Processing started in the background"
+        if started
+        else "Attached to an identical request already in progress",
+        "progress": 0.0 if started else await _job_progress(job_id),
+        **_queue_info(job_id),
     }
 
-@router.get("/process/{job_id}")
-async def check_process_status(job_id: str):
-    """
-    Check the status of a background processing job.
-    Returns the current status and result if processing is complete.
-
-    Response format:
-    - job_id: The unique job ID
-    - status: 'processing', 'completed', or 'failed'
-    - progress: A float between 0 and 1 indicating progress
-    - message: A human-readable status message
-    - visualization: (When completed) The full visualization data
-    - error: (When failed) The error message
-
-    The visualization object contains:
-    - html: The complete HTML for the visualization with embedded JavaScript
-    - title: The title of the scene
-    - timecode_markers: List of timecodes for the animation
-    - total_elements: Total number of elements in the scene
-    """
-    if job_id not in pipeline_jobs:
-        raise HTTPException(status_code=404, detail=f"Job ID {job_id} not found")
+def _queue_info(job_id: str) -> Dict[str, Any]:
+    """Queue position and estimated wait of a job that is still waiting to start"""
+    position = pipeline_queue.position(job_id)
+    if not position:
+        return {}
+    return {
+        "queue_position": position,
+        "estimated_wait_seconds": round(pipeline_queue.estimate_wait(position), 1),
+    }
 
-    job = pipeline_jobs[job_id]
+async def _job_progress(job_id: str) -> float:
+    job = await _get_job(job_id, with_artifacts=False)
+    return job.get("progress", 0.0) if job else 0.0
 
+def _pipeline_status_payload(job_id: str, job: Dict[str, Any]) -> Dict[str, Any]:
+    """Build the client-facing status of a pipeline job (shared by polling and SSE)"""
     # If the job is completed, return the full result
     if job["status"] == "completed":
         # Convert the result to the VisualizationData format
@@ -485,19 +725,106 @@ async def check_process_status(job_id: str):
             # Add empty result field for compatibility
             "result": "",
         }
+    elif job["status"] == "cancelled":
+        return {
+            "job_id": job_id,
+            "status": "cancelled",
+            "progress": job.get("progress", 0.0),
+            "message": "Processing cancelled",
+            "result": "",
+        }
     # Otherwise just return the status info
     else:
         return {
             "job_id": job_id,
             "status": "processing",
             "progress": job.get("progress", 0.0),
+            "stage": job.get("stage"),
             "message": "Processing in progress",
             # Add empty result field for compatibility
             "result": "",
+            **_queue_info(job_id),
         }
 
+@router.get("/process/{job_id}")
+async def check_process_status(job_id: str):
+    """
+    Check the status of a background processing job.
+    Returns the current status and result if processing is complete.
+
+    Response format:
+    - job_id: The unique job ID
+    - status: 'processing', 'completed', or 'failed'
+    - progress: A float between 0 and 1 indicating progress
+    - message: A human-readable status message
+    - visualization: (When completed) The full visualization data
+    - error: (When failed) The error message
+
+    The visualization object contains:
+    - html: The complete HTML for the visualization with embedded JavaScript
+    - title: The title of the scene
+    - timecode_markers: List of timecodes for the animation
+    - total_elements: Total number of elements in the scene
+    """
+    job = await _get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job ID {job_id} not found")
+
+    return _pipeline_status_payload(job_id, job)
+
+@router.delete("/process/{job_id}")
+async def cancel_process(job_id: str):
+    """
+    Cancel a background processing job.
+
+    A queued job is dropped; a running job is stopped and its in-flight LLM
+    calls (including the geometry fan-out) are aborted. Clients attached to
+    the same job through an identical prompt see it as cancelled too.
+    """
+    job = await _get_job(job_id, with_artifacts=False)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job ID {job_id} not found")
+
+    if not await _cancel_job(job_id):
+        raise HTTPException(status_code=409, detail=f"Job ID {job_id} already {job['status']}")
+
+    return {
+        "job_id": job_id,
+        "status": "cancelled",
+        "progress": job.get("progress", 0.0),
+        "message": "Processing cancelled",
+    }
+
+@router.get("/process/{job_id}/events")
+async def stream_process_events(job_id: str, cancel_on_disconnect: bool = False):
+    """
+    Stream the progress of a background processing job as Server-Sent Events.
+
+    Instead of polling /prompt/process/{job_id}, clients can open an EventSource
+    on this endpoint and receive:
+    - progress: {job_id, status, stage, progress} whenever the stage or progress changes
+    - completed / failed / cancelled: sent once at the end, with the same body
+      /prompt/process/{job_id} returns (including the visualization when completed)
+
+    With ?cancel_on_disconnect=true the job is cancelled when the client goes
+    away, unless other callers of an identical prompt still wait for it.
+    """
+    if await _get_job(job_id, with_artifacts=False) is None:
+        raise HTTPException(status_code=404, detail=f"Job ID {job_id} not found")
+
+    return StreamingResponse(
+        stream_job_events(
+            job_id,
+            pipeline_jobs,
+            _pipeline_status_payload,
+            on_disconnect=(lambda: _leave_job(job_id)) if cancel_on_disconnect else None,
+        ),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS,
+    )
+
 @router.post("/generate-from-pubchem/", response_model=dict)
-async def generate_from_pubchem(request: PromptRequest):
+async def generate_from_pubchem(request: PromptRequest, http_request: Request):
     """
     Generate a 3D visualization from a query to PubChem.
 
@@ -509,39 +836,18 @@ async def generate_from_pubchem(request: PromptRequest):
     try:
         logger.info(f"Processing PubChem request: {request.prompt}")
 
-        # Create domain validator agent using the factory
-        domain_validator = AgentFactory.create_domain_validator(request.model)
-
-        # Initial validation can be done synchronously to reject bad prompts immediately
-        validation_result = domain_validator.is_molecular(request.prompt)
-
-        # If not molecular, reject the prompt immediately
-        if not validation_result.is_true:
-            logger.warning(f"Non-molecular prompt rejected: {request.prompt}")
-            return {
-                "job_id": "rejected",
-                "status": "failed",
-                "message": "Non-molecular prompt rejected",
-                "error": "The prompt does not contain molecular content",
-            }
-
-        # Create PubChem agent with script agent override - use the specified model for script generation
-        pubchem_agent = AgentFactory.create_pubchem_agent(
-            script_model=request.model,
-            use_element_labels=True,  # Use element-based labels for better LLM understanding during script generation
-            convert_back_to_indices=True,  # ALWAYS convert element-based labels back to numeric indices for visualization
+        # Identical prompts in flight at the same time share one validation + package run
+        # The work is abandoned once every client waiting for it has disconnected
+        response = await _cancel_on_disconnect(
+            http_request,
+            request_flights.run(
+                flight_key("generate-from-pubchem", request.model, normalize_prompt(request.prompt)),
+                lambda: _generate_from_pubchem(request),
+            ),
         )
-
-        # Generate the geometry directly for immediate response
-        logger.info(f"Generating molecule package for: {request.prompt}")
-        result = pubchem_agent.get_molecule_package(request.prompt)
-        logger.info(f"Successfully generated molecule package: {result.title}")
-
-        return {
-            "pdb_data": result.pdb_data,
-            "result_html": result.html,
-            "title": result.title,
-        }
+        return dict(response)
+    except HTTPException:
+        raise
     except Exception as e:
         error_message = str(e)
         logger.error(f"Error generating from PubChem: {error_message}")
@@ -558,14 +864,54 @@ async def generate_from_pubchem(request: PromptRequest):
 
         raise HTTPException(status_code=500, detail=error_message)
 
+async def _generate_from_pubchem(request: PromptRequest) -> Dict[str, Any]:
+    """Validate a prompt and build its molecule package (shared by coalesced requests)"""
+    validation_result = await _validate_molecular(
+        request.prompt, request.model, "generate-from-pubchem"
+    )
+
+    # If not molecular, reject the prompt immediately
+    if not validation_result.is_true:
+        logger.warning(f"Non-molecular prompt rejected: {request.prompt}")
+        return {
+            "job_id": "rejected",
+            "status": "failed",
+            "message": "Non-molecular prompt rejected",
+            "error": "The prompt does not contain molecular content",
+        }
+
+    # Create PubChem agent with script agent override - use the specified model for script generation
+    pubchem_agent = AgentFactory.create_pubchem_agent(
+        script_model=request.model,
+        use_element_labels=True,  # Use element-based labels for better LLM understanding during script generation
+        convert_back_to_indices=True,  # ALWAYS convert element-based labels back to numeric indices for visualization
+    )
+
+    # Generate the geometry directly for immediate response
+    logger.info(f"Generating molecule package for: {request.prompt}")
+    result = await run_blocking(
+        PoolType.PUBCHEM,
+        pubchem_agent.get_molecule_package,
+        request.prompt,
+        endpoint="generate-from-pubchem",
+    )
+    logger.info(f"Successfully generated molecule package: {result.title}")
+
+    return {
+        "pdb_data": result.pdb_data,
+        "result_html": result.html,
+        "title": result.title,
+    }
+
 @router.post("/", response_model=JobResponse)
-async def submit_prompt(request: PromptRequest, background_tasks: BackgroundTasks):
+async def submit_prompt(request: PromptRequest):
     """
     End-to-end endpoint to process a scientific prompt into a complete 3D visualization.
     This endpoint now launches a background task and returns immediately with a job ID.
 
     The client should poll the /prompt/process/{job_id} endpoint to check the status
-    and get the final result.
+    and get the final result. Jobs wait in a bounded queue; when it is full the
+    endpoint responds 429 with Retry-After.
 
     Pipeline steps:
     1. Validates that the prompt is scientific
@@ -576,11 +922,7 @@ async def submit_prompt(request: PromptRequest, background_tasks: BackgroundTask
     6. Packages everything into a complete scene
     """
     try:
-        # Create domain validator agent using the factory
-        domain_validator = AgentFactory.create_domain_validator(request.model)
-
-        # Initial validation can be done synchronously to reject bad prompts immediately
-        validation_result = domain_validator.is_molecular(request.prompt)
+        validation_result = await _validate_molecular(request.prompt, request.model, "prompt")
 
         # If not scientific, reject the prompt immediately
         if not validation_result.is_true:
@@ -591,27 +933,18 @@ async def submit_prompt(request: PromptRequest, background_tasks: BackgroundTask
                 "error": "The prompt does not contain molecular content",
             }
 
-        # Generate a unique job ID
-        import uuid
-
-        job_id = str(uuid.uuid4())
-
-        # Start the background task with the selected model (if specified)
-        background_tasks.add_task(
-            process_prompt_pipeline_task,
-            job_id=job_id,
-            prompt=request.prompt,
-            override_model=request.model,
-        )
+        job_id, started = await _start_pipeline_job(request.prompt, request.model)
 
-        # Create job entry
-        pipeline_jobs[job_id] = {
-            "status": "processing",
-            "prompt": request.prompt,
-            "created_at": datetime.now().isoformat(),
-            "result": None,
-            "progress": 0.0,  # Initial progress
-        }
+        if not started:
+            print(
+                f"Attached to running job {job_id} for identical prompt: {request.prompt[:50]}..."
+            )
+            return {
+                "job_id": job_id,
+                "status": "processing",
+                "message": "Attached to an identical request already in progress. Poll /prompt/process/{job_id} for updates.",
+                "progress": await _job_progress(job_id),
+            }
 
         print(
             f"Started background processing job {job_id} for prompt: {request.prompt[:50]}..."
@@ -623,7 +956,10 @@ async def submit_prompt(request: PromptRequest, background_tasks: BackgroundTask
             "status": "processing",
             "message": "Processing started in the background. Poll /prompt/process/{job_id} for updates.",
             "progress": 0.0,
+            **_queue_info(job_id),
         }
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Unhandled exception in submit_prompt: {str(e)}")
         traceback.print_exc()
@@ -640,10 +976,9 @@ async def validate_scientific(request: PromptRequest):
                 status_code=500, detail="OPENAI_API_KEY environment variable is not set"
             )
 
-        # Create domain validator with appropriate model
-        domain_validator = AgentFactory.create_domain_validator(request.model)
-
-        validation_result = domain_validator.is_molecular(request.prompt)
+        validation_result = await _validate_molecular(
+            request.prompt, request.model, "validate-scientific"
+        )
 
         return {"is_molecular": validation_result.is_true}
     except Exception as e:
@@ -746,9 +1081,10 @@ async def generate_molecule_diagram(request: DiagramPromptRequest, llm_service:
             system_prompt=formatted_system_prompt, # Use the formatted prompt
             response_model=DiagramPlan,
             llm_config=llm_model_config,
+            cache_namespace="diagram_plan",
         )
         
-        diagram_plan_from_llm = llm_service.generate_structured(structured_llm_request)
+        diagram_plan_from_llm = await llm_service.agenerate_structured(structured_llm_request)
 
         if not diagram_plan_from_llm or not diagram_plan_from_llm.molecule_list:
             raise ValueError("LLM failed to generate a valid diagram plan or molecule list.")
@@ -779,7 +1115,12 @@ async def generate_molecule_diagram(request: DiagramPromptRequest, llm_service:
                     "height": mp.height or 200
                 }
             })
-        fetched_molecules_data = pubchem_agent.get_molecules_2d_layout(layout_requests)
+        fetched_molecules_data = await run_blocking(
+            PoolType.PUBCHEM,
+            pubchem_agent.get_molecules_2d_layout,
+            layout_requests,
+            endpoint="generate-molecule-diagram",
+        )
 
         if len(fetched_molecules_data) != len(final_diagram_plan_obj.molecule_list):
             raise ValueError("Mismatch between planned molecules and fetched molecule data.")
@@ -792,7 +1133,9 @@ async def generate_molecule_diagram(request: DiagramPromptRequest, llm_service:
                 "label_position": plan_data_from_list.label_position
             })
 
-        svg_image = render_diagram(
+        svg_image = await run_blocking(
+            PoolType.CPU,
+            render_diagram,
             molecules=renderable_molecules,
             arrows=[arrow.model_dump() for arrow in final_diagram_plan_obj.arrows] if final_diagram_plan_obj.arrows else [],
             width=request.canvas_width, # Or final_diagram_plan_obj.canvas_width
@@ -830,7 +1173,7 @@ async def generate_molecule_diagram(request: DiagramPromptRequest, llm_service:
 
 @router.post("/generate-geometry/", response_model=GeometryResponse)
 async def generate_geometry(
-    request: GeometryRequest, llm_service: LLMService = Depends(use_llm)
+    request: GeometryRequest, http_request: Request, llm_service: LLMService = Depends(use_llm)
 ):
     """
     Endpoint to generate Three.js geometry based on user prompt.
@@ -853,11 +1196,10 @@ async def generate_geometry(
         # Get override models from request if specified
         global_override_model = request.model
 
-        # Create domain validator agent using the factory with potential override
-        domain_validator = AgentFactory.create_domain_validator(global_override_model)
-
         # Validate the prompt is scientific
-        validation_result = domain_validator.is_molecular(request.prompt)
+        validation_result = await _validate_molecular(
+            request.prompt, global_override_model, "generate-geometry"
+        )
 
         if not validation_result.is_true:
             # Instead of raising an error, return a response indicating non-molecular content
@@ -870,27 +1212,80 @@ async def generate_geometry(
         # Create geometry agent with appropriate model - use specific override if provided
         geometry_agent = AgentFactory.create_geometry_agent(global_override_model)
 
-        # Generate the geometry directly for immediate response
-        generated_code = geometry_agent.get_geometry_snippet(request.prompt)
+        # Generate the geometry directly for immediate response; the provider
+        # request is aborted if the client disconnects
+        async with blocking_executor.limit("generate-geometry"):
+            generated_code = await _cancel_on_disconnect(
+                http_request, geometry_agent.aget_geometry_snippet(request.prompt)
+            )
 
         return {
             "result": generated_code,
             "is_molecular": True,
             "validation_message": None,
         }
+    except HTTPException:
+        raise
     except Exception as e:
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/generate-geometry/stream/")
+async def generate_geometry_stream(request: GeometryRequest):
+    """
+    Streaming variant of /prompt/generate-geometry/.
+    Sends the geometry code as Server-Sent Events while it is generated:
+    - delta: {text} for every piece of generated text
+    - done: {result, is_molecular, validation_message, usage}, the body
+      /prompt/generate-geometry/ returns plus the token usage
+    - error: {detail} if generation fails after streaming has started
+    Generation stops when the client disconnects.
+    """
+    if not os.getenv("OPENAI_API_KEY"):
+        raise HTTPException(
+            status_code=500, detail="OPENAI_API_KEY environment variable is not set"
+        )
+
+    try:
+        validation_result = await _validate_molecular(
+            request.prompt, request.model, "generate-geometry"
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    if not validation_result.is_true:
+        async def not_molecular():
+            yield format_sse("done", {
+                "result": "",
+                "is_molecular": False,
+                "validation_message": "The prompt does not contain molecular content",
+                "usage": None,
+            })
+
+        return StreamingResponse(not_molecular(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+    geometry_agent = AgentFactory.create_geometry_agent(request.model)
+    return StreamingResponse(
+        _code_stream_events(
+            geometry_agent.astream_geometry_snippet(request.prompt),
+            lambda code: {"result": code, "is_molecular": True, "validation_message": None},
+            "generate-geometry",
+        ),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS,
+    )
+
 @router.get("/models/", response_model=List[Dict[str, Any]])
 async def get_models():
     """
     Endpoint to get information about all available models.
-    Returns a list of registered models with their capabilities.
+    Returns a list of registered models with their capabilities and their
+    recent latency and error rate on this worker.
     """
     models = []
     for model_name in ModelRegistry.list_models():
         model_info = ModelRegistry.create_instance(model_name)
+        performance = get_model_performance(model_name)
         models.append(
             {
                 "name": model_name,
@@ -900,6 +1295,7 @@ async def get_models():
                 "context_length": model_info.context_length,
                 "is_default": model_info.is_default,
                 "default_for": model_info.default_for,
+                "performance": vars(performance) if performance is not None else None,
             }
         )
     return models
@@ -910,7 +1306,7 @@ async def get_agent_model_configs():
     Endpoint to get information about all agent-model configurations.
     Returns a list of agents with their preferred models.
     """
-    from agent_management.agent_model_config import AGENT_MODEL_MAP, AgentType
+    from agent_management.agent_model_config import AGENT_MODEL_MAP, AgentType, get_latency_slo_ms
 
     configs = []
     for agent_type in AgentType:
@@ -924,12 +1320,90 @@ async def get_agent_model_configs():
                     "required_categories": [
                         category for category in config.required_categories
                     ],
+                    "latency_slo_ms": get_latency_slo_ms(config),
                     "description": config.description,
                 }
             )
 
     return configs
 
+@router.get("/executor-stats/", response_model=Dict[str, Any])
+async def get_executor_stats():
+    """
+    Endpoint to inspect the blocking-work pools.
+    Returns queue depth, active workers and wait times for each pool,
+    in-flight and waiting counts for each endpoint's concurrency limit,
+    how many requests were coalesced with an identical one in flight,
+    the state of the pipeline job queue, the pooled provider clients and
+    the PubChem client's per-operation latency and connection reuse.
+    """
+    return {
+        **blocking_executor.stats(),
+        "single_flight": {
+            "requests": request_flights.stats(),
+            "pipeline_jobs": pipeline_flights.stats(),
+        },
+        "pipeline_queue": pipeline_queue.stats(),
+        "provider_clients": client_pool.stats(),
+        "pubchem": pubchem_client.stats(),
+    }
+
+@router.get("/job-stats/", response_model=Dict[str, Any])
+async def get_job_stats():
+    """
+    Endpoint to inspect the job stores.
+    Returns the number of stored jobs, their resident (or database) size,
+    evictions and the bytes of artifacts spilled to disk.
+    """
+    return {
+        "pipeline": await run_blocking(PoolType.STORE, pipeline_jobs.stats),
+        "geometry": await run_blocking(PoolType.STORE, geometry_jobs.stats),
+    }
+
+@router.get("/usage-stats/", response_model=Dict[str, Any])
+async def get_usage_stats(job_id: Optional[str] = None):
+    """
+    Endpoint to inspect LLM token usage, estimated cost and latency.
+    Without job_id, returns this worker's recent calls aggregated overall and
+    per job, agent and model, plus the hedging counters per agent, the
+    state of each provider/model circuit breaker and the rate limiter
+    buckets this worker has used. With job_id, returns that
+    job's stage timings, the usage stored when it finished and its
+    individual calls.
+    """
+    if job_id is None:
+        summary = await run_blocking(PoolType.CPU, usage_tracker.summary)
+        summary["hedging"] = hedging.stats()
+        summary["circuit_breakers"] = circuit_breakers.stats()
+        summary["rate_limits"] = await run_blocking(PoolType.CPU, get_rate_limiter().stats)
+        return summary
+
+    job = await _get_job(job_id, with_artifacts=False)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job ID {job_id} not found")
+    return {
+        "job_id": job_id,
+        "status": job.get("status"),
+        "stages": job.get("stages"),
+        # Stored when the job finished; computed from this worker's records while it runs
+        "usage": job.get("usage") or _job_usage(job_id),
+        "calls": usage_tracker.job_records(job_id),
+    }
+
+@router.get("/cache-stats/", response_model=Dict[str, Any])
+async def get_cache_stats():
+    """
+    Endpoint to inspect the LLM response cache.
+    Returns memory and disk hits, misses and stores, overall and per namespace,
+    how many prompts the domain validator's local index decided, and the
+    size and hit counts of the PubChem compound cache.
+    """
+    return {
+        **await run_blocking(PoolType.CPU, get_llm_cache().stats),
+        "domain_validator_fast_path": molecular_index.stats(),
+        "compounds": await run_blocking(PoolType.CPU, get_compound_cache().stats),
+    }
+
 class ScriptRequest(BaseModel):
     script: SceneScript
 
@@ -993,8 +1467,11 @@ async def generate_orchestration(
         orchestration_agent = AgentFactory.create_orchestration_agent(model)
 
         # Generate the orchestration plan from the script
-        orchestration_plan = orchestration_agent.generate_orchestration_plan(
-            request.script
+        orchestration_plan = await run_blocking(
+            PoolType.LLM,
+            orchestration_agent.generate_orchestration_plan,
+            request.script,
+            endpoint="generate-orchestration",
         )
         return orchestration_plan
     except Exception as e:
@@ -1014,12 +1491,9 @@ async def generate_geometry_task(
     """
     try:
         # Initialize job status
-        geometry_jobs[job_id] = {
-            "status": "processing",
-            "total": len(plan.objects),
-            "completed": 0,
-            "results": None,
-        }
+        await run_blocking(
+            PoolType.STORE, geometry_jobs.create, job_id, total=len(plan.objects), completed=0, results=None
+        )
 
         # Create orchestration agent with appropriate model
         orchestration_agent = AgentFactory.create_orchestration_agent(override_model)
@@ -1028,14 +1502,18 @@ async def generate_geometry_task(
         results = await orchestration_agent.generate_geometry_from_plan(plan)
 
         # Update job status
-        geometry_jobs[job_id]["status"] = "completed"
-        geometry_jobs[job_id]["completed"] = len(plan.objects)
-        geometry_jobs[job_id]["results"] = results
+        await run_blocking(
+            PoolType.STORE,
+            geometry_jobs.update,
+            job_id,
+            status="completed",
+            completed=len(plan.objects),
+            results=results,
+        )
 
     except Exception as e:
         # Update job status in case of error
-        geometry_jobs[job_id]["status"] = "failed"
-        geometry_jobs[job_id]["error"] = str(e)
+        await run_blocking(PoolType.STORE, geometry_jobs.update, job_id, status="failed", error=str(e))
 
 @router.post("/generate-geometry-for-plan/", response_model=GeometryGenerationResponse)
 async def generate_geometry_for_plan(
@@ -1045,7 +1523,7 @@ async def generate_geometry_for_plan(
 ):
     """
     Endpoint to generate Three.js geometry for all objects in an orchestration plan.
-    This starts an asynchronous job that processes each object sequentially.
+    This starts an asynchronous job that generates the objects concurrently.
 
     Query parameters:
     - model: Optional specific model to use for geometry generation
@@ -1079,11 +1557,10 @@ async def get_geometry_job_status(job_id: str):
     Check the status of a geometry generation job.
     Returns the results if the job is completed.
     """
-    if job_id not in geometry_jobs:
+    job = await run_blocking(PoolType.STORE, geometry_jobs.get, job_id)
+    if job is None:
         raise HTTPException(status_code=404, detail=f"Job ID {job_id} not found")
 
-    job = geometry_jobs[job_id]
-
     return {
         "job_id": job_id,
         "status": job["status"],
@@ -1114,7 +1591,10 @@ async def generate_animation(
         animation_agent = AgentFactory.create_animation_agent(model)
 
         # Generate animation code
-        animation = animation_agent.generate_animation_code(
+        animation = await run_blocking(
+            PoolType.LLM,
+            animation_agent.generate_animation_code,
+            endpoint="generate-animation",
             script=request.script,
             object_geometries=request.object_geometries,
             orchestration_plan=request.orchestration_plan,
@@ -1130,6 +1610,46 @@ async def generate_animation(
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/generate-animation/stream/")
+async def generate_animation_stream(
+    request: AnimationRequest,
+    model: Optional[str] = None,
+):
+    """
+    Streaming variant of /prompt/generate-animation/.
+    Sends the animation code as Server-Sent Events while it is generated:
+    - delta: {text} for every piece of generated text
+    - done: {code, keyframes, usage}, the body /prompt/generate-animation/
+      returns plus the token usage
+    - error: {detail} if generation fails after streaming has started
+    Generation stops when the client disconnects.
+    """
+    if not os.getenv("OPENAI_API_KEY"):
+        raise HTTPException(
+            status_code=500, detail="OPENAI_API_KEY environment variable is not set"
+        )
+
+    animation_agent = AgentFactory.create_animation_agent(model)
+    return StreamingResponse(
+        _code_stream_events(
+            animation_agent.astream_animation_code(
+                script=request.script,
+                object_geometries=request.object_geometries,
+                orchestration_plan=request.orchestration_plan,
+            ),
+            lambda animation: {
+                "code": animation.code,
+                "keyframes": [
+                    {"timecode": keyframe.timecode, "actions": keyframe.actions}
+                    for keyframe in animation.keyframes
+                ],
+            },
+            "generate-animation",
+        ),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS,
+    )
+
 class FetchMoleculeRequest(BaseModel):
     query: str
 
@@ -1175,7 +1695,12 @@ async def fetch_molecule_data(request: FetchMoleculeRequest):
         pubchem_agent = AgentFactory.create_pubchem_agent(
             script_model=None, use_element_labels=True, convert_back_to_indices=True
         )
-        data = pubchem_agent.get_molecule_data(request.query)
+        data = await run_blocking(
+            PoolType.PUBCHEM,
+            pubchem_agent.get_molecule_data,
+            request.query,
+            endpoint="fetch-molecule-data",
+        )
         return data
     except Exception as e:
         logger.error(f"Error in fetch_molecule_data: {str(e)}")
@@ -1190,7 +1715,12 @@ async def fetch_molecule_2d_data(request: FetchMoleculeRequest):
             use_element_labels=True,
             convert_back_to_indices=True,
         )
-        data = pubchem_agent.get_molecule_2d_info(request.query)
+        data = await run_blocking(
+            PoolType.PUBCHEM,
+            pubchem_agent.get_molecule_2d_info,
+            request.query,
+            endpoint="fetch-molecule-2d",
+        )
         return data
     except Exception as e:
         logger.error(f"Error in fetch_molecule_2d_data: {str(e)}")
@@ -1208,7 +1738,12 @@ async def fetch_molecule_layout(request: MoleculeLayoutRequest):
         queries = [
             {"query": m.query, "box": m.box.model_dump()} for m in request.molecules
         ]
-        data = pubchem_agent.get_molecules_2d_layout(queries)
+        data = await run_blocking(
+            PoolType.PUBCHEM,
+            pubchem_agent.get_molecules_2d_layout,
+            queries,
+            endpoint="fetch-molecule-layout",
+        )
         return {"molecules": data}
     except Exception as e:
         logger.error(f"Error in fetch_molecule_layout: {str(e)}")
@@ -1224,7 +1759,12 @@ async def generate_molecule_html(request: GenerateHTMLRequest):
         pubchem_agent = AgentFactory.create_pubchem_agent(
             script_model=None, use_element_labels=True, convert_back_to_indices=True
         )
-        html = pubchem_agent.generate_visualization(request.molecule_data)
+        html = await run_blocking(
+            PoolType.LLM,
+            pubchem_agent.generate_visualization,
+            request.molecule_data,
+            endpoint="generate-molecule-html",
+        )
         return {"html": html}
     except Exception as e:
         logger.error(f"Error generating HTML: {str(e)}")
@@ -1235,7 +1775,9 @@ async def generate_molecule_html(request: GenerateHTMLRequest):
 async def convert_sdf_to_pdb(request: SDFToPDBRequest):
     """Convert SDF text to PDB format using RDKit."""
     try:
-        pdb_data = _sdf_to_pdb_block(request.sdf)
+        pdb_data = await run_blocking(
+            PoolType.CPU, _sdf_to_pdb_block, request.sdf, endpoint="sdf-to-pdb"
+        )
         if not pdb_data:
             raise ValueError("Failed to convert SDF to PDB")
         return {"pdb_data": pdb_data}
@@ -1251,7 +1793,10 @@ async def package_scene(request: PackagedSceneRequest):
     """
     try:
         # Use the ScenePackager to create a complete scene
-        scene_package = ScenePackager.create_scene_package(
+        scene_package = await run_blocking(
+            PoolType.CPU,
+            ScenePackager.create_scene_package,
+            endpoint="package-scene",
             script=request.script,
             orchestration_plan=request.orchestration_plan,
             object_geometries=request.object_geometries,
@@ -0,0 +1,41 @@
+"""
+Fixtures shared by every test module.
+"""
+
+import os
+import shutil
+import tempfile
+
+import pytest
+
+from agent_management.circuit_breaker import circuit_breakers
+
+_data_dir = None
+
+
+def pytest_configure(config):
+    # Keep the stores out of the real api/data/. The job stores are created
+    # when the routes are imported, so this happens before collection
+    global _data_dir
+    _data_dir = tempfile.mkdtemp(prefix="api-tests-")
+    for variable, name in (
+        ("JOB_STORE_URL", "jobs.sqlite3"),
+        ("LLM_CACHE_URL", "llm_cache.sqlite3"),
+        ("COMPOUND_CACHE_URL", "compound_cache.sqlite3"),
+        ("RATE_LIMIT_URL", "rate_limits.sqlite3"),
+    ):
+        os.environ[variable] = "sqlite:///" + os.path.join(_data_dir, name)
+    os.environ["JOB_ARTIFACT_DIR"] = os.path.join(_data_dir, "artifacts")
+
+
+def pytest_unconfigure(config):
+    if _data_dir is not None:
+        shutil.rmtree(_data_dir, ignore_errors=True)
+
+
+@pytest.fixture(autouse=True)
+def closed_circuits():
+    # Breakers are process-wide: a test that opens one must not fail the next
+    circuit_breakers.clear()
+    yield
+    circuit_breakers.clear()
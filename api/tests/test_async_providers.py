@@ -0,0 +1,138 @@
+"""
+Tests for the async provider API (agenerate / agenerate_structured).
+
+The SDK async clients are replaced with small fakes so no network is used.
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+from pydantic import BaseModel
+
+from agent_management.llm_service import (
+    LLMService,
+    LLMModelConfig,
+    LLMRequest,
+    ProviderType,
+    StructuredLLMRequest,
+)
+
+
+class Answer(BaseModel):
+    is_true: bool
+
+
+def _chat_completion(content: str):
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+        usage=SimpleNamespace(prompt_tokens=3, completion_tokens=2, total_tokens=5),
+    )
+
+
+class FakeAsyncStream:
+    """Streams the content a few characters per chunk, with usage on the last chunk"""
+
+    def __init__(self, content: str):
+        deltas = [content[i:i + 4] for i in range(0, len(content), 4)]
+        self.chunks = [
+            SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=delta))], usage=None)
+            for delta in deltas
+        ]
+        self.chunks.append(
+            SimpleNamespace(choices=[], usage=SimpleNamespace(prompt_tokens=3, completion_tokens=2, total_tokens=5))
+        )
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for chunk in self.chunks:
+            await asyncio.sleep(0)
+            yield chunk
+
+
+class FakeAsyncCompletions:
+    def __init__(self, content: str):
+        self.content = content
+        self.calls = []
+
+    async def create(self, **params):
+        self.calls.append(params)
+        await asyncio.sleep(0)
+        if params.get("stream"):
+            return FakeAsyncStream(self.content)
+        return _chat_completion(self.content)
+
+
+def _fake_chat_client(content: str):
+    completions = FakeAsyncCompletions(content)
+    return SimpleNamespace(chat=SimpleNamespace(completions=completions)), completions
+
+
+def test_openai_agenerate(monkeypatch):
+    """OpenAI agenerate should await the async client and keep usage."""
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    service = LLMService(LLMModelConfig(provider=ProviderType.OPENAI, model_name="gpt-4o"))
+    client, completions = _fake_chat_client("hello")
+    service._provider._async_client = client
+
+    response = asyncio.run(service.agenerate("say hello"))
+
+    assert response.content == "hello"
+    assert response.model == "gpt-4o"
+    assert response.usage["total_tokens"] == 5
+    assert completions.calls[0]["messages"][-1]["content"] == "say hello"
+
+
+def test_groq_agenerate_structured(monkeypatch):
+    """Groq agenerate_structured should reuse the sync JSON repair logic."""
+    monkeypatch.setenv("GROQ_API_KEY", "test-key")
+    service = LLMService(LLMModelConfig(provider=ProviderType.GROQ, model_name="llama3-8b-8192"))
+    client, _ = _fake_chat_client("Here is the answer:\n```json\n{'is_true': true,}\n```")
+    service._provider._async_client = client
+
+    result = asyncio.run(
+        service.agenerate_structured(
+            StructuredLLMRequest[Answer](user_prompt="is water molecular?", response_model=Answer)
+        )
+    )
+
+    assert result == Answer(is_true=True)
+
+
+def test_anthropic_agenerate_runs_concurrently(monkeypatch):
+    """Many in-flight Anthropic calls should overlap on a single thread."""
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "test-key")
+    service = LLMService(
+        LLMModelConfig(provider=ProviderType.ANTHROPIC, model_name="claude-3-5-sonnet-latest")
+    )
+    in_flight = {"now": 0, "peak": 0}
+
+    class FakeMessages:
+        async def create(self, **params):
+            in_flight["now"] += 1
+            in_flight["peak"] = max(in_flight["peak"], in_flight["now"])
+            await asyncio.sleep(0.01)
+            in_flight["now"] -= 1
+            return SimpleNamespace(
+                content=[SimpleNamespace(text='{"is_true": false}')],
+                usage=SimpleNamespace(input_tokens=4, output_tokens=1),
+            )
+
+    service._provider._async_client = SimpleNamespace(messages=FakeMessages())
+
+    async def main():
+        return await asyncio.gather(
+            *[service.agenerate(LLMRequest(user_prompt=f"q{i}")) for i in range(20)]
+        )
+
+    responses = asyncio.run(main())
+
+    assert in_flight["peak"] == 20
+    assert all(r.usage["total_tokens"] == 5 for r in responses)
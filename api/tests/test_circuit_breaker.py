@@ -0,0 +1,139 @@
+"""
+Tests for the per provider/model circuit breakers.
+"""
+
+import asyncio
+import time
+
+import httpx
+import openai
+import pytest
+
+from agent_management.agent_model_config import AgentType, create_agent_llm_service
+from agent_management.circuit_breaker import (
+    BreakerSettings,
+    CircuitBreaker,
+    CircuitOpenError,
+    CircuitState,
+    circuit_breakers,
+    is_provider_failure,
+)
+from agent_management.llm_service import LLMModelConfig, LLMResponse, LLMService, ProviderType
+from agent_management.usage_tracker import record_retry
+
+FAST = BreakerSettings(min_calls=4, failure_rate=0.5, open_seconds=0.1, window_seconds=60)
+
+
+def _overloaded() -> openai.APIStatusError:
+    request = httpx.Request("POST", "https://api.example.com")
+    return openai.APIStatusError("overloaded", response=httpx.Response(529, request=request), body=None)
+
+
+def _wrapped(error: Exception) -> Exception:
+    """Providers re-raise SDK errors as plain exceptions"""
+    try:
+        raise error
+    except Exception as e:
+        try:
+            raise Exception(f"Anthropic API error: {e}")
+        except Exception as wrapped:
+            return wrapped
+
+
+@pytest.fixture(autouse=True)
+def clean_breakers(monkeypatch):
+    monkeypatch.setenv("LLM_CACHE_ENABLED", "0")
+    monkeypatch.delenv("CIRCUIT_BREAKER_ENABLED", raising=False)
+    monkeypatch.delenv("LLM_HEDGING_ENABLED", raising=False)
+    circuit_breakers.clear()
+    yield
+    circuit_breakers.settings = None
+    circuit_breakers.clear()
+
+
+def test_only_provider_side_errors_count_as_failures():
+    assert is_provider_failure(_wrapped(_overloaded()))
+    assert not is_provider_failure(_wrapped(ValueError("Invalid JSON in response")))
+
+
+def test_breaker_opens_on_failure_rate_and_recovers_through_a_probe():
+    breaker = CircuitBreaker("anthropic:claude", FAST)
+    for failed in (False, True, True, True):
+        assert breaker.acquire()
+        breaker.record(failed, 0.1)
+
+    assert breaker.state == CircuitState.OPEN
+    assert not breaker.acquire()
+
+    time.sleep(0.15)
+    assert breaker.state == CircuitState.HALF_OPEN
+    assert breaker.acquire()
+    assert not breaker.acquire()  # one probe at a time
+    breaker.record(False, 0.1)
+    assert breaker.state == CircuitState.CLOSED
+
+
+def test_a_failed_probe_reopens_and_retries_count_as_failed_attempts():
+    breaker = CircuitBreaker("openai:gpt-4o", FAST)
+    # One call that succeeded only on its third attempt
+    breaker.record(False, 0.1, failed_attempts=2)
+    breaker.record(True, 0.1)
+    assert breaker.state == CircuitState.OPEN
+
+    time.sleep(0.15)
+    assert breaker.acquire()
+    breaker.record(True, 0.1)
+    assert breaker.state == CircuitState.OPEN
+    assert breaker.stats()["times_opened"] == 2
+
+
+class FlakyProvider:
+    def __init__(self, error=None, retries=0):
+        self.error = error
+        self.retries = retries
+        self.calls = 0
+
+    def generate(self, request):
+        self.calls += 1
+        for _ in range(self.retries):
+            record_retry()
+        if self.error:
+            raise self.error
+        return LLMResponse(content="ok", model=request.llm_config.model_name)
+
+    async def agenerate(self, request):
+        return self.generate(request)
+
+
+def test_llm_service_fails_fast_while_the_circuit_is_open(monkeypatch):
+    circuit_breakers.settings = FAST
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "test-key")
+    service = LLMService(LLMModelConfig(provider=ProviderType.ANTHROPIC, model_name="claude-3-5-sonnet-latest"))
+    service._provider = FlakyProvider(error=_wrapped(_overloaded()), retries=2)
+
+    for _ in range(2):
+        with pytest.raises(Exception, match="Anthropic API error"):
+            service.generate("draw caffeine")
+
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(service.agenerate("draw caffeine"))
+    assert service._provider.calls == 2
+
+
+def test_agents_skip_to_a_healthy_fallback(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "test-key")
+    breaker = circuit_breakers.get("anthropic", "claude-3-5-sonnet-latest")
+    breaker.settings = FAST
+    for _ in range(4):
+        breaker.record(True, 0.1)
+
+    service = create_agent_llm_service(AgentType.GEOMETRY)
+    assert service.config.model_name == "gpt-4.5-preview"
+
+    # An explicit model choice is respected (and fails fast while tripped)
+    override = create_agent_llm_service(AgentType.GEOMETRY, "claude-3-5-sonnet-latest")
+    assert override.config.model_name == "claude-3-5-sonnet-latest"
+
+    monkeypatch.setenv("CIRCUIT_BREAKER_ENABLED", "0")
+    assert create_agent_llm_service(AgentType.GEOMETRY).config.model_name == "claude-3-5-sonnet-latest"
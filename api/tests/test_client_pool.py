@@ -0,0 +1,104 @@
+"""
+Tests for the shared provider client pool.
+"""
+
+import asyncio
+import threading
+
+from agent_management.llm_service import LLMModelConfig, LLMService, ProviderType
+from agent_management.providers.client_pool import ClientPool, client_pool
+
+
+def test_services_share_one_client_per_provider_and_key():
+    config = LLMModelConfig(provider=ProviderType.OPENAI, model_name="gpt-4o", api_key="sk-a")
+    other_model = LLMModelConfig(provider=ProviderType.OPENAI, model_name="gpt-4o-mini", api_key="sk-a")
+    other_key = LLMModelConfig(provider=ProviderType.OPENAI, model_name="gpt-4o", api_key="sk-b")
+
+    first = LLMService(config)._provider.client
+    assert LLMService(config)._provider.client is first
+    assert LLMService(other_model)._provider.client is first
+    assert LLMService(other_key)._provider.client is not first
+
+
+def test_pooled_clients_use_tuned_connection_limits(monkeypatch):
+    monkeypatch.setenv("LLM_HTTP_MAX_KEEPALIVE", "7")
+    pool = ClientPool()
+
+    http_client = pool.get("fake", "key", lambda http_client: http_client)
+
+    assert http_client._transport._pool._max_keepalive_connections == 7
+    assert pool.get("fake", "key", lambda http_client: object()) is http_client
+    assert pool.stats()["hits"] == 1
+    pool.close()
+
+
+def test_async_clients_are_per_event_loop():
+    pool = ClientPool()
+
+    async def get():
+        first = pool.get_async("fake", "key", lambda http_client: http_client)
+        assert pool.get_async("fake", "key", lambda http_client: object()) is first
+        return first
+
+    first_loop_client = asyncio.run(get())
+    second_loop_client = asyncio.run(get())
+
+    assert first_loop_client is not second_loop_client
+    # The client of the closed first loop has been dropped
+    assert pool.stats()["async_clients"] == 1
+
+
+def test_async_client_from_service_is_pooled():
+    service = LLMService(LLMModelConfig(provider=ProviderType.OPENAI, model_name="gpt-4o", api_key="sk-a"))
+
+    async def get():
+        return service._provider.async_client, LLMService(service.config)._provider.async_client
+
+    first, second = asyncio.run(get())
+    assert first is second
+    assert client_pool.stats()["async_clients"] >= 1
+
+
+def test_async_clients_are_closed_on_their_own_loop():
+    pool = ClientPool()
+
+    class Client:
+        closed_on = None
+
+        async def close(self):
+            self.closed_on = asyncio.get_running_loop()
+
+    other_loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=other_loop.run_forever, daemon=True)
+    thread.start()
+
+    async def get():
+        return pool.get_async("fake", "key", lambda http_client: Client()), asyncio.get_running_loop()
+
+    async def shutdown():
+        current, loop = await get()
+        await pool.aclose()
+        return current, loop
+
+    try:
+        other = asyncio.run_coroutine_threadsafe(get(), other_loop).result()[0]
+        current, loop = asyncio.run(shutdown())
+    finally:
+        other_loop.call_soon_threadsafe(other_loop.stop)
+        thread.join()
+        other_loop.close()
+
+    assert current.closed_on is loop
+    assert other.closed_on is other_loop
+    assert pool.stats()["async_clients"] == 0
+
+
+def test_pooled_httpx_async_clients_are_closed():
+    pool = ClientPool()
+
+    async def run():
+        http_client = pool.get_async("fake", "key", lambda http_client: http_client)
+        await pool.aclose()
+        return http_client
+
+    assert asyncio.run(run()).is_closed
@@ -0,0 +1,169 @@
+"""
+Tests for the CID-keyed read-through cache of PubChem data.
+"""
+
+import random
+import string
+import time
+import zlib
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+from agent_management import compound_cache
+from agent_management.compound_cache import CompoundCache
+from agent_management.pubchem_client import PubChemClient
+
+SDF = "water\n  RDKit          2D\n\n  3  2  0  0  0  0  0  0  0  0999 V2000\nM  END\n"
+
+
+def _record(cid):
+    return {
+        "id": {"id": {"cid": cid}},
+        "atoms": {"aid": [1, 2, 3], "element": [8, 1, 1]},
+        "bonds": {"aid1": [1, 1], "aid2": [2, 3], "order": [1, 1]},
+    }
+
+
+@pytest.fixture()
+def cache(tmp_path, monkeypatch):
+    monkeypatch.delenv("COMPOUND_CACHE_ENABLED", raising=False)
+    cache = CompoundCache("sqlite:///" + str(tmp_path / "compounds.sqlite3"))
+    monkeypatch.setattr(compound_cache, "_cache", cache)
+    return cache
+
+
+@pytest.fixture()
+def pubchem():
+    """Client on a fake PubChem that records the paths it is asked for"""
+    paths = []
+
+    def handler(request):
+        path = request.url.path.replace("/rest/", "", 1)
+        paths.append(path + ("?" + request.url.query.decode() if request.url.query else ""))
+        if path.endswith("/JSON") and "/cid/" in path:
+            cids = [int(cid) for cid in path.split("/")[3].split(",")]
+            return httpx.Response(200, json={"PC_Compounds": [_record(cid) for cid in cids]})
+        if path == "pug/compound/cid/962/SDF" and not request.url.query:
+            return httpx.Response(200, text=SDF)
+        return httpx.Response(404, json={"Fault": {}})
+
+    client = PubChemClient(base_url="https://pubchem.test/rest", transport=httpx.MockTransport(handler))
+    yield client, paths
+    client.close()
+
+
+def test_sdfs_and_records_are_read_through_the_cache(cache, pubchem):
+    client, paths = pubchem
+
+    assert client.sdf(962) == SDF
+    assert client.sdf(962) == SDF
+    # PubChem has no 3D conformer: the 404 is remembered too
+    assert client.sdf(962, three_d=True) is None
+    assert client.sdf(962, three_d=True) is None
+    assert client.compound(962).cid == 962
+    # Only the uncached CID is fetched, and the requested order is kept
+    assert [c.cid for c in client.compounds([963, 962])] == [963, 962]
+
+    assert paths == [
+        "pug/compound/cid/962/SDF",
+        "pug/compound/cid/962/SDF?record_type=3d",
+        "pug/compound/cid/962/JSON",
+        "pug/compound/cid/963/JSON",
+    ]
+    kinds = cache.stats()["kinds"]
+    assert (kinds["sdf_2d"]["hits"], kinds["sdf_2d"]["misses"]) == (1, 1)
+    assert kinds["record"]["stores"] == 2
+
+
+def test_transient_failures_are_not_cached(cache):
+    statuses = [503, 200]
+
+    def handler(request):
+        return httpx.Response(statuses.pop(0), text=SDF)
+
+    client = PubChemClient(base_url="https://pubchem.test/rest", transport=httpx.MockTransport(handler))
+    assert client.sdf(962) is None
+    assert client.sdf(962) == SDF
+    assert cache.get(962, "sdf_2d") == SDF
+
+
+def test_least_recently_used_entries_are_evicted_beyond_the_size_limit(tmp_path):
+    cache = CompoundCache("sqlite:///" + str(tmp_path / "compounds.sqlite3"))
+    values = {cid: "".join(random.Random(cid).choices(string.ascii_letters, k=200)) for cid in (1, 2, 3)}
+    cache.put(1, "sdf_2d", values[1])
+    cache.put(2, "sdf_2d", values[2])
+    cache.max_bytes = cache.stats()["bytes"]
+
+    cache.put(3, "sdf_2d", values[3])
+
+    assert cache.get(1, "sdf_2d") is None
+    assert cache.get(2, "sdf_2d") == values[2] and cache.get(3, "sdf_2d") == values[3]
+    assert cache.stats()["kinds"]["sdf_2d"]["evictions"] == 1
+
+
+def test_popular_entries_outlive_their_ttl_and_eviction(tmp_path, monkeypatch):
+    monkeypatch.setenv("COMPOUND_CACHE_TTL_SECONDS", "0.05")
+    cache = CompoundCache("sqlite:///" + str(tmp_path / "compounds.sqlite3"), pin_hits=2)
+    cache.put(962, "record", "water")
+    assert cache.get(962, "record") == "water"
+    assert cache.get(962, "record") == "water"
+    cache.put(241, "record", "benzene")
+
+    time.sleep(0.1)
+    cache.max_bytes = len(zlib.compress(b"water"))
+    cache.put(2519, "record", "caffeine")
+
+    # water was read twice: kept past its TTL, and unpinned caffeine is evicted first
+    assert cache.get(962, "record") == "water"
+    assert cache.get(241, "record") is None and cache.get(2519, "record") is None
+    stats = cache.stats()
+    assert (stats["entries"], stats["pinned_entries"]) == (1, 1)
+
+    # Pinned entries don't hold the cache over its size limit either
+    cache.max_bytes = 1
+    cache.put(2519, "record", "caffeine")
+    assert cache.get(962, "record") is None
+
+
+def test_pins_expire_and_missing_data_is_never_pinned(tmp_path, monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(compound_cache, "time", SimpleNamespace(time=lambda: clock[0]))
+    monkeypatch.setenv("COMPOUND_CACHE_TTL_SECONDS", "10")
+    monkeypatch.setenv("COMPOUND_CACHE_MISSING_TTL_SECONDS", "10")
+    cache = CompoundCache("sqlite:///" + str(tmp_path / "compounds.sqlite3"), pin_hits=2, pin_max_age=100)
+    cache.put(962, "record", "water")
+    cache.put(962, "sdf_3d", "")
+    for _ in range(3):
+        assert cache.get(962, "record") == "water"
+        assert cache.get(962, "sdf_3d") == ""
+
+    clock[0] += 50
+    cache.put(241, "record", "benzene")
+    assert cache.get(962, "record") == "water"
+    assert cache.get(962, "sdf_3d") is None
+
+    clock[0] += 60
+    cache.put(241, "record", "benzene")
+    assert cache.get(962, "record") is None
+
+
+def test_reads_of_a_fresh_entry_are_counted_without_writing(tmp_path, monkeypatch):
+    cache = CompoundCache("sqlite:///" + str(tmp_path / "compounds.sqlite3"), pin_hits=3)
+    cache.put(962, "record", "water")
+    writes = []
+    write = cache._write
+
+    def counting_write():
+        writes.append(True)
+        return write()
+
+    monkeypatch.setattr(cache, "_write", counting_write)
+    for _ in range(3):
+        assert cache.get(962, "record") == "water"
+    assert writes == []
+
+    # The next write carries the counted reads, pinning the entry
+    cache.put(241, "record", "benzene")
+    assert len(writes) == 1 and cache.stats()["pinned_entries"] == 1
@@ -0,0 +1,118 @@
+"""
+Tests for the blocking-work execution pools.
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from agent_management.execution_pool import (
+    BlockingExecutor,
+    OperationCancelled,
+    PoolType,
+    raise_if_cancelled,
+)
+
+
+def test_run_does_not_block_event_loop():
+    """Blocking calls on the pool should let other coroutines progress."""
+    executor = BlockingExecutor()
+    ticks = []
+
+    async def ticker():
+        for _ in range(5):
+            ticks.append(time.perf_counter())
+            await asyncio.sleep(0.01)
+
+    async def main():
+        await asyncio.gather(
+            executor.run(PoolType.LLM, time.sleep, 0.1),
+            ticker(),
+        )
+
+    asyncio.run(main())
+    executor.shutdown()
+
+    # All ticks happen while the blocking sleep is still running
+    assert len(ticks) == 5
+    assert ticks[-1] - ticks[0] < 0.1
+
+
+def test_endpoint_limit_and_stats(monkeypatch):
+    """Per-endpoint limits should cap concurrency and report wait times."""
+    monkeypatch.setenv("EXECUTOR_LIMIT_TEST_ENDPOINT", "2")
+    executor = BlockingExecutor()
+    lock = threading.Lock()
+    running = {"now": 0, "peak": 0}
+
+    def work():
+        with lock:
+            running["now"] += 1
+            running["peak"] = max(running["peak"], running["now"])
+        time.sleep(0.05)
+        with lock:
+            running["now"] -= 1
+        return threading.current_thread().name
+
+    async def main():
+        return await asyncio.gather(
+            *[executor.run(PoolType.PUBCHEM, work, endpoint="test-endpoint") for _ in range(6)]
+        )
+
+    names = asyncio.run(main())
+    stats = executor.stats()
+    executor.shutdown()
+
+    assert running["peak"] == 2
+    assert all(name.startswith("pubchem-pool") for name in names)
+    assert stats["pools"]["pubchem"]["completed"] == 6
+    assert stats["pools"]["pubchem"]["queued"] == 0
+    assert stats["endpoints"]["test-endpoint"]["limit"] == 2
+    assert stats["endpoints"]["test-endpoint"]["max_wait_ms"] > 0
+
+
+def test_exceptions_propagate_and_count_as_failed():
+    """Exceptions raised in the pool should reach the caller."""
+    executor = BlockingExecutor()
+
+    def boom():
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        asyncio.run(executor.run(PoolType.CPU, boom))
+
+    assert executor.stats()["pools"]["cpu"]["failed"] == 1
+    executor.shutdown()
+
+
+def test_cancelled_caller_flags_the_worker_thread():
+    """Blocking work sees the cancellation at its next raise_if_cancelled() check."""
+    executor = BlockingExecutor()
+    started = threading.Event()
+    outcome = []
+
+    def two_steps():
+        started.set()
+        time.sleep(0.05)
+        try:
+            raise_if_cancelled()
+            outcome.append("second step ran")
+        except OperationCancelled:
+            outcome.append("aborted")
+
+    async def main():
+        task = asyncio.create_task(executor.run(PoolType.LLM, two_steps))
+        while not started.is_set():
+            await asyncio.sleep(0.005)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(main())
+    time.sleep(0.1)
+
+    assert outcome == ["aborted"]
+    raise_if_cancelled()  # no-op outside the pools
+    executor.shutdown()
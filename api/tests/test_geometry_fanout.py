@@ -0,0 +1,92 @@
+"""
+Tests for the concurrent geometry fan-out in OrchestrationAgent.
+"""
+
+import asyncio
+import time
+
+from agent_management.agents.orchestration_agent import OrchestrationAgent
+from agent_management.llm_service import LLMModelConfig, LLMResponse, ProviderType
+from agent_management.models import OrchestrationPlan, SceneObject
+
+
+class FakeLLMService:
+    """Async-only LLM service whose latency depends on the prompt"""
+
+    def __init__(self, delays):
+        self.config = LLMModelConfig(provider=ProviderType.OPENAI, model_name="gpt-4o")
+        self.delays = delays
+        self.in_flight = 0
+        self.peak = 0
+
+    async def agenerate(self, request):
+        name = next(n for n in self.delays if f"Create a Three.js object for: {n}" in request.user_prompt)
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            await asyncio.sleep(self.delays[name])
+        finally:
+            self.in_flight -= 1
+        return LLMResponse(content=f"```javascript\n// {name}\n```", model="gpt-4o", usage={})
+
+
+def _plan(names):
+    return OrchestrationPlan(
+        scene_title="Test scene",
+        objects=[
+            SceneObject(name=n, description="d", properties={}, appears_at="00:00", relationships=[])
+            for n in names
+        ],
+    )
+
+
+def test_objects_generated_concurrently():
+    """Wall time should track the slowest object, not the sum."""
+    delays = {f"obj_{i}": 0.05 for i in range(6)}
+    service = FakeLLMService(delays)
+    agent = OrchestrationAgent(service)
+
+    started = time.perf_counter()
+    results = asyncio.run(agent.generate_geometry_from_plan(_plan(delays), max_concurrency=6))
+    elapsed = time.perf_counter() - started
+
+    assert results["_summary"]["success_count"] == 6
+    assert service.peak == 6
+    assert elapsed < 0.25
+    assert "// obj_0" in results["obj_0"]["code"]
+
+
+def test_fanout_limit_is_respected():
+    delays = {f"obj_{i}": 0.01 for i in range(5)}
+    service = FakeLLMService(delays)
+    agent = OrchestrationAgent(service)
+
+    results = asyncio.run(agent.generate_geometry_from_plan(_plan(delays), max_concurrency=2))
+
+    assert service.peak == 2
+    assert results["_summary"]["success_count"] == 5
+
+
+def test_object_deadline_returns_partial_results():
+    """Objects past their deadline are reported without failing the plan."""
+    delays = {"fast": 0.01, "slow": 1.0}
+    agent = OrchestrationAgent(FakeLLMService(delays))
+
+    results = asyncio.run(agent.generate_geometry_from_plan(_plan(delays), object_timeout=0.1))
+
+    assert results["fast"]["status"] == "success"
+    assert results["slow"]["status"] == "timeout"
+    assert results["_summary"]["timeout_count"] == 1
+    assert results["_summary"]["failure_count"] == 1
+
+
+def test_objects_waiting_for_a_slot_are_not_timed_out():
+    """The deadline covers an object's own call, not its wait behind the fan-out limit."""
+    delays = {f"obj_{i}": 0.06 for i in range(4)}
+    agent = OrchestrationAgent(FakeLLMService(delays))
+
+    results = asyncio.run(
+        agent.generate_geometry_from_plan(_plan(delays), max_concurrency=1, object_timeout=0.15)
+    )
+
+    assert results["_summary"]["success_count"] == 4
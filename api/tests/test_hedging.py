@@ -0,0 +1,203 @@
+"""
+Tests for hedged structured requests across fallback models.
+"""
+
+import asyncio
+import time
+
+import pytest
+
+from agent_management.execution_pool import OperationCancelled, PoolType, run_blocking, sleep_unless_cancelled
+from agent_management.hedging import HedgeBudget, HedgedLLMService
+from agent_management.llm_service import LLMModelConfig, LLMService, ProviderType, StructuredLLMRequest
+from agent_management.models import BooleanResponse
+
+
+class SlowProvider:
+    """Provider stand-in answering structured calls after a fixed delay"""
+
+    def __init__(self, delay, answer=True, error=None):
+        self.delay = delay
+        self.answer = answer
+        self.error = error
+        self.calls = 0
+        self.cancelled = False
+
+    def generate_structured(self, request):
+        self.calls += 1
+        time.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return BooleanResponse(is_true=self.answer)
+
+    async def agenerate_structured(self, request):
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        if self.error:
+            raise self.error
+        return BooleanResponse(is_true=self.answer)
+
+
+def _warm_budget(p95=0.05, max_fraction=0.5):
+    budget = HedgeBudget(max_fraction=max_fraction, min_samples=5, window=100)
+    for _ in range(10):
+        budget.record_latency(p95)
+        budget.start_call()
+    return budget
+
+
+def _hedged_service(monkeypatch, primary, backup, budget):
+    monkeypatch.setenv("LLM_HEDGING_ENABLED", "1")
+    monkeypatch.setenv("LLM_CACHE_ENABLED", "0")
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    service = HedgedLLMService(
+        LLMModelConfig(provider=ProviderType.OPENAI, model_name="o3-mini"),
+        agent="domain_validator",
+        fallback_models=["gpt-4o"],
+        budget=budget,
+    )
+    service._provider = primary
+    backup_service = LLMService(LLMModelConfig(provider=ProviderType.OPENAI, model_name="gpt-4o"))
+    backup_service._provider = backup
+    service._backups["gpt-4o"] = backup_service
+    return service
+
+
+def _request():
+    return StructuredLLMRequest(user_prompt="is water molecular?", response_model=BooleanResponse)
+
+
+def test_slow_primary_is_hedged_and_the_backup_wins(monkeypatch):
+    primary, backup = SlowProvider(1.0, answer=False), SlowProvider(0.01)
+    service = _hedged_service(monkeypatch, primary, backup, _warm_budget())
+
+    started = time.perf_counter()
+    result = asyncio.run(service.agenerate_structured(_request()))
+
+    assert result.is_true
+    assert time.perf_counter() - started < 0.5
+    assert primary.cancelled
+    assert service.budget.hedges == 1 and service.budget.hedge_wins == 1
+    # The primary's time so far is kept as a lower bound of its latency
+    assert service.budget.stats()["samples"] == 11
+    assert service.budget._latencies[-1] >= 0.05
+
+
+def test_blocking_calls_are_hedged_too(monkeypatch):
+    primary, backup = SlowProvider(1.0, answer=False), SlowProvider(0.01)
+    service = _hedged_service(monkeypatch, primary, backup, _warm_budget())
+
+    started = time.perf_counter()
+    assert service.generate_structured(_request()).is_true
+    assert time.perf_counter() - started < 0.5
+    assert service.budget.stats()["samples"] == 11
+
+
+def test_fast_primary_is_not_hedged_and_adds_a_latency_sample(monkeypatch):
+    primary, backup = SlowProvider(0.0), SlowProvider(0.0)
+    service = _hedged_service(monkeypatch, primary, backup, _warm_budget(p95=0.5))
+
+    asyncio.run(service.agenerate_structured(_request()))
+
+    assert backup.calls == 0
+    assert service.budget.stats()["samples"] == 11
+
+
+def test_a_failed_hedge_falls_back_to_the_primary(monkeypatch):
+    primary, backup = SlowProvider(0.2), SlowProvider(0.0, error=RuntimeError("bad json"))
+    service = _hedged_service(monkeypatch, primary, backup, _warm_budget())
+
+    assert asyncio.run(service.agenerate_structured(_request())).is_true
+    assert backup.calls == 1
+
+
+def test_budget_caps_the_fraction_of_hedged_calls(monkeypatch):
+    budget = _warm_budget(p95=0.01, max_fraction=0.1)
+    primary, backup = SlowProvider(0.05, answer=False), SlowProvider(0.0)
+    service = _hedged_service(monkeypatch, primary, backup, budget)
+
+    async def main():
+        for _ in range(10):
+            await service.agenerate_structured(_request())
+
+    asyncio.run(main())
+
+    stats = budget.stats()
+    assert stats["recent_hedged"] <= 0.1 * stats["recent_calls"]
+    assert 1 <= budget.hedges <= 2
+
+
+def test_nothing_is_hedged_without_enough_samples():
+    budget = HedgeBudget(max_fraction=1.0, min_samples=20)
+    budget.record_latency(1.0)
+    assert budget.p95() is None
+
+
+def test_agents_get_a_hedged_service_only_when_enabled(monkeypatch):
+    from agent_management.agent_model_config import AgentType, create_agent_llm_service
+
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    monkeypatch.delenv("LLM_HEDGING_ENABLED", raising=False)
+    assert not isinstance(create_agent_llm_service(AgentType.DOMAIN_VALIDATOR), HedgedLLMService)
+
+    monkeypatch.setenv("LLM_HEDGING_ENABLED", "1")
+    service = create_agent_llm_service(AgentType.DOMAIN_VALIDATOR)
+    assert isinstance(service, HedgedLLMService)
+    assert service.fallback_models == ["gpt-4o", "claude-3-5-sonnet-latest"]
+    assert not isinstance(create_agent_llm_service(AgentType.DOMAIN_VALIDATOR, "gpt-4o"), HedgedLLMService)
+
+
+def test_a_cached_answer_is_looked_up_once(monkeypatch):
+    from agent_management import llm_cache
+    from agent_management.llm_cache import LLMCache
+
+    primary, backup = SlowProvider(0.0), SlowProvider(0.0)
+    service = _hedged_service(monkeypatch, primary, backup, _warm_budget())
+    monkeypatch.setenv("LLM_CACHE_ENABLED", "1")
+    monkeypatch.setattr(llm_cache, "_cache", LLMCache(url="memory"))
+    request = _request().model_copy(update={"cache_namespace": "domain_validator"})
+
+    assert service.generate_structured(request.model_copy()).is_true
+    assert asyncio.run(service.agenerate_structured(request.model_copy())).is_true
+    assert service.generate_structured(request.model_copy()).is_true
+
+    stats = llm_cache.get_llm_cache().stats()
+    assert (stats["memory_hits"], stats["misses"]) == (2, 1)
+    assert primary.calls == 1
+
+
+class CancellableProvider(SlowProvider):
+    """Blocking provider that stops waiting once its call is cancelled"""
+
+    def generate_structured(self, request):
+        self.calls += 1
+        try:
+            sleep_unless_cancelled(self.delay)
+        except OperationCancelled:
+            self.cancelled = True
+            raise
+        return BooleanResponse(is_true=self.answer)
+
+
+def test_cancelling_a_blocking_caller_cancels_its_hedged_attempts(monkeypatch):
+    primary, backup = CancellableProvider(5.0), CancellableProvider(5.0)
+    service = _hedged_service(monkeypatch, primary, backup, _warm_budget())
+
+    async def cancel_the_caller():
+        task = asyncio.ensure_future(run_blocking(PoolType.LLM, service.generate_structured, _request()))
+        await asyncio.sleep(0.3)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    started = time.perf_counter()
+    asyncio.run(cancel_the_caller())
+    while not (primary.cancelled and backup.cancelled) and time.perf_counter() - started < 2.0:
+        time.sleep(0.01)
+
+    assert backup.calls == 1
+    assert primary.cancelled and backup.cancelled
@@ -0,0 +1,143 @@
+"""
+Tests for the Server-Sent Events stream of pipeline job progress.
+"""
+
+import asyncio
+import json
+import threading
+
+from agent_management.job_events import JobEventBus, format_sse, stream_job_events
+from agent_management.job_store import InMemoryJobStore
+
+
+def _parse(messages):
+    events = []
+    for message in messages:
+        if message.startswith(":"):
+            continue
+        lines = dict(line.split(": ", 1) for line in message.strip().split("\n"))
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+def _final(job_id, job):
+    return {"job_id": job_id, "status": job["status"], "result": job.get("result")}
+
+
+async def _collect(store, bus, job_id, driver, poll_interval=5.0):
+    messages = []
+
+    async def consume():
+        async for message in stream_job_events(job_id, store, _final, bus=bus, poll_interval=poll_interval):
+            messages.append(message)
+
+    consumer = asyncio.create_task(consume())
+    await asyncio.sleep(0.01)
+    await driver()
+    await asyncio.wait_for(consumer, timeout=2.0)
+    return _parse(messages)
+
+
+def test_format_sse():
+    assert format_sse("progress", {"a": 1}) == 'event: progress\ndata: {"a": 1}\n\n'
+
+
+def test_stream_pushes_published_progress_and_single_final_event():
+    store = InMemoryJobStore("pipeline")
+    bus = JobEventBus()
+    store.create("job-1")
+
+    async def delivered():
+        # Let the stream take the event off its queue, however long a GC pause delays it
+        await asyncio.sleep(0.01)
+        while any(not queue.empty() for _, queue in bus._subscribers.get("job-1", ())):
+            await asyncio.sleep(0.001)
+
+    async def driver():
+        store.update("job-1", stage="script")
+        bus.publish("job-1", {"stage": "script"})
+        await delivered()
+        store.set_progress("job-1", 0.5)
+        bus.publish("job-1", {"progress": 0.5})
+        await delivered()
+        store.update("job-1", status="completed", progress=1.0, result={"js": "x"})
+        bus.publish("job-1", {"status": "completed"})
+
+    # A long poll interval proves the events are pushed, not polled
+    events = asyncio.run(_collect(store, bus, "job-1", driver))
+
+    names = [name for name, _ in events]
+    assert names.count("completed") == 1
+    assert names[-1] == "completed"
+    assert events[-1][1]["result"] == {"js": "x"}
+    progress = [data for name, data in events if name == "progress"]
+    assert [p["stage"] for p in progress] == [None, "script", "script"]
+    assert progress[-1]["progress"] == 0.5
+    assert bus.subscriber_count("job-1") == 0
+
+
+def test_stream_falls_back_to_polling_the_store():
+    """Changes made by another worker (no bus event) are still picked up."""
+    store = InMemoryJobStore("pipeline")
+    store.create("job-2")
+
+    async def driver():
+        store.update("job-2", status="error", error="boom")
+
+    events = asyncio.run(_collect(store, JobEventBus(), "job-2", driver, poll_interval=0.02))
+
+    assert events[-1][0] == "failed"
+    assert events[-1][1]["status"] == "error"
+
+
+def test_stream_for_missing_job_fails():
+    async def run():
+        return [m async for m in stream_job_events("nope", InMemoryJobStore("pipeline"), _final, bus=JobEventBus())]
+
+    events = _parse(asyncio.run(run()))
+    assert events == [("failed", {"job_id": "nope", "status": "failed", "error": "Job not found"})]
+
+
+def test_disconnect_before_completion_calls_on_disconnect():
+    store = InMemoryJobStore("pipeline")
+    store.create("job-3")
+    disconnected = []
+
+    async def main():
+        stream = stream_job_events(
+            "job-3", store, _final, bus=JobEventBus(), on_disconnect=lambda: disconnected.append(True)
+        )
+        first = await stream.__anext__()
+        await stream.aclose()
+        return first
+
+    assert asyncio.run(main()).startswith("event: progress")
+    assert disconnected == [True]
+
+
+def test_store_is_read_off_the_event_loop_and_async_disconnect_handlers_run():
+    store = InMemoryJobStore("pipeline")
+    store.create("job-4")
+    readers = set()
+    get = store.get
+    cancelled = []
+
+    def recording_get(job_id, **kwargs):
+        readers.add(threading.current_thread().name.split("_")[0])
+        return get(job_id, **kwargs)
+
+    store.get = recording_get
+
+    async def cancel():
+        await asyncio.sleep(0)
+        cancelled.append(True)
+
+    async def main():
+        stream = stream_job_events("job-4", store, _final, bus=JobEventBus(), on_disconnect=cancel)
+        await stream.__anext__()
+        await stream.aclose()
+        await asyncio.sleep(0.01)
+
+    asyncio.run(main())
+    assert readers == {"store-pool"}
+    assert cancelled == [True]
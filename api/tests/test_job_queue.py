@@ -0,0 +1,86 @@
+"""
+Tests for admission control of background pipeline jobs.
+"""
+
+import asyncio
+
+import pytest
+
+from agent_management.job_queue import DEFAULT_JOB_SECONDS, JobQueue, QueueFullError
+
+
+def test_runs_at_most_workers_jobs_and_reports_positions():
+    queue = JobQueue("test", workers=2, max_depth=10)
+    running = []
+    peak = []
+
+    def job(name):
+        async def run():
+            running.append(name)
+            peak.append(len(running))
+            await asyncio.sleep(0.02)
+            running.remove(name)
+        return run
+
+    async def main():
+        positions = [queue.submit(f"job-{i}", job(f"job-{i}")) for i in range(5)]
+        assert queue.position("job-0") == 0
+        assert queue.position("job-4") == 3
+        while queue.stats()["running"] or queue.depth:
+            await asyncio.sleep(0.01)
+        return positions
+
+    assert asyncio.run(main()) == [0, 0, 1, 2, 3]
+    assert max(peak) == 2
+    assert queue.stats()["completed"] == 5
+
+
+def test_full_queue_rejects_with_estimated_wait():
+    queue = JobQueue("test", workers=1, max_depth=2)
+
+    async def main():
+        for i in range(3):
+            queue.submit(f"job-{i}", lambda: asyncio.sleep(1))
+        with pytest.raises(QueueFullError) as excinfo:
+            queue.submit("job-3", lambda: asyncio.sleep(1))
+        for i in range(3):
+            queue.cancel(f"job-{i}")
+        return excinfo.value
+
+    error = asyncio.run(main())
+
+    assert error.depth == 2
+    assert error.retry_after == 3 * DEFAULT_JOB_SECONDS
+    assert queue.stats()["rejected"] == 1
+
+
+def test_estimate_uses_observed_durations():
+    queue = JobQueue("test", workers=2, max_depth=10)
+
+    async def main():
+        queue.submit("job-0", lambda: asyncio.sleep(0.05))
+        await asyncio.sleep(0.1)
+
+    asyncio.run(main())
+
+    assert 0.04 < queue.avg_job_seconds < 0.1
+    assert queue.estimate_wait(3) == pytest.approx(2 * queue.avg_job_seconds)
+
+
+def test_cancel_waiting_job():
+    queue = JobQueue("test", workers=1, max_depth=10)
+    started = []
+
+    async def record(name):
+        started.append(name)
+
+    async def main():
+        queue.submit("job-0", lambda: record("job-0"))
+        queue.submit("job-1", lambda: record("job-1"))
+        assert queue.cancel("job-1")
+        await asyncio.sleep(0.01)
+
+    asyncio.run(main())
+
+    assert started == ["job-0"]
+    assert not queue.cancel("missing")
@@ -0,0 +1,165 @@
+"""
+Tests for the persistent job store.
+"""
+
+import sqlite3
+import time
+
+import pytest
+
+from agent_management.job_store import InMemoryJobStore, SQLJobStore
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_store(request, tmp_path):
+    url = f"sqlite:///{tmp_path / 'jobs.sqlite3'}"
+
+    def factory(kind="pipeline", ttl_seconds=60, **options):
+        if request.param == "memory":
+            return InMemoryJobStore(kind, ttl_seconds=ttl_seconds, **options)
+        return SQLJobStore(kind, url, ttl_seconds=ttl_seconds, **options)
+
+    return factory
+
+
+def test_create_update_and_get(make_store):
+    store = make_store()
+    store.create("job-1", prompt="caffeine")
+
+    assert "job-1" in store
+    assert store.update("job-1", status="completed", result={"html": "<html/>"}, title="Caffeine")
+
+    job = store.get("job-1")
+    assert job["status"] == "completed"
+    assert job["result"] == {"html": "<html/>"}
+    assert job["prompt"] == "caffeine"
+    assert job["title"] == "Caffeine"
+    assert store.get("missing") is None
+    assert not store.update("missing", status="error")
+
+
+def test_progress_never_moves_backwards(make_store):
+    store = make_store()
+    store.create("job-1")
+
+    assert store.set_progress("job-1", 0.7)
+    assert not store.set_progress("job-1", 0.4)
+    assert store.get("job-1")["progress"] == 0.7
+
+
+def test_find_by_status_and_kind(make_store):
+    pipeline = make_store("pipeline")
+    geometry = make_store("geometry")
+    pipeline.create("a")
+    pipeline.create("b")
+    geometry.create("c")
+    pipeline.update("b", status="completed")
+
+    assert [job["job_id"] for job in pipeline.find(status="completed")] == ["b"]
+    assert {job["job_id"] for job in pipeline.find()} == {"a", "b"}
+    assert geometry.get("a") is None
+
+
+def test_expired_jobs_are_hidden_and_purged(make_store):
+    store = make_store(ttl_seconds=0.05)
+    store.create("job-1")
+    time.sleep(0.1)
+
+    assert store.get("job-1") is None
+    assert store.purge_expired() == 1
+
+
+def test_sql_store_is_shared_between_instances(tmp_path):
+    """Two stores on the same database behave like two uvicorn workers."""
+    url = f"sqlite:///{tmp_path / 'jobs.sqlite3'}"
+    worker_a = SQLJobStore("pipeline", url)
+    worker_b = SQLJobStore("pipeline", url)
+
+    worker_a.create("job-1", prompt="water")
+    worker_b.set_progress("job-1", 0.5)
+
+    assert worker_a.get("job-1")["progress"] == 0.5
+    assert worker_b.get("job-1")["prompt"] == "water"
+
+
+def test_large_result_fields_spill_to_disk(make_store, tmp_path):
+    store = make_store()
+    store.spill_threshold = 1024
+    store.artifact_dir = str(tmp_path / "artifacts" / "pipeline")
+    html = "<html>" + "x" * 4096 + "</html>"
+    store.create("job-1")
+    store.update("job-1", status="completed", result={"html": html, "title": "Water"})
+
+    assert store.get("job-1")["result"] == {"html": html, "title": "Water"}
+    reference = store.get("job-1", with_artifacts=False)["result"]["html"]
+    assert reference["bytes"] == len(html)
+    assert store.stats()["spilled_bytes"] == len(html)
+
+    store.delete("job-1")
+    assert store.stats()["spilled_bytes"] == 0
+
+
+def test_least_recently_used_finished_jobs_are_evicted(make_store, tmp_path):
+    store = make_store(max_jobs=2, artifact_dir=str(tmp_path))
+    store.create("running")
+    store.create("old")
+    store.update("old", status="completed")
+    store.create("new")
+    store.update("new", status="completed")
+
+    # "running" is the least recently used but still in progress
+    assert store.get("old") is None
+    assert store.get("running") is not None
+    assert store.get("new") is not None
+    assert store.stats()["evictions"] == 1
+
+
+def test_memory_store_is_bounded_by_resident_size(tmp_path):
+    store = InMemoryJobStore(
+        "pipeline", max_bytes=20_000, artifact_dir=str(tmp_path), spill_threshold=10**9
+    )
+    for i in range(10):
+        store.create(f"job-{i}")
+        store.update(f"job-{i}", status="completed", result={"html": "x" * 5000})
+
+    stats = store.stats()
+    assert stats["resident_bytes"] <= 20_000
+    assert stats["jobs"] < 10
+    assert store.get("job-9") is not None
+
+
+def test_sql_store_is_bounded_by_stored_and_spilled_size(tmp_path):
+    store = SQLJobStore(
+        "pipeline",
+        f"sqlite:///{tmp_path / 'jobs.sqlite3'}",
+        max_bytes=20_000,
+        artifact_dir=str(tmp_path / "artifacts"),
+        spill_threshold=1024,
+    )
+    for i in range(10):
+        store.create(f"job-{i}")
+        store.update(f"job-{i}", status="completed", result={"html": "x" * 5000})
+
+    # Each job's html is on disk, and its files go with it when it is evicted
+    stats = store.stats()
+    assert stats["stored_bytes"] + stats["spilled_bytes"] <= 20_000
+    assert stats["jobs"] < 10 and stats["evictions"] == 10 - stats["jobs"]
+    assert stats["spilled_bytes"] == 5000 * stats["jobs"]
+    assert store.get("job-0") is None
+    assert store.get("job-9")["result"] == {"html": "x" * 5000}
+
+
+def test_jobs_databases_from_before_the_size_bound_are_upgraded(tmp_path):
+    path = tmp_path / "jobs.sqlite3"
+    with sqlite3.connect(path) as conn:
+        conn.execute(
+            "CREATE TABLE jobs (id VARCHAR(64) PRIMARY KEY, kind VARCHAR(32) NOT NULL, "
+            "status VARCHAR(32) NOT NULL, progress FLOAT NOT NULL, error TEXT, result TEXT, "
+            "data TEXT NOT NULL, created_at FLOAT NOT NULL, updated_at FLOAT NOT NULL, "
+            "expires_at FLOAT NOT NULL)"
+        )
+    store = SQLJobStore("pipeline", f"sqlite:///{path}")
+
+    store.create("job-1")
+    assert store.update("job-1", status="completed", result={"html": "<html/>"})
+    assert store.get("job-1")["result"] == {"html": "<html/>"}
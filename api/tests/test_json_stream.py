@@ -0,0 +1,104 @@
+"""
+Tests for the incremental JSON extractor used for Groq structured output.
+"""
+
+import math
+from types import SimpleNamespace
+
+import pytest
+
+from agent_management.llm_service import LLMModelConfig, LLMService, ProviderType, StructuredLLMRequest
+from agent_management.models import BooleanResponse
+from agent_management.providers.json_stream import IncompleteJSONError, IncrementalJSONParser, extract_json
+
+
+def test_fenced_single_quoted_json_with_trailing_commas():
+    text = "Here is the JSON:\n```json\n{'name': 'water', 'atoms': ['H', 'O', 'H',], 'note': 'say \"hi\"',}\n```"
+    assert extract_json(text) == {"name": "water", "atoms": ["H", "O", "H"], "note": 'say "hi"'}
+
+
+def test_javascript_values_and_unquoted_keys():
+    value = extract_json("{rotation: Math.PI / 2, scale: 2 * Math.sqrt(4), seed: Math.random(), ok: True, x: .5}")
+    assert value == {"rotation": math.pi / 2, "scale": 4.0, "seed": 0, "ok": True, "x": 0.5}
+
+
+def test_strings_keep_their_braces_and_escapes():
+    text = '{"code": "function f() { return \'}\'; }", "path": "a\\\\b", "quote": \'it\\\'s\'}'
+    assert extract_json(text) == {"code": "function f() { return '}'; }", "path": "a\\b", "quote": "it's"}
+
+
+def test_think_blocks_are_skipped():
+    text = '<think>Maybe {"is_true": false}? No.</think>\n```json\n{"is_true": true}\n```'
+    assert extract_json(text) == {"is_true": True}
+
+
+def test_object_is_returned_as_soon_as_it_closes():
+    text = "Sure! <think>{draft}</think> {'a': [1, 2, {'b': 'c'}],}\nHope this helps {not json"
+    parser = IncrementalJSONParser()
+    fed = 0
+    # Feed one character at a time so every token and tag is split across deltas
+    for char in text:
+        fed += 1
+        if parser.feed(char):
+            break
+
+    assert parser.finish() == {"a": [1, 2, {"b": "c"}]}
+    assert text[:fed].endswith("}],}")
+
+
+def test_incomplete_and_missing_objects_raise():
+    with pytest.raises(IncompleteJSONError):
+        extract_json('{"a": [1, 2')
+    with pytest.raises(IncompleteJSONError):
+        extract_json("I can't answer that.")
+
+
+def _stream(content, size=3):
+    chunks = [
+        SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=content[i:i + size]))], usage=None)
+        for i in range(0, len(content), size)
+    ]
+    chunks.append(SimpleNamespace(choices=[], usage=SimpleNamespace(prompt_tokens=7, completion_tokens=5, total_tokens=12)))
+    return chunks
+
+
+class FakeStream(list):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+def _groq_service(monkeypatch, content):
+    monkeypatch.setenv("GROQ_API_KEY", "test-key")
+    monkeypatch.setenv("LLM_CACHE_ENABLED", "0")
+    service = LLMService(LLMModelConfig(provider=ProviderType.GROQ, model_name="deepseek-r1-distill-llama-70b"))
+    calls = []
+
+    def create(**params):
+        calls.append(params)
+        return FakeStream(_stream(content))
+
+    service._provider.client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    return service, calls
+
+
+def test_groq_structured_calls_parse_the_stream(monkeypatch):
+    service, calls = _groq_service(monkeypatch, "<think>{'is_true': false}</think>\n```json\n{'is_true': true,}\n```")
+
+    result = service.generate_structured(
+        StructuredLLMRequest(user_prompt="is water molecular?", response_model=BooleanResponse)
+    )
+
+    assert result.is_true
+    assert calls[0]["stream"] is True
+
+
+def test_groq_structured_validation_errors_are_reported(monkeypatch):
+    service, _ = _groq_service(monkeypatch, '{"is_true": "maybe"}')
+
+    with pytest.raises(Exception, match="Failed to validate response against model"):
+        service.generate_structured(
+            StructuredLLMRequest(user_prompt="is water molecular?", response_model=BooleanResponse)
+        )
@@ -0,0 +1,131 @@
+"""
+Tests for the per-model performance statistics and latency-aware model routing.
+"""
+
+import time
+
+import pytest
+
+from agent_management.agent_model_config import AgentType, create_agent_llm_service
+from agent_management.circuit_breaker import circuit_breakers
+from agent_management.llm_service import LLMModelConfig, LLMResponse, LLMService, ProviderType
+from agent_management.model_config import get_model_performance
+from agent_management.model_performance import ModelPerformanceTracker, model_performance
+
+
+@pytest.fixture(autouse=True)
+def clean_stats(monkeypatch):
+    for provider in ("OPENAI", "ANTHROPIC", "GROQ"):
+        monkeypatch.setenv(f"{provider}_API_KEY", "test-key")
+    monkeypatch.setenv("LLM_CACHE_ENABLED", "0")
+    monkeypatch.delenv("LLM_HEDGING_ENABLED", raising=False)
+    monkeypatch.delenv("LATENCY_ROUTING_ENABLED", raising=False)
+    monkeypatch.delenv("LATENCY_SLO_DOMAIN_VALIDATOR_MS", raising=False)
+    model_performance.clear()
+    circuit_breakers.clear()
+    yield
+    model_performance.clear()
+
+
+def _measure(model, seconds, count=20, failed=False, agent="domain_validator"):
+    for _ in range(count):
+        model_performance.record(model, seconds, failed, agent=agent)
+
+
+def test_tracker_percentiles_error_rate_and_agent_samples():
+    tracker = ModelPerformanceTracker(window=100, max_age=60, min_samples=5)
+    for i in range(1, 21):
+        tracker.record("gpt-4o", i / 10, failed=False, agent="caption")
+    for _ in range(5):
+        tracker.record("gpt-4o", 10.0, failed=True, agent="geometry")
+
+    caption = tracker.performance("gpt-4o", "caption")
+    assert (caption.samples, caption.p50_ms, caption.p95_ms, caption.error_rate) == (20, 1000.0, 1900.0, 0.0)
+    overall = tracker.performance("gpt-4o")
+    assert overall.samples == 25 and overall.error_rate == 0.2
+    # Too few samples of the agent's own: unknown, whatever the other agents measured
+    assert tracker.performance("gpt-4o", "script") is None
+    assert tracker.performance("o3-mini") is None
+    assert set(tracker.stats()["gpt-4o"]["by_agent"]) == {"caption", "geometry"}
+
+
+def test_old_samples_expire():
+    tracker = ModelPerformanceTracker(window=100, max_age=0.05, min_samples=1)
+    tracker.record("gpt-4o", 1.0, failed=False)
+    time.sleep(0.1)
+    assert tracker.performance("gpt-4o") is None
+
+
+def test_llm_service_records_provider_calls():
+    class FakeProvider:
+        def generate(self, request):
+            time.sleep(0.01)
+            return LLMResponse(content="ok", model="gpt-4o", usage={})
+
+    service = LLMService(LLMModelConfig(provider=ProviderType.OPENAI, model_name="gpt-4o"), agent="caption")
+    service._provider = FakeProvider()
+    for _ in range(10):
+        service.generate("caption this")
+
+    stats = model_performance.stats()["gpt-4o"]
+    assert stats["samples"] == 10 and stats["p50_ms"] >= 10
+    assert stats["by_agent"]["caption"]["samples"] == 10
+    assert get_model_performance("gpt-4o", "caption").error_rate == 0.0
+
+
+def test_preferred_model_is_kept_while_it_meets_the_slo():
+    assert create_agent_llm_service(AgentType.DOMAIN_VALIDATOR).config.model_name == "o3-mini"
+    _measure("o3-mini", 1.0)
+    assert create_agent_llm_service(AgentType.DOMAIN_VALIDATOR).config.model_name == "o3-mini"
+
+
+def test_models_measured_only_by_other_agents_are_unknown_to_an_agent():
+    # Slow script calls don't say how fast the domain validator's calls are
+    _measure("o3-mini", 8.0, agent="script")
+    _measure("gpt-4o", 2.0)
+    assert create_agent_llm_service(AgentType.DOMAIN_VALIDATOR).config.model_name == "o3-mini"
+
+
+def test_slow_preferred_model_is_routed_to_a_model_within_the_slo():
+    _measure("o3-mini", 8.0)
+    _measure("gpt-4o", 2.0)
+    assert create_agent_llm_service(AgentType.DOMAIN_VALIDATOR).config.model_name == "gpt-4o"
+
+    # When every configured model is slow, the cheapest general model that
+    # hasn't been measured yet is tried
+    _measure("gpt-4o", 7.0)
+    _measure("claude-3-5-sonnet-latest", 6.0)
+    assert create_agent_llm_service(AgentType.DOMAIN_VALIDATOR).config.model_name == "llama3-8b-8192"
+
+    # An explicit model choice and agents without an SLO are left alone
+    assert create_agent_llm_service(AgentType.DOMAIN_VALIDATOR, "o3-mini").config.model_name == "o3-mini"
+    _measure("o3-mini", 8.0, agent="aggregator")
+    assert create_agent_llm_service(AgentType.AGGREGATOR).config.model_name == "o3-mini"
+
+
+def test_each_model_is_measured_once_per_routing(monkeypatch):
+    # Samples ageing out during routing make a second look return None
+    measured = model_performance.performance
+    _measure("o3-mini", 8.0)
+    _measure("gpt-4o", 9.0)
+    _measure("claude-3-5-sonnet-latest", 7.0)
+    looked_up = []
+
+    def once(model, agent=None):
+        looked_up.append(model)
+        return measured(model, agent) if looked_up.count(model) == 1 else None
+
+    monkeypatch.setattr(model_performance, "performance", once)
+    assert create_agent_llm_service(AgentType.DOMAIN_VALIDATOR).config.model_name == "llama3-8b-8192"
+
+
+def test_failing_models_are_avoided_and_routing_can_be_turned_off(monkeypatch):
+    _measure("o3-mini", 0.5, count=10)
+    _measure("o3-mini", 0.5, count=10, failed=True)
+    assert create_agent_llm_service(AgentType.DOMAIN_VALIDATOR).config.model_name == "gpt-4o"
+
+    monkeypatch.setenv("LATENCY_SLO_DOMAIN_VALIDATOR_MS", "0")
+    assert create_agent_llm_service(AgentType.DOMAIN_VALIDATOR).config.model_name == "o3-mini"
+    monkeypatch.delenv("LATENCY_SLO_DOMAIN_VALIDATOR_MS")
+    monkeypatch.setenv("LATENCY_ROUTING_ENABLED", "0")
+    assert create_agent_llm_service(AgentType.DOMAIN_VALIDATOR).config.model_name == "o3-mini"
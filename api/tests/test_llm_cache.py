@@ -0,0 +1,198 @@
+"""
+Tests for the content-addressed LLM response cache.
+"""
+
+import asyncio
+import sqlite3
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from agent_management import llm_cache
+from agent_management.llm_cache import LLMCache, cache_key
+from agent_management.llm_service import (
+    LLMModelConfig,
+    LLMRequest,
+    LLMResponse,
+    LLMService,
+    ProviderType,
+    StructuredLLMRequest,
+)
+from agent_management.models import BooleanResponse, MolecularStructure
+
+
+class CountingProvider:
+    """Provider stand-in that counts the calls that reach it"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def generate(self, request):
+        self.calls += 1
+        return LLMResponse(content=f"answer {self.calls}", model="fake", usage={"total_tokens": 3})
+
+    def generate_structured(self, request):
+        self.calls += 1
+        return BooleanResponse(is_true=True)
+
+    async def agenerate(self, request):
+        return self.generate(request)
+
+    async def agenerate_structured(self, request):
+        return self.generate_structured(request)
+
+
+@pytest.fixture
+def service(tmp_path, monkeypatch):
+    monkeypatch.setattr(llm_cache, "_cache", LLMCache(url=f"sqlite:///{tmp_path}/cache.sqlite3"))
+    config = LLMModelConfig(provider=ProviderType.OPENAI, model_name="gpt-4o", api_key="sk-test")
+    service = LLMService(config)
+    service._provider = CountingProvider()
+    return service
+
+
+def test_cached_requests_skip_the_provider(service):
+    request = LLMRequest(user_prompt="formula of water", temperature=0.1, cache_namespace="molecular_formula")
+
+    first = service.generate(request)
+    second = service.generate(request.model_copy())
+
+    assert service._provider.calls == 1
+    assert second == first
+    stats = llm_cache.get_llm_cache().stats()
+    assert stats["namespaces"]["molecular_formula"]["memory_hits"] == 1
+    assert stats["misses"] == 1
+
+
+def test_requests_without_a_namespace_are_not_cached(service):
+    service.generate(LLMRequest(user_prompt="formula of water"))
+    service.generate(LLMRequest(user_prompt="formula of water"))
+
+    assert service._provider.calls == 2
+
+
+def test_structured_responses_round_trip_and_async_shares_entries(service):
+    request = StructuredLLMRequest[BooleanResponse](
+        user_prompt="is caffeine molecular?", response_model=BooleanResponse, cache_namespace="domain_validator"
+    )
+
+    assert service.generate_structured(request).is_true is True
+    cached = asyncio.run(service.agenerate_structured(request.model_copy()))
+
+    assert isinstance(cached, BooleanResponse) and cached.is_true is True
+    assert service._provider.calls == 1
+
+
+def test_async_calls_use_the_cache_off_the_event_loop(service, monkeypatch):
+    cache = llm_cache.get_llm_cache()
+    threads = []
+    for name in ("get", "put"):
+        original = getattr(cache, name)
+
+        def recording(*args, _original=original, **kwargs):
+            threads.append(threading.current_thread().name.split("_")[0])
+            return _original(*args, **kwargs)
+
+        monkeypatch.setattr(cache, name, recording)
+    request = LLMRequest(user_prompt="formula of water", cache_namespace="molecular_formula")
+
+    async def main():
+        return await service.agenerate(request), await service.agenerate(request.model_copy())
+
+    first, second = asyncio.run(main())
+
+    assert second == first and service._provider.calls == 1
+    # Miss, store, hit
+    assert threads == ["store-pool"] * 3
+
+
+def test_key_covers_prompt_sampling_and_schema():
+    config = LLMModelConfig(provider=ProviderType.OPENAI, model_name="gpt-4o")
+    base = StructuredLLMRequest(
+        user_prompt="aspirin", llm_config=config, response_model=BooleanResponse, cache_namespace="ns"
+    )
+
+    assert cache_key(base) == cache_key(base.model_copy())
+    assert cache_key(base) != cache_key(base.model_copy(update={"temperature": 0.2}))
+    assert cache_key(base) != cache_key(base.model_copy(update={"user_prompt": "caffeine"}))
+    assert cache_key(base) != cache_key(base.model_copy(update={"response_model": MolecularStructure}))
+    other_model = LLMModelConfig(provider=ProviderType.OPENAI, model_name="gpt-4o-mini")
+    assert cache_key(base) != cache_key(base.model_copy(update={"llm_config": other_model}))
+
+
+def test_disk_tier_survives_a_new_process(tmp_path):
+    url = f"sqlite:///{tmp_path}/cache.sqlite3"
+    LLMCache(url=url).put("k", "interpret_query", "caffeine")
+
+    fresh = LLMCache(url=url)
+
+    assert fresh.get("k", "interpret_query") == "caffeine"
+    assert fresh.get("k", "interpret_query") == "caffeine"
+    counters = fresh.stats()["namespaces"]["interpret_query"]
+    assert counters["disk_hits"] == 1 and counters["memory_hits"] == 1
+
+
+def test_entries_expire_per_namespace_ttl(tmp_path, monkeypatch):
+    monkeypatch.setenv("LLM_CACHE_TTL_SHORT", "0.05")
+    cache = LLMCache(url=f"sqlite:///{tmp_path}/cache.sqlite3")
+    cache.put("a", "short", "x")
+    cache.put("b", "diagram_plan", "y")
+
+    time.sleep(0.1)
+
+    assert cache.get("a", "short") is None
+    assert cache.get("b", "diagram_plan") == "y"
+    assert cache.purge_expired() == 1
+
+
+def test_memory_tier_is_lru_bounded():
+    cache = LLMCache(url="memory", max_entries=2)
+    cache.put("a", "ns", "1")
+    cache.put("b", "ns", "2")
+    cache.get("a", "ns")
+    cache.put("c", "ns", "3")
+
+    assert cache.get("b", "ns") is None
+    assert cache.get("a", "ns") == "1"
+    assert cache.stats()["memory_entries"] == 2
+
+
+def test_disk_tier_is_purged_and_lru_bounded(tmp_path, monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(llm_cache, "time", SimpleNamespace(time=lambda: clock[0]))
+    monkeypatch.setenv("LLM_CACHE_TTL_SHORT", "10")
+    url = f"sqlite:///{tmp_path}/cache.sqlite3"
+    cache = LLMCache(url=url, max_bytes=2001)
+    cache.PURGE_INTERVAL = 0
+    cache.put("expiring", "short", "x")
+    cache.put("a", "ns", "a" * 1000)
+    clock[0] += 1
+    cache.put("b", "ns", "b" * 1000)
+
+    # "a" is read from memory later on: its last use still reaches the disk tier
+    clock[0] += 100
+    assert cache.get("a", "ns") == "a" * 1000
+    clock[0] += 1
+    cache.put("c", "ns", "c" * 1000)
+
+    fresh = LLMCache(url=url)
+    assert fresh.get("expiring", "short") is None
+    assert fresh.get("b", "ns") is None
+    assert fresh.get("a", "ns") == "a" * 1000 and fresh.get("c", "ns") == "c" * 1000
+    stats = cache.stats()
+    assert (stats["disk_entries"], stats["disk_bytes"], stats["evictions"]) == (2, 2000, 1)
+
+
+def test_old_cache_databases_get_the_last_use_column(tmp_path):
+    path = tmp_path / "cache.sqlite3"
+    with sqlite3.connect(path) as conn:
+        conn.execute(
+            "CREATE TABLE llm_cache (key VARCHAR(64) PRIMARY KEY, namespace VARCHAR(64) NOT NULL, "
+            "value TEXT NOT NULL, created_at FLOAT NOT NULL, expires_at FLOAT NOT NULL)"
+        )
+    cache = LLMCache(url=f"sqlite:///{path}")
+
+    cache.put("k", "ns", "v")
+    assert LLMCache(url=f"sqlite:///{path}").get("k", "ns") == "v"
@@ -0,0 +1,86 @@
+"""
+Tests for the domain validator's local fast path.
+"""
+
+import asyncio
+
+from agent_management.agents.domain_bool_agent import DomainValidator
+from agent_management.molecular_index import is_formula, is_smiles, match_molecular
+from agent_management.models import BooleanResponse
+
+
+class RecordingLLMService:
+    """LLM service stand-in that records the structured requests it receives"""
+
+    def __init__(self, verdict: bool):
+        self.verdict = verdict
+        self.requests = []
+
+    def generate_structured(self, request):
+        self.requests.append(request)
+        return BooleanResponse(is_true=self.verdict)
+
+
+def test_obvious_prompts_are_matched_locally():
+    assert match_molecular("Show me caffeine") == "name"
+    assert match_molecular("Draw the carbon dioxide molecule") == "name"
+    assert match_molecular("Draw H2O") == "formula"
+    assert match_molecular("Ca(OH)2") == "formula"
+    assert match_molecular("Render CC(=O)OC1=CC=CC=C1C(=O)O") == "smiles"
+    assert match_molecular("Show me isomers") == "term"
+
+
+def test_ambiguous_prompts_are_left_to_the_llm():
+    assert match_molecular("Draw a car") is None
+    assert match_molecular("OK, show the CNN logo") is None
+    assert match_molecular("Explain compound interest") is None
+    # A known name inside a longer request isn't the whole request
+    assert match_molecular("What does carbon dioxide look like?") is None
+    assert match_molecular("Ca(OH)2 in solution") is None
+    assert match_molecular("How do I extract caffeine at home") is None
+
+
+def test_everyday_words_and_controlled_substances_are_not_indexed():
+    assert match_molecular("ATP tennis rankings") is None
+    assert match_molecular("price of a diamond ring") is None
+    assert match_molecular("water cycle") is None
+    assert match_molecular("show me water") is None
+    assert match_molecular("draw methamphetamine") is None
+
+
+def test_formula_and_smiles_rules_reject_words():
+    assert is_formula("NaCl") and is_formula("C6H12O6") and is_formula("CO")
+    assert not is_formula("OK") and not is_formula("Hi") and not is_formula("I")
+    assert is_smiles("c1ccccc1") and is_smiles("O=C=O")
+    assert not is_smiles("CCO") and not is_smiles("2024") and not is_smiles("x=5")
+
+
+def test_validator_skips_the_llm_for_local_matches(monkeypatch):
+    service = RecordingLLMService(verdict=False)
+    validator = DomainValidator(service)
+
+    assert validator.is_molecular("show me serotonin").is_true is True
+    assert service.requests == []
+
+    assert validator.is_molecular("a unicorn in space").is_true is False
+    assert len(service.requests) == 1
+
+    monkeypatch.setenv("DOMAIN_VALIDATOR_FAST_PATH", "0")
+    validator.is_molecular("show me serotonin")
+    assert len(service.requests) == 2
+
+
+def test_the_route_checks_the_index_once_per_prompt(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    from agent_management import molecular_index
+    from routers.prompt import routes
+
+    service = RecordingLLMService(verdict=False)
+    monkeypatch.setattr(
+        routes.AgentFactory, "create_domain_validator", staticmethod(lambda model=None: DomainValidator(service))
+    )
+    before = molecular_index.stats()["ambiguous"]
+
+    assert asyncio.run(routes._validate_molecular("a unicorn in space", None, "test")).is_true is False
+    assert len(service.requests) == 1
+    assert molecular_index.stats()["ambiguous"] == before + 1
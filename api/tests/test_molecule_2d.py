@@ -1,10 +1,10 @@
 import json
 from types import SimpleNamespace
-import requests
 import pytest
 from typing import Dict, Any
 
 from agent_management.agents.pubchem_agent import PubChemAgent
+from agent_management.pubchem_client import pubchem_client
 from agent_management.llm_service import LLMService, LLMModelConfig, ProviderType
 
 
@@ -53,12 +53,13 @@ def test_get_molecule_2d_info_mock(monkeypatch, sample_sdf):
         status_code = 200
         text = sample_sdf
 
-    def fake_get(url, timeout=30):
+    def fake_get(path, params=None):
         return FakeResponse()
 
+    monkeypatch.setenv("COMPOUND_CACHE_ENABLED", "0")
     monkeypatch.setattr(agent, "interpret_user_query", fake_interpret)
     monkeypatch.setattr(agent, "_search_with_fallbacks", fake_search)
-    monkeypatch.setattr(requests, "get", fake_get)
+    monkeypatch.setattr(pubchem_client, "get", fake_get)
 
     result = agent.get_molecule_2d_info("water")
     assert result["cid"] == 962
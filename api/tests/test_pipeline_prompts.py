@@ -0,0 +1,88 @@
+"""
+Tests that a scene script flows through the prompt pipeline's agents into their prompts.
+
+Every agent shares one fake LLM service that answers by response model and
+records the requests it gets, so no network is used.
+"""
+
+import asyncio
+import os
+
+from agent_management.agents.animation_agent import AnimationAgent
+from agent_management.agents.orchestration_agent import OrchestrationAgent
+from agent_management.agents.script_agent import ScriptAgent
+from agent_management.job_store import InMemoryJobStore
+from agent_management.llm_service import LLMModelConfig, LLMResponse, ProviderType
+from agent_management.models import OrchestrationPlan, SceneObject, SceneScript, ScriptTimePoint
+
+SCRIPT = SceneScript(
+    title="Water",
+    content=[
+        ScriptTimePoint(timecode="00:00", atoms=["O1", "H1", "H2"], caption="Water is bent"),
+        ScriptTimePoint(timecode="00:15", atoms=[], caption="Its bond angle is 104.5 degrees"),
+    ],
+)
+
+PLAN = OrchestrationPlan(
+    scene_title="Water",
+    objects=[SceneObject(name="water", description="A water molecule", properties={}, appears_at="00:00")],
+)
+
+
+class RecordingLLMService:
+    """Answers script, plan, geometry and animation requests and keeps every request"""
+
+    def __init__(self):
+        self.config = LLMModelConfig(provider=ProviderType.OPENAI, model_name="gpt-4o")
+        self.requests = []
+
+    async def agenerate_structured(self, request):
+        self.requests.append(request)
+        return SCRIPT if request.response_model is SceneScript else PLAN
+
+    async def agenerate(self, request):
+        self.requests.append(request)
+        if "Create a Three.js object for" in request.user_prompt:
+            code = "const water = new THREE.Group();"
+        else:
+            code = "// 00:00 - show water\nconst water = scene.getObjectByName('water');"
+        return LLMResponse(content=f"```javascript\n{code}\n```", model="gpt-4o", usage={})
+
+
+def test_timecodes_atoms_and_captions_reach_the_orchestration_and_animation_prompts(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    from routers.prompt import routes
+
+    service = RecordingLLMService()
+    jobs = InMemoryJobStore("pipeline")
+    monkeypatch.setattr(routes, "pipeline_jobs", jobs)
+    monkeypatch.setattr(routes.AgentFactory, "create_script_agent", staticmethod(lambda model=None: ScriptAgent(service)))
+    monkeypatch.setattr(
+        routes.AgentFactory, "create_orchestration_agent", staticmethod(lambda model=None: OrchestrationAgent(service))
+    )
+    monkeypatch.setattr(routes.AgentFactory, "create_animation_agent", staticmethod(lambda model=None: AnimationAgent(service)))
+
+    jobs.create("job-prompts", status="processing", progress=0.0)
+    try:
+        asyncio.run(routes._run_prompt_pipeline("job-prompts", "show me water", None))
+    finally:
+        # The saving stage writes the scene files next to the app
+        static_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(routes.__file__))), "static")
+        for name in ("scene_job-prompts.js", "scene_job-prompts.html"):
+            path = os.path.join(static_dir, name)
+            if os.path.exists(path):
+                os.remove(path)
+
+    job = jobs.get("job-prompts")
+    assert job["status"] == "completed", job.get("error")
+
+    plan_prompt = next(r.user_prompt for r in service.requests if getattr(r, "response_model", None) is OrchestrationPlan)
+    animation_prompt = service.requests[-1].user_prompt
+    for prompt in (plan_prompt, animation_prompt):
+        assert "TIMECODE 00:00:\nATOMS: O1, H1, H2\nCAPTION: Water is bent" in prompt
+        assert "TIMECODE 00:15:\nCAPTION: Its bond angle is 104.5 degrees" in prompt
+
+    question_service = RecordingLLMService()
+    question_service.generate_structured = lambda request: question_service.requests.append(request)
+    OrchestrationAgent(question_service).generate_test_questions(SCRIPT)
+    assert "ATOMS: O1, H1, H2\nCAPTION: Water is bent" in question_service.requests[0].user_prompt
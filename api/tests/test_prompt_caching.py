@@ -0,0 +1,81 @@
+"""
+Tests for the cacheable prompt layout and provider prompt-cache accounting.
+"""
+
+from types import SimpleNamespace
+
+import pytest
+
+from agent_management.agents.geometry_agent import GEOMETRY_SYSTEM_PROMPT, GeometryAgent
+from agent_management.agents.script_agent import SCRIPT_SYSTEM_PROMPT, ScriptAgent
+from agent_management.llm_service import LLMModelConfig, LLMRequest, ProviderType
+from agent_management.providers.anthropic_provider import AnthropicProvider
+from agent_management.usage_tracker import CallRecord, estimate_cost, usage_from
+
+
+class StubService:
+    config = LLMModelConfig(provider=ProviderType.ANTHROPIC, model_name="claude-3-5-sonnet-latest")
+
+
+def test_agent_requests_share_a_static_prefix():
+    geometry = GeometryAgent(StubService())
+    first, second = geometry._build_request("a water molecule"), geometry._build_request("a DNA helix")
+
+    assert first.system_prompt == second.system_prompt == GEOMETRY_SYSTEM_PROMPT
+    assert "water" not in first.system_prompt and "water" in first.user_prompt
+    assert len(first.user_prompt) < 200
+
+    script = ScriptAgent(StubService())._build_script_request("photosynthesis")
+    assert script.system_prompt == SCRIPT_SYSTEM_PROMPT
+    assert "photosynthesis" not in script.system_prompt
+
+
+def test_anthropic_marks_long_system_prompts_for_caching(monkeypatch):
+    monkeypatch.delenv("PROMPT_CACHING_ENABLED", raising=False)
+    config = LLMModelConfig(provider=ProviderType.ANTHROPIC, model_name="claude-3-5-sonnet-latest")
+    provider = AnthropicProvider(api_key="test-key")
+
+    params = provider._build_params(
+        LLMRequest(system_prompt=GEOMETRY_SYSTEM_PROMPT, user_prompt="caffeine", llm_config=config)
+    )
+    assert params["system"] == [
+        {"type": "text", "text": GEOMETRY_SYSTEM_PROMPT, "cache_control": {"type": "ephemeral"}}
+    ]
+
+    short = provider._build_params(LLMRequest(system_prompt="Be brief.", user_prompt="hi", llm_config=config))
+    assert short["system"] == "Be brief."
+
+    monkeypatch.setenv("PROMPT_CACHING_ENABLED", "0")
+    params = provider._build_params(
+        LLMRequest(system_prompt=GEOMETRY_SYSTEM_PROMPT, user_prompt="caffeine", llm_config=config)
+    )
+    assert params["system"] == GEOMETRY_SYSTEM_PROMPT
+
+
+def test_cached_prompt_tokens_are_reported_for_both_usage_styles():
+    openai_usage = SimpleNamespace(
+        prompt_tokens=2000, completion_tokens=100, total_tokens=2100,
+        prompt_tokens_details=SimpleNamespace(cached_tokens=1536),
+    )
+    assert usage_from(openai_usage) == {
+        "prompt_tokens": 2000, "completion_tokens": 100, "total_tokens": 2100, "cached_tokens": 1536,
+    }
+
+    anthropic_usage = SimpleNamespace(
+        input_tokens=50, output_tokens=100, cache_read_input_tokens=1800, cache_creation_input_tokens=200,
+    )
+    usage = usage_from(anthropic_usage)
+    assert usage["prompt_tokens"] == 2050
+    assert usage["cached_tokens"] == 1800 and usage["cache_write_tokens"] == 200
+
+
+def test_cached_tokens_are_priced_at_the_discounted_rate():
+    full = estimate_cost("gpt-4o", 1_000_000, 0)
+    assert estimate_cost("gpt-4o", 1_000_000, 0, cached_tokens=1_000_000) == pytest.approx(full / 2)
+
+    sonnet = estimate_cost("claude-3-5-sonnet-latest", 1_000_000, 0)
+    assert estimate_cost("claude-3-5-sonnet-latest", 1_000_000, 0, cached_tokens=1_000_000) == pytest.approx(sonnet / 10)
+
+    record = CallRecord(provider="openai", model="gpt-4o", operation="generate")
+    record.set_usage({"prompt_tokens": 10, "completion_tokens": 1, "total_tokens": 11, "cached_tokens": 8})
+    assert record.cached_tokens == 8
@@ -0,0 +1,149 @@
+"""
+Tests for the pooled PubChem HTTP client.
+"""
+
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import pytest
+
+from agent_management.pubchem_client import CompoundNotFoundError, PubChemClient, operation_name
+
+WATER = {
+    "id": {"id": {"cid": 962}},
+    "atoms": {"aid": [1, 2, 3], "element": [8, 1, 1]},
+    "bonds": {"aid1": [1, 1], "aid2": [2, 3], "order": [1, 1]},
+    "props": [{"urn": {"label": "Molecular Formula"}, "value": {"sval": "H2O"}}],
+}
+
+
+def _pubchem(request: httpx.Request) -> httpx.Response:
+    """Stand-in for the PUG REST endpoints the client uses"""
+    path = request.url.path
+    if path == "/rest/pug/compound/cid/962/JSON":
+        return httpx.Response(200, json={"PC_Compounds": [WATER]})
+    if path == "/rest/pug/compound/cid/962,963/JSON":
+        other = dict(WATER, id={"id": {"cid": 963}})
+        return httpx.Response(200, json={"PC_Compounds": [WATER, other]})
+    if path == "/rest/pug/compound/cid/962/synonyms/JSON":
+        return httpx.Response(200, json={"InformationList": {"Information": [{"CID": 962, "Synonym": ["water", "oxidane"]}]}})
+    if path == "/rest/pug/compound/fastformula/H2O/cids/JSON":
+        return httpx.Response(200, json={"IdentifierList": {"CID": [962, 963]}})
+    if path == "/rest/pug/compound/cid/500/SDF":
+        return httpx.Response(503, text="busy")
+    return httpx.Response(404, json={"Fault": {"Code": "PUGREST.NotFound"}})
+
+
+@pytest.fixture(autouse=True)
+def no_compound_cache(monkeypatch):
+    # Every lookup here must reach the transport (see test_compound_cache.py)
+    monkeypatch.setenv("COMPOUND_CACHE_ENABLED", "0")
+
+
+@pytest.fixture()
+def client():
+    transport = httpx.MockTransport(_pubchem)
+    client = PubChemClient(base_url="https://pubchem.test/rest", transport=transport, async_transport=transport)
+    yield client
+    client.close()
+
+
+def test_operation_names_drop_the_identifier():
+    assert operation_name("pug/compound/cid/962/SDF?record_type=3d") == "cid/SDF"
+    assert operation_name("pug/compound/name/water/cids/JSON") == "name/cids/JSON"
+    assert operation_name("autocomplete/compound/wat/json") == "autocomplete"
+
+
+def test_compounds_are_pubchempy_records_with_pooled_synonyms(client):
+    water = client.compound(962)
+    assert (water.cid, water.molecular_formula, water.elements) == (962, "H2O", ["O", "H", "H"])
+    assert water.synonyms == ["water", "oxidane"]
+
+    assert [c.cid for c in client.compounds(client.cids_by_formula("H2O"))] == [962, 963]
+    with pytest.raises(CompoundNotFoundError):
+        client.compound(1)
+
+
+def test_async_api_matches_the_sync_one(client):
+    async def lookup():
+        return await client.aget_json("pug/compound/cid/962/JSON"), await client.aget_json("pug/compound/cid/1/JSON")
+
+    water, missing = asyncio.run(lookup())
+    assert water["PC_Compounds"][0]["id"]["id"]["cid"] == 962 and missing is None
+
+
+def test_stats_count_calls_errors_and_latency_per_operation(client):
+    client.get("pug/compound/cid/962/JSON")
+    client.get("pug/compound/cid/962/JSON")
+    client.get("pug/compound/cid/500/SDF")
+    with pytest.raises(httpx.HTTPStatusError):
+        client.get_json("pug/compound/cid/500/SDF")
+
+    stats = client.stats()
+    operations = stats["operations"]
+    assert stats["calls"] == 4
+    assert (operations["cid/JSON"]["calls"], operations["cid/JSON"]["errors"]) == (2, 0)
+    assert operations["cid/JSON"]["p95_ms"] is not None
+    assert (operations["cid/SDF"]["calls"], operations["cid/SDF"]["errors"]) == (2, 2)
+
+
+class _KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        body = json.dumps({"PC_Compounds": [WATER]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def test_connections_are_reused_across_calls_and_threads():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _KeepAliveHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    client = PubChemClient(base_url=f"http://127.0.0.1:{server.server_address[1]}/rest")
+    try:
+        for _ in range(5):
+            client.compound(962)
+        threads = [threading.Thread(target=client.compound, args=(962,)) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        async def lookups():
+            await asyncio.gather(*(client.aget_json("pug/compound/cid/962/JSON") for _ in range(3)))
+            await client.aget_json("pug/compound/cid/962/JSON")
+
+        asyncio.run(lookups())
+
+        stats = client.stats()
+        assert stats["calls"] == 12
+        # One connection for the sequential calls, at most one more per
+        # concurrent caller, instead of one per request
+        assert 1 <= stats["connections_opened"] <= 7
+        assert stats["http_versions"] == {"HTTP/1.1": 12}
+    finally:
+        client.close()
+        server.shutdown()
+        server.server_close()
+
+
+def test_async_clients_are_closed_at_shutdown():
+    client = PubChemClient(base_url="https://pubchem.test/rest", async_transport=httpx.MockTransport(_pubchem))
+
+    async def lookup_and_shut_down():
+        assert (await client.aget_json("pug/compound/cid/962/JSON"))["PC_Compounds"]
+        http_client = client._async_client()
+        await client.aclose()
+        return http_client
+
+    assert asyncio.run(lookup_and_shut_down()).is_closed
+    assert client.stats()["calls"] == 1
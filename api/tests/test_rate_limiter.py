@@ -0,0 +1,172 @@
+"""
+Tests for the token-bucket rate limiter shared by LLM calls.
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from agent_management import rate_limiter
+from agent_management.llm_service import LLMModelConfig, LLMResponse, LLMService, ProviderType
+from agent_management.rate_limiter import RateLimiter, RateLimitExceeded, configured_buckets
+from agent_management.usage_tracker import usage_tracker
+
+
+@pytest.fixture(autouse=True)
+def limits(monkeypatch):
+    for name in ("RATE_LIMIT_URL", "RATE_LIMIT_ENABLED", "RATE_LIMIT_MAX_WAIT_SECONDS"):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setenv("RATE_LIMIT_BURST_SECONDS", "2")
+    monkeypatch.setenv("LLM_CACHE_ENABLED", "0")
+
+
+def test_limits_are_read_per_provider_and_model(monkeypatch):
+    monkeypatch.setenv("RATE_LIMIT_GROQ_RPM", "30")
+    monkeypatch.setenv("RATE_LIMIT_OPENAI_GPT_4O_TPM", "60000")
+
+    requests, tokens = configured_buckets("groq", "llama3-70b-8192")
+    assert [(b.key, b.capacity, b.rate) for b in requests] == [("groq:rpm", 1.0, 0.5)]
+    assert tokens == []
+
+    requests, tokens = configured_buckets("openai", "gpt-4o")
+    assert requests == [] and [(b.key, b.capacity) for b in tokens] == [("openai:gpt-4o:tpm", 2000.0)]
+    assert configured_buckets("openai", "gpt-4o-mini") == ([], [])
+
+
+def test_requests_beyond_the_burst_wait_for_their_turn(monkeypatch):
+    monkeypatch.setenv("RATE_LIMIT_OPENAI_RPM", "60")
+    limiter = RateLimiter("memory")
+
+    waits = [limiter.reserve("openai", "gpt-4o", 10).wait for _ in range(4)]
+
+    assert waits[:2] == [0.0, 0.0]
+    assert waits[2] == pytest.approx(1.0, abs=0.05)
+    assert waits[3] == pytest.approx(2.0, abs=0.05)
+    assert limiter.reserve("anthropic", "claude-3-5-sonnet-latest", 10) is None
+
+
+def test_token_reservations_are_settled_to_the_real_usage(monkeypatch):
+    monkeypatch.setenv("RATE_LIMIT_OPENAI_TPM", "30000")  # 500 tokens/s, 1000 token bucket
+    limiter = RateLimiter("memory")
+
+    first = limiter.reserve("openai", "gpt-4o", 900)
+    assert first.wait == 0.0
+    first.settle(100)
+
+    # Without the refund this reservation would have to wait ~1.6s
+    assert limiter.reserve("openai", "gpt-4o", 900).wait == 0.0
+
+
+def test_waits_beyond_the_maximum_fail_without_taking_capacity(monkeypatch):
+    monkeypatch.setenv("RATE_LIMIT_OPENAI_RPM", "6")  # one request per 10s
+    limiter = RateLimiter("memory")
+    limiter.reserve("openai", "gpt-4o", 10)
+
+    with pytest.raises(RateLimitExceeded):
+        limiter.reserve("openai", "gpt-4o", 10, max_wait=5)
+    assert limiter.reserve("openai", "gpt-4o", 10, max_wait=15).wait == pytest.approx(10.0, abs=0.1)
+    assert limiter.stats()["buckets"]["openai:rpm"]["rejected"] == 1
+
+
+def test_buckets_are_shared_by_workers_and_threads(monkeypatch, tmp_path):
+    monkeypatch.setenv("RATE_LIMIT_GROQ_RPM", "600")  # 10 requests/s, 20 request bucket
+    url = "sqlite:///" + str(tmp_path / "rate_limits.sqlite3")
+    # Two limiters on one database stand in for two uvicorn workers
+    workers = [RateLimiter(url), RateLimiter(url)]
+    admitted = []
+
+    def call(limiter):
+        admitted.append(limiter.reserve("groq", "llama3-70b-8192", 10).ready_at)
+
+    threads = [threading.Thread(target=call, args=(workers[i % 2],)) for i in range(30)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # Past the burst, calls are admitted one refill (0.1s) apart
+    admitted.sort()
+    gaps = [later - earlier for earlier, later in zip(admitted[20:], admitted[21:])]
+    assert len(gaps) == 9 and min(gaps) >= 0.099
+    assert admitted[-1] - admitted[0] >= 0.9
+
+
+class FakeProvider:
+    def generate(self, request):
+        return LLMResponse(content="ok", model="gpt-4o", usage={"total_tokens": 5})
+
+    async def agenerate(self, request):
+        return self.generate(request)
+
+
+def test_llm_service_waits_for_the_limit(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    monkeypatch.setenv("RATE_LIMIT_BURST_SECONDS", "0.1")
+    monkeypatch.setenv("RATE_LIMIT_OPENAI_GPT_4O_RPM", "600")  # 10 requests/s, 1 request bucket
+    monkeypatch.setattr(rate_limiter, "_limiter", RateLimiter("memory"))
+    service = LLMService(LLMModelConfig(provider=ProviderType.OPENAI, model_name="gpt-4o"))
+    service._provider = FakeProvider()
+
+    async def burst():
+        return await asyncio.gather(*(service.agenerate("draw water") for _ in range(4)))
+
+    started = time.perf_counter()
+    asyncio.run(burst())
+    service.generate("draw water")
+
+    assert time.perf_counter() - started >= 0.35
+    throttled = [record.throttled_ms for record in usage_tracker.records()[-5:]]
+    assert throttled[0] == 0.0 and max(throttled) >= 250
+
+    monkeypatch.setenv("RATE_LIMIT_ENABLED", "0")
+    started = time.perf_counter()
+    for _ in range(5):
+        service.generate("draw water")
+    assert time.perf_counter() - started < 0.1
+
+
+def test_cancelled_waits_give_their_capacity_back(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    monkeypatch.setenv("RATE_LIMIT_OPENAI_RPM", "6")
+    limiter = RateLimiter("memory")
+    monkeypatch.setattr(rate_limiter, "_limiter", limiter)
+    service = LLMService(LLMModelConfig(provider=ProviderType.OPENAI, model_name="gpt-4o"))
+    service._provider = FakeProvider()
+
+    async def cancel_a_waiting_call():
+        service.generate("draw water")
+        task = asyncio.create_task(service.agenerate("draw water"))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(cancel_a_waiting_call())
+
+    # Only the completed call's request is still taken
+    assert limiter.reserve("openai", "gpt-4o", 10).wait == pytest.approx(10.0, abs=0.5)
+
+
+def test_async_calls_reserve_and_settle_off_the_event_loop(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    monkeypatch.setenv("RATE_LIMIT_OPENAI_TPM", "60000")
+    limiter = RateLimiter("memory")
+    monkeypatch.setattr(rate_limiter, "_limiter", limiter)
+    threads = []
+    for name in ("reserve", "_refund"):
+        original = getattr(limiter, name)
+
+        def recording(*args, _original=original, **kwargs):
+            threads.append(threading.current_thread().name.split("_")[0])
+            return _original(*args, **kwargs)
+
+        monkeypatch.setattr(limiter, name, recording)
+    service = LLMService(LLMModelConfig(provider=ProviderType.OPENAI, model_name="gpt-4o"))
+    service._provider = FakeProvider()
+
+    asyncio.run(service.agenerate("draw water"))
+
+    # The reservation, then the refund of the tokens the call didn't use
+    assert threads == ["store-pool", "store-pool"]
@@ -0,0 +1,145 @@
+"""
+Tests for the record/replay LLM provider used for offline load testing.
+"""
+
+import asyncio
+import time
+
+import pytest
+
+from agent_management.llm_service import (
+    LLMModelConfig,
+    LLMRequest,
+    LLMResponse,
+    LLMService,
+    ProviderType,
+    StructuredLLMRequest,
+)
+from agent_management.models import BooleanResponse
+from agent_management.providers.replay_provider import (
+    FixtureStore,
+    RecordingProvider,
+    ReplayMissError,
+    ReplayProvider,
+    latency_model,
+)
+
+
+class FakeProvider:
+    """Stands in for a real provider while recording"""
+
+    def generate(self, request):
+        return LLMResponse(content=f"answer to {request.user_prompt}", model="gpt-4o", usage={"total_tokens": 12})
+
+    def generate_structured(self, request):
+        return BooleanResponse(is_true=True)
+
+    async def agenerate(self, request):
+        return self.generate(request)
+
+    async def agenerate_structured(self, request):
+        return self.generate_structured(request)
+
+
+@pytest.fixture
+def fixtures_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("LLM_FIXTURES_DIR", str(tmp_path))
+    monkeypatch.setenv("LLM_CACHE_ENABLED", "0")
+    monkeypatch.setenv("LLM_REPLAY_LATENCY", "none")
+    monkeypatch.delenv("LLM_REPLAY_STRICT", raising=False)
+    return tmp_path
+
+
+def _record(monkeypatch, fixtures_dir, prompt="draw water"):
+    monkeypatch.setenv("LLM_REPLAY_MODE", "record")
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    service = LLMService(LLMModelConfig(provider=ProviderType.OPENAI, model_name="gpt-4o"))
+    assert isinstance(service._provider, RecordingProvider)
+    service._provider.provider = FakeProvider()
+    service.generate(LLMRequest(user_prompt=prompt, system_prompt="You draw molecules."))
+    service.generate_structured(
+        StructuredLLMRequest(user_prompt="is water molecular?", response_model=BooleanResponse)
+    )
+
+
+def test_recorded_calls_are_replayed_without_api_keys(monkeypatch, fixtures_dir):
+    _record(monkeypatch, fixtures_dir)
+    assert len(list(fixtures_dir.glob("*.json"))) == 2
+
+    monkeypatch.setenv("LLM_REPLAY_MODE", "replay")
+    monkeypatch.delenv("OPENAI_API_KEY")
+    service = LLMService(LLMModelConfig(provider=ProviderType.OPENAI, model_name="gpt-4o"))
+    assert isinstance(service._provider, ReplayProvider)
+
+    response = asyncio.run(service.agenerate(LLMRequest(user_prompt="draw water", system_prompt="You draw molecules.")))
+    assert response.content == "answer to draw water"
+    assert response.usage == {"total_tokens": 12}
+    result = service.generate_structured(
+        StructuredLLMRequest(user_prompt="is water molecular?", response_model=BooleanResponse)
+    )
+    assert result.is_true
+
+
+def test_unrecorded_requests_use_a_fixture_of_the_same_kind(monkeypatch, fixtures_dir):
+    _record(monkeypatch, fixtures_dir)
+    service = LLMService(LLMModelConfig(provider=ProviderType.REPLAY, model_name="replay"))
+
+    # Same system prompt (the agent's static prefix), different user prompt
+    response = service.generate(LLMRequest(user_prompt="draw methane", system_prompt="You draw molecules."))
+    assert response.content == "answer to draw water"
+
+    with pytest.raises(ReplayMissError):
+        service.generate(LLMRequest(user_prompt="draw methane", system_prompt="Another agent"))
+
+    monkeypatch.setenv("LLM_REPLAY_STRICT", "1")
+    strict = LLMService(LLMModelConfig(provider=ProviderType.REPLAY, model_name="replay"))
+    with pytest.raises(ReplayMissError):
+        strict.generate(LLMRequest(user_prompt="draw methane", system_prompt="You draw molecules."))
+
+
+def test_replayed_streams_are_split_into_deltas(fixtures_dir):
+    store = FixtureStore(str(fixtures_dir))
+    request = LLMRequest(
+        user_prompt="x", llm_config=LLMModelConfig(provider=ProviderType.REPLAY, model_name="replay")
+    )
+    RecordingProvider(FakeProvider(), store).generate(request)
+
+    chunks = list(ReplayProvider(store, latency=lambda recorded: 0.0).stream(request))
+
+    assert [chunk.delta for chunk in chunks[:-1]] == ["answer ", "to ", "x"]
+    assert chunks[-1].is_final and chunks[-1].content == "answer to x"
+
+
+def test_latency_models(monkeypatch):
+    monkeypatch.setenv("LLM_REPLAY_LATENCY_SCALE", "0.5")
+    assert latency_model("recorded")(2.0) == 1.0
+    assert latency_model("fixed:0.4")(None) == 0.2
+
+    monkeypatch.delenv("LLM_REPLAY_LATENCY_SCALE")
+    first = [latency_model("lognormal:0.5,0.3", seed=7)(None) for _ in range(3)]
+    uniform = latency_model("uniform:0.1,0.2", seed=7)
+    samples = [uniform(None) for _ in range(50)]
+    assert all(0.1 <= sample <= 0.2 for sample in samples)
+    assert first == [latency_model("lognormal:0.5,0.3", seed=7)(None) for _ in range(3)]
+
+    with pytest.raises(ValueError):
+        latency_model("gaussian")
+
+
+def test_replayed_calls_wait_for_the_synthetic_latency(fixtures_dir):
+    store = FixtureStore(str(fixtures_dir))
+    request = LLMRequest(
+        user_prompt="x", llm_config=LLMModelConfig(provider=ProviderType.REPLAY, model_name="replay")
+    )
+    RecordingProvider(FakeProvider(), store).generate(request)
+    provider = ReplayProvider(store, latency=latency_model("fixed:0.1"))
+
+    async def ten_concurrent_calls():
+        return await asyncio.gather(*(provider.agenerate(request) for _ in range(10)))
+
+    started = time.perf_counter()
+    responses = asyncio.run(ten_concurrent_calls())
+    elapsed = time.perf_counter() - started
+
+    assert len(responses) == 10
+    assert 0.1 <= elapsed < 0.5
@@ -0,0 +1,247 @@
+"""
+Tests for the shared provider retry policy.
+"""
+
+import asyncio
+import contextvars
+import threading
+import time
+from types import SimpleNamespace
+
+import anthropic
+import httpx
+import openai
+import pytest
+from pydantic import BaseModel
+
+from agent_management.execution_pool import OperationCancelled, _cancel_flag
+from agent_management.llm_service import LLMModelConfig, LLMService, ProviderType, StructuredLLMRequest
+from agent_management.providers.retry_policy import (
+    ErrorKind,
+    RetryPolicy,
+    classify_error,
+    retry_after_seconds,
+)
+
+
+def _status_error(status: int, headers=None) -> openai.APIStatusError:
+    request = httpx.Request("POST", "https://api.example.com/v1/chat/completions")
+    response = httpx.Response(status, headers=headers or {}, request=request)
+    return openai.APIStatusError("error", response=response, body=None)
+
+
+def test_errors_are_classified_by_type_and_status():
+    request = httpx.Request("POST", "https://api.example.com")
+    assert classify_error(_status_error(429)) == ErrorKind.RATE_LIMIT
+    assert classify_error(_status_error(529)) == ErrorKind.OVERLOADED
+    assert classify_error(_status_error(502)) == ErrorKind.SERVER
+    assert classify_error(_status_error(400)) == ErrorKind.CLIENT
+    assert classify_error(openai.APITimeoutError(request=request)) == ErrorKind.TIMEOUT
+    assert classify_error(openai.APIConnectionError(request=request)) == ErrorKind.CONNECTION
+    # The message no longer decides: a client error mentioning "rate limit" is not retried
+    assert classify_error(ValueError("rate limit exceeded")) == ErrorKind.OTHER
+
+
+def test_retry_after_headers_take_precedence():
+    policy = RetryPolicy(base_delay=10.0, max_delay=30.0)
+
+    assert retry_after_seconds(_status_error(429, {"retry-after": "2"})) == 2.0
+    assert retry_after_seconds(_status_error(429, {"retry-after-ms": "250"})) == 0.25
+    assert policy.delay_for(_status_error(429, {"retry-after": "2"}), attempt=1) == 2.0
+    assert policy.delay_for(_status_error(429, {"retry-after": "120"}), attempt=1) == 30.0
+    assert 0 <= policy.delay_for(_status_error(503), attempt=3) <= 30.0
+
+
+def test_retryable_errors_are_retried_until_success():
+    policy = RetryPolicy(max_attempts=3, base_delay=0.0)
+    calls = []
+
+    def flaky():
+        calls.append(1)
+        if len(calls) < 3:
+            raise _status_error(503)
+        return "ok"
+
+    assert policy.call("Test", flaky) == "ok"
+    assert len(calls) == 3
+
+
+def test_client_errors_and_exhausted_attempts_are_raised():
+    policy = RetryPolicy(max_attempts=2, base_delay=0.0)
+    calls = []
+
+    def bad_request():
+        calls.append(1)
+        raise _status_error(400)
+
+    with pytest.raises(openai.APIStatusError):
+        policy.call("Test", bad_request)
+    assert len(calls) == 1
+
+    async def overloaded():
+        calls.append(1)
+        raise _status_error(529)
+
+    with pytest.raises(openai.APIStatusError):
+        asyncio.run(policy.acall("Test", overloaded))
+    assert len(calls) == 3
+
+
+def test_async_backoff_does_not_block_the_event_loop():
+    policy = RetryPolicy(max_attempts=2)
+
+    async def rate_limited_then_ok(state):
+        if not state:
+            state.append(1)
+            raise _status_error(429, {"retry-after": "0.2"})
+        return "ok"
+
+    async def main():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        task = asyncio.create_task(ticker())
+        result = await policy.acall("Test", rate_limited_then_ok, [])
+        task.cancel()
+        return result, ticks
+
+    result, ticks = asyncio.run(main())
+    assert result == "ok"
+    assert ticks >= 10
+
+
+def test_blocking_backoff_stops_when_the_caller_is_cancelled():
+    policy = RetryPolicy(max_attempts=3)
+    flag = threading.Event()
+
+    def always_overloaded():
+        raise _status_error(529, {"retry-after": "10"})
+
+    def run():
+        _cancel_flag.set(flag)
+        policy.call("Test", always_overloaded)
+
+    threading.Timer(0.1, flag.set).start()
+    started = time.monotonic()
+    with pytest.raises(OperationCancelled):
+        # Own context, so the cancel flag doesn't leak into other tests
+        contextvars.copy_context().run(run)
+    assert time.monotonic() - started < 5
+
+
+def test_providers_share_the_policy_and_disable_sdk_retries(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    provider = LLMService(LLMModelConfig(provider=ProviderType.OPENAI, model_name="gpt-4o"))._provider
+
+    assert provider.client.max_retries == 0
+    assert isinstance(provider.retry_policy, RetryPolicy)
+
+
+class _FakeMessageStream:
+    """Stand-in for anthropic's MessageStream over a list of events"""
+
+    def __init__(self, events):
+        self._events = iter(events)
+        self.closed = False
+
+    def __next__(self):
+        event = next(self._events)
+        if isinstance(event, Exception):
+            raise event
+        return event
+
+    def __iter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return self.__next__()
+        except StopIteration:
+            raise StopAsyncIteration
+
+    def __aiter__(self):
+        return self
+
+    def close(self):
+        self.closed = True
+
+    def get_final_message(self):
+        return SimpleNamespace(usage=SimpleNamespace(input_tokens=3, output_tokens=2))
+
+
+class _FakeAsyncMessageStream(_FakeMessageStream):
+    async def close(self):
+        self.closed = True
+
+    async def get_final_message(self):
+        return super().get_final_message()
+
+
+class _FakeStreamingMessages:
+    """messages.stream that fails to open, then fails on the first event, then succeeds"""
+
+    def __init__(self):
+        self.attempts = 0
+        self.opened = []
+
+    def _next_stream(self, stream_type=_FakeMessageStream):
+        attempt, self.attempts = self.attempts, self.attempts + 1
+        if attempt == 0:
+            raise anthropic.APIStatusError("overloaded", response=_anthropic_response(529), body=None)
+        first = (
+            anthropic.APIStatusError(
+                "overloaded", response=_anthropic_response(200),
+                body={"type": "error", "error": {"type": "overloaded_error"}},
+            )
+            if attempt == 1
+            else SimpleNamespace(type="message_start")
+        )
+        delta = SimpleNamespace(type="content_block_delta", delta=SimpleNamespace(type="text_delta", text='{"is_true": true}'))
+        stream = stream_type([first, delta])
+        self.opened.append(stream)
+        return stream
+
+    def stream(self, **params):
+        messages = self
+
+        class Manager:
+            def __enter__(self):
+                return messages._next_stream()
+
+            async def __aenter__(self):
+                return messages._next_stream(_FakeAsyncMessageStream)
+
+        return Manager()
+
+
+def _anthropic_response(status):
+    return httpx.Response(status, request=httpx.Request("POST", "https://api.anthropic.com/v1/messages"))
+
+
+class _Answer(BaseModel):
+    is_true: bool
+
+
+def test_anthropic_streams_are_opened_through_the_retry_policy(monkeypatch):
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "test-key")
+    monkeypatch.setenv("LLM_CACHE_ENABLED", "0")
+    service = LLMService(LLMModelConfig(provider=ProviderType.ANTHROPIC, model_name="claude-3-5-sonnet-latest"))
+    provider = service._provider
+    monkeypatch.setattr(provider, "retry_policy", RetryPolicy(max_attempts=3, base_delay=0.0))
+    request = StructuredLLMRequest[_Answer](user_prompt="is water molecular?", response_model=_Answer)
+
+    messages = _FakeStreamingMessages()
+    monkeypatch.setattr(provider, "client", SimpleNamespace(messages=messages))
+    # Structured requests default to 20000 max tokens, so they stream
+    assert service.generate_structured(request) == _Answer(is_true=True)
+    assert messages.attempts == 3 and all(stream.closed for stream in messages.opened)
+
+    messages = _FakeStreamingMessages()
+    provider._async_client = SimpleNamespace(messages=messages)
+    assert asyncio.run(service.agenerate_structured(request)) == _Answer(is_true=True)
+    assert messages.attempts == 3 and all(stream.closed for stream in messages.opened)
@@ -0,0 +1,136 @@
+"""
+Tests for coalescing identical in-flight requests.
+"""
+
+import asyncio
+
+import pytest
+
+from agent_management.job_store import InMemoryJobStore
+from agent_management.single_flight import InFlightJobs, SingleFlight, flight_key, normalize_prompt
+
+
+def test_normalized_prompts_share_a_key():
+    assert normalize_prompt("  Show me   Caffeine! ") == normalize_prompt("show me caffeine")
+    assert flight_key("prompt", None, "caffeine") != flight_key("prompt", "gpt-4o", "caffeine")
+
+
+def test_concurrent_callers_share_one_computation():
+    flights = SingleFlight()
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"title": "Caffeine"}
+
+    async def main():
+        return await asyncio.gather(*(flights.run("caffeine", compute) for _ in range(5)))
+
+    results = asyncio.run(main())
+
+    assert len(calls) == 1
+    assert all(result == {"title": "Caffeine"} for result in results)
+    assert flights.stats() == {"in_flight": 0, "leaders": 1, "followers": 4}
+
+
+def test_errors_reach_every_caller_and_are_not_cached():
+    flights = SingleFlight()
+    calls = []
+
+    async def fail():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        raise RuntimeError("PubChem down")
+
+    async def main():
+        return await asyncio.gather(*(flights.run("k", fail) for _ in range(3)), return_exceptions=True)
+
+    assert all(isinstance(r, RuntimeError) for r in asyncio.run(main()))
+    assert len(calls) == 1
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(flights.run("k", fail))
+    assert len(calls) == 2
+
+
+def test_cancelled_caller_does_not_cancel_the_shared_computation():
+    flights = SingleFlight()
+
+    async def compute():
+        await asyncio.sleep(0.05)
+        return "done"
+
+    async def main():
+        first = asyncio.create_task(flights.run("k", compute))
+        second = asyncio.create_task(flights.run("k", compute))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(main()) == "done"
+
+
+def test_in_flight_jobs_attach_until_released():
+    jobs = InFlightJobs()
+
+    assert jobs.claim("caffeine", "job-1") == ("job-1", True)
+    assert jobs.claim("caffeine", "job-2") == ("job-1", False)
+
+    jobs.release("caffeine", "job-1")
+    assert jobs.claim("caffeine", "job-3") == ("job-3", True)
+    assert jobs.stats() == {"in_flight": 1, "started": 2, "attached": 1}
+
+
+def test_in_flight_jobs_count_the_callers_still_waiting():
+    jobs = InFlightJobs()
+    jobs.claim("caffeine", "job-1")
+    jobs.claim("caffeine", "job-1")
+
+    assert jobs.leave("job-1") == 1
+    assert jobs.leave("job-1") == 0
+    assert jobs.leave("job-1") == 0
+    # Jobs run by another worker aren't tracked here
+    assert jobs.leave("job-2") == 0
+
+
+def test_computation_is_cancelled_when_every_caller_is_gone():
+    flights = SingleFlight()
+    finished = []
+
+    async def compute():
+        await asyncio.sleep(0.05)
+        finished.append(1)
+
+    async def main():
+        callers = [asyncio.create_task(flights.run("k", compute)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        for caller in callers:
+            caller.cancel()
+        await asyncio.sleep(0.1)
+
+    asyncio.run(main())
+
+    assert finished == []
+    assert flights.stats()["in_flight"] == 0
+
+
+def test_a_disconnecting_stream_cancels_a_shared_job_only_when_the_last_caller_leaves(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    from routers.prompt import routes
+
+    monkeypatch.setattr(routes, "pipeline_jobs", InMemoryJobStore("pipeline"))
+    monkeypatch.setattr(routes, "pipeline_flights", InFlightJobs())
+    monkeypatch.setattr(routes.pipeline_queue, "submit", lambda job_id, func: 1)
+    monkeypatch.setattr(routes.pipeline_queue, "cancel", lambda job_id: True)
+
+    async def main():
+        job_id, started = await routes._start_pipeline_job("show me caffeine", None)
+        assert (await routes._start_pipeline_job("Show me caffeine!", None)) == (job_id, False)
+
+        await routes._leave_job(job_id)
+        assert routes.pipeline_jobs.get(job_id)["status"] == "processing"
+        await routes._leave_job(job_id)
+        assert routes.pipeline_jobs.get(job_id)["status"] == "cancelled"
+
+    asyncio.run(main())
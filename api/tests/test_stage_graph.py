@@ -0,0 +1,136 @@
+"""
+Tests for the pipeline stage graph.
+"""
+
+import asyncio
+import time
+
+import pytest
+
+from agent_management.stage_graph import StageFailedError, StageGraph
+
+
+def _sleeper(delay, value=None, log=None, name=None):
+    async def stage(inputs):
+        if log is not None:
+            log.append(("start", name))
+        await asyncio.sleep(delay)
+        if log is not None:
+            log.append(("end", name))
+        return value if value is not None else inputs
+    return stage
+
+
+def test_independent_stages_overlap():
+    graph = (
+        StageGraph()
+        .add("script", _sleeper(0.01, "s"))
+        .add("geometry", _sleeper(0.1, "g"), deps=["script"])
+        .add("shell", _sleeper(0.1, "h"), deps=["script"])
+        .add("package", _sleeper(0.0), deps=["geometry", "shell"])
+    )
+
+    started = time.perf_counter()
+    results = asyncio.run(graph.run())
+    elapsed = time.perf_counter() - started
+
+    assert elapsed < 0.18
+    assert results["package"].value == {"geometry": "g", "shell": "h"}
+    assert all(r.status == "success" for r in results.values())
+    assert results["geometry"].duration_ms >= 100
+
+
+def test_retries_until_success():
+    calls = []
+
+    async def flaky(inputs):
+        calls.append(1)
+        if len(calls) < 3:
+            raise RuntimeError("transient")
+        return "ok"
+
+    results = asyncio.run(StageGraph().add("llm", flaky, retries=2, retry_delay=0.001).run())
+
+    assert results["llm"].status == "success"
+    assert results["llm"].attempts == 3
+
+
+def test_critical_failure_cancels_running_stages():
+    log = []
+
+    async def boom(inputs):
+        await asyncio.sleep(0.01)
+        raise ValueError("bad plan")
+
+    graph = (
+        StageGraph()
+        .add("orchestration", boom)
+        .add("questions", _sleeper(1.0, log=log, name="questions"))
+        .add("geometry", _sleeper(0.0), deps=["orchestration"])
+    )
+
+    with pytest.raises(StageFailedError) as excinfo:
+        asyncio.run(graph.run())
+
+    assert excinfo.value.stage == "orchestration"
+    assert str(excinfo.value.error) == "bad plan"
+    assert excinfo.value.results["questions"].status == "cancelled"
+    assert ("end", "questions") not in log
+
+
+def test_non_critical_failure_skips_dependents_only():
+    async def boom(inputs):
+        raise RuntimeError("no questions")
+
+    graph = (
+        StageGraph()
+        .add("script", _sleeper(0.0, "s"))
+        .add("questions", boom, deps=["script"], critical=False)
+        .add("quiz_page", _sleeper(0.0), deps=["questions"], critical=False)
+        .add("package", _sleeper(0.0, "p"), deps=["script"])
+    )
+
+    results = asyncio.run(graph.run())
+
+    assert results["questions"].status == "failed"
+    assert results["quiz_page"].status == "skipped"
+    assert results["package"].value == "p"
+
+
+def test_stage_timeout():
+    graph = StageGraph().add("slow", _sleeper(1.0), timeout=0.01, critical=False)
+
+    results = asyncio.run(graph.run())
+
+    assert results["slow"].status == "timeout"
+
+
+def test_invalid_graphs_are_rejected():
+    with pytest.raises(ValueError):
+        StageGraph().add("a", _sleeper(0), deps=["missing"]).validate()
+    with pytest.raises(ValueError):
+        StageGraph().add("a", _sleeper(0), deps=["b"]).add("b", _sleeper(0), deps=["a"]).validate()
+
+
+def test_async_hooks_are_awaited_before_the_stage_runs_and_completes():
+    log = []
+
+    async def on_start(name):
+        await asyncio.sleep(0.01)
+        log.append(("hook start", name))
+
+    async def on_finish(result):
+        await asyncio.sleep(0.01)
+        log.append(("hook finish", result.name))
+
+    graph = (
+        StageGraph()
+        .add("script", _sleeper(0.0, "s", log, "script"))
+        .add("plan", _sleeper(0.0, "p", log, "plan"), deps=["script"])
+    )
+    asyncio.run(graph.run(on_start=on_start, on_finish=on_finish))
+
+    assert log == [
+        ("hook start", "script"), ("start", "script"), ("end", "script"), ("hook finish", "script"),
+        ("hook start", "plan"), ("start", "plan"), ("end", "plan"), ("hook finish", "plan"),
+    ]
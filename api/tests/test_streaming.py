@@ -0,0 +1,176 @@
+"""
+Tests for token streaming (LLMService.stream / astream and the streaming endpoints).
+
+The SDK clients are replaced with small fakes so no network is used.
+"""
+
+import asyncio
+import json
+from types import SimpleNamespace
+
+from agent_management.llm_service import (
+    LLMModelConfig,
+    LLMRequest,
+    LLMService,
+    LLMStreamChunk,
+    ProviderType,
+)
+
+
+def _delta_chunk(text):
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))], usage=None)
+
+
+def _usage_chunk():
+    usage = SimpleNamespace(prompt_tokens=4, completion_tokens=3, total_tokens=7)
+    return SimpleNamespace(choices=[], usage=usage)
+
+
+class FakeStream:
+    """Sync and async SDK stream over a fixed list of chunks"""
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.closed = True
+
+    def __iter__(self):
+        return iter(self.chunks)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.closed = True
+
+    async def __aiter__(self):
+        for chunk in self.chunks:
+            await asyncio.sleep(0)
+            yield chunk
+
+
+class FakeCompletions:
+    def __init__(self, chunks):
+        self.stream = FakeStream(chunks)
+        self.calls = []
+
+    def create(self, **params):
+        self.calls.append(params)
+        return self.stream
+
+
+class FakeAsyncCompletions(FakeCompletions):
+    async def create(self, **params):
+        self.calls.append(params)
+        return self.stream
+
+
+def _openai_service(monkeypatch, completions):
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    service = LLMService(LLMModelConfig(provider=ProviderType.OPENAI, model_name="gpt-4o"))
+    client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    service._provider.client = client
+    service._provider._async_client = client
+    return service
+
+
+def test_openai_astream_yields_deltas_then_usage(monkeypatch):
+    completions = FakeAsyncCompletions([_delta_chunk("const "), _delta_chunk("x = 1;"), _usage_chunk()])
+    service = _openai_service(monkeypatch, completions)
+
+    async def collect():
+        return [chunk async for chunk in service.astream("write code")]
+
+    chunks = asyncio.run(collect())
+
+    assert [chunk.delta for chunk in chunks[:-1]] == ["const ", "x = 1;"]
+    assert chunks[-1].is_final
+    assert chunks[-1].content == "const x = 1;"
+    assert chunks[-1].usage["total_tokens"] == 7
+    assert completions.calls[0]["stream"] is True
+    assert completions.calls[0]["stream_options"] == {"include_usage": True}
+    assert completions.stream.closed
+
+
+def test_generate_honours_the_stream_flag(monkeypatch):
+    completions = FakeCompletions([_delta_chunk("hel"), _delta_chunk("lo"), _usage_chunk()])
+    service = _openai_service(monkeypatch, completions)
+
+    response = service.generate(LLMRequest(user_prompt="say hello", stream=True))
+
+    assert response.content == "hello"
+    assert response.usage["completion_tokens"] == 3
+
+
+def test_groq_reads_usage_from_the_x_groq_extension(monkeypatch):
+    monkeypatch.setenv("GROQ_API_KEY", "test-key")
+    service = LLMService(LLMModelConfig(provider=ProviderType.GROQ, model_name="llama3-8b-8192"))
+    usage = SimpleNamespace(prompt_tokens=1, completion_tokens=1, total_tokens=2)
+    last = SimpleNamespace(
+        choices=[SimpleNamespace(delta=SimpleNamespace(content=None))], usage=None, x_groq=SimpleNamespace(usage=usage)
+    )
+    service._provider.client = SimpleNamespace(
+        chat=SimpleNamespace(completions=FakeCompletions([_delta_chunk("hi"), last]))
+    )
+
+    chunks = list(service.stream("greet"))
+
+    assert chunks[0].delta == "hi"
+    assert chunks[-1].usage["total_tokens"] == 2
+
+
+def test_providers_without_native_streaming_fall_back_to_one_delta():
+    from agent_management.llm_service import LLMProvider, LLMResponse
+
+    class OneShotProvider(LLMProvider):
+        def generate(self, request):
+            return LLMResponse(content="done", model="fake", usage={"total_tokens": 1})
+
+        def generate_structured(self, request):
+            raise NotImplementedError
+
+        async def agenerate(self, request):
+            return self.generate(request)
+
+        async def agenerate_structured(self, request):
+            raise NotImplementedError
+
+    chunks = list(OneShotProvider().stream(LLMRequest(user_prompt="x")))
+
+    assert [chunk.delta for chunk in chunks] == ["done", ""]
+    assert chunks[-1].is_final and chunks[-1].content == "done"
+
+
+def test_geometry_stream_endpoint_forwards_chunks(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    monkeypatch.setenv("JOB_STORE_URL", "memory")
+    from fastapi.testclient import TestClient
+    from main import app
+    from routers.prompt import routes
+
+    class StreamingGeometryAgent:
+        async def astream_geometry_snippet(self, prompt):
+            yield LLMStreamChunk(delta="const mol")
+            yield LLMStreamChunk(delta="ecule = 1;")
+            yield LLMStreamChunk(content="const molecule = 1;", usage={"total_tokens": 9})
+            yield "// formatted\nconst molecule = 1;"
+
+    monkeypatch.setattr(routes.AgentFactory, "create_geometry_agent", staticmethod(lambda model=None: StreamingGeometryAgent()))
+
+    with TestClient(app) as client:
+        response = client.post("/prompt/generate-geometry/stream/", json={"prompt": "show me caffeine"})
+
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = [
+        (block.split("\n")[0][len("event: "):], json.loads(block.split("\n")[1][len("data: "):]))
+        for block in response.text.strip().split("\n\n")
+    ]
+    assert events[:2] == [("delta", {"text": "const mol"}), ("delta", {"text": "ecule = 1;"})]
+    assert events[-1][0] == "done"
+    assert events[-1][1]["result"].startswith("// formatted")
+    assert events[-1][1]["usage"] == {"total_tokens": 9}
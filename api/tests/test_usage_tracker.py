@@ -0,0 +1,157 @@
+"""
+Tests for per-call token, cost and latency accounting.
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from agent_management.llm_service import (
+    LLMModelConfig,
+    LLMRequest,
+    LLMResponse,
+    LLMService,
+    ProviderType,
+    StructuredLLMRequest,
+)
+from agent_management.models import BooleanResponse
+from agent_management.usage_tracker import (
+    UsageTracker,
+    estimate_cost,
+    record_retry,
+    report_usage,
+    usage_context,
+    usage_tracker,
+)
+
+
+class FakeProvider:
+    """Provider stand-in that reports usage like the real ones"""
+
+    def generate(self, request):
+        return LLMResponse(
+            content="ok", model=request.llm_config.model_name,
+            usage={"prompt_tokens": 1000, "completion_tokens": 500, "total_tokens": 1500},
+        )
+
+    def generate_structured(self, request):
+        record_retry()
+        report_usage({"prompt_tokens": 200, "completion_tokens": 20, "total_tokens": 220})
+        return BooleanResponse(is_true=True)
+
+    async def agenerate(self, request):
+        await asyncio.sleep(0)
+        return self.generate(request)
+
+    async def agenerate_structured(self, request):
+        return self.generate_structured(request)
+
+
+@pytest.fixture
+def service(monkeypatch):
+    monkeypatch.setenv("LLM_CACHE_ENABLED", "0")
+    usage_tracker.clear()
+    config = LLMModelConfig(provider=ProviderType.OPENAI, model_name="gpt-4o", api_key="sk-test")
+    service = LLMService(config, agent="geometry")
+    service._provider = FakeProvider()
+    yield service
+    usage_tracker.clear()
+
+
+def test_calls_are_recorded_with_agent_job_tokens_and_cost(service):
+    with usage_context(job_id="job-1"):
+        service.generate("draw water")
+        service.generate_structured(
+            StructuredLLMRequest(user_prompt="is water molecular?", response_model=BooleanResponse)
+        )
+
+    first, second = usage_tracker.records("job-1")
+    assert (first.agent, first.provider, first.model, first.operation) == ("geometry", "openai", "gpt-4o", "generate")
+    assert first.prompt_tokens == 1000 and first.completion_tokens == 500
+    assert first.cost_usd == pytest.approx(estimate_cost("gpt-4o", 1000, 500))
+    assert second.operation == "generate_structured"
+    assert second.total_tokens == 220 and second.retries == 1
+
+
+def test_summary_aggregates_per_job_agent_and_model(service):
+    async def run_job(job_id):
+        with usage_context(job_id=job_id):
+            await service.agenerate(LLMRequest(user_prompt=f"prompt for {job_id}"))
+
+    async def main():
+        await asyncio.gather(run_job("a"), run_job("b"))
+
+    asyncio.run(main())
+    service.generate("no job")
+
+    summary = usage_tracker.summary()
+    assert summary["totals"]["calls"] == 3
+    assert set(summary["by_job"]) == {"a", "b"}
+    assert summary["by_agent"]["geometry"]["total_tokens"] == 4500
+    assert summary["by_model"]["gpt-4o"]["calls"] == 3
+    assert usage_tracker.summary("a")["totals"]["calls"] == 1
+
+
+def test_failed_calls_are_recorded_as_errors(service):
+    def fail(request):
+        raise RuntimeError("provider down")
+
+    service._provider.generate = fail
+    with pytest.raises(RuntimeError):
+        service.generate("draw water")
+
+    (record,) = usage_tracker.records()
+    assert record.error == "RuntimeError: provider down"
+    assert usage_tracker.summary()["totals"]["errors"] == 1
+
+
+def test_tracker_is_bounded_and_prices_unknown_models_as_none():
+    tracker = UsageTracker(max_records=2)
+    for _ in range(3):
+        with tracker.track("groq", "some-new-model", "generate"):
+            pass
+
+    assert len(tracker.records()) == 2
+    assert tracker.records()[0].cost_usd is None
+    assert estimate_cost("gpt-4o-mini-2024", 1_000_000, 0) == pytest.approx(0.15)
+
+
+def test_streamed_anthropic_generations_report_the_final_message_usage(monkeypatch):
+    monkeypatch.setenv("LLM_CACHE_ENABLED", "0")
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "test-key")
+    usage_tracker.clear()
+    service = LLMService(LLMModelConfig(provider=ProviderType.ANTHROPIC, model_name="claude-3-5-sonnet-latest"))
+
+    class Stream:
+        def __init__(self):
+            self.events = iter([
+                SimpleNamespace(type="message_start"),
+                SimpleNamespace(type="content_block_delta", delta=SimpleNamespace(type="text_delta", text="ok")),
+            ])
+
+        def __next__(self):
+            return next(self.events)
+
+        def __iter__(self):
+            return self
+
+        def close(self):
+            pass
+
+        def get_final_message(self):
+            return SimpleNamespace(usage=SimpleNamespace(input_tokens=1200, output_tokens=300))
+
+    class Messages:
+        def stream(self, **params):
+            return SimpleNamespace(__enter__=Stream)
+
+    service._provider.client = SimpleNamespace(messages=Messages())
+    # Above 4096 max tokens the generation is streamed
+    response = service.generate(LLMRequest(user_prompt="describe water", max_tokens=8000))
+
+    assert response.usage["total_tokens"] == 1500
+    (record,) = usage_tracker.records()
+    assert (record.prompt_tokens, record.completion_tokens) == (1200, 300)
+    assert record.cost_usd > 0
+    usage_tracker.clear()